@@ -0,0 +1,36 @@
+# api/routes/export.py
+# Exportação de tabelas inteiras em Arrow IPC (backend/arrow_ipc.py), para notebooks:
+#   pyarrow.ipc.open_stream(resposta).read_pandas()
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from .. import crud
+from ..arrow_ipc import ARROW_BATCH_SIZE, arrow_response
+from ..db import get_async_db, get_read_db
+from ..etag import conditional, conditional_async
+
+router = APIRouter()
+# rotas de leitura assíncronas (DB_MODE=async); mesmo contrato das síncronas
+async_router = APIRouter()
+
+
+def export_headers(request: Request, table: str) -> dict:
+    if table not in crud.EXPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail=f"tabela desconhecida; use uma de {sorted(crud.EXPORT_COLUMNS)}")
+    headers = dict(getattr(request.state, "cache_headers", None) or {})
+    headers["Content-Disposition"] = f'attachment; filename="{table}.arrow"'
+    return headers
+
+
+@router.get("/{table}.arrow", dependencies=[Depends(conditional("export"))])
+def export_table(request: Request, table: str, db: Session = Depends(get_read_db)):
+    """Tabela inteira (pois, indicadores ou municipios sem geometria) em Arrow IPC, lida do cursor em lotes."""
+    headers = export_headers(request, table)
+    partitions = crud.stream_partitions(db, crud.export_stmt(table), ARROW_BATCH_SIZE)
+    return arrow_response(partitions, crud.EXPORT_COLUMNS[table], headers)
+
+
+@async_router.get("/{table}.arrow", dependencies=[Depends(conditional_async("export"))])
+async def export_table_async(request: Request, table: str, db=Depends(get_async_db)):
+    headers = export_headers(request, table)
+    partitions = crud.stream_partitions_async(db, crud.export_stmt(table), ARROW_BATCH_SIZE)
+    return arrow_response(partitions, crud.EXPORT_COLUMNS[table], headers)
@@ -1,19 +1,216 @@
 # api/routes/indicadores.py
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+import math
+from typing import Dict, List, Tuple
 from sqlalchemy.orm import Session
 from .. import crud, schemas
-from ..db import get_db
+from ..arrow_ipc import ARROW_BATCH_SIZE, arrow_response
+from ..db import get_async_db, get_read_db
+from ..etag import conditional, conditional_async
+from ..autocorrelation import DEFAULT_PERMUTATIONS, moran
+from ..contiguity import load_graph, load_graph_async, municipio_graph
+from ..indicators import INDICADOR_FIELDS, NORMALIZATIONS, indicador_matrix, load_matrix, load_matrix_async
 
 router = APIRouter()
+# rotas de leitura assíncronas (DB_MODE=async); mesmo contrato das síncronas
+async_router = APIRouter()
 
-@router.get("/", response_model=List[schemas.IndicadorOut])
-def read_indicadores(skip: int = 0, limit: int = 1000, db: Session = Depends(get_db)):
+FORMAT = Query("json", regex="^(json|arrow)$", description="json | arrow (Arrow IPC, backend/arrow_ipc.py)")
+# códigos por comparação: o estado inteiro (645) cabe com folga
+COMPARE_MAX_CODES = 1000
+CODES = Query(..., example="3550308,3509502", description="códigos IBGE separados por vírgula")
+STATS = Query(False, description="inclui z-score e percentil no estado")
+INDICATOR = Query(..., regex=f"^({'|'.join(INDICADOR_FIELDS)})$", description=" | ".join(INDICADOR_FIELDS))
+BINS = Query(10, ge=1, le=100, description="número de faixas")
+PERMUTATIONS = Query(DEFAULT_PERMUTATIONS, ge=0, le=9999, description="permutações do teste de significância")
+SEED = Query(0, ge=0, description="semente das permutações (mesma semente, mesmo resultado)")
+WEIGHTS = Query(..., example="saneamento:0.5,idh_educacao:0.3,renda_per_capita:-0.2",
+                description="indicador:peso separados por vírgula (peso negativo inverte o sentido)")
+NORMALIZE = Query("minmax", regex=f"^({'|'.join(NORMALIZATIONS)})$", description=" | ".join(NORMALIZATIONS))
+CLASSES = Query(5, ge=1, le=20, description="classes do coroplético (quantis em `breaks`)")
+
+def autocorrelation(graph, matrix, indicator: str, permutations: int, seed: int) -> dict:
+    """Moran/LISA do indicador, guardado no grafo da versão (grafo e matriz são da mesma versão)."""
+    def compute():
+        values = matrix.column(indicator, [e.ibge_code for e in graph.entries])
+        return {"indicator": indicator, **moran(graph, values, permutations, seed)}
+    return graph.cached(("moran", indicator, permutations, seed), compute)
+
+def parse_codes(codes: List[str]) -> List[str]:
+    """Códigos sem repetição, na ordem pedida; 400 se vazio ou acima de COMPARE_MAX_CODES."""
+    unique = list(dict.fromkeys(c.strip() for c in codes if c and c.strip()))
+    if not unique:
+        raise HTTPException(status_code=400, detail="codes vazio")
+    if len(unique) > COMPARE_MAX_CODES:
+        raise HTTPException(status_code=400, detail=f"no máximo {COMPARE_MAX_CODES} códigos por comparação")
+    return unique
+
+def split_codes(codes: str) -> List[str]:
+    return parse_codes(codes.split(","))
+
+def parse_weights(weights: str) -> List[Tuple[str, float]]:
+    """'saneamento:0.5,idh:0.3' -> [(indicador, peso)]; 400 se o formato, o indicador ou o peso é inválido."""
+    parsed: Dict[str, float] = {}
+    for item in filter(None, (w.strip() for w in weights.split(","))):
+        field, sep, value = (p.strip() for p in item.partition(":"))
+        if not sep or field not in INDICADOR_FIELDS:
+            raise HTTPException(status_code=400, detail=f"peso inválido: {item!r} (use indicador:peso, "
+                                                        f"indicador em {', '.join(INDICADOR_FIELDS)})")
+        if field in parsed:
+            raise HTTPException(status_code=400, detail=f"indicador repetido: {field}")
+        try:
+            parsed[field] = float(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"peso inválido: {item!r}")
+        if not math.isfinite(parsed[field]):
+            raise HTTPException(status_code=400, detail=f"peso inválido: {item!r}")
+    if not any(parsed.values()):
+        raise HTTPException(status_code=400, detail="weights precisa de ao menos um peso diferente de zero")
+    return list(parsed.items())
+
+def get_matrix(db: Session, version: int):
+    return indicador_matrix.get(version, lambda: load_matrix(db))
+
+async def get_matrix_async(db, version: int):
+    matrix = indicador_matrix.current(version)
+    if matrix is None:
+        rows = await load_matrix_async(db)
+        matrix = await run_in_threadpool(indicador_matrix.put, version, rows)
+    return matrix
+
+@router.get("/", response_model=List[schemas.IndicadorOut], dependencies=[Depends(conditional("indicadores"))])
+def read_indicadores(request: Request, skip: int = 0, limit: int = 1000, format: str = FORMAT,
+                     db: Session = Depends(get_read_db)):
+    if format == "arrow":
+        return arrow_response(crud.stream_partitions(db, crud.indicadores_stmt(skip, limit), ARROW_BATCH_SIZE),
+                              crud.INDICADOR_COLUMNS, getattr(request.state, "cache_headers", None))
     return crud.list_indicadores(db, skip=skip, limit=limit)
 
-@router.get("/{ibge_code}", response_model=schemas.IndicadorOut)
-def get_indicador(ibge_code: str, db: Session = Depends(get_db)):
+@router.get("/stats", response_model=Dict[str, schemas.IndicadorStats])
+def indicadores_stats(db: Session = Depends(get_read_db), version: int = Depends(conditional("indicadores-stats"))):
+    """
+    Estatísticas do estado por indicador (contagem, ausentes, média, desvio, mínimo, quartis,
+    máximo), calculadas de uma vez sobre a matriz em memória e guardadas até os dados mudarem.
+    """
+    return get_matrix(db, version).describe()
+
+@router.get("/histogram", response_model=schemas.IndicadorHistogram)
+def indicadores_histogram(indicator: str = INDICATOR, bins: int = BINS, db: Session = Depends(get_read_db),
+                          version: int = Depends(conditional("indicadores-histogram"))):
+    return get_matrix(db, version).histogram(indicator, bins)
+
+@router.get("/correlation", response_model=schemas.IndicadorCorrelation)
+def indicadores_correlation(db: Session = Depends(get_read_db),
+                            version: int = Depends(conditional("indicadores-correlation"))):
+    """Correlação de Pearson entre os indicadores, par a par sobre os municípios com os dois valores."""
+    return get_matrix(db, version).correlation()
+
+@router.get("/autocorrelation", response_model=schemas.Autocorrelation)
+def indicadores_autocorrelation(indicator: str = INDICATOR, permutations: int = PERMUTATIONS, seed: int = SEED,
+                                db: Session = Depends(get_read_db),
+                                version: int = Depends(conditional("indicadores-autocorrelation"))):
+    """
+    Autocorrelação espacial do indicador: Moran global e LISA por município (clusters HH, LL,
+    HL, LH) sobre a vizinhança gravada pelo ETL, com teste de permutação vetorizado
+    (backend/autocorrelation.py). O resultado fica guardado até a versão dos dados mudar.
+    """
+    graph = municipio_graph.get(version, lambda: load_graph(db))
+    return autocorrelation(graph, get_matrix(db, version), indicator, permutations, seed)
+
+@router.get("/composite", response_model=schemas.IndicadorComposite)
+def indicadores_composite(weights: str = WEIGHTS, normalize: str = NORMALIZE, classes: int = CLASSES,
+                          db: Session = Depends(get_read_db),
+                          version: int = Depends(conditional("indicadores-composite"))):
+    """
+    Índice composto ponderado para todos os municípios, numa passada vetorizada sobre a matriz
+    em memória: valor, rank e percentil de cada um e os quantis (`breaks`) para o coroplético.
+    O resultado fica guardado por combinação de pesos até a versão dos dados mudar.
+    """
+    weights = parse_weights(weights)
+    return get_matrix(db, version).composite(weights, normalize, classes)
+
+@router.get("/compare", response_model=schemas.IndicadorCompareOut)
+def compare_indicadores(codes: str = CODES, stats: bool = STATS, db: Session = Depends(get_read_db),
+                        version: int = Depends(conditional("indicadores-compare"))):
+    """
+    Indicadores de vários municípios numa chamada, na ordem pedida, lidos da matriz em memória
+    (backend/indicators.py, refeita quando a versão dos dados muda). Com `stats`, cada um vem
+    com z-score e percentil no estado. Códigos sem indicador saem em `missing`.
+    """
+    codes = split_codes(codes)
+    return get_matrix(db, version).compare(codes, stats)
+
+@router.post("/compare", response_model=schemas.IndicadorCompareOut)
+def compare_indicadores_post(body: schemas.IndicadorCompareIn, db: Session = Depends(get_read_db)):
+    """Mesmo que GET /compare, com os códigos no corpo (listas longas de relatórios)."""
+    codes = parse_codes(body.codes)
+    return get_matrix(db, crud.get_data_version(db)).compare(codes, body.stats)
+
+@router.get("/{ibge_code}", response_model=schemas.IndicadorOut, dependencies=[Depends(conditional("indicador"))])
+def get_indicador(ibge_code: str, db: Session = Depends(get_read_db)):
     ind = crud.get_indicador_by_ibge(db, ibge_code)
     if not ind:
         raise HTTPException(status_code=404, detail="Indicador not found")
     return ind
+
+
+@async_router.get("/", response_model=List[schemas.IndicadorOut], dependencies=[Depends(conditional_async("indicadores"))])
+async def read_indicadores_async(request: Request, skip: int = 0, limit: int = 1000, format: str = FORMAT,
+                                 db=Depends(get_async_db)):
+    if format == "arrow":
+        partitions = crud.stream_partitions_async(db, crud.indicadores_stmt(skip, limit), ARROW_BATCH_SIZE)
+        return arrow_response(partitions, crud.INDICADOR_COLUMNS, getattr(request.state, "cache_headers", None))
+    return await crud.list_indicadores_async(db, skip=skip, limit=limit)
+
+@async_router.get("/stats", response_model=Dict[str, schemas.IndicadorStats])
+async def indicadores_stats_async(db=Depends(get_async_db), version: int = Depends(conditional_async("indicadores-stats"))):
+    return (await get_matrix_async(db, version)).describe()
+
+@async_router.get("/histogram", response_model=schemas.IndicadorHistogram)
+async def indicadores_histogram_async(indicator: str = INDICATOR, bins: int = BINS, db=Depends(get_async_db),
+                                      version: int = Depends(conditional_async("indicadores-histogram"))):
+    return (await get_matrix_async(db, version)).histogram(indicator, bins)
+
+@async_router.get("/correlation", response_model=schemas.IndicadorCorrelation)
+async def indicadores_correlation_async(db=Depends(get_async_db),
+                                        version: int = Depends(conditional_async("indicadores-correlation"))):
+    return (await get_matrix_async(db, version)).correlation()
+
+@async_router.get("/autocorrelation", response_model=schemas.Autocorrelation)
+async def indicadores_autocorrelation_async(indicator: str = INDICATOR, permutations: int = PERMUTATIONS,
+                                            seed: int = SEED, db=Depends(get_async_db),
+                                            version: int = Depends(conditional_async("indicadores-autocorrelation"))):
+    graph = municipio_graph.current(version)
+    if graph is None:
+        rows = await load_graph_async(db)
+        graph = await run_in_threadpool(municipio_graph.put, version, rows)
+    matrix = await get_matrix_async(db, version)
+    # permutações são CPU: fora do event loop
+    return await run_in_threadpool(autocorrelation, graph, matrix, indicator, permutations, seed)
+
+@async_router.get("/composite", response_model=schemas.IndicadorComposite)
+async def indicadores_composite_async(weights: str = WEIGHTS, normalize: str = NORMALIZE, classes: int = CLASSES,
+                                      db=Depends(get_async_db),
+                                      version: int = Depends(conditional_async("indicadores-composite"))):
+    weights = parse_weights(weights)
+    return (await get_matrix_async(db, version)).composite(weights, normalize, classes)
+
+@async_router.get("/compare", response_model=schemas.IndicadorCompareOut)
+async def compare_indicadores_async(codes: str = CODES, stats: bool = STATS, db=Depends(get_async_db),
+                                    version: int = Depends(conditional_async("indicadores-compare"))):
+    codes = split_codes(codes)
+    return (await get_matrix_async(db, version)).compare(codes, stats)
+
+@async_router.post("/compare", response_model=schemas.IndicadorCompareOut)
+async def compare_indicadores_post_async(body: schemas.IndicadorCompareIn, db=Depends(get_async_db)):
+    codes = parse_codes(body.codes)
+    version = await crud.get_data_version_async(db)
+    return (await get_matrix_async(db, version)).compare(codes, body.stats)
+
+@async_router.get("/{ibge_code}", response_model=schemas.IndicadorOut, dependencies=[Depends(conditional_async("indicador"))])
+async def get_indicador_async(ibge_code: str, db=Depends(get_async_db)):
+    ind = await crud.get_indicador_by_ibge_async(db, ibge_code)
+    if not ind:
+        raise HTTPException(status_code=404, detail="Indicador not found")
+    return ind
@@ -1,49 +1,279 @@
 # api/routes/municipios.py
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import Iterator, List, Optional
 import json
 from sqlalchemy.orm import Session
 from .. import crud, schemas
-from ..db import get_db
+from ..cards import load_cards, load_cards_async, municipio_cards
+from ..contiguity import load_graph, load_graph_async, municipio_graph
+from ..db import get_async_db, get_read_db
+from ..etag import conditional, conditional_async
+from ..flatgeobuf import MEDIA_TYPE as FGB_MEDIA_TYPE, build_municipios_fgb
+from ..geometry import (FEATURE_COLLECTION_HEAD, FEATURE_COLLECTION_TAIL, encode_feature, feature_collection,
+                        geometry_text)
+from ..names import municipio_names
+from ..spatial import round_geometry
+from ..shared_index import GEOJSON_LIMIT, GEOJSON_SKIP, shared_fgb, shared_geojson
+from ..singleflight import async_flights, flights, request_key
+from ..streaming import FORMAT, ranged_file_response, stream_response
+from .pois import parse_bbox
 
 router = APIRouter()
+# rotas de leitura assíncronas (DB_MODE=async); mesmo contrato das síncronas
+async_router = APIRouter()
+
+SEARCH_QUERY = Query(None, max_length=100, description="autocomplete do nome (sem acento, prefixo, tolera erro)")
+
+def name_matches(index, q: str, skip: int, limit: int):
+    """Resultado do autocomplete no formato de MunicipioOut, sem geometria (só id, código e nome)."""
+    return [m._asdict() for m in index.search(q, limit=skip + limit)[skip:]]
 
 @router.get("/", response_model=List[schemas.MunicipioOut])
-def read_municipios(skip: int = 0, limit: int = 1000, db: Session = Depends(get_db)):
+def read_municipios(skip: int = 0, limit: int = 1000, q: Optional[str] = SEARCH_QUERY,
+                    db: Session = Depends(get_read_db), version: int = Depends(conditional("municipios"))):
+    """
+    Lista os municípios. Com `q`, busca pelo nome no índice em memória (refeito quando os
+    dados mudam): "sao jose" acha "São José dos Campos", mais relevantes primeiro.
+    """
+    if q and q.strip():
+        index = municipio_names.get(version, lambda: crud.list_municipios(
+            db, skip=0, limit=None, columns=crud.MUNICIPIO_NAME_COLUMNS))
+        return name_matches(index, q, skip, limit)
     return crud.list_municipios(db, skip=skip, limit=limit)
 
+def load_features(db: Session, skip: int = 0, limit: int = 1000, precision: Optional[int] = None,
+                  bbox: Optional[tuple] = None, ibge_codes: Optional[List[str]] = None) -> List[bytes]:
+    """Features (bytes UTF-8) dos municípios pedidos; sem `precision`, direto da coluna pré-codificada."""
+    municipios = crud.list_municipios(db, skip=skip, limit=limit, bbox=bbox, ibge_codes=ibge_codes,
+                                      columns=feature_columns(precision))
+    return feature_fragments(municipios, precision)
+
+def build_geojson(db: Session, skip: int = 0, limit: int = 1000, precision: Optional[int] = None) -> bytes:
+    """
+    Monta o FeatureCollection dos municípios já serializado em JSON (bytes).
+    Municípios sem geometria ou com geometria inválida são ignorados.
+    """
+    return b"".join(feature_collection(load_features(db, skip=skip, limit=limit, precision=precision)))
+
+def geometry_json(m, precision: Optional[int] = None) -> Optional[str]:
+    """Texto GeoJSON da geometria: da coluna binária (em cache) ou, sem ela, do texto gravado."""
+    blob = getattr(m, "geometry_bin", None)
+    if isinstance(blob, (bytes, memoryview)):
+        return geometry_text(blob, precision)
+    if not m.geometry:
+        return None
+    try:
+        geom = json.loads(m.geometry) if isinstance(m.geometry, str) else m.geometry
+    except Exception as e:
+        return None
+    if precision is not None:
+        geom = round_geometry(geom, precision)
+    return json.dumps(geom, ensure_ascii=False)
+
+def iter_features(municipios, precision: Optional[int] = None) -> Iterator[bytes]:
+    for m in municipios:
+        feature = getattr(m, "feature", None)
+        if precision is None and isinstance(feature, bytes):
+            yield feature
+            continue
+        geom = geometry_json(m, precision)
+        if geom is not None:
+            yield encode_feature(m.id, m.nome, m.ibge_code, geom)
+
+def feature_fragments(municipios, precision: Optional[int] = None) -> List[bytes]:
+    return list(iter_features(municipios, precision))
+
+def feature_columns(precision: Optional[int]) -> tuple:
+    return crud.MUNICIPIO_FEATURE_COLUMNS if precision is None else crud.MUNICIPIO_COLUMNS
+
+def stream_geojson(request: Request, fragments, format: str):
+    """?format=stream|ndjson: FeatureCollection (ou uma Feature por linha) direto do cursor."""
+    return stream_response(fragments, format, getattr(request.state, "cache_headers", None),
+                           head=FEATURE_COLLECTION_HEAD, tail=FEATURE_COLLECTION_TAIL)
+
+def geojson_bytes(municipios, precision: Optional[int] = None) -> bytes:
+    return b"".join(feature_collection(feature_fragments(municipios, precision)))
+
+def parse_subset(bbox: Optional[str], ibge: Optional[str]):
+    """Recorte opcional do FeatureCollection: bbox e/ou lista de códigos IBGE."""
+    return (parse_bbox(bbox) if bbox else None,
+            [code.strip() for code in ibge.split(",") if code.strip()] if ibge else None)
+
 @router.get("/geojson")
-def get_municipios_geojson(skip: int = 0, limit: int = 1000, db: Session = Depends(get_db)):
+def get_municipios_geojson(request: Request, skip: int = 0, limit: int = 1000,
+                           precision: Optional[int] = Query(None, ge=0, le=7, description="casas decimais das coordenadas"),
+                           bbox: Optional[str] = Query(None, example="-46.8,-23.7,-46.3,-23.4"),
+                           ibge: Optional[str] = Query(None, description="códigos IBGE separados por vírgula"),
+                           format: str = FORMAT, db: Session = Depends(get_read_db), version: int = Depends(conditional("municipios-geojson"))):
     """
     Retorna um FeatureCollection GeoJSON com os municípios.
     Cada feature contém `geometry` (objeto GeoJSON) e `properties` com id, nome e ibge_code.
+    Requisições idênticas simultâneas compartilham um único cálculo (single-flight).
+    A página padrão sai de um arquivo publicado uma vez por versão e compartilhado pelos workers;
+    os demais recortes são a concatenação, em streaming, das Features já codificadas no banco.
     """
-    municipios = crud.list_municipios(db, skip=skip, limit=limit)
-    features = []
-    for m in municipios:
-        if not m.geometry:
-            continue
-        try:
-            geom = json.loads(m.geometry) if isinstance(m.geometry, str) else m.geometry
-        except Exception as e:
-            continue
+    box, ibge_codes = parse_subset(bbox, ibge)
+    if format != "json":
+        stmt = crud.municipios_stmt(skip, limit, box, ibge_codes, columns=feature_columns(precision))
+        return stream_geojson(request, iter_features(crud.stream_rows(db, stmt), precision), format)
+    if shared_geojson.enabled and (skip, limit, precision, bbox, ibge) == (GEOJSON_SKIP, GEOJSON_LIMIT, None, None, None):
+        path = shared_geojson.publish(version, lambda: build_geojson(db, skip=skip, limit=limit))
+        return FileResponse(path, media_type="application/json",
+                            headers=getattr(request.state, "cache_headers", None))
+    fragments = flights.do(request_key(request, version),
+                           lambda: load_features(db, skip, limit, precision, box, ibge_codes))
+    return StreamingResponse(feature_collection(fragments), media_type="application/json",
+                             headers=getattr(request.state, "cache_headers", None))
+
+def build_fgb(db: Session) -> bytes:
+    return build_municipios_fgb(crud.list_municipios(db, skip=0, limit=None), crud.list_indicadores(db, limit=None))
+
+def fgb_response(request: Request, path):
+    headers = dict(getattr(request.state, "cache_headers", None) or {})
+    headers["Content-Disposition"] = 'attachment; filename="municipios.fgb"'
+    return ranged_file_response(request, path, FGB_MEDIA_TYPE, headers)
+
+@router.api_route("/export.fgb", methods=["GET", "HEAD"])
+def export_fgb(request: Request, db: Session = Depends(get_read_db),
+               version: int = Depends(conditional("municipios-fgb"))):
+    """
+    Polígonos dos municípios com os indicadores em FlatGeobuf (R-tree de Hilbert embutida),
+    gerado uma vez por versão dos dados. Aceita Range: QGIS/GDAL e flatgeobuf.js leem só o
+    cabeçalho, os nós do índice e as features que cruzam o bbox.
+    """
+    return fgb_response(request, shared_fgb.publish(version, lambda: build_fgb(db)))
+
+def card_response(request: Request, card: Optional[bytes]) -> Response:
+    if card is None:
+        raise HTTPException(status_code=404, detail="Municipio not found")
+    return Response(content=card, media_type="application/json",
+                    headers=getattr(request.state, "cache_headers", None))
+
+@router.get("/{ibge_code}/card", response_model=schemas.MunicipioCard)
+def read_municipio_card(request: Request, ibge_code: str, db: Session = Depends(get_read_db),
+                        version: int = Depends(conditional("municipio-card"))):
+    """
+    Ficha do município: indicadores, rank e percentil no estado, média/mediana do estado,
+    vizinhos e média deles e POIs por tipo. As fichas de todos os municípios são montadas
+    de uma vez por versão dos dados (backend/cards.py) e guardadas já em JSON.
+    """
+    cards = municipio_cards.get(version, lambda: load_cards(db))
+    return card_response(request, cards.get(ibge_code))
 
-        features.append({
-            "type": "Feature",
-            "geometry": geom,
-            "properties": {
-                "id": m.id,
-                "nome": m.nome,
-                "ibge_code": m.ibge_code
-            }
-        })
+def neighbor_list(graph, ibge_code: str):
+    neighbors = graph.neighbors(ibge_code)
+    if neighbors is None:
+        raise HTTPException(status_code=404, detail="Municipio not found")
+    return [m._asdict() for m in neighbors]
 
-    return {"type": "FeatureCollection", "features": features}
+@router.get("/{ibge_code}/neighbors", response_model=List[schemas.MunicipioOut])
+def read_municipio_neighbors(ibge_code: str, db: Session = Depends(get_read_db),
+                             version: int = Depends(conditional("municipio-neighbors"))):
+    """Municípios que fazem divisa (vizinhança queen gravada pelo ETL), sem geometria."""
+    graph = municipio_graph.get(version, lambda: load_graph(db))
+    return neighbor_list(graph, ibge_code)
 
-@router.get("/{ibge_code}", response_model=schemas.MunicipioOut)
-def read_municipio(ibge_code: str, db: Session = Depends(get_db)):
+@router.get("/{ibge_code}", response_model=schemas.MunicipioOut, dependencies=[Depends(conditional("municipio"))])
+def read_municipio(ibge_code: str, db: Session = Depends(get_read_db)):
     m = crud.get_municipio_by_ibge(db, ibge_code)
     if not m:
         raise HTTPException(status_code=404, detail="Municipio not found")
     return m
 
+
+def published_body(body: Optional[bytes], build_body) -> bytes:
+    """
+    build() de SharedGeojson.publish nas rotas assíncronas (roda no threadpool): os bytes já
+    montados ou, se o arquivo sumiu (poda de outro worker) depois da checagem, montados agora
+    no event loop.
+    """
+    return body if body is not None else from_thread.run(build_body)
+
+@async_router.get("/", response_model=List[schemas.MunicipioOut])
+async def read_municipios_async(skip: int = 0, limit: int = 1000, q: Optional[str] = SEARCH_QUERY,
+                                db=Depends(get_async_db), version: int = Depends(conditional_async("municipios"))):
+    if q and q.strip():
+        index = municipio_names.current(version)
+        if index is None:
+            entries = await crud.list_municipios_async(db, skip=0, limit=None, columns=crud.MUNICIPIO_NAME_COLUMNS)
+            index = await run_in_threadpool(municipio_names.put, version, entries)
+        return name_matches(index, q, skip, limit)
+    return await crud.list_municipios_async(db, skip=skip, limit=limit)
+
+@async_router.get("/geojson")
+async def get_municipios_geojson_async(request: Request, skip: int = 0, limit: int = 1000,
+                                       precision: Optional[int] = Query(None, ge=0, le=7),
+                                       bbox: Optional[str] = None, ibge: Optional[str] = None, format: str = FORMAT,
+                                       db=Depends(get_async_db), version: int = Depends(conditional_async("municipios-geojson"))):
+    box, ibge_codes = parse_subset(bbox, ibge)
+    if format != "json":
+        stmt = crud.municipios_stmt(skip, limit, box, ibge_codes, columns=feature_columns(precision))
+
+        async def fragments():
+            async for m in crud.stream_rows_async(db, stmt):
+                for feature in iter_features((m,), precision):
+                    yield feature
+        return stream_geojson(request, fragments(), format)
+
+    async def load():
+        municipios = await crud.list_municipios_async(db, skip=skip, limit=limit, bbox=box,
+                                                      ibge_codes=ibge_codes, columns=feature_columns(precision))
+        # geometrias sem Feature pré-codificada são CPU: sai do event loop
+        return await run_in_threadpool(feature_fragments, municipios, precision)
+
+    async def build_body() -> bytes:
+        fragments = await async_flights.do(request_key(request, version), load)
+        return b"".join(feature_collection(fragments))
+
+    if shared_geojson.enabled and (skip, limit, precision, bbox, ibge) == (GEOJSON_SKIP, GEOJSON_LIMIT, None, None, None):
+        body = None
+        if shared_geojson.version != version and not shared_geojson.path_for(version).exists():
+            body = await build_body()
+        path = await run_in_threadpool(shared_geojson.publish, version, lambda: published_body(body, build_body))
+        return FileResponse(path, media_type="application/json",
+                            headers=getattr(request.state, "cache_headers", None))
+    fragments = await async_flights.do(request_key(request, version), load)
+    return StreamingResponse(feature_collection(fragments), media_type="application/json",
+                             headers=getattr(request.state, "cache_headers", None))
+
+@async_router.api_route("/export.fgb", methods=["GET", "HEAD"])
+async def export_fgb_async(request: Request, db=Depends(get_async_db),
+                           version: int = Depends(conditional_async("municipios-fgb"))):
+    async def build_body() -> bytes:
+        municipios = await crud.list_municipios_async(db, skip=0, limit=None)
+        indicadores = await crud.list_indicadores_async(db, limit=None)
+        return await run_in_threadpool(build_municipios_fgb, municipios, indicadores)
+
+    body = None
+    if shared_fgb.version != version and not shared_fgb.path_for(version).exists():
+        body = await build_body()
+    path = await run_in_threadpool(shared_fgb.publish, version, lambda: published_body(body, build_body))
+    return fgb_response(request, path)
+
+@async_router.get("/{ibge_code}/card", response_model=schemas.MunicipioCard)
+async def read_municipio_card_async(request: Request, ibge_code: str, db=Depends(get_async_db),
+                                    version: int = Depends(conditional_async("municipio-card"))):
+    cards = municipio_cards.current(version)
+    if cards is None:
+        rows = await load_cards_async(db)
+        cards = await run_in_threadpool(municipio_cards.put, version, rows)
+    return card_response(request, cards.get(ibge_code))
+
+@async_router.get("/{ibge_code}/neighbors", response_model=List[schemas.MunicipioOut])
+async def read_municipio_neighbors_async(ibge_code: str, db=Depends(get_async_db),
+                                         version: int = Depends(conditional_async("municipio-neighbors"))):
+    graph = municipio_graph.current(version)
+    if graph is None:
+        rows = await load_graph_async(db)
+        graph = await run_in_threadpool(municipio_graph.put, version, rows)
+    return neighbor_list(graph, ibge_code)
+
+@async_router.get("/{ibge_code}", response_model=schemas.MunicipioOut, dependencies=[Depends(conditional_async("municipio"))])
+async def read_municipio_async(ibge_code: str, db=Depends(get_async_db)):
+    m = await crud.get_municipio_by_ibge_async(db, ibge_code)
+    if not m:
+        raise HTTPException(status_code=404, detail="Municipio not found")
+    return m
@@ -1,46 +1,361 @@
 # api/routes/pois.py
-from fastapi import APIRouter, Depends, Query, HTTPException
+import math
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from .. import crud, schemas
-from ..db import get_db
+from ..db import get_async_db, get_db, get_read_db
+from ..etag import conditional, conditional_async
+from ..cache import quantize_pois, query_cache
+from ..arrow_ipc import ARROW_BATCH_SIZE, arrow_response
+from ..columnar import poi_store
+from ..markers import MEDIA_TYPE as MARKERS_MEDIA_TYPE, markers_from_records
+from ..planner import EMPTY_PLAN, Plan, load_stats, load_stats_async, plan_query, plan_query_async, poi_stats
+from ..spatial import radius_bbox
+from ..streaming import STREAM_FORMATS, compressed_response, poi_json, stream_response
 
 router = APIRouter()
+# rotas de leitura assíncronas (DB_MODE=async); mesmo contrato das síncronas
+async_router = APIRouter()
+
+# casas decimais das coordenadas na resposta (7 = resolução E7; None = sem arredondar)
+PRECISION = Query(None, ge=0, le=7, description="casas decimais de latitude/longitude")
+# json (padrão) | stream/ndjson (backend/streaming.py) | binary (marcadores, backend/markers.py)
+# | arrow (Arrow IPC, backend/arrow_ipc.py)
+FORMAT = Query("json", regex="^(json|stream|ndjson|binary|arrow)$",
+               description="json | stream | ndjson | binary (id, lat, lon e tipo empacotados) | arrow (Arrow IPC)")
+# formatos escritos direto do cursor, em lotes
+CURSOR_FORMATS = (*STREAM_FORMATS, "arrow")
+SEARCH_QUERY = Query(..., min_length=1, max_length=200, description="palavras (ou começo delas) do nome")
+SEARCH_LIMIT = Query(50, ge=1, le=500)
+# /pois/query
+QUERY_TIPOS = Query(None, description="tipos aceitos: ?tipo=school&tipo=hospital ou ?tipo=school,hospital")
+LATITUDE = Query(None, ge=-90, le=90)
+LONGITUDE = Query(None, ge=-180, le=180)
+RADIUS = Query(None, gt=0, le=100000, description="raio em metros em volta de lat/lon")
+NAME_PREFIX = Query(None, min_length=1, max_length=200, description="começo das palavras do nome (FTS)")
+QUERY_LIMIT = Query(200, ge=1, le=10000)
+
+def parse_bbox(bbox: str):
+    # bbox format: "minlon,minlat,maxlon,maxlat"
+    parts = bbox.split(",")
+    if len(parts) != 4:
+        raise HTTPException(status_code=400, detail="bbox must be minlon,minlat,maxlon,maxlat")
+    try:
+        box = tuple(map(float, parts))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox values must be numbers")
+    # inf/nan não viram célula de Hilbert nem inteiro E7
+    if not all(map(math.isfinite, box)):
+        raise HTTPException(status_code=400, detail="bbox values must be finite")
+    return box
+
+def stream_pois(request: Request, db: Session, format: str, precision: Optional[int] = None, stmt=None, **filters):
+    """?format=stream|ndjson|arrow: POIs lidos do cursor em lotes e escritos conforme chegam."""
+    headers = getattr(request.state, "cache_headers", None)
+    stmt = crud.pois_stmt(**filters) if stmt is None else stmt
+    if format == "arrow":
+        return arrow_response(crud.stream_partitions(db, stmt, ARROW_BATCH_SIZE), crud.POI_COLUMNS, headers)
+    rows = crud.stream_rows(db, stmt)
+    return stream_response((poi_json(r, precision) for r in rows), format, headers)
+
+def stream_pois_async(request: Request, db, format: str, precision: Optional[int] = None, stmt=None, **filters):
+    stmt = crud.pois_stmt(**filters) if stmt is None else stmt
+    if format == "arrow":
+        return arrow_response(crud.stream_partitions_async(db, stmt, ARROW_BATCH_SIZE),
+                              crud.POI_COLUMNS, getattr(request.state, "cache_headers", None))
+
+    async def fragments():
+        async for r in crud.stream_rows_async(db, stmt):
+            yield poi_json(r, precision)
+    return stream_response(fragments(), format, getattr(request.state, "cache_headers", None))
+
+def parse_query(tipo: Optional[List[str]], bbox: Optional[str], lat: Optional[float], lon: Optional[float],
+                radius: Optional[float], name: Optional[str]) -> dict:
+    """
+    Filtros de /pois/query: tipos (repetidos ou separados por vírgula), bbox, círculo
+    (lat, lon, radius em metros, que também restringe o bbox) e expressão FTS do nome.
+    `empty` marca filtros que não podem casar com nada (bbox fora do círculo, nome sem palavras).
+    """
+    tipos = sorted({t.strip() for value in tipo or () for t in value.split(",") if t.strip()}) or None
+    box = parse_bbox(bbox) if bbox else None
+    circle = None
+    if (lat, lon, radius).count(None) not in (0, 3):
+        raise HTTPException(status_code=400, detail="lat, lon and radius must be given together")
+    if radius is not None:
+        circle = (lon, lat, radius)
+        around = radius_bbox(lon, lat, radius)
+        box = around if box is None else (max(box[0], around[0]), max(box[1], around[1]),
+                                          min(box[2], around[2]), min(box[3], around[3]))
+    expression = crud.search_expression(name) if name is not None else None
+    empty = (box is not None and (box[0] > box[2] or box[1] > box[3])) or (name is not None and expression is None)
+    return {"tipos": tipos, "bbox": box, "circle": circle, "expression": expression, "empty": empty}
+
+def plan_headers(request: Request, response: Response, plan: Plan) -> None:
+    """Caminho escolhido e linhas estimadas em X-Query-Plan (também nas respostas próprias)."""
+    value = f"{plan.path}; estimate={plan.estimate:.0f}"
+    request.state.cache_headers = {**(getattr(request.state, "cache_headers", None) or {}), "X-Query-Plan": value}
+    response.headers["X-Query-Plan"] = value
+
+def markers_response(request: Request, body: bytes):
+    """?format=binary: buffer de marcadores, com gzip se o cliente aceitar."""
+    return compressed_response(request, body, MARKERS_MEDIA_TYPE)
 
 @router.get("/", response_model=List[schemas.POIOut])
-def get_pois(skip:int=0, limit:int=200, db: Session = Depends(get_db)):
-    return crud.list_pois(db, skip=skip, limit=limit)
+def get_pois(request: Request, skip:int=0, limit:int=200, precision: Optional[int] = PRECISION,
+             format: str = FORMAT, db: Session = Depends(get_read_db), version: int = Depends(conditional("pois"))):
+    if format in CURSOR_FORMATS:
+        return stream_pois(request, db, format, precision, skip=skip, limit=limit)
+    if format == "binary":
+        if poi_store.is_fresh(version):
+            return markers_response(request, poi_store.markers(skip=skip, limit=limit))
+        return markers_response(request, markers_from_records(crud.list_pois(db, skip=skip, limit=limit)))
+    return quantize_pois(crud.list_pois(db, skip=skip, limit=limit), precision)
+
+@router.get("/search", response_model=List[schemas.POIOut], dependencies=[Depends(conditional("pois-search"))])
+def search_pois(q: str = SEARCH_QUERY, tipo: Optional[str] = None, bbox: Optional[str] = None,
+                skip: int = 0, limit: int = SEARCH_LIMIT, precision: Optional[int] = PRECISION,
+                db: Session = Depends(get_read_db)):
+    """
+    Busca POIs pelo nome (FTS5): palavras como prefixo, sem diferenciar acentos, ordenadas
+    por relevância (BM25). `tipo` e `bbox` (minlon,minlat,maxlon,maxlat) restringem o resultado.
+    """
+    box = parse_bbox(bbox) if bbox else None
+    return quantize_pois(crud.search_pois(db, q, tipo=tipo, bbox=box, skip=skip, limit=limit), precision)
+
+@router.get("/query", response_model=List[schemas.POIOut])
+def query_pois(request: Request, response: Response, tipo: Optional[List[str]] = QUERY_TIPOS,
+               ibge_code: Optional[str] = None, bbox: Optional[str] = None, lat: Optional[float] = LATITUDE,
+               lon: Optional[float] = LONGITUDE, radius: Optional[float] = RADIUS, name: Optional[str] = NAME_PREFIX,
+               skip: int = 0, limit: int = QUERY_LIMIT, precision: Optional[int] = PRECISION, format: str = FORMAT,
+               db: Session = Depends(get_read_db), version: int = Depends(conditional("pois-query"))):
+    """
+    Filtros combinados (AND): tipos, município, bbox, raio em volta de lat/lon e prefixo do nome.
+    O caminho de acesso (índice espacial, (tipo, municipio_id), município ou FTS) é o que as
+    estatísticas de cardinalidade apontam como o mais seletivo; vai no cabeçalho X-Query-Plan.
+    """
+    filters = parse_query(tipo, bbox, lat, lon, radius, name)
+    municipio_id = None
+    if ibge_code is not None:
+        municipio_id = crud.get_municipio_id(db, ibge_code)
+        if municipio_id is None:
+            raise HTTPException(status_code=404, detail="Municipio not found")
+    if filters.pop("empty"):
+        plan = EMPTY_PLAN
+    else:
+        stats = poi_stats.get(version, lambda: load_stats(db))
+        plan = plan_query(db, stats, filters["tipos"], municipio_id, filters["bbox"], filters["expression"])
+    plan_headers(request, response, plan)
+    stmt = crud.poi_query_stmt(plan.path, municipio_id=municipio_id, skip=skip, limit=limit, **filters)
+    if format in CURSOR_FORMATS:
+        return stream_pois(request, db, format, precision, stmt=stmt)
+    pois = db.execute(stmt).all()
+    if format == "binary":
+        return markers_response(request, markers_from_records(pois))
+    return quantize_pois(pois, precision)
+
+@router.get("/counts", response_model=List[schemas.POICount], dependencies=[Depends(conditional("pois-counts"))])
+def get_poi_counts(ibge_code: Optional[str] = None, tipo: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Nº de POIs por município e tipo (tabela poi_counts, sem ler os POIs).
+    `ibge_code` e `tipo` filtram: ?ibge_code=3550308&tipo=school = quantas escolas em São Paulo.
+    """
+    return crud.list_poi_counts(db, ibge_code=ibge_code, tipo=tipo)
+
+@router.get("/counts/matrix", response_model=schemas.POICountMatrix,
+            dependencies=[Depends(conditional("pois-counts-matrix"))])
+def get_poi_count_matrix(db: Session = Depends(get_read_db)):
+    """Matriz município x tipo do estado inteiro; POIs fora dos municípios na linha `null`."""
+    return crud.count_matrix(crud.list_poi_counts(db))
 
-@router.get("/tipos")
-def get_poi_types(db: Session = Depends(get_db)):
+@router.get("/tipos", dependencies=[Depends(conditional("pois-tipos"))])
+def get_poi_types(db: Session = Depends(get_read_db)):
     """
-    Retorna lista de tipos/categorias de POIs disponíveis no banco de dados.
+    Retorna lista de tipos/categorias de POIs disponíveis no banco de dados (de poi_counts).
     Útil para popular dropdowns de filtro no frontend.
     """
     tipos = crud.get_poi_types(db)
     return {"tipos": tipos}
 
 @router.get("/tipo/{tipo}", response_model=List[schemas.POIOut])
-def get_pois_by_type(tipo: str, skip: int = 0, limit: int = 200, db: Session = Depends(get_db)):
-    return crud.list_pois_by_type(db, tipo=tipo, skip=skip, limit=limit)
+def get_pois_by_type(request: Request, tipo: str, skip: int = 0, limit: int = 200, precision: Optional[int] = PRECISION,
+                     format: str = FORMAT, db: Session = Depends(get_read_db),
+                     version: int = Depends(conditional("pois-tipo"))):
+    if format in CURSOR_FORMATS:
+        return stream_pois(request, db, format, precision, skip=skip, limit=limit, tipo=tipo)
+    if poi_store.is_fresh(version):
+        if format == "binary":
+            return markers_response(request, poi_store.markers(tipo=tipo, skip=skip, limit=limit))
+        pois = poi_store.pois_by_type(tipo, skip=skip, limit=limit)
+    else:
+        pois = query_cache.pois_by_type(db, tipo=tipo, skip=skip, limit=limit, version=version)
+    if format == "binary":
+        return markers_response(request, markers_from_records(pois))
+    return quantize_pois(pois, precision)
 
 @router.get("/municipio/{ibge_code}", response_model=List[schemas.POIOut])
-def get_pois_by_municipio(ibge_code: str, skip: int = 0, limit: int = 2000, db: Session = Depends(get_db)):
+def get_pois_by_municipio(ibge_code: str, skip: int = 0, limit: int = 2000, precision: Optional[int] = PRECISION,
+                          db: Session = Depends(get_read_db), version: int = Depends(conditional("pois-municipio"))):
     """
     Filtra POIs por município usando o código IBGE.
     Retorna todos os POIs cadastrados naquele município.
     """
-    return crud.list_pois_by_municipio(db, ibge_code=ibge_code, skip=skip, limit=limit)
+    if poi_store.is_fresh(version):
+        pois = poi_store.pois_by_municipio(ibge_code, skip=skip, limit=limit)
+    else:
+        pois = query_cache.pois_by_municipio(db, ibge_code=ibge_code, skip=skip, limit=limit, version=version)
+    return quantize_pois(pois, precision)
 
 @router.get("/bbox", response_model=List[schemas.POIOut])
-def get_pois_bbox(bbox: str = Query(..., example="-46.7,-23.7,-46.4,-23.5"), tipo: Optional[str] = None, db: Session = Depends(get_db)):
-    # bbox format: "minlon,minlat,maxlon,maxlat"
-    parts = bbox.split(",")
-    if len(parts) != 4:
-        raise HTTPException(status_code=400, detail="bbox must be minlon,minlat,maxlon,maxlat")
-    min_lon, min_lat, max_lon, max_lat = map(float, parts)
-    return crud.list_pois_in_bbox(db, min_lon, min_lat, max_lon, max_lat, tipo=tipo)
+def get_pois_bbox(request: Request, bbox: str = Query(..., example="-46.7,-23.7,-46.4,-23.5"), tipo: Optional[str] = None,
+                  precision: Optional[int] = PRECISION, format: str = FORMAT, db: Session = Depends(get_read_db),
+                  version: int = Depends(conditional("pois-bbox"))):
+    min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    if format in CURSOR_FORMATS:
+        return stream_pois(request, db, format, precision, tipo=tipo, bbox=(min_lon, min_lat, max_lon, max_lat))
+    # colunas mapeadas em memória, se estiverem na versão corrente dos dados
+    if poi_store.is_fresh(version):
+        if format == "binary":
+            return markers_response(request, poi_store.markers(bbox=(min_lon, min_lat, max_lon, max_lat), tipo=tipo))
+        pois = poi_store.pois_in_bbox(min_lon, min_lat, max_lon, max_lat, tipo=tipo)
+    else:
+        # o cache busca o bbox alinhado à grade e recorta para o bbox exato
+        pois = query_cache.pois_in_bbox(db, min_lon, min_lat, max_lon, max_lat, tipo=tipo, version=version)
+    if format == "binary":
+        return markers_response(request, markers_from_records(pois))
+    return quantize_pois(pois, precision)
+
+@router.get("/count")
+def count_pois(bbox: Optional[str] = None, tipo: Optional[str] = None, ibge_code: Optional[str] = None,
+               db: Session = Depends(get_read_db), version: int = Depends(conditional("pois-count"))):
+    """
+    Conta POIs com filtros opcionais de bbox, tipo e município (código IBGE).
+    """
+    box = parse_bbox(bbox) if bbox else None
+    if poi_store.is_fresh(version):
+        return {"count": poi_store.count_pois(box, tipo=tipo, ibge_code=ibge_code)}
+    return {"count": crud.count_pois(db, box, tipo=tipo, ibge_code=ibge_code)}
 
 @router.post("/", response_model=schemas.POIOut)
 def create_poi(poi_in: schemas.POICreate, db: Session = Depends(get_db)):
-    return crud.create_poi(db, poi_in)
+    poi, version = crud.create_poi(db, poi_in)
+    query_cache.invalidate_poi(poi, version)
+    poi_store.append(poi, version)
+    return poi
+
+
+@async_router.get("/", response_model=List[schemas.POIOut])
+async def get_pois_async(request: Request, skip: int = 0, limit: int = 200, precision: Optional[int] = PRECISION,
+                         format: str = FORMAT, db=Depends(get_async_db),
+                         version: int = Depends(conditional_async("pois"))):
+    if format in CURSOR_FORMATS:
+        return stream_pois_async(request, db, format, precision, skip=skip, limit=limit)
+    if format == "binary":
+        if poi_store.is_fresh(version):
+            body = await run_in_threadpool(poi_store.markers, skip=skip, limit=limit)
+        else:
+            body = markers_from_records(await crud.list_pois_async(db, skip=skip, limit=limit))
+        return markers_response(request, body)
+    return quantize_pois(await crud.list_pois_async(db, skip=skip, limit=limit), precision)
+
+@async_router.get("/search", response_model=List[schemas.POIOut], dependencies=[Depends(conditional_async("pois-search"))])
+async def search_pois_async(q: str = SEARCH_QUERY, tipo: Optional[str] = None, bbox: Optional[str] = None,
+                            skip: int = 0, limit: int = SEARCH_LIMIT, precision: Optional[int] = PRECISION,
+                            db=Depends(get_async_db)):
+    box = parse_bbox(bbox) if bbox else None
+    return quantize_pois(await crud.search_pois_async(db, q, tipo=tipo, bbox=box, skip=skip, limit=limit), precision)
+
+@async_router.get("/query", response_model=List[schemas.POIOut])
+async def query_pois_async(request: Request, response: Response, tipo: Optional[List[str]] = QUERY_TIPOS,
+                           ibge_code: Optional[str] = None, bbox: Optional[str] = None,
+                           lat: Optional[float] = LATITUDE, lon: Optional[float] = LONGITUDE,
+                           radius: Optional[float] = RADIUS, name: Optional[str] = NAME_PREFIX, skip: int = 0,
+                           limit: int = QUERY_LIMIT, precision: Optional[int] = PRECISION, format: str = FORMAT,
+                           db=Depends(get_async_db), version: int = Depends(conditional_async("pois-query"))):
+    filters = parse_query(tipo, bbox, lat, lon, radius, name)
+    municipio_id = None
+    if ibge_code is not None:
+        municipio_id = await crud.get_municipio_id_async(db, ibge_code)
+        if municipio_id is None:
+            raise HTTPException(status_code=404, detail="Municipio not found")
+    if filters.pop("empty"):
+        plan = EMPTY_PLAN
+    else:
+        stats = poi_stats.current(version)
+        if stats is None:
+            stats = await run_in_threadpool(poi_stats.put, version, await load_stats_async(db))
+        plan = await plan_query_async(db, stats, filters["tipos"], municipio_id, filters["bbox"], filters["expression"])
+    plan_headers(request, response, plan)
+    stmt = crud.poi_query_stmt(plan.path, municipio_id=municipio_id, skip=skip, limit=limit, **filters)
+    if format in CURSOR_FORMATS:
+        return stream_pois_async(request, db, format, precision, stmt=stmt)
+    pois = (await db.execute(stmt)).all()
+    if format == "binary":
+        return markers_response(request, markers_from_records(pois))
+    return quantize_pois(pois, precision)
+
+@async_router.get("/counts", response_model=List[schemas.POICount],
+                  dependencies=[Depends(conditional_async("pois-counts"))])
+async def get_poi_counts_async(ibge_code: Optional[str] = None, tipo: Optional[str] = None, db=Depends(get_async_db)):
+    return await crud.list_poi_counts_async(db, ibge_code=ibge_code, tipo=tipo)
+
+@async_router.get("/counts/matrix", response_model=schemas.POICountMatrix,
+                  dependencies=[Depends(conditional_async("pois-counts-matrix"))])
+async def get_poi_count_matrix_async(db=Depends(get_async_db)):
+    return crud.count_matrix(await crud.list_poi_counts_async(db))
+
+@async_router.get("/tipos", dependencies=[Depends(conditional_async("pois-tipos"))])
+async def get_poi_types_async(db=Depends(get_async_db)):
+    return {"tipos": await crud.get_poi_types_async(db)}
+
+@async_router.get("/tipo/{tipo}", response_model=List[schemas.POIOut])
+async def get_pois_by_type_async(request: Request, tipo: str, skip: int = 0, limit: int = 200,
+                                 precision: Optional[int] = PRECISION, format: str = FORMAT,
+                                 db=Depends(get_async_db), version: int = Depends(conditional_async("pois-tipo"))):
+    if format in CURSOR_FORMATS:
+        return stream_pois_async(request, db, format, precision, skip=skip, limit=limit, tipo=tipo)
+    if poi_store.is_fresh(version):
+        if format == "binary":
+            return markers_response(request, await run_in_threadpool(poi_store.markers, tipo=tipo, skip=skip, limit=limit))
+        pois = await run_in_threadpool(poi_store.pois_by_type, tipo, skip=skip, limit=limit)
+    else:
+        pois = await query_cache.pois_by_type_async(db, tipo=tipo, skip=skip, limit=limit, version=version)
+    if format == "binary":
+        return markers_response(request, markers_from_records(pois))
+    return quantize_pois(pois, precision)
+
+@async_router.get("/municipio/{ibge_code}", response_model=List[schemas.POIOut])
+async def get_pois_by_municipio_async(ibge_code: str, skip: int = 0, limit: int = 2000, precision: Optional[int] = PRECISION,
+                                      db=Depends(get_async_db), version: int = Depends(conditional_async("pois-municipio"))):
+    if poi_store.is_fresh(version):
+        pois = await run_in_threadpool(poi_store.pois_by_municipio, ibge_code, skip=skip, limit=limit)
+    else:
+        pois = await query_cache.pois_by_municipio_async(db, ibge_code=ibge_code, skip=skip, limit=limit, version=version)
+    return quantize_pois(pois, precision)
+
+@async_router.get("/bbox", response_model=List[schemas.POIOut])
+async def get_pois_bbox_async(request: Request, bbox: str = Query(..., example="-46.7,-23.7,-46.4,-23.5"),
+                              tipo: Optional[str] = None, precision: Optional[int] = PRECISION, format: str = FORMAT,
+                              db=Depends(get_async_db), version: int = Depends(conditional_async("pois-bbox"))):
+    min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    if format in CURSOR_FORMATS:
+        return stream_pois_async(request, db, format, precision, tipo=tipo, bbox=(min_lon, min_lat, max_lon, max_lat))
+    if poi_store.is_fresh(version):
+        if format == "binary":
+            body = await run_in_threadpool(poi_store.markers, bbox=(min_lon, min_lat, max_lon, max_lat), tipo=tipo)
+            return markers_response(request, body)
+        pois = await run_in_threadpool(poi_store.pois_in_bbox, min_lon, min_lat, max_lon, max_lat, tipo=tipo)
+    else:
+        pois = await query_cache.pois_in_bbox_async(db, min_lon, min_lat, max_lon, max_lat, tipo=tipo, version=version)
+    if format == "binary":
+        return markers_response(request, markers_from_records(pois))
+    return quantize_pois(pois, precision)
+
+@async_router.get("/count")
+async def count_pois_async(bbox: Optional[str] = None, tipo: Optional[str] = None, ibge_code: Optional[str] = None,
+                           db=Depends(get_async_db), version: int = Depends(conditional_async("pois-count"))):
+    box = parse_bbox(bbox) if bbox else None
+    if poi_store.is_fresh(version):
+        return {"count": await run_in_threadpool(poi_store.count_pois, box, tipo=tipo, ibge_code=ibge_code)}
+    return {"count": await crud.count_pois_async(db, box, tipo=tipo, ibge_code=ibge_code)}
@@ -0,0 +1,89 @@
+# backend/arrow_ipc.py
+# Respostas em Arrow IPC (formato de stream, application/vnd.apache.arrow.stream) para
+# quem lê os dados em pandas/polars: cada lote do cursor (yield_per) vira um RecordBatch
+# coluna a coluna, sem dicts nem modelos pydantic, e é escrito assim que fica pronto.
+#
+# pyarrow é dependência opcional: sem ele a API sobe normalmente e ?format=arrow
+# e /export/{tabela}.arrow respondem 501.
+import io
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Sequence
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import DateTime, Float, Integer, LargeBinary
+
+try:
+    import pyarrow as pa
+except ImportError:  # instalação mínima: só os formatos JSON/binário
+    pa = None
+
+MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# linhas por RecordBatch: lotes grandes amortizam o cabeçalho de cada mensagem IPC
+ARROW_BATCH_SIZE = 65536
+
+
+def require_arrow() -> None:
+    if pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow não está instalado: formato Arrow indisponível")
+
+
+def arrow_type(column):
+    """Tipo Arrow da coluna SQLAlchemy (o que o SQLite devolve para ela)."""
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+
+def arrow_schema(columns: Sequence):
+    return pa.schema([pa.field(c.key, arrow_type(c)) for c in columns])
+
+
+def record_batch(rows: Sequence, schema):
+    """RecordBatch a partir de um lote de linhas: transpõe as tuplas e monta uma coluna por vez."""
+    if rows:
+        values = list(zip(*rows))
+    else:
+        values = [()] * len(schema)
+    return pa.record_batch([pa.array(v, type=f.type) for v, f in zip(values, schema)], schema=schema)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def ipc_chunks(partitions: Iterable[Sequence], schema) -> Iterator[bytes]:
+    """Stream IPC: esquema, um RecordBatch por lote do cursor e o marcador de fim."""
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in partitions:
+            writer.write_batch(record_batch(rows, schema))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+async def ipc_chunks_async(partitions: AsyncIterable[Sequence], schema) -> AsyncIterator[bytes]:
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        async for rows in partitions:
+            writer.write_batch(record_batch(rows, schema))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def arrow_response(partitions, columns: Sequence, headers: Optional[dict] = None) -> StreamingResponse:
+    """StreamingResponse Arrow a partir dos lotes do cursor (iterável síncrono ou assíncrono)."""
+    require_arrow()
+    schema = arrow_schema(columns)
+    if hasattr(partitions, "__aiter__"):
+        body = ipc_chunks_async(partitions, schema)
+    else:
+        body = ipc_chunks(partitions, schema)
+    return StreamingResponse(body, media_type=MEDIA_TYPE, headers=headers)
@@ -0,0 +1,135 @@
+# backend/autocorrelation.py
+# Autocorrelação espacial de um indicador sobre o grafo de vizinhança (backend/contiguity.py),
+# com pesos padronizados por linha (cada vizinho pesa 1/grau):
+#
+#   Moran global  I = (n / S0) * Σ z_i lag_i / Σ z_i²     z = x - média, lag = média dos vizinhos
+#   LISA          I_i = z_i * lag_i / m2                  m2 = Σ z² / n
+#
+# Significância por permutação (pseudo p-valor = (extremos + 1) / (permutações + 1)):
+#   global  embaralha z inteiro; o lag das P permutações sai de uma soma acumulada sobre
+#           as arestas (P x nnz), sem laço por permutação
+#   LISA    permutação condicional: z_i fica, os vizinhos são sorteados entre os outros n - 1.
+#           Como no PySAL, um sorteio de k_max posições por permutação serve a todos os nós;
+#           os nós de mesmo grau são calculados juntos (grupos x P x k)
+#
+# Clusters LISA com p <= ALPHA: HH (alto cercado de alto), LL, HL, LH; os demais "ns".
+# Municípios sem valor ficam fora do cálculo; sem vizinho com valor, "isolado".
+from typing import Optional
+import numpy as np
+
+ALPHA = 0.05
+DEFAULT_PERMUTATIONS = 999
+# permutações por lote no teste global (memória: lote x arestas)
+PERMUTATION_BATCH = 128
+
+
+def subgraph(indptr: np.ndarray, indices: np.ndarray, keep: np.ndarray):
+    """CSR só com os nós `keep` (máscara), renumerados na ordem original."""
+    new_id = np.full(len(keep), -1, dtype=np.int64)
+    new_id[keep] = np.arange(int(keep.sum()))
+    rows = np.repeat(np.arange(len(keep)), np.diff(indptr))
+    edge = keep[rows] & keep[indices]
+    src, dst = new_id[rows[edge]], new_id[indices[edge]]
+    n = int(keep.sum())
+    sub_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=sub_indptr[1:])
+    return sub_indptr, dst
+
+
+def spatial_lag(z: np.ndarray, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Média dos vizinhos para cada nó (última dimensão de `z`); 0 para nós sem vizinho."""
+    degrees = np.diff(indptr)
+    edges = np.take(z, indices, axis=-1)
+    cumulative = np.concatenate([np.zeros(z.shape[:-1] + (1,)), np.cumsum(edges, axis=-1)], axis=-1)
+    sums = np.take(cumulative, indptr[1:], axis=-1) - np.take(cumulative, indptr[:-1], axis=-1)
+    return np.where(degrees > 0, sums / np.maximum(degrees, 1), 0.0)
+
+
+def pseudo_p(simulated: np.ndarray, observed, axis: int = 0) -> np.ndarray:
+    """(nº de simulações tão extremas quanto a observada, pelo lado mais raro, + 1) / (P + 1)."""
+    permutations = simulated.shape[axis]
+    larger = (simulated >= np.expand_dims(observed, axis)).sum(axis=axis)
+    larger = np.minimum(larger, permutations - larger)
+    return (larger + 1.0) / (permutations + 1.0)
+
+
+def global_moran(z: np.ndarray, indptr: np.ndarray, indices: np.ndarray, permutations: int,
+                 rng: np.random.Generator) -> dict:
+    n = len(z)
+    s0 = float((np.diff(indptr) > 0).sum())
+    denominator = float(z @ z)
+    if n < 3 or s0 == 0 or denominator == 0:
+        return {"moran_i": None, "expected": None, "z_score": None, "p_value": None}
+    observed = n / s0 * float(z @ spatial_lag(z, indptr, indices)) / denominator
+    simulated = []
+    for start in range(0, permutations, PERMUTATION_BATCH):
+        size = min(PERMUTATION_BATCH, permutations - start)
+        shuffled = rng.permuted(np.broadcast_to(z, (size, n)), axis=1)
+        lags = spatial_lag(shuffled, indptr, indices)
+        simulated.append(n / s0 * (shuffled * lags).sum(axis=1) / denominator)
+    simulated = np.concatenate(simulated) if simulated else np.zeros(0)
+    result = {"moran_i": observed, "expected": -1.0 / (n - 1), "z_score": None, "p_value": None}
+    if permutations:
+        spread = simulated.std()
+        result["z_score"] = float((observed - simulated.mean()) / spread) if spread > 0 else None
+        result["p_value"] = float(pseudo_p(simulated, np.float64(observed)))
+    return result
+
+
+def local_moran(z: np.ndarray, indptr: np.ndarray, indices: np.ndarray, permutations: int,
+                rng: np.random.Generator):
+    """(I_i, lag_i, p_i) com permutação condicional; p é NaN sem permutações ou sem vizinhos."""
+    n = len(z)
+    m2 = float(z @ z) / n if n else 0.0
+    lag = spatial_lag(z, indptr, indices)
+    local = z * lag / m2 if m2 > 0 else np.zeros(n)
+    p_values = np.full(n, np.nan)
+    degrees = np.diff(indptr)
+    k_max = int(degrees.max()) if n else 0
+    if not permutations or k_max == 0 or m2 == 0 or n < 2:
+        return local, lag, p_values
+    k_max = min(k_max, n - 1)
+    # posições entre os n - 1 "outros" (pulando o próprio nó abaixo), sem repetição em cada sorteio
+    draws = np.argsort(rng.random((permutations, n - 1)), axis=1)[:, :k_max]
+    for k in np.unique(degrees[degrees > 0]).tolist():
+        nodes = np.flatnonzero(degrees == k)
+        k = min(k, n - 1)
+        picked = draws[None, :, :k] + (draws[None, :, :k] >= nodes[:, None, None])
+        simulated = z[nodes, None] * z[picked].mean(axis=2) / m2
+        p_values[nodes] = pseudo_p(simulated, local[nodes], axis=1)
+    return local, lag, p_values
+
+
+def clusters(z: np.ndarray, lag: np.ndarray, p_values: np.ndarray, degrees: np.ndarray,
+             alpha: float = ALPHA) -> np.ndarray:
+    labels = np.where(z >= 0, np.where(lag >= 0, "HH", "HL"), np.where(lag >= 0, "LH", "LL")).astype(object)
+    labels[~(p_values <= alpha)] = "ns"
+    labels[degrees == 0] = "isolado"
+    return labels
+
+
+def moran(graph, values: np.ndarray, permutations: int = DEFAULT_PERMUTATIONS, seed: Optional[int] = 0) -> dict:
+    """
+    Moran global e LISA de `values` (um valor por nó do grafo, NaN = sem dado).
+    Resultado no formato de schemas.Autocorrelation, sem o nome do indicador.
+    """
+    rng = np.random.default_rng(seed)
+    keep = ~np.isnan(values)
+    indptr, indices = subgraph(graph.indptr, graph.indices, keep)
+    x = values[keep]
+    z = x - x.mean() if len(x) else x
+    result = {"n": int(len(x)), "permutations": permutations}
+    result.update(global_moran(z, indptr, indices, permutations, rng))
+    local, lag, p_values = local_moran(z, indptr, indices, permutations, rng)
+    degrees = np.diff(indptr)
+    labels = clusters(z, lag, p_values, degrees)
+    # lag na unidade do indicador: média dos valores dos vizinhos
+    neighbour_mean = np.where(degrees > 0, lag + (x.mean() if len(x) else 0.0), np.nan)
+    nodes = np.flatnonzero(keep)
+    result["lisa"] = [
+        {"ibge_code": graph.entries[node].ibge_code, "value": v, "lag": None if np.isnan(g) else g,
+         "local_i": i, "p_value": None if np.isnan(p) else p, "cluster": c}
+        for node, v, g, i, p, c in zip(nodes.tolist(), x.tolist(), neighbour_mean.tolist(), local.tolist(),
+                                       p_values.tolist(), labels.tolist())
+    ]
+    return result
@@ -0,0 +1 @@
+# Benchmarks (scripts executáveis: python -m backend.benchmarks.<nome>)
@@ -0,0 +1,73 @@
+# backend/benchmarks/arrow_export.py
+# Ingestão da tabela de POIs num cliente: páginas JSON de /pois/ (como os notebooks faziam)
+# x uma única resposta /export/pois.arrow, incluindo o parse do lado do cliente
+# (json.loads x pyarrow.ipc.open_stream().read_all()).
+#
+# uso: python -m backend.benchmarks.arrow_export [--pois 200000] [--page 1000]
+import argparse
+import json
+import os
+import tempfile
+import time
+import pyarrow as pa
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from backend.benchmarks.sqlite_concurrency import seed
+from backend.db import create_engines, get_read_db
+from backend.main import create_app
+
+
+def json_pages(client, page: int):
+    rows, skip = [], 0
+    while True:
+        batch = json.loads(client.get(f"/pois/?skip={skip}&limit={page}").content)
+        rows += batch
+        if len(batch) < page:
+            return len(rows)
+        skip += page
+
+
+def arrow_export(client):
+    return pa.ipc.open_stream(client.get("/export/pois.arrow").content).read_all().num_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Páginas JSON x exportação Arrow IPC")
+    parser.add_argument("--pois", type=int, default=200000)
+    parser.add_argument("--page", type=int, default=1000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="bench_arrow_", suffix=".sqlite")
+    os.close(fd)
+    writer, reader = create_engines(f"sqlite:///{path}")
+    try:
+        seed(writer, args.pois)
+        Session = sessionmaker(bind=reader)
+
+        def override_get_db():
+            db = Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = create_app("sync")
+        app.dependency_overrides[get_read_db] = override_get_db
+        client = TestClient(app)
+        for name, fn in ((f"json ({args.page}/página)", lambda: json_pages(client, args.page)),
+                         ("arrow (export)", lambda: arrow_export(client))):
+            t0 = time.perf_counter()
+            n = fn()
+            print(f"{name:<22} {n:>8} linhas {time.perf_counter() - t0:>8.2f} s")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
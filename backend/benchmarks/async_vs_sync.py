@@ -0,0 +1,109 @@
+# backend/benchmarks/async_vs_sync.py
+# Teste de carga: N requisições /pois/bbox simultâneas (viewports sorteados),
+# comparando DB_MODE=sync (def + threadpool de 40) com DB_MODE=async (async def + aiosqlite).
+# O cache de consultas é desligado para medir o caminho até o banco.
+#
+# uso: python -m backend.benchmarks.async_vs_sync [--pois 50000] [--concurrency 500]
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import httpx
+from sqlalchemy.orm import sessionmaker
+from backend import db as db_module
+from backend.benchmarks.sqlite_concurrency import LAT_RANGE, LON_RANGE, seed
+from backend.cache import NullCache, query_cache
+from backend.main import create_app
+
+
+def build_app(mode: str, path: str):
+    writer, reader = db_module.create_engines(f"sqlite:///{path}")
+    ReadSession = sessionmaker(bind=reader)
+    async_engine = db_module.create_async_read_engine(f"sqlite+aiosqlite:///{path}")
+    AsyncSession = db_module.make_async_sessionmaker(async_engine)
+
+    def override_read_db():
+        session = ReadSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def override_async_db():
+        async with AsyncSession() as session:
+            yield session
+
+    app = create_app(mode)
+    app.dependency_overrides[db_module.get_read_db] = override_read_db
+    app.dependency_overrides[db_module.get_async_db] = override_async_db
+    return app, writer, reader, async_engine
+
+
+async def fire(app, concurrency: int, seed_value: int = 7):
+    rnd = random.Random(seed_value)
+    urls = []
+    for _ in range(concurrency):
+        lon = rnd.uniform(*LON_RANGE)
+        lat = rnd.uniform(*LAT_RANGE)
+        urls.append(f"/pois/bbox?bbox={lon},{lat},{lon + 0.03},{lat + 0.02}")
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(url):
+            t0 = time.perf_counter()
+            r = await client.get(url)
+            latencies.append(time.perf_counter() - t0)
+            return r.status_code
+
+        t0 = time.perf_counter()
+        codes = await asyncio.gather(*(one(u) for u in urls))
+        wall = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "wall_s": wall,
+        "req_per_s": concurrency / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": sum(1 for c in codes if c != 200),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de viewports: sync x async")
+    parser.add_argument("--pois", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="bench_async_", suffix=".sqlite")
+    os.close(fd)
+    previous_backend = query_cache.backend
+    query_cache.backend = NullCache()
+    try:
+        writer, _ = db_module.create_engines(f"sqlite:///{path}")
+        seed(writer, args.pois)
+        writer.dispose()
+
+        print(f"{'modo':<6} {'tempo (s)':>10} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'erros':>6}")
+        for mode in ("sync", "async"):
+            app, writer, reader, async_engine = build_app(mode, path)
+            r = asyncio.run(fire(app, args.concurrency))
+            print(f"{mode:<6} {r['wall_s']:>10.2f} {r['req_per_s']:>8.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['errors']:>6}")
+            writer.dispose()
+            reader.dispose()
+            asyncio.run(async_engine.dispose())
+    finally:
+        query_cache.backend = previous_backend
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# backend/benchmarks/columnar.py
+# Latência de consultas bbox e count: SQLite (crud) x colunas NumPy mapeadas em memória
+# (backend/columnar.py), nos mesmos viewports sorteados.
+#
+# uso: python -m backend.benchmarks.columnar [--pois 200000] [--queries 500]
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from sqlalchemy.orm import sessionmaker
+from backend import crud
+from backend.benchmarks.sqlite_concurrency import LAT_RANGE, LON_RANGE, seed
+from backend.columnar import POIColumnStore, export_pois
+from backend.db import create_engines
+
+
+def timed(fn, boxes):
+    latencies = []
+    for box in boxes:
+        t0 = time.perf_counter()
+        fn(box)
+        latencies.append(time.perf_counter() - t0)
+    return statistics.median(latencies) * 1000, sum(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite x colunas NumPy em consultas bbox")
+    parser.add_argument("--pois", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_columnar_")
+    path = os.path.join(workdir, "db.sqlite")
+    writer, reader = create_engines(f"sqlite:///{path}")
+    try:
+        seed(writer, args.pois)
+        db = sessionmaker(bind=reader)()
+        t0 = time.perf_counter()
+        export_pois(db, os.path.join(workdir, "cols"))
+        export_s = time.perf_counter() - t0
+        store = POIColumnStore(os.path.join(workdir, "cols"))
+        t0 = time.perf_counter()
+        store.load()
+        load_ms = (time.perf_counter() - t0) * 1000
+        print(f"exportação: {export_s:.2f} s, carga (mmap): {load_ms:.1f} ms")
+
+        rnd = random.Random(7)
+        boxes = []
+        for _ in range(args.queries):
+            lon = rnd.uniform(*LON_RANGE)
+            lat = rnd.uniform(*LAT_RANGE)
+            boxes.append((lon, lat, lon + 0.05, lat + 0.05))
+
+        cases = (
+            ("bbox sqlite", lambda b: crud.list_pois_in_bbox(db, *b)),
+            ("bbox numpy", lambda b: store.pois_in_bbox(*b)),
+            ("count sqlite", lambda b: crud.count_pois(db, b, tipo="hospital")),
+            ("count numpy", lambda b: store.count_pois(b, tipo="hospital")),
+        )
+        print(f"{'consulta':<13} {'p50 (ms)':>9} {'total (s)':>10}")
+        for name, fn in cases:
+            p50, total = timed(fn, boxes)
+            print(f"{name:<13} {p50:>9.2f} {total:>10.2f}")
+        db.close()
+    finally:
+        writer.dispose()
+        reader.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# backend/benchmarks/hilbert_pages.py
+# Páginas lidas por viewport: tabela na ordem de inserção (OSM, aqui aleatória) com os
+# índices simples de latitude/longitude x tabela em ordem de Hilbert com o índice composto
+# (hilbert, lon_e7, lat_e7), e o artefato VACUUM INTO em vários page_size.
+#
+# As páginas são contadas pelos bytes que o processo lê do arquivo (rchar de /proc/self/io,
+# só Linux) numa conexão nova, sem mmap: cada página que o SQLite busca é um read().
+#
+# uso: python -m backend.benchmarks.hilbert_pages [--pois 200000] [--viewports 200]
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+from sqlalchemy import create_engine, select, text
+from backend import crud, models
+from backend.benchmarks.sqlite_concurrency import LAT_RANGE, LON_RANGE
+from backend.etl.optimize import vacuum_into
+from backend.spatial import hilbert_key
+
+BEFORE_SQL = (
+    "SELECT id, municipio_id, tipo, nome, latitude, longitude, created_at FROM pois "
+    "WHERE longitude >= ? AND longitude <= ? AND latitude >= ? AND latitude <= ?"
+)
+
+
+def rchar() -> int:
+    with open("/proc/self/io") as fh:
+        for line in fh:
+            if line.startswith("rchar:"):
+                return int(line.split()[1])
+    raise RuntimeError("/proc/self/io sem rchar")
+
+
+def synthetic_rows(n: int):
+    rnd = random.Random(42)
+    rows = []
+    for i in range(n):
+        lat, lon = rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE)
+        rows.append({
+            "municipio_id": rnd.randint(1, 645),
+            "tipo": rnd.choice(["hospital", "school", "police", "park", "social_facility"]),
+            "nome": f"POI {i}", "latitude": lat, "longitude": lon, "hilbert": hilbert_key(lon, lat),
+        })
+    return rows
+
+
+def build(path: str, rows, hilbert_order: bool):
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if not hilbert_order:
+            # layout antigo: índices simples de latitude/longitude, sem o composto
+            conn.execute(text("DROP INDEX ix_pois_hilbert_e7"))
+            conn.execute(text("CREATE INDEX ix_pois_latitude ON pois (latitude)"))
+            conn.execute(text("CREATE INDEX ix_pois_longitude ON pois (longitude)"))
+        else:
+            rows = sorted(rows, key=lambda r: r["hilbert"])
+        conn.execute(models.POI.__table__.insert(), rows)
+    return engine
+
+
+def after_sql(box) -> str:
+    stmt = select(*crud.POI_COLUMNS).where(*crud.poi_bbox_filters(*box))
+    return str(stmt.compile(compile_kwargs={"literal_binds": True}))
+
+
+def measure(path: str, boxes, hilbert_query: bool):
+    pages, kib = [], []
+    for box in boxes:
+        conn = sqlite3.connect(path)
+        # mesmo cache do perfil "performance": conta páginas distintas, não releituras
+        conn.execute("PRAGMA mmap_size = 0")
+        conn.execute("PRAGMA cache_size = -65536")
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        conn.execute("SELECT 1 FROM pois LIMIT 0")  # carrega o schema antes de medir
+        before = rchar()
+        if hilbert_query:
+            conn.execute(after_sql(box)).fetchall()
+        else:
+            min_lon, min_lat, max_lon, max_lat = box
+            conn.execute(BEFORE_SQL, (min_lon, max_lon, min_lat, max_lat)).fetchall()
+        read = rchar() - before
+        conn.close()
+        pages.append(read / page_size)
+        kib.append(read / 1024)
+    return statistics.mean(pages), statistics.mean(kib), page_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Páginas lidas por viewport: ordem OSM x Hilbert")
+    parser.add_argument("--pois", type=int, default=200000)
+    parser.add_argument("--viewports", type=int, default=200)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    boxes = []
+    for _ in range(args.viewports):
+        lon, lat = rnd.uniform(*LON_RANGE), rnd.uniform(*LAT_RANGE)
+        boxes.append((lon, lat, lon + 0.03, lat + 0.02))
+
+    rows = synthetic_rows(args.pois)
+    workdir = tempfile.mkdtemp(prefix="bench_hilbert_")
+    before_path = os.path.join(workdir, "before.sqlite")
+    after_path = os.path.join(workdir, "after.sqlite")
+    build(before_path, rows, hilbert_order=False).dispose()
+    engine = build(after_path, rows, hilbert_order=True)
+
+    results = [("ordem OSM, índices lat/lon",) + measure(before_path, boxes, False),
+               ("ordem Hilbert, índice composto",) + measure(after_path, boxes, True)]
+    for page_size in (1024, 4096, 8192, 16384):
+        out = os.path.join(workdir, f"vacuum_{page_size}.sqlite")
+        vacuum_into(engine, out, page_size)
+        results.append((f"VACUUM INTO page_size={page_size}",) + measure(out, boxes, True))
+    engine.dispose()
+
+    print(f"{'layout':<32} {'páginas/viewport':>17} {'KiB/viewport':>13}")
+    for name, pages, kib, page_size in results:
+        print(f"{name:<32} {pages:>17.1f} {kib:>13.1f}")
+    for name in os.listdir(workdir):
+        os.unlink(os.path.join(workdir, name))
+    os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# backend/benchmarks/markers.py
+# Tamanho e tempo de codificação de N marcadores: lista JSON (schemas.POIOut) x formato
+# binário (?format=binary, backend/markers.py), cru e com gzip nível 1 (o que a rota envia
+# quando o cliente aceita). Os POIs são agrupados em torno de centros urbanos e ficam em
+# ordem de Hilbert, como no banco gerado pelo ETL.
+#
+# uso: python -m backend.benchmarks.markers [--pois 200000]
+import argparse
+import gzip
+import json
+import random
+import time
+import numpy as np
+from backend.benchmarks.sqlite_concurrency import LAT_RANGE, LON_RANGE
+from backend.cache import PoiRecord
+from backend.columnar import encode_columns
+from backend.markers import encode_markers
+from backend.spatial import hilbert_keys
+from backend.streaming import poi_json
+
+TIPOS = ["hospital", "school", "police", "park", "social_facility"]
+
+
+def synthetic(n: int):
+    rnd = random.Random(42)
+    centers = [(rnd.uniform(*LON_RANGE), rnd.uniform(*LAT_RANGE)) for _ in range(645)]
+    points = []
+    for _ in range(n):
+        lon, lat = rnd.choice(centers)
+        points.append((lon + rnd.gauss(0, 0.05), lat + rnd.gauss(0, 0.05)))
+    lon = np.array([p[0] for p in points])
+    lat = np.array([p[1] for p in points])
+    order = np.argsort(hilbert_keys(lon, lat), kind="stable")
+    return [PoiRecord(i + 1, rnd.randint(1, 645), rnd.choice(TIPOS), f"POI {i}", float(lat[j]), float(lon[j]), None)
+            for i, j in enumerate(order)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamanho de marcadores: JSON x binário")
+    parser.add_argument("--pois", type=int, default=200000)
+    args = parser.parse_args()
+
+    records = synthetic(args.pois)
+    cols = encode_columns(records)
+
+    t0 = time.perf_counter()
+    as_json = b"[" + b", ".join(poi_json(r) for r in records) + b"]"
+    json_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    binary = encode_markers(cols["id"], cols["lat"], cols["lon"], cols["tipo"], cols["tipos"])
+    binary_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    zipped = gzip.compress(binary, compresslevel=1, mtime=0)
+    gzip_s = time.perf_counter() - t0 + binary_s
+    json.loads(as_json)  # garante que o JSON de comparação é válido
+
+    print(f"{'formato':<16} {'MB':>7} {'bytes/POI':>10} {'codificação (ms)':>17}")
+    for name, body, seconds in (("json", as_json, json_s), ("binary", binary, binary_s),
+                                ("binary + gzip", zipped, gzip_s)):
+        print(f"{name:<16} {len(body) / 1e6:>7.2f} {len(body) / args.pois:>10.1f} {seconds * 1000:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
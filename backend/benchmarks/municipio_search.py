@@ -0,0 +1,56 @@
+# backend/benchmarks/municipio_search.py
+# Latência do autocomplete de municípios (?q=): índice em memória (trie + trigramas)
+# x varredura linear normalizando e comparando cada nome, sobre os nomes de data/municipios.json.
+#
+# uso: python -m backend.benchmarks.municipio_search [--repeat 1000]
+import argparse
+import json
+import time
+from backend.db import DATA_DIR
+from backend.names import NameEntry, NameIndex, normalize_name
+
+QUERIES = ("sao jose", "são josé dos campos", "sao jse dos campos", "ribeirao prto", "sant", "campinas", "s")
+
+
+def load_entries():
+    features = json.loads((DATA_DIR / "municipios.json").read_text(encoding="utf-8"))["features"]
+    return [NameEntry(i, f["properties"]["id"], f["properties"]["name"]) for i, f in enumerate(features)]
+
+
+def scan(entries, q, limit=10):
+    """Sem índice: normaliza todos os nomes a cada consulta e filtra por palavra-prefixo."""
+    tokens = normalize_name(q).split()
+    hits = []
+    for e in entries:
+        words = normalize_name(e.nome).split()
+        if all(any(w.startswith(t) for w in words) for t in tokens):
+            hits.append(e)
+    return hits[:limit]
+
+
+def per_query(fn, q, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(q)
+    return (time.perf_counter() - t0) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autocomplete de municípios: índice x varredura")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    entries = load_entries()
+    t0 = time.perf_counter()
+    index = NameIndex(entries)
+    print(f"{len(entries)} nomes, índice montado em {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    print(f"{'consulta':<22} {'índice (ms)':>12} {'varredura (ms)':>15}  1º resultado")
+    for q in QUERIES:
+        indexed = per_query(index.search, q, args.repeat)
+        scanned = per_query(lambda q: scan(entries, q), q, max(args.repeat // 100, 1))
+        top = index.search(q, 1)
+        print(f"{q:<22} {indexed:>12.3f} {scanned:>15.3f}  {top[0].nome if top else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# backend/benchmarks/poi_query.py
+# /pois/query: caminho escolhido pelas estatísticas (backend/planner.py) x a mesma consulta
+# com todos os filtros indexáveis, deixando a escolha para o SQLite, em dados com tipos
+# bem desbalanceados (escolas aos montes, museus raros).
+#
+# uso: python -m backend.benchmarks.poi_query [--pois 300000]
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import select, text
+from sqlalchemy.orm import sessionmaker
+from backend import crud, models
+from backend.db import create_engines
+from backend.planner import PoiStats, load_stats, plan_query
+
+LON_RANGE = (-53.0, -44.0)
+LAT_RANGE = (-25.0, -19.8)
+TIPOS = {"school": 0.6, "park": 0.25, "hospital": 0.1, "police": 0.049, "museum": 0.001}
+CASES = {
+    "museu em bbox grande": {"tipos": ["museum"], "bbox": (-50.0, -24.0, -45.0, -21.0)},
+    "escola em bbox pequeno": {"tipos": ["school"], "bbox": (-46.66, -23.56, -46.62, -23.53)},
+    "escola+hospital no município": {"tipos": ["school", "hospital"], "municipio_id": 42},
+    "nome raro em bbox grande": {"expression": '"ipiranga"*', "bbox": (-50.0, -24.0, -45.0, -21.0)},
+    "município em bbox grande": {"municipio_id": 42, "bbox": (-53.0, -25.0, -44.0, -19.8)},
+}
+
+
+def seed(writer, n_pois: int):
+    models.Base.metadata.create_all(writer)
+    rnd = random.Random(7)
+    tipos, weights = zip(*TIPOS.items())
+    rows = [
+        {
+            "municipio_id": rnd.randint(1, 645),
+            "tipo": rnd.choices(tipos, weights)[0],
+            "nome": "Museu do Ipiranga" if i % 50000 == 0 else f"POI {i}",
+            "latitude": rnd.uniform(*LAT_RANGE),
+            "longitude": rnd.uniform(*LON_RANGE),
+        }
+        for i in range(n_pois)
+    ]
+    with writer.begin() as conn:
+        conn.execute(models.POI.__table__.insert(), rows)
+        crud.rebuild_poi_search(conn)
+        conn.execute(text("ANALYZE"))
+
+
+def unplanned(tipos=None, municipio_id=None, bbox=None, expression=None):
+    """Todos os filtros indexáveis: o SQLite escolhe sozinho."""
+    stmt = select(*crud.POI_COLUMNS)
+    if bbox is not None:
+        stmt = stmt.where(*crud.poi_bbox_filters(*bbox))
+    if tipos:
+        stmt = stmt.where(models.POI.tipo.in_(tipos))
+    if municipio_id is not None:
+        stmt = stmt.where(models.POI.municipio_id == municipio_id)
+    if expression is not None:
+        stmt = stmt.where(models.POI.id.in_(crud.search_rowids(expression)))
+    return stmt
+
+
+def timed(fn, repeat: int):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - t0) / repeat * 1e3, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta composta: plano por estatísticas x planejador do SQLite")
+    parser.add_argument("--pois", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="bench_query_", suffix=".sqlite")
+    os.close(fd)
+    writer, reader = create_engines(f"sqlite:///{path}")
+    try:
+        seed(writer, args.pois)
+        db = sessionmaker(bind=reader)()
+        t0 = time.perf_counter()
+        stats = PoiStats.from_rows(load_stats(db))
+        print(f"{args.pois} POIs, estatísticas em {(time.perf_counter() - t0) * 1e3:.0f} ms")
+        print(f"{'consulta':<30} {'caminho':<10} {'linhas':>7} {'planejado (ms)':>15} {'SQLite (ms)':>12}")
+        for name, kw in CASES.items():
+            def planned():
+                plan = plan_query(db, stats, kw.get("tipos"), kw.get("municipio_id"), kw.get("bbox"), kw.get("expression"))
+                return plan, db.execute(crud.poi_query_stmt(plan.path, **kw)).all()
+            planned_ms, (plan, rows) = timed(planned, args.repeat)
+            naive_ms, naive_rows = timed(lambda: db.execute(unplanned(**kw)).all(), args.repeat)
+            assert len(rows) == len(naive_rows)
+            print(f"{name:<30} {plan.path:<10} {len(rows):>7} {planned_ms:>15.2f} {naive_ms:>12.2f}")
+        db.close()
+    finally:
+        writer.dispose()
+        reader.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
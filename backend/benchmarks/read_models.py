@@ -0,0 +1,68 @@
+# backend/benchmarks/read_models.py
+# Memória e tempo de uma consulta bbox grande: entidades ORM (models.POI) x Row de colunas
+# (crud.list_pois_in_bbox). O bbox cobre todos os POIs sintéticos.
+#
+# uso: python -m backend.benchmarks.read_models [--pois 100000]
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from sqlalchemy.orm import sessionmaker
+from backend import crud, models
+from backend.benchmarks.sqlite_concurrency import LAT_RANGE, LON_RANGE, seed
+from backend.db import create_engines
+
+
+def orm_entities(db):
+    return db.query(models.POI).filter(
+        *crud.poi_bbox_filters(LON_RANGE[0], LAT_RANGE[0], LON_RANGE[1], LAT_RANGE[1])
+    ).all()
+
+
+def light_rows(db):
+    return crud.list_pois_in_bbox(db, LON_RANGE[0], LAT_RANGE[0], LON_RANGE[1], LAT_RANGE[1])
+
+
+def measure(Session, fn):
+    db = Session()
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    rows = fn(db)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(rows)
+    db.close()
+    return n, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM x Row em consultas bbox grandes")
+    parser.add_argument("--pois", type=int, default=100000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="bench_rows_", suffix=".sqlite")
+    os.close(fd)
+    writer, reader = create_engines(f"sqlite:///{path}")
+    try:
+        seed(writer, args.pois)
+        Session = sessionmaker(bind=reader)
+        print(f"{'leitura':<14} {'linhas':>8} {'tempo (s)':>10} {'pico (MB)':>10}")
+        for name, fn in (("ORM (POI)", orm_entities), ("Row (colunas)", light_rows)):
+            n, elapsed, peak = measure(Session, fn)
+            print(f"{name:<14} {n:>8} {elapsed:>10.3f} {peak / 1e6:>10.1f}")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
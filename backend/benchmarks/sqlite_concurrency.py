@@ -0,0 +1,119 @@
+# backend/benchmarks/sqlite_concurrency.py
+# Vazão de leitores (consultas bbox) enquanto um escritor insere POIs continuamente.
+# Compara o perfil "default" (rollback journal) com o "performance" (WAL etc.) de backend/db.py.
+#
+# uso: python -m backend.benchmarks.sqlite_concurrency [--pois 50000] [--readers 8] [--seconds 5]
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from sqlalchemy.orm import sessionmaker
+from backend import crud, models, schemas
+from backend.db import create_engines
+
+# bbox da Grande SP, onde os POIs sintéticos são sorteados
+LON_RANGE = (-47.0, -46.2)
+LAT_RANGE = (-24.0, -23.3)
+
+
+def seed(writer, n_pois: int):
+    models.Base.metadata.create_all(writer)
+    rnd = random.Random(42)
+    rows = [
+        {
+            "municipio_id": rnd.randint(1, 645),
+            "tipo": rnd.choice(["hospital", "school", "police", "park", "social_facility"]),
+            "nome": f"POI {i}",
+            "latitude": rnd.uniform(*LAT_RANGE),
+            "longitude": rnd.uniform(*LON_RANGE),
+        }
+        for i in range(n_pois)
+    ]
+    with writer.begin() as conn:
+        conn.execute(models.POI.__table__.insert(), rows)
+
+
+def run(profile: str, n_pois: int, n_readers: int, seconds: float) -> dict:
+    fd, path = tempfile.mkstemp(prefix="bench_", suffix=".sqlite")
+    os.close(fd)
+    writer, reader = create_engines(f"sqlite:///{path}", profile=profile, read_pool_size=n_readers)
+    seed(writer, n_pois)
+
+    WriteSession = sessionmaker(bind=writer)
+    ReadSession = sessionmaker(bind=reader)
+    stop = threading.Event()
+    reads = [0] * n_readers
+    read_errors = [0] * n_readers
+    writes = [0]
+
+    def reader_loop(i):
+        rnd = random.Random(i)
+        db = ReadSession()
+        try:
+            while not stop.is_set():
+                lon = rnd.uniform(*LON_RANGE)
+                lat = rnd.uniform(*LAT_RANGE)
+                try:
+                    crud.list_pois_in_bbox(db, lon, lat, lon + 0.05, lat + 0.05)
+                    reads[i] += 1
+                except Exception:
+                    read_errors[i] += 1
+                    db.rollback()
+        finally:
+            db.close()
+
+    def writer_loop():
+        rnd = random.Random(99)
+        db = WriteSession()
+        try:
+            while not stop.is_set():
+                crud.create_poi(db, schemas.POICreate(
+                    municipio_id=1, tipo="school", nome="novo",
+                    latitude=rnd.uniform(*LAT_RANGE), longitude=rnd.uniform(*LON_RANGE),
+                ))
+                writes[0] += 1
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=reader_loop, args=(i,)) for i in range(n_readers)]
+    threads.append(threading.Thread(target=writer_loop))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    writer.dispose()
+    reader.dispose()
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.unlink(path + suffix)
+        except FileNotFoundError:
+            pass
+
+    return {
+        "profile": profile,
+        "reads_per_s": sum(reads) / seconds,
+        "writes_per_s": writes[0] / seconds,
+        "read_errors": sum(read_errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de leitores sob escrita concorrente")
+    parser.add_argument("--pois", type=int, default=50000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'perfil':<12} {'leituras/s':>12} {'escritas/s':>12} {'erros leitura':>14}")
+    for profile in ("default", "performance"):
+        r = run(profile, args.pois, args.readers, args.seconds)
+        print(f"{r['profile']:<12} {r['reads_per_s']:>12.1f} {r['writes_per_s']:>12.1f} {r['read_errors']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# backend/benchmarks/streaming.py
+# Pico de memória e tempo até o primeiro byte de um bbox grande: lista JSON montada inteira
+# (.all() + response_model, como ?format=json) x streaming do cursor (?format=stream).
+#
+# uso: python -m backend.benchmarks.streaming [--pois 100000]
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+from sqlalchemy.orm import sessionmaker
+from backend import crud, schemas
+from backend.benchmarks.sqlite_concurrency import LAT_RANGE, LON_RANGE, seed
+from backend.db import create_engines
+from backend.streaming import chunks, poi_json
+
+BBOX = (LON_RANGE[0], LAT_RANGE[0], LON_RANGE[1], LAT_RANGE[1])
+
+
+def full_list(db):
+    rows = crud.list_pois_in_bbox(db, *BBOX)
+    body = json.dumps(jsonable_encoder(parse_obj_as(List[schemas.POIOut], rows))).encode("utf-8")
+    yield body
+
+
+def streamed(db):
+    rows = crud.stream_rows(db, crud.pois_stmt(bbox=BBOX))
+    yield from chunks(poi_json(r) for r in rows)
+
+
+def consume(fn, db):
+    t0 = time.perf_counter()
+    first, total = None, 0
+    for chunk in fn(db):
+        if first is None:
+            first = time.perf_counter() - t0
+        total += len(chunk)
+    return total, first, time.perf_counter() - t0
+
+
+def measure(Session, fn):
+    # tempos numa passada sem tracemalloc (que deixa a alocação bem mais lenta), pico em outra
+    db = Session()
+    total, first, elapsed = consume(fn, db)
+    db.close()
+    db = Session()
+    gc.collect()
+    tracemalloc.start()
+    consume(fn, db)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    return total, first, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lista JSON inteira x streaming do cursor")
+    parser.add_argument("--pois", type=int, default=100000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="bench_stream_", suffix=".sqlite")
+    os.close(fd)
+    writer, reader = create_engines(f"sqlite:///{path}")
+    try:
+        seed(writer, args.pois)
+        Session = sessionmaker(bind=reader)
+        print(f"{'resposta':<16} {'MB':>7} {'1º byte (s)':>12} {'total (s)':>10} {'pico (MB)':>10}")
+        for name, fn in (("json (lista)", full_list), ("stream (cursor)", streamed)):
+            total, first, elapsed, peak = measure(Session, fn)
+            print(f"{name:<16} {total / 1e6:>7.1f} {first:>12.3f} {elapsed:>10.3f} {peak / 1e6:>10.1f}")
+    finally:
+        writer.dispose()
+        reader.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+# backend/cache.py
+# Cache de resultados de consultas de POIs (LRU com orçamento em bytes).
+import hashlib
+import math
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from . import crud
+from .db import DATA_DIR
+
+# configuração via variáveis de ambiente
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")          # memory | disk | none
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DIR = Path(os.getenv("CACHE_DIR", str(DATA_DIR / "cache")))
+# resultados derivados de uma versão (índice composto, Moran...): orçamento por matriz/grafo
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# grade de quantização do bbox: passo mínimo em graus (~100 m)
+MIN_GRID_STEP = 1.0 / 1024
+
+POI_FIELDS = ("id", "municipio_id", "tipo", "nome", "latitude", "longitude", "created_at")
+
+# registro compacto (tupla nomeada), seguro para guardar fora da sessão e para pickle
+PoiRecord = namedtuple("PoiRecord", POI_FIELDS)
+
+
+def poi_record(p) -> PoiRecord:
+    """Converte um POI (Row, ORM ou schema) em PoiRecord."""
+    return PoiRecord(*(getattr(p, f, None) for f in POI_FIELDS))
+
+
+def quantize_pois(pois, precision: Optional[int]) -> list:
+    """Arredonda latitude/longitude para `precision` casas (None = sem mudança)."""
+    if precision is None:
+        return pois
+    return [
+        poi_record(p)._replace(latitude=round(p.latitude, precision), longitude=round(p.longitude, precision))
+        for p in pois
+    ]
+
+
+def estimate_size(records: List[PoiRecord]) -> int:
+    """Estimativa grosseira do tamanho em bytes de uma lista de registros."""
+    size = sys.getsizeof(records)
+    for r in records:
+        size += sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r)
+    return size
+
+
+def estimate_result_size(value) -> int:
+    """Estimativa grosseira do tamanho em bytes de um resultado (dicts, listas e escalares aninhados)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_result_size(k) + estimate_result_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_result_size(v) for v in value)
+    return size
+
+
+def grid_step(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> float:
+    """
+    Passo da grade adequado ao "zoom": potência de 2 em graus, 1/4 do maior lado do bbox.
+    Bboxes vizinhos de mesmo tamanho caem na mesma célula e compartilham a entrada.
+    """
+    span = max(max_lon - min_lon, max_lat - min_lat, MIN_GRID_STEP)
+    return max(MIN_GRID_STEP, 2.0 ** math.ceil(math.log2(span)) / 4)
+
+
+def snap_bbox(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> Tuple[float, float, float, float]:
+    """Expande o bbox para fora, alinhando as bordas à grade."""
+    step = grid_step(min_lon, min_lat, max_lon, max_lat)
+    return (
+        math.floor(min_lon / step) * step,
+        math.floor(min_lat / step) * step,
+        math.ceil(max_lon / step) * step,
+        math.ceil(max_lat / step) * step,
+    )
+
+
+class LRUCache:
+    """
+    Cache LRU em memória limitado por bytes.
+    Cada entrada guarda um `meta` (dict) usado na invalidação seletiva.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._index: "OrderedDict[Any, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._values: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # armazenamento (sobrescrito por DiskCache)
+    def _load(self, key):
+        return self._values[key]
+
+    def _store(self, key, value):
+        self._values[key] = value
+
+    def _drop(self, key):
+        self._values.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return self._load(key)
+
+    def set(self, key, value, size: int, meta: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self.delete(key)
+            self._store(key, value)
+            self._index[key] = (size, meta or {})
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and self._index:
+                old_key = next(iter(self._index))
+                self.delete(old_key)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._index.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[0]
+                self._drop(key)
+
+    def invalidate(self, predicate) -> int:
+        """Remove as entradas cujo meta satisfaz `predicate(meta)`. Retorna quantas saíram."""
+        with self._lock:
+            keys = [k for k, (_, meta) in self._index.items() if predicate(meta)]
+            for k in keys:
+                self.delete(k)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            for k in list(self._index):
+                self.delete(k)
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+class DiskCache(LRUCache):
+    """
+    Mesma política LRU, mas os valores ficam em arquivos pickle em `directory`.
+    O índice fica em memória; o diretório é limpo ao iniciar.
+    """
+
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__(max_bytes=max_bytes)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for f in self.directory.glob("*.pkl"):
+            f.unlink()
+
+    def _path(self, key) -> Path:
+        return self.directory / (hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".pkl")
+
+    def _load(self, key):
+        with open(self._path(key), "rb") as fh:
+            return pickle.load(fh)
+
+    def _store(self, key, value):
+        with open(self._path(key), "wb") as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _drop(self, key):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class NullCache(LRUCache):
+    """Cache desligado: nunca guarda nada (CACHE_BACKEND=none)."""
+
+    def set(self, key, value, size: int, meta: Optional[Dict[str, Any]] = None):
+        return
+
+
+class ResultCache(LRUCache):
+    """
+    Resultados derivados de um objeto imutável (matriz de indicadores, grafo de vizinhança).
+    As chaves vêm de parâmetros do cliente (pesos, permutações, semente): LRU em memória com
+    orçamento em bytes, para não crescer sem limite enquanto a versão dos dados não muda.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        super().__init__(max_bytes=max_bytes)
+
+    def get_or_compute(self, key, compute: Callable[[], Any]) -> Any:
+        """Resultado guardado em `key`; senão `compute()` (fora do lock: duas chamadas podem calcular juntas)."""
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.set(key, result, estimate_result_size(result))
+        return result
+
+
+def make_backend(name: str = CACHE_BACKEND) -> LRUCache:
+    if name == "disk":
+        return DiskCache()
+    if name == "none":
+        return NullCache()
+    return LRUCache()
+
+
+class VersionedCache:
+    """
+    Um valor derivado dos dados inteiros (índice de nomes, estatísticas), montado por
+    `build(linhas)` e válido para uma versão dos dados; refeito quando a versão muda.
+    """
+
+    def __init__(self, build: Callable[[Any], Any]):
+        self.build = build
+        self._lock = threading.Lock()
+        self.version: Optional[int] = None
+        self.value: Any = None
+
+    def current(self, version: int) -> Any:
+        """O valor, se foi montado para `version`; senão None (o chamador assíncrono carrega e chama put)."""
+        return self.value if self.value is not None and self.version == version else None
+
+    def put(self, version: int, rows) -> Any:
+        value = self.build(rows)
+        with self._lock:
+            self.version, self.value = version, value
+        return value
+
+    def get(self, version: int, load: Callable[[], Any]) -> Any:
+        """Valor da versão `version`; `load()` busca as linhas só quando é preciso refazer (uma vez, sob lock)."""
+        value = self.current(version)
+        if value is not None:
+            return value
+        with self._lock:
+            if self.value is None or self.version != version:
+                self.value = self.build(load())
+                self.version = version
+            return self.value
+
+
+class QueryCache:
+    """
+    Cache na frente de crud.list_pois_in_bbox, list_pois_by_municipio e list_pois_by_type.
+
+    Coerência: as entradas valem para uma versão dos dados. Escritas locais (create_poi)
+    invalidam só as entradas afetadas (mesmo tipo / célula que contém o ponto) e passam à
+    versão que gravaram, se é a seguinte; qualquer outra mudança de versão (ETL, outro
+    worker, escrita que pulou versões) limpa tudo.
+    Uma leitura que cruzou uma dessas mudanças não grava o que leu (`generation`): as linhas
+    podem ser de antes da escrita e ficariam no cache sob a versão nova.
+    """
+
+    def __init__(self, backend: Optional[LRUCache] = None):
+        self.backend = backend or make_backend()
+        self.version: Optional[int] = None
+        # avança a cada invalidação/limpeza, com ou sem versão conhecida
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def _sync(self, version: Optional[int]):
+        if version is None:
+            return
+        with self._lock:
+            if version != self.version:
+                self.backend.clear()
+                self.version = version
+                self.generation += 1
+
+    def _store(self, key, rows: List[PoiRecord], meta: Dict[str, Any], generation: int):
+        with self._lock:
+            if self.generation == generation:
+                self.backend.set(key, rows, estimate_size(rows), meta)
+
+    def _load(self, key, meta: Dict[str, Any], fetch) -> List[PoiRecord]:
+        rows = self.backend.get(key)
+        if rows is None:
+            generation = self.generation
+            rows = [poi_record(p) for p in fetch()]
+            self._store(key, rows, meta, generation)
+        return rows
+
+    async def _load_async(self, key, meta: Dict[str, Any], fetch) -> List[PoiRecord]:
+        rows = self.backend.get(key)
+        if rows is None:
+            generation = self.generation
+            rows = [poi_record(p) for p in await fetch()]
+            self._store(key, rows, meta, generation)
+        return rows
+
+    @staticmethod
+    def _clip(rows, min_lon, min_lat, max_lon, max_lat) -> List[PoiRecord]:
+        return [
+            r for r in rows
+            if min_lon <= r.longitude <= max_lon and min_lat <= r.latitude <= max_lat
+        ]
+
+    @staticmethod
+    def _municipio_meta(rows) -> Dict[str, Any]:
+        # sem linhas não sabemos o municipio_id: a entrada cai em qualquer escrita
+        return {"kind": "municipio", "municipio_id": rows[0].municipio_id if rows else None}
+
+    def pois_in_bbox(self, db: Session, min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+                     tipo: Optional[str] = None, version: Optional[int] = None) -> List[PoiRecord]:
+        """
+        Busca o bbox expandido para a grade (superconjunto compartilhável) e filtra
+        o resultado para o bbox exato pedido.
+        """
+        self._sync(version)
+        snapped = snap_bbox(min_lon, min_lat, max_lon, max_lat)
+        rows = self._load(("bbox", snapped, tipo), {"kind": "bbox", "bbox": snapped, "tipo": tipo},
+                          lambda: crud.list_pois_in_bbox(db, *snapped, tipo=tipo))
+        return self._clip(rows, min_lon, min_lat, max_lon, max_lat)
+
+    def pois_by_type(self, db: Session, tipo: str, skip: int = 0, limit: int = 100,
+                     version: Optional[int] = None) -> List[PoiRecord]:
+        self._sync(version)
+        return self._load(("tipo", tipo, skip, limit), {"kind": "tipo", "tipo": tipo},
+                          lambda: crud.list_pois_by_type(db, tipo=tipo, skip=skip, limit=limit))
+
+    def pois_by_municipio(self, db: Session, ibge_code: str, skip: int = 0, limit: int = 500,
+                          version: Optional[int] = None) -> List[PoiRecord]:
+        self._sync(version)
+        key = ("municipio", ibge_code, skip, limit)
+        rows = self.backend.get(key)
+        if rows is None:
+            generation = self.generation
+            rows = [poi_record(p) for p in crud.list_pois_by_municipio(db, ibge_code=ibge_code, skip=skip, limit=limit)]
+            self._store(key, rows, self._municipio_meta(rows), generation)
+        return rows
+
+    # versões assíncronas (DB_MODE=async): mesma chave, mesmo armazenamento
+    async def pois_in_bbox_async(self, db, min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+                                 tipo: Optional[str] = None, version: Optional[int] = None) -> List[PoiRecord]:
+        self._sync(version)
+        snapped = snap_bbox(min_lon, min_lat, max_lon, max_lat)
+        rows = await self._load_async(("bbox", snapped, tipo), {"kind": "bbox", "bbox": snapped, "tipo": tipo},
+                                      lambda: crud.list_pois_in_bbox_async(db, *snapped, tipo=tipo))
+        return self._clip(rows, min_lon, min_lat, max_lon, max_lat)
+
+    async def pois_by_type_async(self, db, tipo: str, skip: int = 0, limit: int = 100,
+                                 version: Optional[int] = None) -> List[PoiRecord]:
+        self._sync(version)
+        return await self._load_async(("tipo", tipo, skip, limit), {"kind": "tipo", "tipo": tipo},
+                                      lambda: crud.list_pois_by_type_async(db, tipo=tipo, skip=skip, limit=limit))
+
+    async def pois_by_municipio_async(self, db, ibge_code: str, skip: int = 0, limit: int = 500,
+                                      version: Optional[int] = None) -> List[PoiRecord]:
+        self._sync(version)
+        key = ("municipio", ibge_code, skip, limit)
+        rows = self.backend.get(key)
+        if rows is None:
+            generation = self.generation
+            rows = [poi_record(p) for p in await crud.list_pois_by_municipio_async(db, ibge_code=ibge_code, skip=skip, limit=limit)]
+            self._store(key, rows, self._municipio_meta(rows), generation)
+        return rows
+
+    def invalidate_poi(self, poi, version: int) -> int:
+        """
+        Invalidação seletiva após a criação de um POI: entradas do mesmo tipo
+        (ou sem filtro de tipo) cuja célula contém o ponto, e o município do POI.
+        `version` é a que crud.bump_data_version deu à escrita.
+        """
+        tipo, lat, lon, municipio_id = poi.tipo, poi.latitude, poi.longitude, poi.municipio_id
+
+        def affected(meta):
+            kind = meta.get("kind")
+            if kind == "bbox":
+                b = meta["bbox"]
+                inside = b[0] <= lon <= b[2] and b[1] <= lat <= b[3]
+                return inside and meta["tipo"] in (None, tipo)
+            if kind == "tipo":
+                return meta["tipo"] == tipo
+            if kind == "municipio":
+                return meta["municipio_id"] in (None, municipio_id)
+            return True
+
+        # invalidação e versão nova juntas: nenhuma leitura grava entre as duas
+        with self._lock:
+            # outra escrita entre a versão guardada e esta: as entradas podem não tê-la, sai tudo
+            skipped = self.version is not None and version != self.version + 1
+            removed = self.backend.invalidate(lambda meta: skipped or affected(meta))
+            self.generation += 1
+            self.version = version
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+            self.backend.reset_stats()
+            self.version = None
+            self.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        out = self.backend.stats()
+        out["data_version"] = self.version
+        return out
+
+
+query_cache = QueryCache()
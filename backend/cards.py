@@ -0,0 +1,107 @@
+# backend/cards.py
+# Ficha do município (/municipios/{ibge_code}/card): indicadores, posição no estado,
+# médias do estado e dos vizinhos e POIs por tipo. Tudo é calculado de uma vez, por
+# versão dos dados, sobre vetores NumPy (um por indicador, na ordem dos municípios), e
+# cada ficha fica guardada já serializada: a resposta é um lookup em dict.
+#
+#   rank       1 = maior valor do estado; empates dividem a melhor posição
+#   percentil  % dos municípios com valor menor ou igual
+#   estado     todos os municípios da base (o ETL carrega um estado só)
+#   vizinhos   municípios que compartilham ao menos um vértice da divisa (backend/contiguity.py)
+import json
+from typing import Dict, Optional, Sequence
+import numpy as np
+from . import crud
+from .cache import VersionedCache
+from .contiguity import NeighborGraph
+from .indicators import INDICADOR_FIELDS, fields, nan_stats, ranks
+
+
+def neighbour_means(values: np.ndarray, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Média (sem NaN) de cada coluna de `values` sobre os vizinhos de cada linha; NaN sem vizinho com valor."""
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    picked = values[indices]
+    valid = ~np.isnan(picked)
+    sums = np.zeros_like(values)
+    counts = np.zeros_like(values)
+    np.add.at(sums, rows, np.where(valid, picked, 0.0))
+    np.add.at(counts, rows, valid)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+class CardIndex:
+    """Fichas de todos os municípios, já em JSON (bytes UTF-8), por código IBGE."""
+
+    def __init__(self, municipios: Sequence, indicadores: Sequence, counts: Sequence, edges: Sequence):
+        by_ibge = {i.ibge_code: i for i in indicadores}
+        n, k = len(municipios), len(INDICADOR_FIELDS)
+        values = np.full((n, k), np.nan)
+        for row, m in enumerate(municipios):
+            ind = by_ibge.get(m.ibge_code)
+            if ind is not None:
+                values[row] = [np.nan if getattr(ind, f) is None else getattr(ind, f) for f in INDICADOR_FIELDS]
+        pois: Dict[str, Dict[str, int]] = {}
+        for c in counts:
+            if c.ibge_code is not None and c.tipo is not None:
+                pois.setdefault(c.ibge_code, {})[c.tipo] = int(c.n)
+
+        graph = NeighborGraph(municipios, edges)
+        self.indptr, self.indices = graph.indptr, graph.indices
+        nearby = neighbour_means(values, self.indptr, self.indices)
+        columns = [ranks(values[:, j]) for j in range(k)]
+        rank = np.column_stack([c[0] for c in columns])
+        percentile = np.column_stack([c[1] for c in columns])
+        mean, median, _ = nan_stats(values)
+        totals = {f: c[2] for f, c in zip(INDICADOR_FIELDS, columns)}
+        state = {"media": fields(mean), "mediana": fields(median)}
+
+        self.cards: Dict[str, bytes] = {}
+        for row, m in enumerate(municipios):
+            neighbours = self.indices[self.indptr[row]:self.indptr[row + 1]]
+            card = {
+                "ibge_code": m.ibge_code,
+                "nome": m.nome,
+                "indicadores": fields(values[row]),
+                "rank": {f: None if np.isnan(r) else int(r) for f, r in zip(INDICADOR_FIELDS, rank[row])},
+                "percentil": {f: None if np.isnan(p) else round(float(p), 2)
+                              for f, p in zip(INDICADOR_FIELDS, percentile[row])},
+                "total": totals,
+                "estado": state,
+                "vizinhos": [municipios[j].ibge_code for j in neighbours.tolist()],
+                "vizinhos_media": fields(nearby[row]),
+                "pois": pois.get(m.ibge_code, {}),
+            }
+            self.cards[m.ibge_code] = json.dumps(card, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_rows(cls, rows: dict) -> "CardIndex":
+        return cls(rows["municipios"], rows["indicadores"], rows["counts"], rows["edges"])
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def get(self, ibge_code: str) -> Optional[bytes]:
+        return self.cards.get(ibge_code)
+
+
+def load_cards(db) -> dict:
+    return {
+        "municipios": crud.list_municipios(db, skip=0, limit=None, columns=crud.MUNICIPIO_NAME_COLUMNS),
+        "indicadores": crud.list_indicadores(db, limit=None),
+        "counts": crud.list_poi_counts(db),
+        "edges": crud.list_neighbors(db),
+    }
+
+
+async def load_cards_async(db) -> dict:
+    return {
+        "municipios": await crud.list_municipios_async(db, skip=0, limit=None,
+                                                       columns=crud.MUNICIPIO_NAME_COLUMNS),
+        "indicadores": await crud.list_indicadores_async(db, limit=None),
+        "counts": await crud.list_poi_counts_async(db),
+        "edges": await crud.list_neighbors_async(db),
+    }
+
+
+municipio_cards = VersionedCache(CardIndex.from_rows)
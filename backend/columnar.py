@@ -0,0 +1,442 @@
+# backend/columnar.py
+# Armazenamento colunar de POIs em arrays NumPy mapeados em memória (.npy + mmap).
+# O ETL grava as colunas; a API só faz np.load(mmap_mode="r") na subida, então o
+# custo de iniciar é quase nulo e as páginas ficam no page cache do SO entre restarts.
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from . import crud, models
+from .cache import PoiRecord
+from .db import DATA_DIR
+from .markers import encode_markers
+
+# auto (padrão): usa as colunas quando existem e estão na versão corrente dos dados,
+# senão cai no SQLite; sqlite: sempre consulta o banco
+POI_ENGINE = os.getenv("POI_ENGINE", "auto")
+COLUMNAR_DIR = Path(os.getenv("POI_COLUMNAR_DIR", str(DATA_DIR / "pois_columnar")))
+# o delta é incorporado aos arquivos quando passa desse tamanho ou dessa idade (s)
+DELTA_MERGE_ROWS = int(os.getenv("POI_DELTA_MERGE_ROWS", "1000"))
+DELTA_MERGE_SECONDS = float(os.getenv("POI_DELTA_MERGE_SECONDS", "300"))
+# lado (graus) da célula do índice em grade usado nas consultas bbox
+GRID_CELL = float(os.getenv("POI_GRID_CELL", "0.02"))
+
+COLUMNS = ("id", "lat", "lon", "municipio_id", "tipo", "created_at", "nome_offsets", "nome_data")
+GRID_COLUMNS = ("grid_order", "grid_offsets")
+NO_MUNICIPIO = -1
+NO_TIPO = -1
+
+
+def encode_columns(rows: Sequence) -> Dict[str, object]:
+    """
+    Converte linhas (id, municipio_id, tipo, nome, latitude, longitude, created_at)
+    em arrays colunares. `tipo` vira código int16 num dicionário ordenado; `nome` vira
+    bytes UTF-8 concatenados + offsets (como uma coluna de strings do Arrow).
+    """
+    tipos = sorted({r.tipo for r in rows if r.tipo})
+    tipo_code = {t: i for i, t in enumerate(tipos)}
+    n = len(rows)
+    nomes = [(r.nome or "").encode("utf-8") for r in rows]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    if n:
+        np.cumsum([len(b) for b in nomes], out=offsets[1:])
+    return {
+        "id": np.fromiter((r.id for r in rows), dtype=np.int64, count=n),
+        "lat": np.fromiter((r.latitude for r in rows), dtype=np.float64, count=n),
+        "lon": np.fromiter((r.longitude for r in rows), dtype=np.float64, count=n),
+        "municipio_id": np.fromiter(
+            (NO_MUNICIPIO if r.municipio_id is None else r.municipio_id for r in rows), dtype=np.int32, count=n),
+        "tipo": np.fromiter((tipo_code.get(r.tipo, NO_TIPO) for r in rows), dtype=np.int16, count=n),
+        "created_at": np.array([r.created_at for r in rows], dtype="datetime64[us]"),
+        "nome_offsets": offsets,
+        "nome_data": np.frombuffer(b"".join(nomes), dtype=np.uint8),
+        "tipos": tipos,
+    }
+
+
+def take_rows(columns: Dict[str, object], order: np.ndarray) -> Dict[str, object]:
+    """Linhas `order` das colunas, na ordem dada; os nomes são copiados com um gather só."""
+    out = {name: np.asarray(columns[name])[order] for name in ("id", "lat", "lon", "municipio_id", "tipo", "created_at")}
+    offsets = np.asarray(columns["nome_offsets"])
+    lengths = np.diff(offsets)[order]
+    new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    gather = np.repeat(offsets[:-1][order] - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    out["nome_offsets"] = new_offsets
+    out["nome_data"] = np.asarray(columns["nome_data"])[gather]
+    out["tipos"] = columns["tipos"]
+    return out
+
+
+def concat_columns(parts: Sequence[Dict[str, object]]) -> Dict[str, object]:
+    """
+    Junta blocos de colunas (encode_columns ou a base mapeada) num só, em ordem de id:
+    os dicionários de tipo viram um só (códigos traduzidos por lookup) e os offsets dos
+    nomes são deslocados pelo tamanho dos blocos anteriores. Sem laço por linha.
+    """
+    if not parts:
+        return encode_columns([])
+    tipos = sorted({t for p in parts for t in p["tipos"]})
+    code = {t: i for i, t in enumerate(tipos)}
+    out = {name: np.concatenate([np.asarray(p[name]) for p in parts])
+           for name in ("id", "lat", "lon", "municipio_id", "created_at", "nome_data")}
+    # código local -> código unificado; o último item atende NO_TIPO (-1)
+    out["tipo"] = np.concatenate([
+        np.array([code[t] for t in p["tipos"]] + [NO_TIPO], dtype=np.int16)[np.asarray(p["tipo"])] for p in parts
+    ])
+    shifts = np.cumsum([0] + [len(p["nome_data"]) for p in parts[:-1]])
+    out["nome_offsets"] = np.concatenate(
+        [np.zeros(1, dtype=np.int64)] + [np.asarray(p["nome_offsets"])[1:] + shift for p, shift in zip(parts, shifts)])
+    out["tipos"] = tipos
+    if (np.diff(out["id"]) < 0).any():
+        out = take_rows(out, np.argsort(out["id"], kind="stable"))
+    return out
+
+
+def build_grid(lat: np.ndarray, lon: np.ndarray, cell: float = GRID_CELL) -> Dict[str, object]:
+    """
+    Índice em grade (CSR): posições das linhas ordenadas por célula (linha a linha) e
+    o offset de cada célula nessa ordem. As células de uma faixa de latitude ficam
+    contíguas, então um bbox vira uma fatia por linha da grade.
+    """
+    if len(lat) == 0:
+        return {"grid_order": np.zeros(0, dtype=np.int64), "grid_offsets": np.zeros(1, dtype=np.int64),
+                "grid": {"cell": cell, "lon0": 0.0, "lat0": 0.0, "nx": 0, "ny": 0}}
+    lon0 = float(np.floor(lon.min() / cell) * cell)
+    lat0 = float(np.floor(lat.min() / cell) * cell)
+    ix = ((lon - lon0) / cell).astype(np.int64)
+    iy = ((lat - lat0) / cell).astype(np.int64)
+    nx, ny = int(ix.max()) + 1, int(iy.max()) + 1
+    key = iy * nx + ix
+    order = np.argsort(key, kind="stable")
+    offsets = np.searchsorted(key[order], np.arange(nx * ny + 1))
+    return {"grid_order": order, "grid_offsets": offsets.astype(np.int64),
+            "grid": {"cell": cell, "lon0": lon0, "lat0": lat0, "nx": nx, "ny": ny}}
+
+
+def write_columns(columns: Dict[str, object], directory: Path, data_version: int,
+                  ibge_to_id: Dict[str, int]) -> dict:
+    """
+    Grava as colunas numa geração nova (subdiretório) de `directory` e só então troca
+    meta.json (os.replace), que aponta para ela. Quem mapeia lê meta.json primeiro, então
+    nunca mistura arquivos de gerações diferentes; as duas gerações mais recentes ficam.
+    Devolve o meta gravado.
+    """
+    directory = Path(directory)
+    generation = f"gen-{data_version}-{os.getpid()}-{time.time_ns()}"
+    gen_dir = directory / generation
+    gen_dir.mkdir(parents=True)
+    grid = build_grid(columns["lat"], columns["lon"])
+    for name in COLUMNS + GRID_COLUMNS:
+        np.save(gen_dir / f"{name}.npy", columns[name] if name in columns else grid[name])
+    meta = {
+        "data_version": data_version,
+        "generation": generation,
+        "count": int(len(columns["id"])),
+        "tipos": columns["tipos"],
+        "municipios": ibge_to_id,
+        "grid": grid["grid"],
+    }
+    tmp = directory / f"meta.{generation}.tmp"
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, directory / "meta.json")
+    # arrays já mapeados continuam válidos depois do unlink (POSIX)
+    for old in sorted(directory.glob("gen-*"), key=lambda d: d.stat().st_mtime)[:-2]:
+        shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def export_pois(db: Session, directory: Path = COLUMNAR_DIR, batch_size: int = 10000) -> int:
+    """
+    Lê os POIs do SQLite em lotes (yield_per) e grava as colunas. Usado pelo ETL.
+    Cada lote vira arrays na hora: em memória ficam as colunas, não as linhas.
+    """
+    stmt = select(*crud.POI_COLUMNS).order_by(models.POI.id).execution_options(yield_per=batch_size)
+    parts = [encode_columns(chunk) for chunk in db.execute(stmt).partitions()]
+    columns = concat_columns(parts)
+    ibge_to_id = {ibge: mid for mid, ibge in db.execute(select(models.Municipio.id, models.Municipio.ibge_code))}
+    write_columns(columns, directory, crud.get_data_version(db), ibge_to_id)
+    return len(columns["id"])
+
+
+class POIColumnStore:
+    """
+    Consultas vetorizadas (máscaras NumPy) sobre as colunas mapeadas em memória.
+    Escritas locais (create_poi) entram num delta em memória, consultado junto com a base
+    e incorporado aos arquivos periodicamente (merge), numa thread à parte: o POST que
+    completa o delta não espera a regravação.
+    """
+
+    def __init__(self, directory: Path = COLUMNAR_DIR, enabled: bool = True):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self._lock = threading.RLock()
+        self.version: Optional[int] = None
+        self.cols: Dict[str, np.ndarray] = {}
+        self.tipos: List[str] = []
+        self.tipo_code: Dict[str, int] = {}
+        self.municipios: Dict[str, int] = {}
+        self.grid: Optional[dict] = None
+        self.delta: List[PoiRecord] = []
+        self.last_merge = time.monotonic()
+        self._merging = False
+        self._merge_lock = threading.Lock()
+
+    # ---------- carga ----------
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def load(self) -> bool:
+        """Mapeia os arquivos (se existirem). Não lê os dados: o SO pagina sob demanda."""
+        meta_path = self.directory / "meta.json"
+        if not meta_path.exists():
+            return False
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        cols = self._map(meta)
+        if cols is None:
+            return False
+        with self._lock:
+            self._install(meta, cols)
+            self.version = int(meta["data_version"])
+            self.delta = []
+        return True
+
+    def _map(self, meta: dict) -> Optional[Dict[str, np.ndarray]]:
+        gen_dir = self.directory / meta["generation"]
+        try:
+            return {name: np.load(gen_dir / f"{name}.npy", mmap_mode="r") for name in COLUMNS + GRID_COLUMNS}
+        except OSError:
+            # geração removida entre ler meta.json e mapear: fica na anterior
+            return None
+
+    def _install(self, meta: dict, cols: Dict[str, np.ndarray]):
+        self.cols = cols
+        self.grid = meta["grid"]
+        self.tipos = list(meta["tipos"])
+        self.tipo_code = {t: i for i, t in enumerate(self.tipos)}
+        self.municipios = dict(meta["municipios"])
+        self.last_merge = time.monotonic()
+
+    def is_fresh(self, version: Optional[int]) -> bool:
+        """
+        True se as colunas (+ delta) refletem `version`. Se outro processo já gravou
+        colunas mais novas (merge ou ETL), recarrega; se não, quem chama usa o SQLite.
+        """
+        # só quem mapeou as colunas na subida (load) passa a segui-las
+        if not self.enabled or not self.loaded or version is None:
+            return False
+        with self._lock:
+            if self.version == version:
+                return True
+        meta_path = self.directory / "meta.json"
+        if meta_path.exists():
+            try:
+                on_disk = json.loads(meta_path.read_text(encoding="utf-8"))["data_version"]
+            except (OSError, ValueError, KeyError):
+                return False
+            if on_disk == version and self.load():
+                return True
+        return False
+
+    # ---------- escrita ----------
+    def append(self, poi, version: int) -> None:
+        """
+        Registra um POI recém-criado no delta. `version` é a que crud.bump_data_version deu a
+        esta escrita: se não é a seguinte à do store, outra escrita (outro worker) passou sem
+        entrar no delta, e o store fica na versão antiga (is_fresh falha, as rotas usam o SQLite).
+        """
+        with self._lock:
+            if not self.loaded or version != self.version + 1:
+                return
+            self.delta.append(PoiRecord(*(getattr(poi, f, None) for f in PoiRecord._fields)))
+            self.version = version
+            due = not self._merging and (len(self.delta) >= DELTA_MERGE_ROWS
+                                         or time.monotonic() - self.last_merge >= DELTA_MERGE_SECONDS)
+            if due:
+                self._merging = True
+        if due:
+            threading.Thread(target=self._merge_in_background, name="poi-delta-merge", daemon=True).start()
+
+    def _merge_in_background(self):
+        try:
+            self.merge()
+        except Exception as err:  # o delta fica; a próxima escrita tenta de novo
+            print(f"Aviso: merge do delta de POIs falhou: {err}")
+        finally:
+            with self._lock:
+                self._merging = False
+
+    def merge(self) -> None:
+        """
+        Incorpora o delta: base + delta concatenados em arrays (concat_columns), gravados
+        numa geração nova e remapeados. Só o retrato do estado e a troca final seguram o
+        lock; consultas e escritas seguem na base + delta enquanto os arquivos são gravados.
+        """
+        with self._merge_lock:
+            with self._lock:
+                if not self.loaded or not self.delta:
+                    self.last_merge = time.monotonic()
+                    return
+                base = self.cols
+                parts = [{**{name: base[name] for name in COLUMNS}, "tipos": list(self.tipos)},
+                         encode_columns(self.delta)]
+                merged, version, municipios = len(self.delta), self.version, dict(self.municipios)
+            meta = write_columns(concat_columns(parts), self.directory, version, municipios)
+            cols = self._map(meta)
+            with self._lock:
+                # outro load (ETL, merge de outro processo) trocou a base no meio: fica com ela
+                if cols is None or self.cols is not base:
+                    return
+                self._install(meta, cols)
+                # escritas que chegaram durante a gravação continuam no delta
+                self.delta = self.delta[merged:]
+
+    # ---------- consultas ----------
+    def _bbox_candidates(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        """Linhas das células da grade que cruzam o bbox (superconjunto, em ordem de linha)."""
+        g, cols = self.grid, self.cols
+        nx, ny, cell = g["nx"], g["ny"], g["cell"]
+        ix0 = max(int(np.floor((min_lon - g["lon0"]) / cell)), 0)
+        ix1 = min(int(np.floor((max_lon - g["lon0"]) / cell)), nx - 1)
+        iy0 = max(int(np.floor((min_lat - g["lat0"]) / cell)), 0)
+        iy1 = min(int(np.floor((max_lat - g["lat0"]) / cell)), ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.zeros(0, dtype=np.int64)
+        order, offsets = cols["grid_order"], cols["grid_offsets"]
+        parts = [order[offsets[iy * nx + ix0]:offsets[iy * nx + ix1 + 1]] for iy in range(iy0, iy1 + 1)]
+        return np.sort(np.concatenate(parts))
+
+    def _select(self, bbox=None, tipos: Optional[Sequence[str]] = None, municipio_id: Optional[int] = None) -> np.ndarray:
+        """Posições (ordem de id) das linhas base que passam nos filtros."""
+        cols = self.cols
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            idx = self._bbox_candidates(min_lon, min_lat, max_lon, max_lat)
+            lon, lat = cols["lon"][idx], cols["lat"][idx]
+            idx = idx[(lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)]
+        else:
+            idx = None
+        mask = None
+        if tipos:
+            codes = [self.tipo_code[t] for t in tipos if t in self.tipo_code]
+            tipo = cols["tipo"] if idx is None else cols["tipo"][idx]
+            mask = np.isin(tipo, codes)
+        if municipio_id is not None:
+            mid = cols["municipio_id"] if idx is None else cols["municipio_id"][idx]
+            mask = (mid == municipio_id) if mask is None else mask & (mid == municipio_id)
+        if idx is None:
+            return np.arange(len(cols["id"])) if mask is None else np.flatnonzero(mask)
+        return idx if mask is None else idx[mask]
+
+    @staticmethod
+    def _delta_match(r: PoiRecord, bbox, tipos, municipio_id) -> bool:
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            if not (min_lon <= r.longitude <= max_lon and min_lat <= r.latitude <= max_lat):
+                return False
+        if tipos and r.tipo not in tipos:
+            return False
+        if municipio_id is not None and r.municipio_id != municipio_id:
+            return False
+        return True
+
+    def records(self, idx: np.ndarray) -> List[PoiRecord]:
+        """Materializa as linhas `idx` como PoiRecord (só as selecionadas)."""
+        cols = self.cols
+        offsets, data = cols["nome_offsets"], cols["nome_data"]
+        tipos = self.tipos
+        out = []
+        for i, pid, lat, lon, mid, code, created in zip(
+            idx.tolist(), cols["id"][idx].tolist(), cols["lat"][idx].tolist(), cols["lon"][idx].tolist(),
+            cols["municipio_id"][idx].tolist(), cols["tipo"][idx].tolist(), cols["created_at"][idx].tolist(),
+        ):
+            nome = bytes(data[offsets[i]:offsets[i + 1]]).decode("utf-8") or None
+            out.append(PoiRecord(
+                pid, None if mid == NO_MUNICIPIO else mid, None if code == NO_TIPO else tipos[code],
+                nome, lat, lon, created,
+            ))
+        return out
+
+    def _page(self, bbox, tipos, municipio_id, skip: int, limit: Optional[int]):
+        """Página [skip, skip + limit) sobre base + delta: (posições na base, registros do delta)."""
+        idx = self._select(bbox, tipos, municipio_id)
+        delta = [r for r in self.delta if self._delta_match(r, bbox, tipos, municipio_id)]
+        total = len(idx) + len(delta)
+        end = total if limit is None else min(total, skip + limit)
+        return idx[skip:end], delta[max(0, skip - len(idx)):max(0, end - len(idx))]
+
+    def query(self, bbox=None, tipos: Optional[Sequence[str]] = None, municipio_id: Optional[int] = None,
+              skip: int = 0, limit: Optional[int] = None) -> List[PoiRecord]:
+        with self._lock:
+            idx, extra = self._page(bbox, tipos, municipio_id, skip, limit)
+            return self.records(idx) + extra
+
+    def count(self, bbox=None, tipos: Optional[Sequence[str]] = None, municipio_id: Optional[int] = None) -> int:
+        with self._lock:
+            n = len(self._select(bbox, tipos, municipio_id))
+            return n + sum(1 for r in self.delta if self._delta_match(r, bbox, tipos, municipio_id))
+
+    # mesma interface das funções de crud
+    def pois_in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+                     tipo: Optional[str] = None) -> List[PoiRecord]:
+        return self.query(bbox=(min_lon, min_lat, max_lon, max_lat), tipos=[tipo] if tipo else None)
+
+    def pois_by_type(self, tipo: str, skip: int = 0, limit: int = 100) -> List[PoiRecord]:
+        return self.query(tipos=[tipo], skip=skip, limit=limit)
+
+    def pois_by_municipio(self, ibge_code: str, skip: int = 0, limit: int = 500) -> List[PoiRecord]:
+        municipio_id = self.municipios.get(ibge_code)
+        if municipio_id is None:
+            return []
+        return self.query(municipio_id=municipio_id, skip=skip, limit=limit)
+
+    def count_pois(self, bbox=None, tipo: Optional[str] = None, ibge_code: Optional[str] = None) -> int:
+        municipio_id = None
+        if ibge_code is not None:
+            municipio_id = self.municipios.get(ibge_code)
+            if municipio_id is None:
+                return 0
+        return self.count(bbox=bbox, tipos=[tipo] if tipo else None, municipio_id=municipio_id)
+
+    def markers(self, bbox=None, tipo: Optional[str] = None, ibge_code: Optional[str] = None,
+                skip: int = 0, limit: Optional[int] = None) -> bytes:
+        """Buffer de ?format=binary (backend/markers.py) direto das colunas, sem PoiRecord por linha."""
+        municipio_id = None
+        if ibge_code is not None:
+            municipio_id = self.municipios.get(ibge_code, NO_MUNICIPIO - 1)  # desconhecido: nenhum POI
+        with self._lock:
+            idx, extra = self._page(bbox, [tipo] if tipo else None, municipio_id, skip, limit)
+            cols, tipos = self.cols, list(self.tipos)
+            code = dict(self.tipo_code)
+            for r in extra:
+                if r.tipo and r.tipo not in code:
+                    code[r.tipo] = len(tipos)
+                    tipos.append(r.tipo)
+            return encode_markers(
+                np.concatenate([cols["id"][idx], np.array([r.id for r in extra], dtype=np.int64)]),
+                np.concatenate([cols["lat"][idx], np.array([r.latitude for r in extra], dtype=np.float64)]),
+                np.concatenate([cols["lon"][idx], np.array([r.longitude for r in extra], dtype=np.float64)]),
+                np.concatenate([cols["tipo"][idx],
+                                np.array([code[r.tipo] if r.tipo else NO_TIPO for r in extra], dtype=np.int16)]),
+                tipos,
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "enabled": self.enabled,
+                "version": self.version,
+                "rows": len(self.cols["id"]) if self.loaded else 0,
+                "delta": len(self.delta),
+            }
+
+
+poi_store = POIColumnStore(enabled=POI_ENGINE != "sqlite")
@@ -0,0 +1,132 @@
+# backend/contiguity.py
+# Vizinhança dos municípios por contiguidade "queen": dois municípios são vizinhos quando
+# as divisas dividem ao menos um vértice. O ETL calcula os pares uma vez a partir das
+# geometrias e grava em municipio_vizinhos (os dois sentidos); a API lê a tabela e monta,
+# por versão dos dados, um grafo CSR em memória:
+#
+#   indptr   int64[n + 1]   vizinhos do nó i = indices[indptr[i]:indptr[i + 1]]
+#   indices  int64[nnz]     nós vizinhos, em ordem crescente
+#
+# Os vértices são comparados exatos (inteiros E7 das geometrias já arredondadas pelo ETL):
+# uma ordenação de todos os vértices junta os municípios de cada ponto, sem comparar
+# polígonos dois a dois.
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from . import crud, models
+from .cache import ResultCache, VersionedCache
+from .geometry import packed_of
+from .names import NameEntry
+
+
+def csr(n: int, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Arestas (src -> dst, sem repetição) em CSR com os vizinhos de cada nó em ordem crescente."""
+    pairs = np.unique(src.astype(np.int64) * n + dst.astype(np.int64))
+    rows, indices = pairs // max(n, 1), pairs % max(n, 1)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, indices
+
+
+def touching(geometries: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """Vizinhança por vértice compartilhado entre as geometrias (PackedGeometry ou None), em CSR."""
+    n = len(geometries)
+    keys, owners = [], []
+    for i, g in enumerate(geometries):
+        if g is None or not len(g.coords):
+            continue
+        xy = g.coords.astype(np.int64)
+        # lon e lat E7 cabem em 32 bits: um int64 por vértice
+        keys.append((xy[:, 0] << 32) | (xy[:, 1] & 0xFFFFFFFF))
+        owners.append(np.full(len(xy), i, dtype=np.int64))
+    if not keys:
+        return csr(n, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    keys, owners = np.concatenate(keys), np.concatenate(owners)
+    order = np.lexsort((owners, keys))
+    keys, owners = keys[order], owners[order]
+    # um (vértice, município) por vez: anéis fechados repetem o primeiro ponto
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]) | (owners[1:] != owners[:-1])
+    keys, owners = keys[first], owners[first]
+    # todo par no mesmo vértice: cada município com os seguintes do grupo (poucos por vértice)
+    src, dst = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    step = 1
+    while step < len(keys):
+        same = keys[step:] == keys[:-step]
+        if not same.any():
+            break
+        src.append(owners[:-step][same])
+        dst.append(owners[step:][same])
+        step += 1
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    return csr(n, np.concatenate([src, dst]), np.concatenate([dst, src]))
+
+
+def rebuild_neighbors(conn) -> int:
+    """Refaz municipio_vizinhos a partir das geometrias (depois da carga dos municípios). Devolve o nº de pares."""
+    table = models.MunicipioVizinho.__table__
+    table.create(conn, checkfirst=True)
+    conn.execute(table.delete())
+    rows = conn.execute(select(models.Municipio.id, models.Municipio.geometry, models.Municipio.geometry_bin)
+                        .order_by(models.Municipio.id)).all()
+    indptr, indices = touching([packed_of(r) for r in rows])
+    ids = np.array([r.id for r in rows], dtype=np.int64)
+    src = ids[np.repeat(np.arange(len(rows)), np.diff(indptr))]
+    pairs = [{"municipio_id": a, "vizinho_id": b} for a, b in zip(src.tolist(), ids[indices].tolist())]
+    if pairs:
+        conn.execute(table.insert(), pairs)
+    return len(pairs)
+
+
+class NeighborGraph:
+    """Municípios (nós, na ordem de `municipios`) e a vizinhança gravada, em CSR."""
+
+    def __init__(self, municipios: Sequence, edges: Sequence):
+        self.entries = [NameEntry(m.id, m.ibge_code, m.nome) for m in municipios]
+        self.node_of: Dict[int, int] = {e.id: i for i, e in enumerate(self.entries)}
+        self.row_of: Dict[str, int] = {e.ibge_code: i for i, e in enumerate(self.entries)}
+        # pares de municípios que não estão mais na tabela ficam de fora
+        known = [(self.node_of[a], self.node_of[b]) for a, b in edges if a in self.node_of and b in self.node_of]
+        src = np.array([a for a, _ in known], dtype=np.int64)
+        dst = np.array([b for _, b in known], dtype=np.int64)
+        self.indptr, self.indices = csr(len(self.entries), src, dst)
+        self._results = ResultCache()
+
+    @classmethod
+    def from_rows(cls, rows: dict) -> "NeighborGraph":
+        return cls(rows["municipios"], rows["edges"])
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def neighbors(self, ibge_code: str) -> Optional[List[NameEntry]]:
+        """Vizinhos do município (None se o código não existe)."""
+        node = self.row_of.get(ibge_code)
+        if node is None:
+            return None
+        return [self.entries[j] for j in self.indices[self.indptr[node]:self.indptr[node + 1]].tolist()]
+
+    def cached(self, key: tuple, compute):
+        """Resultado derivado do grafo (e dos dados da mesma versão), guardado por chave (LRU limitado)."""
+        return self._results.get_or_compute(key, compute)
+
+
+def load_graph(db) -> dict:
+    return {
+        "municipios": crud.list_municipios(db, skip=0, limit=None, columns=crud.MUNICIPIO_NAME_COLUMNS),
+        "edges": crud.list_neighbors(db),
+    }
+
+
+async def load_graph_async(db) -> dict:
+    return {
+        "municipios": await crud.list_municipios_async(db, skip=0, limit=None, columns=crud.MUNICIPIO_NAME_COLUMNS),
+        "edges": await crud.list_neighbors_async(db),
+    }
+
+
+municipio_graph = VersionedCache(NeighborGraph.from_rows)
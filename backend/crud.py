@@ -1,9 +1,122 @@
-from typing import List, Optional
+import math
+import re
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from sqlalchemy import case, column, false, func, literal_column, or_, select, table, text
 from sqlalchemy.orm import Session
 from . import models, schemas
+from .spatial import E7, METERS_PER_DEGREE, hilbert_ranges, to_e7
 
-def list_municipios(db: Session, skip: int = 0, limit: int = 100) -> List[models.Municipio]:
-    return db.query(models.Municipio).offset(skip).limit(limit).all()
+# ----------------------------
+# Leitura leve: listas e bbox selecionam colunas (não entidades ORM) e devolvem Row,
+# uma tupla nomeada com __slots__, sem identity map nem instrumentação por objeto.
+# O ORM (models.*) fica para escritas e buscas de um único registro.
+# ----------------------------
+MUNICIPIO_COLUMNS = (
+    models.Municipio.id, models.Municipio.ibge_code, models.Municipio.nome, models.Municipio.geometry,
+    models.Municipio.geometry_bin,
+)
+# autocomplete (?q=): só o que o índice de nomes precisa
+MUNICIPIO_NAME_COLUMNS = (models.Municipio.id, models.Municipio.ibge_code, models.Municipio.nome)
+# GeoJSON: a Feature pré-codificada; texto/binário da geometria só nas linhas sem ela
+MUNICIPIO_FEATURE_COLUMNS = (
+    models.Municipio.id, models.Municipio.ibge_code, models.Municipio.nome, models.Municipio.feature,
+    case((models.Municipio.feature.is_(None), models.Municipio.geometry)).label("geometry"),
+    case((models.Municipio.feature.is_(None), models.Municipio.geometry_bin)).label("geometry_bin"),
+)
+INDICADOR_COLUMNS = (
+    models.Indicador.id, models.Indicador.ibge_code, models.Indicador.idh, models.Indicador.idh_renda,
+    models.Indicador.idh_longevidade, models.Indicador.idh_educacao, models.Indicador.renda_per_capita,
+    models.Indicador.saneamento,
+)
+POI_COLUMNS = (
+    models.POI.id, models.POI.municipio_id, models.POI.tipo, models.POI.nome,
+    models.POI.latitude, models.POI.longitude, models.POI.created_at,
+)
+
+MUNICIPIO_EXPORT_COLUMNS = (
+    models.Municipio.id, models.Municipio.ibge_code, models.Municipio.nome,
+    models.Municipio.min_lon, models.Municipio.min_lat, models.Municipio.max_lon, models.Municipio.max_lat,
+)
+# tabelas exportadas inteiras (/export/{tabela}.arrow): só atributos, sem as geometrias
+EXPORT_COLUMNS = {
+    "pois": POI_COLUMNS,
+    "indicadores": INDICADOR_COLUMNS,
+    "municipios": MUNICIPIO_EXPORT_COLUMNS,
+}
+
+# streaming: linhas lidas do cursor em lotes, sem materializar a lista inteira
+STREAM_BATCH_SIZE = 1000
+
+# busca textual (models.POI_SEARCH_DDL): rowid = pois.id; nome pesa mais que tipo no BM25
+POI_SEARCH = table(models.POI_SEARCH_TABLE, column("rowid"), column("nome"), column("tipo"))
+POI_SEARCH_WEIGHTS = (10.0, 1.0)
+
+# Filtros compartilhados entre o acesso síncrono (Session) e o assíncrono (AsyncSession)
+def poi_bbox_filters(min_lon: float, min_lat: float, max_lon: float, max_lat: float, tipo: Optional[str] = None) -> list:
+    # faixas da curva de Hilbert que cobrem o bbox: range scans em ix_pois_hilbert_e7;
+    # o recorte exato compara as colunas E7, que estão no próprio índice
+    ranges = hilbert_ranges(min_lon, min_lat, max_lon, max_lat)
+    filters = [
+        or_(*[models.POI.hilbert.between(start, end) for start, end in ranges]),
+        models.POI.lon_e7 >= to_e7(min_lon),
+        models.POI.lon_e7 <= to_e7(max_lon),
+        models.POI.lat_e7 >= to_e7(min_lat),
+        models.POI.lat_e7 <= to_e7(max_lat)
+    ]
+    if tipo:
+        filters.append(models.POI.tipo == tipo)
+    return filters
+
+def municipio_filters(bbox: Optional[tuple] = None, ibge_codes: Optional[List[str]] = None) -> list:
+    filters = []
+    if bbox is not None:
+        # retângulos que se cruzam com o bbox
+        min_lon, min_lat, max_lon, max_lat = bbox
+        filters += [
+            models.Municipio.max_lon >= min_lon, models.Municipio.min_lon <= max_lon,
+            models.Municipio.max_lat >= min_lat, models.Municipio.min_lat <= max_lat,
+        ]
+    if ibge_codes is not None:
+        filters.append(models.Municipio.ibge_code.in_(ibge_codes))
+    return filters
+
+def poi_count_stmt(bbox: Optional[tuple] = None, tipo: Optional[str] = None, ibge_code: Optional[str] = None):
+    """SELECT count(*) de POIs com os mesmos filtros do armazenamento colunar."""
+    stmt = select(func.count(models.POI.id))
+    if bbox is not None:
+        stmt = stmt.where(*poi_bbox_filters(*bbox))
+    if tipo:
+        stmt = stmt.where(models.POI.tipo == tipo)
+    if ibge_code is not None:
+        municipio_id = select(models.Municipio.id).where(models.Municipio.ibge_code == ibge_code).scalar_subquery()
+        stmt = stmt.where(models.POI.municipio_id == municipio_id)
+    return stmt
+
+# Versão dos dados (PRAGMA user_version do SQLite)
+def get_data_version(db: Session) -> int:
+    """
+    Retorna o contador de versão dos dados.
+    Usa o PRAGMA user_version, que fica no cabeçalho do arquivo e não depende de tabela.
+    """
+    return int(db.execute(text("PRAGMA user_version")).scalar() or 0)
+
+def bump_data_version(db: Session) -> int:
+    """
+    Incrementa o contador de versão dos dados dentro da transação corrente.
+    Quem chama é responsável pelo commit.
+    """
+    version = get_data_version(db) + 1
+    # PRAGMA não aceita parâmetros ligados; version é sempre int
+    db.execute(text(f"PRAGMA user_version = {int(version)}"))
+    return version
+
+def list_municipios(db: Session, skip: int = 0, limit: int = 100, bbox: Optional[tuple] = None,
+                    ibge_codes: Optional[List[str]] = None, columns: tuple = MUNICIPIO_COLUMNS):
+    query = db.query(*columns)
+    filters = municipio_filters(bbox, ibge_codes)
+    if filters:
+        query = query.filter(*filters)
+    return query.offset(skip).limit(limit).all()
 
 def get_municipio_by_ibge(db: Session, ibge_code: str) -> Optional[models.Municipio]:
     return db.query(models.Municipio).filter(models.Municipio.ibge_code == ibge_code).first()
@@ -12,51 +125,254 @@ def get_municipio_by_ibge(db: Session, ibge_code: str) -> Optional[models.Munici
 def get_indicador_by_ibge(db: Session, ibge_code: str):
     return db.query(models.Indicador).filter(models.Indicador.ibge_code == ibge_code).first()
 
-def list_indicadores(db: Session, skip: int = 0, limit: int = 100) -> List[models.Indicador]:
-    return db.query(models.Indicador).offset(skip).limit(limit).all()
+def list_indicadores(db: Session, skip: int = 0, limit: int = 100):
+    return db.query(*INDICADOR_COLUMNS).offset(skip).limit(limit).all()
 
 # POIs
+def poi_order(path: str = "scan"):
+    """
+    ORDER BY estável das páginas de POIs: id, a mesma ordem do POIColumnStore.
+    Só a varredura e o índice de municipio_id (municipio_id = ?, rowid) já trazem as linhas em
+    ordem de id; nos outros caminhos id + 0 ordena o que o índice trouxe, senão o SQLite troca o
+    índice por uma varredura da tabela em ordem de rowid.
+    """
+    return models.POI.id if path in ("scan", "municipio") else models.POI.id + 0
+
 def list_pois(db: Session, skip:int=0, limit:int=100):
-    return db.query(models.POI).offset(skip).limit(limit).all()
+    return db.query(*POI_COLUMNS).order_by(poi_order()).offset(skip).limit(limit).all()
 
 def list_pois_by_type(db: Session, tipo: str, skip:int=0, limit:int=100):
-    return db.query(models.POI).filter(models.POI.tipo == tipo).offset(skip).limit(limit).all()
+    return db.query(*POI_COLUMNS).filter(models.POI.tipo == tipo).order_by(
+        poi_order("tipo")).offset(skip).limit(limit).all()
 
 def list_pois_by_municipio(db: Session, ibge_code: str, skip: int = 0, limit: int = 500):
     """
     Filtra POIs por município (via ibge_code).
     Busca o municipio pelo ibge_code e depois lista POIs com seu ID.
     """
-    municipio = db.query(models.Municipio).filter(
+    municipio = db.query(models.Municipio.id).filter(
         models.Municipio.ibge_code == ibge_code
     ).first()
     
     if not municipio:
         return []
     
-    return db.query(models.POI).filter(
+    return db.query(*POI_COLUMNS).filter(
         models.POI.municipio_id == municipio.id
-    ).offset(skip).limit(limit).all()
+    ).order_by(poi_order("municipio")).offset(skip).limit(limit).all()
 
 def list_pois_in_bbox(db: Session, min_lon: float, min_lat: float, max_lon: float, max_lat: float, tipo: Optional[str]=None):
-    q = db.query(models.POI).filter(
-        models.POI.longitude >= min_lon,
-        models.POI.longitude <= max_lon,
-        models.POI.latitude >= min_lat,
-        models.POI.latitude <= max_lat
-    )
+    return db.query(*POI_COLUMNS).filter(*poi_bbox_filters(min_lon, min_lat, max_lon, max_lat, tipo)).all()
+
+def pois_stmt(skip: int = 0, limit: Optional[int] = None, tipo: Optional[str] = None, bbox: Optional[tuple] = None):
+    """SELECT das listas de POIs (todas, por tipo ou por bbox) para as rotas em streaming."""
+    stmt = select(*POI_COLUMNS)
+    path = "scan"
+    if bbox is not None:
+        stmt = stmt.where(*poi_bbox_filters(*bbox, tipo=tipo))
+        path = "spatial"
+    elif tipo is not None:
+        stmt = stmt.where(models.POI.tipo == tipo)
+        path = "tipo"
+    return stmt.order_by(poi_order(path)).offset(skip).limit(limit)
+
+def municipios_stmt(skip: int = 0, limit: Optional[int] = None, bbox: Optional[tuple] = None,
+                    ibge_codes: Optional[List[str]] = None, columns: tuple = MUNICIPIO_COLUMNS):
+    return select(*columns).where(*municipio_filters(bbox, ibge_codes)).offset(skip).limit(limit)
+
+def indicadores_stmt(skip: int = 0, limit: Optional[int] = None):
+    return select(*INDICADOR_COLUMNS).offset(skip).limit(limit)
+
+def export_stmt(table: str):
+    return select(*EXPORT_COLUMNS[table])
+
+def stream_partitions(db: Session, stmt, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[list]:
+    """Lotes de até `batch_size` linhas lidos com yield_per (lista de Row por lote)."""
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+def stream_rows(db: Session, stmt, batch_size: int = STREAM_BATCH_SIZE) -> Iterator:
+    """Itera o resultado com yield_per: só `batch_size` linhas em memória por vez."""
+    for partition in stream_partitions(db, stmt, batch_size):
+        yield from partition
+
+def search_expression(q: str) -> Optional[str]:
+    """
+    Texto do usuário -> consulta FTS5: cada palavra entre aspas (sem sintaxe do FTS vinda
+    de fora) e como prefixo, então "hosp sao" acha "Hospital São Luiz".
+    """
+    tokens = re.findall(r"\w+", q)
+    return " ".join(f'"{t}"*' for t in tokens) or None
+
+def search_pois_stmt(expression: str, tipo: Optional[str] = None, bbox: Optional[tuple] = None,
+                     skip: int = 0, limit: Optional[int] = 50):
+    """POIs que casam com `expression`, do mais relevante (BM25) ao menos; bbox/tipo filtram depois do MATCH."""
+    fts = literal_column(models.POI_SEARCH_TABLE)
+    stmt = (select(*POI_COLUMNS).select_from(POI_SEARCH)
+            .join(models.POI, models.POI.id == POI_SEARCH.c.rowid)
+            .where(fts.op("MATCH")(expression)))
+    if bbox is not None:
+        stmt = stmt.where(*poi_bbox_filters(*bbox))
     if tipo:
-        q = q.filter(models.POI.tipo == tipo)
-    return q.all()
+        stmt = stmt.where(models.POI.tipo == tipo)
+    return stmt.order_by(func.bm25(fts, *POI_SEARCH_WEIGHTS)).offset(skip).limit(limit)
+
+def search_pois(db: Session, q: str, tipo: Optional[str] = None, bbox: Optional[tuple] = None,
+                skip: int = 0, limit: int = 50):
+    expression = search_expression(q)
+    if expression is None:
+        return []
+    return db.execute(search_pois_stmt(expression, tipo, bbox, skip, limit)).all()
+
+def rebuild_poi_search(conn) -> int:
+    """Recria o índice de busca a partir de `pois` (depois de cargas em lote). Devolve o nº de POIs."""
+    conn.execute(text(models.POI_SEARCH_DDL))
+    conn.execute(text(f"INSERT INTO {models.POI_SEARCH_TABLE}({models.POI_SEARCH_TABLE}) VALUES ('rebuild')"))
+    return int(conn.execute(text("SELECT count(*) FROM pois")).scalar() or 0)
+
+# Consulta composta (/pois/query): o caminho de acesso vem de backend/planner.py. Só os
+# filtros do caminho escolhido ficam "indexáveis"; os demais são escritos de modo que o
+# SQLite não use índice para eles (tipo || '', municipio_id + 0, id + 0) e filtrem as
+# linhas que o caminho já trouxe.
+def poi_circle_filter(lon: float, lat: float, radius_m: float):
+    """Distância equirretangular em E7 (só aritmética: o SQLite não tem cos/sqrt por padrão)."""
+    k = math.cos(math.radians(lat))
+    r = radius_m / METERS_PER_DEGREE * E7
+    dx = (models.POI.lon_e7 - to_e7(lon)) * k
+    dy = models.POI.lat_e7 - to_e7(lat)
+    return dx * dx + dy * dy <= r * r
+
+def search_rowids(expression: str):
+    return select(POI_SEARCH.c.rowid).where(literal_column(models.POI_SEARCH_TABLE).op("MATCH")(expression))
+
+def poi_query_stmt(path: str, tipos: Optional[List[str]] = None, municipio_id: Optional[int] = None,
+                   bbox: Optional[tuple] = None, circle: Optional[tuple] = None, expression: Optional[str] = None,
+                   skip: int = 0, limit: Optional[int] = None):
+    """
+    SELECT de POIs com os filtros combinados (AND), dirigido pelo caminho `path`:
+    spatial (faixas de Hilbert), tipo (ix_pois_tipo_municipio), municipio, fts, scan ou empty.
+    """
+    stmt = select(*POI_COLUMNS)
+    if path == "empty":
+        return stmt.where(false())
+    if path == "fts":
+        stmt = stmt.select_from(POI_SEARCH).join(models.POI, models.POI.id == POI_SEARCH.c.rowid).where(
+            literal_column(models.POI_SEARCH_TABLE).op("MATCH")(expression))
+    elif expression is not None:
+        stmt = stmt.where((models.POI.id + 0).in_(search_rowids(expression)))
+    if bbox is not None:
+        if path == "spatial":
+            stmt = stmt.where(*poi_bbox_filters(*bbox))
+        else:
+            stmt = stmt.where(*poi_bbox_filters(*bbox)[1:])  # só o recorte E7, sem as faixas de chave
+    if circle is not None:
+        stmt = stmt.where(poi_circle_filter(*circle))
+    if tipos:
+        column = models.POI.tipo if path == "tipo" else models.POI.tipo + ""
+        stmt = stmt.where(column.in_(tipos))
+    if municipio_id is not None:
+        column = models.POI.municipio_id if path in ("tipo", "municipio") else models.POI.municipio_id + 0
+        stmt = stmt.where(column == municipio_id)
+    return stmt.order_by(poi_order(path)).offset(skip).limit(limit)
+
+def poi_tipo_counts_stmt():
+    return select(models.POI.tipo, func.count()).group_by(models.POI.tipo)
+
+def poi_municipio_counts_stmt():
+    return select(models.POI.municipio_id, func.count()).group_by(models.POI.municipio_id)
+
+def poi_extent_stmt():
+    return select(func.min(models.POI.lon_e7), func.min(models.POI.lat_e7),
+                  func.max(models.POI.lon_e7), func.max(models.POI.lat_e7))
+
+def poi_grid_stmt(extent: tuple, size: int):
+    """Contagem de POIs por célula de uma grade size x size sobre `extent` (E7)."""
+    x0, y0, x1, y1 = extent
+    cx = (models.POI.lon_e7 - x0) * size // (x1 - x0 + 1)
+    cy = (models.POI.lat_e7 - y0) * size // (y1 - y0 + 1)
+    return select(cx, cy, func.count()).where(models.POI.lon_e7.isnot(None)).group_by(cx, cy)
+
+def search_count_stmt(expression: str, cap: int):
+    """Quantos POIs casam com `expression`, contando no máximo `cap` (custo limitado)."""
+    return select(func.count()).select_from(search_rowids(expression).limit(cap).subquery())
+
+def get_municipio_id(db: Session, ibge_code: str) -> Optional[int]:
+    return db.execute(select(models.Municipio.id).where(models.Municipio.ibge_code == ibge_code)).scalar()
+
+def count_pois(db: Session, bbox: Optional[tuple] = None, tipo: Optional[str] = None, ibge_code: Optional[str] = None) -> int:
+    return int(db.execute(poi_count_stmt(bbox, tipo, ibge_code)).scalar() or 0)
 
 def get_poi_types(db: Session) -> List[str]:
     """
     Retorna lista de tipos de POIs únicos no banco de dados.
+    Lê de poi_counts (centenas de linhas), não do DISTINCT sobre todos os POIs.
     """
-    results = db.query(models.POI.tipo).distinct().filter(models.POI.tipo.isnot(None)).all()
+    results = db.query(models.PoiCount.tipo).distinct().filter(
+        models.PoiCount.tipo.isnot(None), models.PoiCount.n > 0).all()
     return sorted([r[0] for r in results if r[0]])
 
-def create_poi(db: Session, poi_in: schemas.POICreate):
+# Contagens materializadas (models.PoiCount)
+def poi_types_stmt():
+    return select(models.PoiCount.tipo).distinct().where(models.PoiCount.tipo.isnot(None), models.PoiCount.n > 0)
+
+def poi_counts_stmt(ibge_code: Optional[str] = None, tipo: Optional[str] = None):
+    """(ibge_code, tipo, n) por município e tipo; POIs sem município saem com ibge_code None."""
+    stmt = (select(models.Municipio.ibge_code, models.PoiCount.tipo, models.PoiCount.n)
+            .select_from(models.PoiCount)
+            .outerjoin(models.Municipio, models.Municipio.id == models.PoiCount.municipio_id)
+            .where(models.PoiCount.n > 0))
+    if ibge_code is not None:
+        stmt = stmt.where(models.Municipio.ibge_code == ibge_code)
+    if tipo is not None:
+        stmt = stmt.where(models.PoiCount.tipo == tipo)
+    return stmt.order_by(models.Municipio.ibge_code, models.PoiCount.tipo)
+
+def list_poi_counts(db: Session, ibge_code: Optional[str] = None, tipo: Optional[str] = None):
+    return db.execute(poi_counts_stmt(ibge_code, tipo)).all()
+
+def count_matrix(rows) -> dict:
+    """Linhas (ibge_code, tipo, n) -> matriz densa município x tipo (schemas.POICountMatrix)."""
+    ibge_codes = sorted({r.ibge_code for r in rows}, key=lambda c: (c is None, c or ""))
+    tipos = sorted({r.tipo for r in rows}, key=lambda t: (t is None, t or ""))
+    row_of = {code: i for i, code in enumerate(ibge_codes)}
+    col_of = {t: j for j, t in enumerate(tipos)}
+    counts = [[0] * len(tipos) for _ in ibge_codes]
+    for r in rows:
+        counts[row_of[r.ibge_code]][col_of[r.tipo]] += r.n
+    return {"ibge_codes": ibge_codes, "tipos": tipos, "counts": counts}
+
+def rebuild_poi_counts(conn) -> int:
+    """Refaz poi_counts com um GROUP BY sobre pois (depois de cargas em lote). Devolve o nº de linhas."""
+    models.PoiCount.__table__.create(conn, checkfirst=True)
+    conn.execute(models.PoiCount.__table__.delete())
+    conn.execute(models.PoiCount.__table__.insert().from_select(
+        ["municipio_id", "tipo", "n"],
+        select(models.POI.municipio_id, models.POI.tipo, func.count()).group_by(models.POI.municipio_id, models.POI.tipo),
+    ))
+    return int(conn.execute(select(func.count()).select_from(models.PoiCount)).scalar() or 0)
+
+# Vizinhança (models.MunicipioVizinho): pares em ordem de município, prontos para o CSR
+def neighbors_stmt():
+    return (select(models.MunicipioVizinho.municipio_id, models.MunicipioVizinho.vizinho_id)
+            .order_by(models.MunicipioVizinho.municipio_id, models.MunicipioVizinho.vizinho_id))
+
+def list_neighbors(db: Session):
+    return db.execute(neighbors_stmt()).all()
+
+def increment_poi_count(db: Session, municipio_id: Optional[int], tipo: Optional[str]) -> None:
+    """+1 na contagem de (município, tipo), na transação de quem chama. `IS` casa também NULL com NULL."""
+    counts = models.PoiCount.__table__
+    updated = db.execute(counts.update()
+                         .where(counts.c.municipio_id.is_(municipio_id), counts.c.tipo.is_(tipo))
+                         .values(n=counts.c.n + 1))
+    if updated.rowcount == 0:
+        db.execute(counts.insert().values(municipio_id=municipio_id, tipo=tipo, n=1))
+
+def create_poi(db: Session, poi_in: schemas.POICreate) -> Tuple[models.POI, int]:
+    """Grava o POI (com o índice de busca e as contagens) e devolve (poi, versão dos dados desta escrita)."""
     poi = models.POI(
         municipio_id = poi_in.municipio_id,
         tipo = poi_in.tipo,
@@ -65,6 +381,104 @@ def create_poi(db: Session, poi_in: schemas.POICreate):
         longitude = poi_in.longitude
     )
     db.add(poi)
+    db.flush()
+    # índice de busca de conteúdo externo: a linha nova entra na mesma transação
+    db.execute(POI_SEARCH.insert().values(rowid=poi.id, nome=poi.nome, tipo=poi.tipo))
+    increment_poi_count(db, poi.municipio_id, poi.tipo)
+    version = bump_data_version(db)
     db.commit()
     db.refresh(poi)
-    return poi
+    return poi, version
+
+
+# ----------------------------
+# Acesso assíncrono (AsyncSession), mesmas consultas em select()
+# ----------------------------
+async def get_data_version_async(db) -> int:
+    return int((await db.execute(text("PRAGMA user_version"))).scalar() or 0)
+
+async def list_municipios_async(db, skip: int = 0, limit: int = 100, bbox: Optional[tuple] = None,
+                                ibge_codes: Optional[List[str]] = None, columns: tuple = MUNICIPIO_COLUMNS):
+    stmt = select(*columns).where(*municipio_filters(bbox, ibge_codes))
+    result = await db.execute(stmt.offset(skip).limit(limit))
+    return result.all()
+
+async def get_municipio_by_ibge_async(db, ibge_code: str) -> Optional[models.Municipio]:
+    result = await db.execute(select(models.Municipio).where(models.Municipio.ibge_code == ibge_code).limit(1))
+    return result.scalars().first()
+
+async def get_indicador_by_ibge_async(db, ibge_code: str):
+    result = await db.execute(select(models.Indicador).where(models.Indicador.ibge_code == ibge_code).limit(1))
+    return result.scalars().first()
+
+async def list_indicadores_async(db, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(*INDICADOR_COLUMNS).offset(skip).limit(limit))
+    return result.all()
+
+async def list_pois_async(db, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(*POI_COLUMNS).order_by(poi_order()).offset(skip).limit(limit))
+    return result.all()
+
+async def list_pois_by_type_async(db, tipo: str, skip: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(*POI_COLUMNS).where(models.POI.tipo == tipo).order_by(poi_order("tipo")).offset(skip).limit(limit)
+    )
+    return result.all()
+
+async def list_pois_by_municipio_async(db, ibge_code: str, skip: int = 0, limit: int = 500):
+    municipio_id = (await db.execute(
+        select(models.Municipio.id).where(models.Municipio.ibge_code == ibge_code).limit(1)
+    )).scalar()
+    if municipio_id is None:
+        return []
+    result = await db.execute(
+        select(*POI_COLUMNS).where(models.POI.municipio_id == municipio_id).order_by(
+            poi_order("municipio")).offset(skip).limit(limit)
+    )
+    return result.all()
+
+async def list_pois_in_bbox_async(db, min_lon: float, min_lat: float, max_lon: float, max_lat: float, tipo: Optional[str] = None):
+    result = await db.execute(select(*POI_COLUMNS).where(*poi_bbox_filters(min_lon, min_lat, max_lon, max_lat, tipo)))
+    return result.all()
+
+async def count_pois_async(db, bbox: Optional[tuple] = None, tipo: Optional[str] = None, ibge_code: Optional[str] = None) -> int:
+    return int((await db.execute(poi_count_stmt(bbox, tipo, ibge_code))).scalar() or 0)
+
+async def stream_partitions_async(db, stmt, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[list]:
+    result = await db.stream(stmt.execution_options(yield_per=batch_size))
+    try:
+        async for partition in result.partitions():
+            yield partition
+    finally:
+        await result.close()
+
+async def stream_rows_async(db, stmt, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator:
+    result = await db.stream(stmt.execution_options(yield_per=batch_size))
+    try:
+        async for partition in result.partitions():
+            for row in partition:
+                yield row
+    finally:
+        await result.close()
+
+async def search_pois_async(db, q: str, tipo: Optional[str] = None, bbox: Optional[tuple] = None,
+                            skip: int = 0, limit: int = 50):
+    expression = search_expression(q)
+    if expression is None:
+        return []
+    result = await db.execute(search_pois_stmt(expression, tipo, bbox, skip, limit))
+    return result.all()
+
+async def get_municipio_id_async(db, ibge_code: str) -> Optional[int]:
+    result = await db.execute(select(models.Municipio.id).where(models.Municipio.ibge_code == ibge_code))
+    return result.scalar()
+
+async def get_poi_types_async(db) -> List[str]:
+    result = await db.execute(poi_types_stmt())
+    return sorted(r[0] for r in result.all() if r[0])
+
+async def list_poi_counts_async(db, ibge_code: Optional[str] = None, tipo: Optional[str] = None):
+    return (await db.execute(poi_counts_stmt(ibge_code, tipo))).all()
+
+async def list_neighbors_async(db):
+    return (await db.execute(neighbors_stmt())).all()
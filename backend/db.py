@@ -1,8 +1,9 @@
 # backend/db.py (exemplo)
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from pathlib import Path
-from typing import Generator
+from typing import Dict, Generator, Optional, Tuple
 
 # determina o path absoluto da raiz do projeto a partir de backend/
 BASE_DIR = Path(__file__).resolve().parent      # backend/
@@ -13,11 +14,99 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)     # garante que data/ exista
 DB_PATH = DATA_DIR / "db.sqlite"
 DB_URL = f"sqlite:///{DB_PATH}"
 
+# leitores em outro arquivo: SQLITE_READ_PATH=data/db.optimized.sqlite serve as rotas GET da
+# cópia compactada que o ETL gera (backend/etl/optimize.py, VACUUM INTO). As escritas seguem
+# em DB_PATH e só chegam aos leitores na próxima cópia: para implantações só de leitura.
+READ_DB_PATH = Path(os.getenv("SQLITE_READ_PATH", str(DB_PATH)))
+if not READ_DB_PATH.is_absolute():
+    READ_DB_PATH = PROJECT_ROOT / READ_DB_PATH
+if not READ_DB_PATH.exists() and READ_DB_PATH != DB_PATH:
+    # sem a cópia o SQLite criaria um banco vazio no lugar
+    print("SQLITE_READ_PATH not found, reading from:", DB_PATH)
+    READ_DB_PATH = DB_PATH
+READ_DB_URL = f"sqlite:///{READ_DB_PATH}"
+
 # opcional: debug
 print("Using SQLite DB at:", DB_PATH)
+if READ_DB_PATH != DB_PATH:
+    print("Reading from:", READ_DB_PATH)
+
+# ---------- perfil de desempenho do SQLite ----------
+# "performance": WAL (leitores não bloqueiam atrás do escritor), fsync só no checkpoint,
+# mmap e cache de páginas maiores, tabelas temporárias em memória.
+# "default": comportamento padrão do SQLite (rollback journal), útil para comparar.
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    "default": {},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,   # bytes
+        "cache_size": -64 * 1024,         # negativo = KiB (64 MiB)
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,             # ms
+    },
+}
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "performance")
+READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+# a sessão segura a conexão entre idas diferentes ao threadpool (dependência, rota,
+# serialização): com um teto de conexões abaixo da demanda, threads esperando conexão e
+# conexões esperando thread travam entre si. Por isso o overflow é ilimitado por padrão
+# (-1); conexões SQLite são baratas e só READ_POOL_SIZE ficam abertas quando ociosas.
+READ_POOL_OVERFLOW = int(os.getenv("SQLITE_READ_POOL_OVERFLOW", "-1"))
+
+# rotas de leitura: "sync" (def + threadpool) ou "async" (async def + aiosqlite)
+DB_MODE = os.getenv("DB_MODE", "sync")
+ASYNC_DB_URL = f"sqlite+aiosqlite:///{READ_DB_PATH}"
+
+
+def sqlite_pragmas(profile: str = SQLITE_PROFILE) -> Dict[str, object]:
+    """
+    PRAGMAs do perfil escolhido; cada um pode ser sobrescrito por SQLITE_<NOME>
+    (ex.: SQLITE_MMAP_SIZE=0, SQLITE_SYNCHRONOUS=FULL).
+    """
+    pragmas = dict(SQLITE_PROFILES.get(profile, {}))
+    for name in ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store", "busy_timeout"):
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
 
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
+
+def apply_pragmas(engine, pragmas: Dict[str, object], query_only: bool = False):
+    """Aplica os PRAGMAs em cada conexão nova do pool (evento connect)."""
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cur.execute(f"PRAGMA {name} = {value}")
+        if query_only:
+            cur.execute("PRAGMA query_only = ON")
+        cur.close()
+
+
+def create_engines(db_url: str = DB_URL, profile: str = SQLITE_PROFILE,
+                   read_pool_size: int = READ_POOL_SIZE,
+                   read_pool_overflow: int = READ_POOL_OVERFLOW,
+                   read_url: Optional[str] = None) -> Tuple[object, object]:
+    """
+    Cria o par (escritor, leitores) para o mesmo arquivo SQLite (ou, com `read_url`,
+    leitores numa cópia). O escritor tem uma única conexão (SQLite só aceita um escritor
+    por vez); os leitores usam um pool próprio com PRAGMA query_only.
+    """
+    pragmas = sqlite_pragmas(profile)
+    connect_args = {"check_same_thread": False}
+    writer = create_engine(db_url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    reader = create_engine(read_url or db_url, connect_args=connect_args, pool_size=read_pool_size,
+                           max_overflow=read_pool_overflow)
+    apply_pragmas(writer, pragmas)
+    apply_pragmas(reader, pragmas, query_only=True)
+    return writer, reader
+
+
+engine, read_engine = create_engines(read_url=READ_DB_URL)
 SessionLocal = sessionmaker(bind=engine)
+ReadSessionLocal = sessionmaker(bind=read_engine)
 
 # dependency for FastAPI
 def get_db() -> Generator:
@@ -26,3 +115,39 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+# dependency for FastAPI (rotas GET: conexões somente leitura)
+def get_read_db() -> Generator:
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ---------- acesso assíncrono (DB_MODE=async) ----------
+# o engine só é criado no primeiro uso: o modo síncrono não precisa do aiosqlite instalado
+_async_sessionmaker = None
+
+def create_async_read_engine(db_url: str = ASYNC_DB_URL, profile: str = SQLITE_PROFILE,
+                             pool_size: int = READ_POOL_SIZE, pool_overflow: int = READ_POOL_OVERFLOW):
+    """Engine assíncrono somente leitura, com os mesmos PRAGMAs do perfil."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    async_engine = create_async_engine(db_url, pool_size=pool_size, max_overflow=pool_overflow)
+    apply_pragmas(async_engine.sync_engine, sqlite_pragmas(profile), query_only=True)
+    return async_engine
+
+def make_async_sessionmaker(async_engine):
+    from sqlalchemy.ext.asyncio import AsyncSession
+    return sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+def get_async_sessionmaker():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = make_async_sessionmaker(create_async_read_engine())
+    return _async_sessionmaker
+
+# dependency for FastAPI (rotas GET assíncronas)
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
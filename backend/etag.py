@@ -0,0 +1,58 @@
+# backend/etag.py
+# Requisições condicionais (ETag / If-None-Match) amarradas à versão dos dados.
+import hashlib
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from . import crud
+from .db import get_async_db, get_read_db
+
+# o browser sempre revalida, mas a revalidação custa só um 304 sem corpo
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+def make_etag(resource: str, version: int, params=None) -> str:
+    """
+    Monta um ETag forte para o recurso: nome, versão dos dados e hash dos parâmetros.
+    """
+    items = sorted((params or {}).items())
+    digest = hashlib.md5(repr(items).encode("utf-8")).hexdigest()[:12]
+    return f'"{resource}-v{version}-{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [t.strip() for t in if_none_match.split(",")]
+
+
+def check_conditional(request: Request, response: Response, resource: str, version: int) -> int:
+    """Responde 304 se o If-None-Match bate; senão anota ETag e Cache-Control na resposta."""
+    params = dict(request.path_params)
+    # parâmetro repetido (?tipo=a&tipo=b) entra com todos os valores
+    params.update((key, ",".join(request.query_params.getlist(key))) for key in request.query_params)
+    headers = {"ETag": make_etag(resource, version, params), "Cache-Control": CACHE_CONTROL}
+    if etag_matches(headers["ETag"], request.headers.get("if-none-match")):
+        raise HTTPException(status_code=304, headers=headers)
+    request.state.cache_headers = headers
+    response.headers.update(headers)
+    return version
+
+
+def conditional(resource: str):
+    """
+    Cria uma dependência que responde 304 quando o cliente já tem a versão atual.
+    Deve rodar antes da consulta do endpoint: só lê o PRAGMA user_version.
+    Os cabeçalhos ficam em request.state.cache_headers para rotas que devolvem Response própria.
+    """
+    def dependency(request: Request, response: Response, db: Session = Depends(get_read_db)):
+        return check_conditional(request, response, resource, crud.get_data_version(db))
+    return dependency
+
+
+def conditional_async(resource: str):
+    """Mesma dependência de `conditional`, para as rotas assíncronas (DB_MODE=async)."""
+    async def dependency(request: Request, response: Response, db=Depends(get_async_db)):
+        return check_conditional(request, response, resource, await crud.get_data_version_async(db))
+    return dependency
@@ -6,16 +6,19 @@ from pathlib import Path
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import re
-from unidecode import unidecode
 from backend.models import Base, Municipio, Indicador, POI
+from backend.contiguity import rebuild_neighbors
+from backend.crud import bump_data_version, rebuild_poi_counts, rebuild_poi_search
+from backend.db import DATA_DIR
+from backend.columnar import export_pois
+from backend.etl.optimize import GEOMETRY_PRECISION, encode_features, vacuum_into
+from backend.geometry import pack_geometry
+from backend.names import normalize_name as _normalize_name
+from backend.spatial import hilbert_keys, round_geometry
 
 def normalize_name(s):
-    s = "" if pd.isna(s) else str(s)
-    s = s.strip().lower()
-    s = unidecode(s)
-    s = re.sub(r'[^a-z0-9\s]', ' ', s)
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s
+    # a mesma normalização da busca de municípios da API (backend/names.py)
+    return _normalize_name(None if pd.isna(s) else s)
 
 def parse_num_str(x):
     if pd.isna(x): return None
@@ -36,7 +39,7 @@ INDICADORES_FILES = [
     "data/idh.csv",
     "data/saneamento.csv"
 ]
-DB_URL = "sqlite:///data/db.sqlite"   # cria/usa data/db.sqlite
+DB_URL = f"sqlite:///{DATA_DIR / 'db.sqlite'}"   # cria/usa data/db.sqlite (o mesmo arquivo da API)
 # ----------------------------
 
 engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
@@ -60,16 +63,26 @@ def load_municipios():
     session = Session()
     print("Inserindo municípios no DB...")
     for _, row in gdf.iterrows():
-        geom_geojson = json.dumps(row.geometry.__geo_interface__, ensure_ascii=False)
+        # 6 casas decimais (~11 cm): o arquivo de origem traz até 10
+        geom = round_geometry(row.geometry.__geo_interface__, GEOMETRY_PRECISION)
+        geom_geojson = json.dumps(geom, ensure_ascii=False)
+        geom_bin = pack_geometry(geom)
         existing = session.query(Municipio).filter_by(ibge_code=str(row['ibge_code'])).one_or_none()
         if existing:
             existing.nome = row['nome']
             existing.geometry = geom_geojson
+            existing.geometry_bin = geom_bin
+            existing.feature = None
         else:
-            m = Municipio(ibge_code=str(row['ibge_code']), nome=row['nome'], geometry=geom_geojson)
+            m = Municipio(ibge_code=str(row['ibge_code']), nome=row['nome'], geometry=geom_geojson, geometry_bin=geom_bin)
             session.add(m)
+    bump_data_version(session)
     session.commit()
     session.close()
+    # Feature GeoJSON de cada município já em bytes (precisa do id gravado)
+    print("Features pré-codificadas:", encode_features(engine))
+    with engine.begin() as conn:
+        print("Pares de municípios vizinhos:", rebuild_neighbors(conn))
     return gdf[['ibge_code','nome','nome_norm','geometry']].copy()
 
 from pathlib import Path
@@ -206,6 +219,7 @@ def load_indicadores(gdf_munis):
         )
         session.add(ind)
         inserted += 1
+    bump_data_version(session)
     session.commit()
     session.close()
     print(f"Indicadores inseridos: {inserted}")
@@ -314,7 +328,10 @@ def load_pois(gdf_munis, pois_file=POIS_FILE, batch_size=1000):
     session.commit()
     print("POIs antigos removidos.")
 
-    # 6) inserir em batches
+    # 6) inserir em batches, em ordem de chave de Hilbert: POIs vizinhos no mapa ficam em
+    #    rowids (e páginas) vizinhos, e um bbox pequeno lê poucas páginas contíguas
+    joined['hilbert'] = hilbert_keys(joined['longitude'].to_numpy(), joined['latitude'].to_numpy())
+    joined = joined.sort_values('hilbert', kind='stable')
     inserted = 0
     batch_objs = []
     for _, r in joined.iterrows():
@@ -326,6 +343,7 @@ def load_pois(gdf_munis, pois_file=POIS_FILE, batch_size=1000):
             nome = r.get('nome') or None,
             latitude = float(r['latitude']),
             longitude = float(r['longitude']),
+            hilbert = int(r['hilbert']),
         )
         batch_objs.append(poi)
         if len(batch_objs) >= batch_size:
@@ -338,11 +356,18 @@ def load_pois(gdf_munis, pois_file=POIS_FILE, batch_size=1000):
     # final batch
     if batch_objs:
         session.bulk_save_objects(batch_objs)
-        session.commit()
         inserted += len(batch_objs)
+    bump_data_version(session)
+    # índice de busca por nome (FTS5) refeito de uma vez, em vez de linha a linha
+    rebuild_poi_search(session)
+    # contagens por município e tipo: um GROUP BY sobre a tabela recém-carregada
+    rebuild_poi_counts(session.connection())
+    session.commit()
 
+    # 7) colunas NumPy (.npy) que a API mapeia em memória na subida
+    exported = export_pois(session)
     session.close()
-    print(f"POIs inseridos no DB: {inserted}")
+    print(f"POIs inseridos no DB: {inserted} (colunas exportadas: {exported})")
 
 # -- no final do arquivo, permitir rodar só os POIs --
 if __name__ == "__main__":
@@ -354,4 +379,6 @@ if __name__ == "__main__":
     else:
         load_indicadores(gdf_munis)
         load_pois(gdf_munis, pois_file=POIS_FILE)
+    # cópia compactada para leitura, no page_size escolhido para viewports pequenos
+    print("Artefato de leitura:", vacuum_into(engine))
     print("=== ETL finalizado ===")
@@ -0,0 +1,207 @@
+# backend/etl/optimize.py
+# Layout físico para leitura: chave de Hilbert e coordenadas E7 nos POIs, tabela em ordem
+# de chave, geometrias com 6 casas (texto e binária), Features GeoJSON pré-codificadas, o
+# índice de busca por nome (FTS5), as contagens por município e tipo, a vizinhança entre
+# municípios e um artefato compactado (VACUUM INTO) com page_size escolhido para viewports pequenos.
+#
+# uso (banco já existente): python -m backend.etl.optimize [--reorder] [--page-size 4096]
+import argparse
+import json
+import os
+from pathlib import Path
+import numpy as np
+from sqlalchemy import create_engine, inspect, text
+from backend.contiguity import rebuild_neighbors
+from backend.crud import bump_data_version, rebuild_poi_counts, rebuild_poi_search
+from backend.db import DATA_DIR, PROJECT_ROOT
+from backend.geometry import PackedGeometry, encode_feature, pack_geometry
+from backend.models import POI
+from backend.spatial import E7, hilbert_keys, round_geometry
+
+# a partir da raiz do projeto, como backend/db.py: não depende do diretório de onde se roda
+DB_PATH = DATA_DIR / "db.sqlite"
+OPTIMIZED_DB_PATH = Path(os.getenv("SQLITE_OPTIMIZED_PATH", str(DATA_DIR / "db.optimized.sqlite")))
+if not OPTIMIZED_DB_PATH.is_absolute():
+    OPTIMIZED_DB_PATH = PROJECT_ROOT / OPTIMIZED_DB_PATH
+# 4 KiB = página do SO (e do mmap): num viewport pequeno lê menos bytes que 8/16 KiB e
+# 2,5x menos páginas que 1 KiB (ver python -m backend.benchmarks.hilbert_pages)
+READ_PAGE_SIZE = int(os.getenv("SQLITE_READ_PAGE_SIZE", "4096"))
+# 6 casas = ~11 cm, muito abaixo de um pixel em qualquer zoom do mapa
+GEOMETRY_PRECISION = 6
+DERIVED_COLUMNS = ("hilbert", "lat_e7", "lon_e7")
+# índices que os compostos (hilbert, lon_e7, lat_e7) e (tipo, municipio_id) substituem
+LEGACY_INDEXES = ("ix_pois_latitude", "ix_pois_longitude", "ix_pois_hilbert_lon_lat", "ix_pois_tipo")
+FEATURE_COLUMNS = {"feature": "BLOB", "min_lon": "FLOAT", "min_lat": "FLOAT", "max_lon": "FLOAT", "max_lat": "FLOAT"}
+POI_COLUMNS = "municipio_id, tipo, nome, latitude, longitude, created_at, hilbert, lat_e7, lon_e7"
+
+
+def add_missing_columns(engine, table: str, columns: dict):
+    """ALTER TABLE ... ADD COLUMN para as colunas (nome -> tipo SQL) que o banco ainda não tem."""
+    existing = {c["name"] for c in inspect(engine).get_columns(table)}
+    with engine.begin() as conn:
+        for column, sql_type in columns.items():
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}"))
+
+
+def migrate_pois(engine, batch_size: int = 50000) -> int:
+    """
+    Bancos anteriores às colunas: cria `pois.hilbert`, `lat_e7` e `lon_e7`, preenche as linhas
+    sem valor e troca os índices antigos pelos compostos. Devolve quantas linhas foram preenchidas.
+    """
+    add_missing_columns(engine, "pois", {column: "INTEGER" for column in DERIVED_COLUMNS})
+    filled = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, longitude, latitude FROM pois "
+                "WHERE hilbert IS NULL OR lat_e7 IS NULL OR lon_e7 IS NULL LIMIT :n"
+            ), {"n": batch_size}).all()
+            if not rows:
+                break
+            ids, lon, lat = (np.array(c) for c in zip(*rows))
+            keys = hilbert_keys(lon, lat)
+            lat_e7 = np.rint(lat * E7).astype(np.int64)
+            lon_e7 = np.rint(lon * E7).astype(np.int64)
+            conn.execute(
+                text("UPDATE pois SET hilbert = :k, lat_e7 = :lat, lon_e7 = :lon WHERE id = :id"),
+                [{"k": int(k), "lat": int(a), "lon": int(o), "id": int(i)}
+                 for k, a, o, i in zip(keys, lat_e7, lon_e7, ids)],
+            )
+            filled += len(rows)
+    with engine.begin() as conn:
+        for legacy in LEGACY_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {legacy}"))
+    for index in POI.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    return filled
+
+
+def quantize_geometries(engine, precision: int = GEOMETRY_PRECISION) -> int:
+    """
+    Regrava `municipios.geometry` com `precision` casas decimais (o ETL já grava assim);
+    a versão binária das linhas alteradas é refeita junto.
+    """
+    add_missing_columns(engine, "municipios", {"geometry_bin": "BLOB", **FEATURE_COLUMNS})
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, geometry FROM municipios WHERE geometry IS NOT NULL")).all()
+        updates = []
+        for mid, geometry in rows:
+            geom = round_geometry(json.loads(geometry), precision)
+            rounded = json.dumps(geom, ensure_ascii=False)
+            if rounded != geometry:
+                updates.append({"g": rounded, "b": pack_geometry(geom), "id": mid})
+        if updates:
+            # a Feature pré-codificada é refeita por encode_features
+            conn.execute(text("UPDATE municipios SET geometry = :g, geometry_bin = :b, feature = NULL WHERE id = :id"), updates)
+            bump_data_version(conn)
+    return len(updates)
+
+
+def pack_geometries(engine) -> int:
+    """Bancos anteriores a `municipios.geometry_bin`: cria a coluna e empacota as geometrias em texto."""
+    add_missing_columns(engine, "municipios", {"geometry_bin": "BLOB"})
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT id, geometry FROM municipios WHERE geometry IS NOT NULL AND geometry_bin IS NULL"
+        )).all()
+        updates = [{"b": pack_geometry(json.loads(geometry)), "id": mid} for mid, geometry in rows]
+        if updates:
+            conn.execute(text("UPDATE municipios SET geometry_bin = :b WHERE id = :id"), updates)
+            bump_data_version(conn)
+    return len(updates)
+
+
+def encode_features(engine) -> int:
+    """
+    Grava em `municipios.feature` a Feature GeoJSON completa (UTF-8) e o retângulo envolvente
+    das linhas que ainda não têm: o endpoint GeoJSON só concatena esses bytes.
+    """
+    add_missing_columns(engine, "municipios", {"geometry_bin": "BLOB", **FEATURE_COLUMNS})
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT id, nome, ibge_code, geometry, geometry_bin FROM municipios "
+            "WHERE feature IS NULL AND (geometry IS NOT NULL OR geometry_bin IS NOT NULL)"
+        )).all()
+        updates = []
+        for mid, nome, ibge_code, geometry, blob in rows:
+            if blob is None:
+                blob = pack_geometry(json.loads(geometry))
+            if blob is None:  # tipo sem layout binário: Feature a partir do texto, sem retângulo
+                bounds, geom = (None,) * 4, geometry
+            else:
+                packed = PackedGeometry(blob)
+                bounds, geom = packed.bounds(), json.dumps(packed.to_geojson())
+            updates.append({"f": encode_feature(mid, nome, ibge_code, geom), "id": mid,
+                            **dict(zip(("x0", "y0", "x1", "y1"), bounds))})
+        if updates:
+            conn.execute(text(
+                "UPDATE municipios SET feature = :f, min_lon = :x0, min_lat = :y0, max_lon = :x1, max_lat = :y1 "
+                "WHERE id = :id"
+            ), updates)
+    return len(updates)
+
+
+def reorder_pois(engine) -> int:
+    """
+    Regrava `pois` em ordem de chave de Hilbert. Os ids são renumerados (como numa carga
+    nova do ETL), porque no SQLite a ordem física da tabela é a do rowid.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TEMP TABLE pois_sorted AS SELECT {POI_COLUMNS} FROM pois ORDER BY hilbert, id"))
+        conn.execute(text("DELETE FROM pois"))
+        n = conn.execute(text(
+            f"INSERT INTO pois ({POI_COLUMNS}) SELECT {POI_COLUMNS} FROM pois_sorted ORDER BY rowid"
+        )).rowcount
+        conn.execute(text("DROP TABLE pois_sorted"))
+        bump_data_version(conn)
+    return n
+
+
+def vacuum_into(engine, dst: Path = OPTIMIZED_DB_PATH, page_size: int = READ_PAGE_SIZE) -> Path:
+    """
+    Gera o artefato de leitura: estatísticas do planejador (ANALYZE) e cópia compactada,
+    sem fragmentação, no page_size pedido. O original não muda de page_size.
+    """
+    dst = Path(dst)
+    tmp = dst.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("ANALYZE")
+        raw.commit()
+        cur.execute(f"PRAGMA page_size = {int(page_size)}")
+        cur.execute("VACUUM INTO ?", (str(tmp),))
+    finally:
+        raw.close()
+    os.replace(tmp, dst)
+    return dst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chave de Hilbert, coordenadas E7, geometria binária e artefato VACUUM INTO")
+    parser.add_argument("--db", default=str(DB_PATH))
+    parser.add_argument("--reorder", action="store_true", help="regrava pois em ordem de chave (renumera ids)")
+    parser.add_argument("--page-size", type=int, default=READ_PAGE_SIZE)
+    parser.add_argument("--out", default=str(OPTIMIZED_DB_PATH))
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    print(f"POIs com chave/E7 preenchidos: {migrate_pois(engine)}")
+    print(f"geometrias arredondadas para {GEOMETRY_PRECISION} casas: {quantize_geometries(engine)}")
+    print(f"geometrias empacotadas em binário: {pack_geometries(engine)}")
+    print(f"Features GeoJSON pré-codificadas: {encode_features(engine)}")
+    if args.reorder:
+        print(f"POIs regravados em ordem de Hilbert: {reorder_pois(engine)}")
+    # depois do --reorder: os ids mudam e o índice de busca aponta para eles
+    with engine.begin() as conn:
+        print(f"POIs no índice de busca (FTS5): {rebuild_poi_search(conn)}")
+        print(f"contagens por município e tipo (poi_counts): {rebuild_poi_counts(conn)}")
+        print(f"pares de municípios vizinhos (municipio_vizinhos): {rebuild_neighbors(conn)}")
+    print(f"artefato de leitura: {vacuum_into(engine, args.out, args.page_size)}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
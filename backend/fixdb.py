@@ -1,3 +1,4 @@
+from sqlalchemy import text
 from db import SessionLocal
 from models import Municipio, Indicador
 
@@ -59,6 +60,10 @@ for nome, valores in dados_indicadores.items():
         )
         session.add(novo)
 
+# invalida ETags / caches: incrementa a versão dos dados (PRAGMA user_version)
+data_version = int(session.execute(text("PRAGMA user_version")).scalar() or 0) + 1
+session.execute(text(f"PRAGMA user_version = {data_version}"))
+
 session.commit()
 session.close()
 print("✅ Correções e repovoamento concluídos.")
@@ -0,0 +1,240 @@
+# backend/flatgeobuf.py
+# Exportação da camada de municípios (polígonos + indicadores) em FlatGeobuf:
+# https://flatgeobuf.org. O arquivo leva o próprio índice espacial (R-tree empacotada em
+# ordem de Hilbert) logo depois do cabeçalho, então um cliente com HTTP range (QGIS/GDAL,
+# flatgeobuf.js) lê cabeçalho + os nós do índice que cruzam o bbox + só as features dele.
+#
+# layout:
+#   magic      "fgb\x03fgb\x00"
+#   cabeçalho  uint32 tamanho + FlatBuffer Header (colunas, envelope, nº de features, CRS)
+#   índice     nós (min_x, min_y, max_x, max_y float64, offset uint64), raiz primeiro
+#   features   uint32 tamanho + FlatBuffer Feature, na ordem das folhas do índice
+#
+# Os FlatBuffers são escritos à mão (_Builder): só tabelas, strings e vetores, o
+# suficiente para header.fbs e feature.fbs, sem depender do pacote flatbuffers.
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .geometry import PackedGeometry, packed_of
+from .spatial import E7, hilbert_keys
+
+MAGIC = b"fgb\x03fgb\x00"
+MEDIA_TYPE = "application/octet-stream"
+# filhos por nó da R-tree (padrão do formato)
+INDEX_NODE_SIZE = 16
+NODE_DTYPE = np.dtype([("min_x", "<f8"), ("min_y", "<f8"), ("max_x", "<f8"), ("max_y", "<f8"), ("offset", "<u8")])
+
+# enums de header.fbs
+POLYGON, MULTIPOLYGON = 3, 6
+INT, DOUBLE, STRING = 5, 10, 11
+
+# colunas do arquivo: atributos do município + indicadores (ordem = índice da coluna)
+COLUMNS = (
+    ("id", INT), ("ibge_code", STRING), ("nome", STRING),
+    ("idh", DOUBLE), ("idh_renda", DOUBLE), ("idh_longevidade", DOUBLE), ("idh_educacao", DOUBLE),
+    ("renda_per_capita", DOUBLE), ("saneamento", DOUBLE),
+)
+INDICADOR_FIELDS = tuple(name for name, kind in COLUMNS if kind == DOUBLE)
+
+# tamanho e formato struct dos escalares inline nas tabelas
+_SCALARS = {"u8": "B", "bool": "B", "u16": "H", "i32": "i", "u64": "Q"}
+
+
+class _Builder:
+    """
+    Serializa uma tabela raiz de frente para trás: vtable, tabela e depois os filhos
+    (strings, vetores, subtabelas), com os uoffsets corrigidos quando o filho é escrito.
+    Campo: (slot, tipo, valor) com tipo em _SCALARS, "str", "vec:<fmt numpy>", "table" ou "tables".
+    """
+
+    def __init__(self):
+        self.buf = bytearray(4)  # uoffset da tabela raiz, preenchido em finish
+
+    def _pad(self, align: int, extra: int = 0) -> None:
+        self.buf += b"\0" * (-(len(self.buf) + extra) % align)
+
+    def finish(self, fields: list) -> bytes:
+        root = self._table(fields)
+        struct.pack_into("<I", self.buf, 0, root)
+        return bytes(self.buf)
+
+    def _table(self, fields: list) -> int:
+        fields = [f for f in fields if f[2] is not None]
+        # campos maiores primeiro: cada um fica alinhado ao próprio tamanho
+        sized = sorted(((struct.calcsize(_SCALARS.get(kind, "I")), slot, kind, value)
+                        for slot, kind, value in fields), key=lambda f: -f[0])
+        layout, size = [], 4  # 4 = soffset para a vtable
+        for width, slot, kind, value in sized:
+            size += -size % width
+            layout.append((size, slot, kind, value))
+            size += width
+        n_slots = max((slot for _, slot, _, _ in layout), default=-1) + 1
+        slots = [0] * n_slots
+        for offset, slot, _, _ in layout:
+            slots[slot] = offset
+
+        self._pad(2)
+        vtable = len(self.buf)
+        self.buf += struct.pack(f"<HH{n_slots}H", 4 + 2 * n_slots, size, *slots)
+        self._pad(8)
+        table = len(self.buf)
+        self.buf += bytes(size)
+        struct.pack_into("<i", self.buf, table, table - vtable)
+        children = []
+        for offset, _, kind, value in layout:
+            if kind in _SCALARS:
+                struct.pack_into("<" + _SCALARS[kind], self.buf, table + offset, value)
+            else:
+                children.append((table + offset, kind, value))
+        for at, kind, value in children:
+            struct.pack_into("<I", self.buf, at, self._child(kind, value) - at)
+        return table
+
+    def _child(self, kind: str, value) -> int:
+        if kind == "str":
+            data = value.encode("utf-8")
+            self._pad(4)
+            pos = len(self.buf)
+            self.buf += struct.pack("<I", len(data)) + data + b"\0"
+            return pos
+        if kind.startswith("vec:"):
+            array = np.ascontiguousarray(value, dtype=kind[4:])
+            self._pad(max(array.itemsize, 4), extra=4)
+            pos = len(self.buf)
+            self.buf += struct.pack("<I", len(array)) + array.tobytes()
+            return pos
+        if kind == "table":
+            return self._table(value)
+        # vetor de tabelas: uoffsets para as tabelas escritas em seguida
+        self._pad(4)
+        pos = len(self.buf)
+        self.buf += struct.pack("<I", len(value)) + bytes(4 * len(value))
+        for i, fields in enumerate(value):
+            at = pos + 4 + 4 * i
+            struct.pack_into("<I", self.buf, at, self._table(fields) - at)
+        return pos
+
+
+def _size_prefixed(fields: list) -> bytes:
+    body = _Builder().finish(fields)
+    return struct.pack("<I", len(body)) + body
+
+
+def encode_header(envelope: Sequence[float], features_count: int, name: str = "municipios") -> bytes:
+    columns = [[(0, "str", col), (1, "u8", kind), (7, "bool", 1)] for col, kind in COLUMNS]
+    crs = [(0, "str", "EPSG"), (1, "i32", 4326)]
+    return _size_prefixed([
+        (0, "str", name),
+        (1, "vec:<f8", list(envelope) or None),
+        (2, "u8", MULTIPOLYGON),
+        (7, "tables", columns),
+        (8, "u64", features_count),
+        # arquivo vazio não tem índice (o GDAL recusa node_size > 0 sem features)
+        (9, "u16", INDEX_NODE_SIZE if features_count else 0),
+        (10, "table", crs),
+    ])
+
+
+def encode_properties(values: Sequence) -> bytes:
+    """Propriedades no formato do FlatGeobuf: (índice da coluna u16, valor) para cada não nulo."""
+    out = bytearray()
+    for i, ((_, kind), value) in enumerate(zip(COLUMNS, values)):
+        if value is None:
+            continue
+        out += struct.pack("<H", i)
+        if kind == STRING:
+            data = str(value).encode("utf-8")
+            out += struct.pack("<I", len(data)) + data
+        elif kind == INT:
+            out += struct.pack("<i", value)
+        else:
+            out += struct.pack("<d", value)
+    return bytes(out)
+
+
+def encode_feature(packed: PackedGeometry, properties: bytes) -> bytes:
+    """Feature MultiPolygon: uma parte por polígono, anéis marcados em `ends` (em pontos)."""
+    xy = packed.coords / E7
+    parts = []
+    for a, b in zip(packed.parts[:-1].tolist(), packed.parts[1:].tolist()):
+        start, stop = int(packed.rings[a]), int(packed.rings[b])
+        ends = packed.rings[a + 1:b + 1] - start
+        parts.append([
+            (0, "vec:<u4", ends if len(ends) > 1 else None),
+            (1, "vec:<f8", xy[start:stop].ravel()),
+            (6, "u8", POLYGON),
+        ])
+    geometry = [(6, "u8", MULTIPOLYGON), (7, "tables", parts)]
+    return _size_prefixed([(0, "table", geometry), (1, "vec:<u1", np.frombuffer(properties, dtype=np.uint8))])
+
+
+def level_bounds(num_items: int, node_size: int = INDEX_NODE_SIZE) -> List[Tuple[int, int]]:
+    """Faixa [início, fim) de cada nível no array de nós, das folhas até a raiz (que fica no início)."""
+    counts = [num_items]
+    n = num_items
+    while True:
+        n = -(-n // node_size)
+        counts.append(n)
+        if n == 1:
+            break
+    bounds, end = [], sum(counts)
+    for count in counts:
+        bounds.append((end - count, end))
+        end -= count
+    return bounds
+
+
+def build_index(boxes: np.ndarray, offsets: np.ndarray, node_size: int = INDEX_NODE_SIZE) -> np.ndarray:
+    """
+    R-tree empacotada: folhas = retângulos das features (já em ordem de Hilbert) com o byte
+    de início de cada uma; cada nó pai cobre até `node_size` filhos e guarda o índice do primeiro.
+    """
+    bounds = level_bounds(len(boxes), node_size)
+    nodes = np.zeros(bounds[0][1], dtype=NODE_DTYPE)
+    leaves = nodes[bounds[0][0]:bounds[0][1]]
+    leaves["min_x"], leaves["min_y"], leaves["max_x"], leaves["max_y"] = boxes.T
+    leaves["offset"] = offsets
+    for (start, end), (parent, _) in zip(bounds[:-1], bounds[1:]):
+        firsts = np.arange(start, end, node_size)
+        level = nodes[start:end]
+        group = firsts - start
+        target = nodes[parent:parent + len(firsts)]
+        target["min_x"] = np.minimum.reduceat(level["min_x"], group)
+        target["min_y"] = np.minimum.reduceat(level["min_y"], group)
+        target["max_x"] = np.maximum.reduceat(level["max_x"], group)
+        target["max_y"] = np.maximum.reduceat(level["max_y"], group)
+        target["offset"] = firsts
+    return nodes
+
+
+def _packed(m) -> Optional[PackedGeometry]:
+    packed = packed_of(m)
+    return packed if packed is not None and packed.kind in ("Polygon", "MultiPolygon") else None
+
+
+def build_municipios_fgb(municipios: Sequence, indicadores: Sequence) -> bytes:
+    """
+    Arquivo FlatGeobuf dos municípios (linhas com id, ibge_code, nome, geometry, geometry_bin)
+    com os indicadores de cada um; municípios sem polígono ficam de fora.
+    """
+    by_ibge: Dict[str, object] = {i.ibge_code: i for i in indicadores}
+    rows = []
+    for m in municipios:
+        packed = _packed(m)
+        if packed is None:
+            continue
+        ind = by_ibge.get(m.ibge_code)
+        values = [m.id, m.ibge_code, m.nome] + [getattr(ind, f, None) for f in INDICADOR_FIELDS]
+        rows.append((packed.bounds(), encode_feature(packed, encode_properties(values))))
+    if not rows:
+        return MAGIC + encode_header([], 0)
+
+    boxes = np.array([box for box, _ in rows], dtype=np.float64)
+    order = np.argsort(hilbert_keys((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2), kind="stable")
+    boxes = boxes[order]
+    features = [rows[i][1] for i in order]
+    sizes = np.fromiter((len(f) for f in features), dtype=np.uint64, count=len(features))
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.uint64)
+    envelope = [boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()]
+    index = build_index(boxes, offsets)
+    return b"".join([MAGIC, encode_header(envelope, len(features)), index.tobytes(), *features])
@@ -0,0 +1,146 @@
+# backend/geometry.py
+# Geometria binária dos municípios: anéis em int32 E7 (1e-7 grau) com vetores de offsets,
+# lidos sem cópia com np.frombuffer sobre o blob. O texto GeoJSON é gerado a partir dele
+# uma vez por geometria e fica em cache; a Feature inteira, já em UTF-8, fica gravada em
+# `municipios.feature` e um FeatureCollection é só a concatenação desses fragmentos.
+#
+# layout (little-endian, tudo alinhado a 4 bytes):
+#   cabeçalho  "PKG1", tipo (u8), 3 bytes de padding, n_parts, n_rings, n_points (u32)
+#   parts      int32[n_parts + 1]   primeiro anel de cada parte
+#   rings      int32[n_rings + 1]   primeiro ponto de cada anel
+#   coords     int32[n_points * 2]  lon, lat em E7
+#
+# Todo tipo vira partes -> anéis -> pontos: Point é 1 parte com 1 anel de 1 ponto,
+# LineString 1 parte com 1 anel, Polygon 1 parte com seus anéis e assim por diante.
+import hashlib
+import json
+import os
+import struct
+from typing import Iterable, Iterator, Optional
+import numpy as np
+from .cache import LRUCache
+from .spatial import E7
+from .streaming import STREAM_CHUNK_BYTES, chunks
+
+MAGIC = b"PKG1"
+HEADER = struct.Struct("<4sB3xIII")
+GEOMETRY_TYPES = ("Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon")
+GEOMETRY_CACHE_BYTES = int(os.getenv("GEOMETRY_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+
+def _parts(kind: str, coords) -> list:
+    if kind == "Point":
+        return [[[coords]]]
+    if kind == "MultiPoint":
+        return [[[c]] for c in coords]
+    if kind == "LineString":
+        return [[coords]]
+    if kind == "MultiLineString":
+        return [[line] for line in coords]
+    if kind == "Polygon":
+        return [coords]
+    return coords
+
+
+def _nest(kind: str, parts: list):
+    if kind == "Point":
+        return parts[0][0][0]
+    if kind == "MultiPoint":
+        return [p[0][0] for p in parts]
+    if kind == "LineString":
+        return parts[0][0]
+    if kind == "MultiLineString":
+        return [p[0] for p in parts]
+    if kind == "Polygon":
+        return parts[0]
+    return parts
+
+
+def pack_geometry(geom: Optional[dict]) -> Optional[bytes]:
+    """GeoJSON (dict) -> blob. Devolve None para tipos sem layout (GeometryCollection)."""
+    if not geom or geom.get("type") not in GEOMETRY_TYPES:
+        return None
+    kind = geom["type"]
+    part_offsets, ring_offsets, flat = [0], [0], []
+    for part in _parts(kind, geom["coordinates"]):
+        for ring in part:
+            flat.extend((c[0], c[1]) for c in ring)
+            ring_offsets.append(len(flat))
+        part_offsets.append(len(ring_offsets) - 1)
+    coords = np.rint(np.asarray(flat, dtype=np.float64).reshape(-1, 2) * E7).astype("<i4")
+    header = HEADER.pack(MAGIC, GEOMETRY_TYPES.index(kind) + 1,
+                         len(part_offsets) - 1, len(ring_offsets) - 1, len(flat))
+    return b"".join((header, np.asarray(part_offsets, dtype="<i4").tobytes(),
+                     np.asarray(ring_offsets, dtype="<i4").tobytes(), coords.tobytes()))
+
+
+class PackedGeometry:
+    """Vista sobre um blob: os arrays apontam para o buffer original (sem cópia)."""
+    __slots__ = ("kind", "parts", "rings", "coords")
+
+    def __init__(self, blob):
+        buf = memoryview(blob)
+        magic, code, n_parts, n_rings, n_points = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError("geometria binária inválida")
+        self.kind = GEOMETRY_TYPES[code - 1]
+        offset = HEADER.size
+        self.parts = np.frombuffer(buf, dtype="<i4", count=n_parts + 1, offset=offset)
+        offset += self.parts.nbytes
+        self.rings = np.frombuffer(buf, dtype="<i4", count=n_rings + 1, offset=offset)
+        offset += self.rings.nbytes
+        self.coords = np.frombuffer(buf, dtype="<i4", count=n_points * 2, offset=offset).reshape(-1, 2)
+
+    def ring(self, i: int) -> np.ndarray:
+        """Pontos (lon, lat) E7 do anel i, como vista do buffer."""
+        return self.coords[self.rings[i]:self.rings[i + 1]]
+
+    def bounds(self):
+        lon_min, lat_min = self.coords.min(axis=0) / E7
+        lon_max, lat_max = self.coords.max(axis=0) / E7
+        return float(lon_min), float(lat_min), float(lon_max), float(lat_max)
+
+    def to_geojson(self, precision: Optional[int] = None) -> dict:
+        xy = self.coords / E7
+        if precision is not None:
+            xy = np.round(xy, precision)
+        points = xy.tolist()
+        rings = [points[a:b] for a, b in zip(self.rings[:-1].tolist(), self.rings[1:].tolist())]
+        parts = [rings[a:b] for a, b in zip(self.parts[:-1].tolist(), self.parts[1:].tolist())]
+        return {"type": self.kind, "coordinates": _nest(self.kind, parts)}
+
+
+def packed_of(m) -> Optional[PackedGeometry]:
+    """Geometria empacotada de um município: da coluna binária ou, sem ela, do texto GeoJSON."""
+    blob = getattr(m, "geometry_bin", None)
+    if not isinstance(blob, (bytes, memoryview)):
+        blob = pack_geometry(json.loads(m.geometry)) if m.geometry else None
+    return PackedGeometry(blob) if blob is not None else None
+
+
+# texto GeoJSON por geometria, endereçado pelo conteúdo do blob (não precisa invalidar)
+geometry_cache = LRUCache(max_bytes=GEOMETRY_CACHE_BYTES)
+
+
+def geometry_text(blob, precision: Optional[int] = None) -> str:
+    key = (hashlib.blake2b(blob, digest_size=16).digest(), precision)
+    text = geometry_cache.get(key)
+    if text is None:
+        text = json.dumps(PackedGeometry(blob).to_geojson(precision))
+        geometry_cache.set(key, text, len(text))
+    return text
+
+
+def encode_feature(id: int, nome: str, ibge_code: str, geometry: str) -> bytes:
+    """Feature GeoJSON em UTF-8 a partir do texto da geometria (sem reserializar a geometria)."""
+    properties = json.dumps({"id": id, "nome": nome, "ibge_code": ibge_code}, ensure_ascii=False)
+    return ('{"type": "Feature", "geometry": %s, "properties": %s}' % (geometry, properties)).encode("utf-8")
+
+
+FEATURE_COLLECTION_HEAD = b'{"type": "FeatureCollection", "features": ['
+FEATURE_COLLECTION_TAIL = b"]}"
+
+
+def feature_collection(fragments: Iterable[bytes], chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """FeatureCollection em pedaços de ~`chunk_bytes`, juntando as Features com vírgulas."""
+    return chunks(fragments, FEATURE_COLLECTION_HEAD, b", ", FEATURE_COLLECTION_TAIL, chunk_bytes)
@@ -0,0 +1,224 @@
+# backend/indicators.py
+# Tabela de indicadores em memória: uma matriz NumPy (município x indicador, NaN onde falta
+# valor) montada uma vez por versão dos dados, com o mapa código IBGE -> linha. Comparações
+# entre municípios (/indicadores/compare) são indexação nessa matriz, sem ir ao banco, e
+# estatísticas, histogramas, correlação e índices compostos (/indicadores/stats, /histogram,
+# /correlation, /composite) são operações vetorizadas sobre ela, calculadas na primeira
+# chamada e guardadas na matriz.
+#
+#   zscore     (valor - média do estado) / desvio padrão do estado (populacional)
+#   percentil  % dos municípios com valor menor ou igual
+#   rank       1 = maior valor do estado; empates dividem a melhor posição
+import warnings
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from . import crud
+from .cache import ResultCache, VersionedCache
+
+INDICADOR_FIELDS = tuple(c.key for c in crud.INDICADOR_COLUMNS if c.key not in ("id", "ibge_code"))
+QUANTILES = (25, 50, 75)
+# escala de cada indicador antes da soma ponderada do índice composto
+NORMALIZATIONS = ("minmax", "zscore")
+
+
+def ranks(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    """(rank, percentil, municípios com valor) de cada posição de `values`; NaN fica sem posição."""
+    present = np.sort(values[~np.isnan(values)])
+    total = len(present)
+    at_most = np.searchsorted(present, values, side="right")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rank = np.where(np.isnan(values), np.nan, total - at_most + 1)
+        percentile = np.where(np.isnan(values), np.nan, 100.0 * at_most / total)
+    return rank, percentile, total
+
+
+def nan_stats(values: np.ndarray):
+    """Média, mediana e desvio padrão de cada coluna ignorando NaN (coluna vazia: NaN, sem aviso)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values, axis=0), np.nanmedian(values, axis=0), np.nanstd(values, axis=0)
+
+
+def fields(values) -> Dict[str, Optional[float]]:
+    """Linha da matriz -> {indicador: valor}, com None no lugar de NaN."""
+    return {f: None if np.isnan(v) else float(v) for f, v in zip(INDICADOR_FIELDS, values)}
+
+
+class IndicadorMatrix:
+    """Indicadores de todos os municípios (imutável): values[linha, coluna de INDICADOR_FIELDS]."""
+
+    def __init__(self, rows: Sequence):
+        self.row_of: Dict[str, int] = {}
+        kept = []
+        for r in rows:
+            # ibge_code não é único na tabela: vale a primeira linha, como em get_indicador_by_ibge
+            if r.ibge_code not in self.row_of:
+                self.row_of[r.ibge_code] = len(kept)
+                kept.append(r)
+        self.codes = [r.ibge_code for r in kept]
+        self.ids = np.array([r.id for r in kept], dtype=np.int64)
+        self.values = np.array([[np.nan if getattr(r, f) is None else getattr(r, f) for f in INDICADOR_FIELDS]
+                                for r in kept], dtype=np.float64).reshape(len(kept), len(INDICADOR_FIELDS))
+        self.mean, self.median, self.std = nan_stats(self.values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.zscores = np.where(self.std > 0, (self.values - self.mean) / self.std, np.nan)
+        columns = [ranks(self.values[:, j]) for j in range(len(INDICADOR_FIELDS))]
+        self.percentiles = np.column_stack([c[1] for c in columns])
+        self.totals = {f: c[2] for f, c in zip(INDICADOR_FIELDS, columns)}
+        self._results = ResultCache()
+
+    def _cached(self, key: tuple, compute):
+        """Resultado derivado guardado por chave (a matriz não muda; só sai do LRU por espaço)."""
+        return self._results.get_or_compute(key, compute)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def lookup(self, codes: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+        """Linhas dos códigos pedidos (na ordem pedida) e os códigos sem indicador."""
+        found, missing = [], []
+        for code in codes:
+            row = self.row_of.get(code)
+            if row is None:
+                missing.append(code)
+            else:
+                found.append(row)
+        return np.array(found, dtype=np.int64), missing
+
+    def column(self, indicator: str, codes: Sequence[str]) -> np.ndarray:
+        """Valores do indicador para `codes`, nessa ordem (NaN para quem não tem)."""
+        j = INDICADOR_FIELDS.index(indicator)
+        rows = np.array([self.row_of.get(code, -1) for code in codes], dtype=np.int64)
+        out = np.full(len(codes), np.nan)
+        found = rows >= 0
+        out[found] = self.values[rows[found], j]
+        return out
+
+    def compare(self, codes: Sequence[str], stats: bool = False) -> dict:
+        """Indicadores dos `codes` (formato IndicadorOut), com z-score e percentil no estado se `stats`."""
+        rows, missing = self.lookup(codes)
+        items = []
+        for row in rows.tolist():
+            item = {"id": int(self.ids[row]), "ibge_code": self.codes[row], **fields(self.values[row])}
+            if stats:
+                item["zscore"] = fields(self.zscores[row])
+                item["percentil"] = {f: None if v is None else round(v, 2)
+                                     for f, v in fields(self.percentiles[row]).items()}
+            items.append(item)
+        return {"items": items, "missing": missing}
+
+    def describe(self) -> Dict[str, dict]:
+        """Estatísticas descritivas de cada indicador, ignorando os valores ausentes."""
+        return self._cached(("describe",), self._describe)
+
+    def _describe(self) -> Dict[str, dict]:
+        values = self.values
+        present = ~np.isnan(values)
+        if not len(values):
+            # tabela vazia: nanmin/nanmax não reduzem zero linhas
+            low = high = np.full(len(INDICADOR_FIELDS), np.nan)
+            quantiles = np.full((len(QUANTILES), len(INDICADOR_FIELDS)), np.nan)
+        else:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+                quantiles = np.nanpercentile(values, QUANTILES, axis=0)
+        columns = {
+            "mean": self.mean, "std": self.std, "min": low, "p25": quantiles[0],
+            "median": quantiles[1], "p75": quantiles[2], "max": high,
+        }
+        out = {}
+        for j, f in enumerate(INDICADOR_FIELDS):
+            stats = {"count": int(present[:, j].sum()), "missing": int((~present[:, j]).sum())}
+            stats.update({name: None if np.isnan(col[j]) else float(col[j]) for name, col in columns.items()})
+            out[f] = stats
+        return out
+
+    def histogram(self, indicator: str, bins: int) -> dict:
+        """`bins` faixas iguais entre o mínimo e o máximo do indicador (sem os ausentes)."""
+        return self._cached(("histogram", indicator, bins), lambda: self._histogram(indicator, bins))
+
+    def _histogram(self, indicator: str, bins: int) -> dict:
+        column = self.values[:, INDICADOR_FIELDS.index(indicator)]
+        present = column[~np.isnan(column)]
+        if len(present):
+            counts, edges = np.histogram(present, bins=bins)
+        else:
+            counts, edges = np.zeros(0, dtype=np.int64), np.zeros(0)
+        return {"indicator": indicator, "edges": edges.tolist(), "counts": counts.tolist(),
+                "missing": int(len(column) - len(present))}
+
+    def correlation(self) -> dict:
+        """Pearson entre cada par de indicadores, sobre os municípios com os dois valores."""
+        return self._cached(("correlation",), self._correlation)
+
+    def _correlation(self) -> dict:
+        present = (~np.isnan(self.values)).astype(np.float64)
+        x = np.where(present > 0, self.values, 0.0)
+        # somas por par só sobre as linhas com os dois valores: produtos de matrizes, sem laço
+        n = present.T @ present
+        sums = x.T @ present                # sums[i, j] = soma de x_i onde x_j existe
+        squares = (x * x).T @ present
+        products = x.T @ x
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = products - sums * sums.T / n
+            var = squares - sums ** 2 / n
+            r = cov / np.sqrt(var * var.T)
+        r = np.where((n > 1) & np.isfinite(r), np.clip(r, -1.0, 1.0), np.nan)
+        return {
+            "indicators": list(INDICADOR_FIELDS),
+            "matrix": [[None if np.isnan(v) else float(v) for v in row] for row in r],
+            "n": n.astype(np.int64).tolist(),
+        }
+
+    def composite(self, weights: Sequence[Tuple[str, float]], normalize: str = "minmax", classes: int = 5) -> dict:
+        """
+        Índice composto de todos os municípios: soma ponderada dos indicadores normalizados
+        (minmax: 0 no mínimo e 1 no máximo; zscore: desvios da média do estado), com os pesos
+        divididos pela soma dos seus módulos. Município sem algum dos indicadores fica sem índice.
+        `breaks` são os `classes` + 1 quantis do índice, prontos para o coroplético.
+        """
+        key = ("composite", tuple(sorted(weights)), normalize, classes)
+        return self._cached(key, lambda: self._composite(weights, normalize, classes))
+
+    def _composite(self, weights: Sequence[Tuple[str, float]], normalize: str, classes: int) -> dict:
+        columns = [INDICADOR_FIELDS.index(f) for f, _ in weights]
+        w = np.array([v for _, v in weights], dtype=np.float64)
+        w = w / np.abs(w).sum()
+        applied = {f: float(v) for (f, _), v in zip(weights, w)}
+        if not len(self):
+            return {"weights": applied, "normalize": normalize, "total": 0, "breaks": [], "items": []}
+        x = self.values[:, columns]
+        if normalize == "zscore":
+            center, spread = self.mean[columns], self.std[columns]
+        else:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                center, high = np.nanmin(x, axis=0), np.nanmax(x, axis=0)
+            spread = high - center
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # indicador constante não diferencia ninguém: entra com 0
+            scaled = np.where(spread > 0, (x - center) / spread, 0.0)
+        scaled[np.isnan(x)] = np.nan
+        index = scaled @ w
+        rank, percentile, total = ranks(index)
+        present = index[~np.isnan(index)]
+        breaks = np.quantile(present, np.linspace(0.0, 1.0, classes + 1)) if total else np.zeros(0)
+        items = [
+            {"ibge_code": code, "value": None if np.isnan(v) else v, "rank": None if np.isnan(r) else int(r),
+             "percentil": None if np.isnan(p) else round(p, 2)}
+            for code, v, r, p in zip(self.codes, index.tolist(), rank.tolist(), percentile.tolist())
+        ]
+        return {"weights": applied, "normalize": normalize, "total": total, "breaks": breaks.tolist(),
+                "items": items}
+
+
+def load_matrix(db) -> list:
+    return crud.list_indicadores(db, limit=None)
+
+
+async def load_matrix_async(db) -> list:
+    return await crud.list_indicadores_async(db, limit=None)
+
+
+indicador_matrix = VersionedCache(IndicadorMatrix)
@@ -1,23 +1,76 @@
 # backend/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.api import municipios, indicadores, pois
-
-app = FastAPI(title="GIS API")
-
-# CORS (dev: allow all; lock down in production)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(municipios.router, prefix="/municipios", tags=["municipios"])
-app.include_router(indicadores.router, prefix="/indicadores", tags=["indicadores"])
-app.include_router(pois.router, prefix="/pois", tags=["pois"])
-
-@app.get("/")
-def root():
-    return {"status":"ok", "service":"gis-api"}
+from backend.api import export, municipios, indicadores, pois
+from backend.cache import query_cache
+from backend.api.municipios import build_geojson
+from backend.columnar import poi_store
+from backend.db import DB_MODE, ReadSessionLocal
+from backend.shared_index import SHARED_INDEX, publish_all, shared_geojson
+from backend.singleflight import async_flights, flights
+
+ROUTERS = [
+    (municipios, "/municipios", "municipios"),
+    (indicadores, "/indicadores", "indicadores"),
+    (pois, "/pois", "pois"),
+    (export, "/export", "export"),
+]
+
+
+def create_app(db_mode: str = DB_MODE) -> FastAPI:
+    """
+    Monta a aplicação. Com db_mode="async" as rotas GET usam async def + aiosqlite;
+    elas são registradas antes e têm precedência, o POST continua no router síncrono.
+    """
+    app = FastAPI(title="GIS API")
+
+    # CORS (dev: allow all; lock down in production)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    for module, prefix, tag in ROUTERS:
+        if db_mode == "async":
+            # mesmo contrato: a documentação continua vindo do router síncrono
+            app.include_router(module.async_router, prefix=prefix, tags=[tag], include_in_schema=False)
+        app.include_router(module.router, prefix=prefix, tags=[tag])
+
+    @app.on_event("startup")
+    def attach_shared():
+        # o primeiro worker publica colunas de POIs e GeoJSON; os outros só mapeiam os arquivos
+        if SHARED_INDEX:
+            db = ReadSessionLocal()
+            try:
+                publish_all(db, build_geojson)
+            finally:
+                db.close()
+        elif poi_store.enabled:
+            poi_store.load()
+
+    @app.get("/")
+    def root():
+        return {"status":"ok", "service":"gis-api", "db_mode": db_mode}
+
+    @app.get("/cache/stats")
+    def cache_stats():
+        """Estatísticas do cache de consultas (entradas, bytes, taxa de acerto)."""
+        return query_cache.stats()
+
+    @app.get("/columnar/stats")
+    def columnar_stats():
+        """Estado do armazenamento colunar de POIs (versão, linhas, tamanho do delta)."""
+        return {**poi_store.stats(), "geojson": shared_geojson.stats()}
+
+    @app.get("/singleflight/stats")
+    def singleflight_stats():
+        """Quantos cálculos rodaram e quantas requisições foram coalescidas."""
+        return {"sync": flights.stats(), "async": async_flights.stats()}
+
+    return app
+
+
+app = create_app()
@@ -1,6 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import DDL, Column, Integer, String, Float, DateTime, JSON, Index, LargeBinary, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
+try:
+    from .spatial import hilbert_key, to_e7
+except ImportError:  # scripts que importam `models` direto de backend/ (fixdb.py)
+    from spatial import hilbert_key, to_e7
 
 Base = declarative_base()
 
@@ -10,6 +14,13 @@ class Municipio(Base):
     ibge_code = Column(String, unique=True, index=True, nullable=False)
     nome = Column(String, nullable=False)
     geometry = Column(String)  
+    geometry_bin = Column(LargeBinary)   # mesma geometria empacotada (backend/geometry.py)
+    feature = Column(LargeBinary)        # Feature GeoJSON completa, já em UTF-8
+    # retângulo envolvente, para recortar o FeatureCollection por bbox
+    min_lon = Column(Float)
+    min_lat = Column(Float)
+    max_lon = Column(Float)
+    max_lat = Column(Float)
 
 class Indicador(Base):
     __tablename__ = "indicadores"
@@ -27,8 +38,62 @@ class POI(Base):
     __tablename__ = "pois"
     id = Column(Integer, primary_key=True)
     municipio_id = Column(Integer, index=True)       # FK lógica com municipios.id
-    tipo = Column(String, index=True)                 # e.g. 'hospital','park'
+    tipo = Column(String)                             # e.g. 'hospital','park'
     nome = Column(String, nullable=True)
-    latitude = Column(Float, nullable=False, index=True)
-    longitude = Column(Float, nullable=False, index=True)
-    created_at = Column(DateTime, default=func.now()) 
\ No newline at end of file
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    # chave de Hilbert de (longitude, latitude); o ETL grava a tabela nessa ordem
+    hilbert = Column(Integer, default=lambda ctx: hilbert_key(
+        ctx.get_current_parameters()["longitude"], ctx.get_current_parameters()["latitude"]))
+    # coordenadas em inteiros de 1e-7 grau: no índice ocupam 4 bytes cada, contra 8 do float
+    lat_e7 = Column(Integer, default=lambda ctx: to_e7(ctx.get_current_parameters()["latitude"]))
+    lon_e7 = Column(Integer, default=lambda ctx: to_e7(ctx.get_current_parameters()["longitude"]))
+
+    __table_args__ = (
+        # bbox pequeno = poucas faixas de chave; lon/lat no índice filtram sem ler a tabela.
+        # Substitui os índices simples de latitude/longitude: com eles o planejador do SQLite
+        # preferia varrer uma faixa inteira de longitude a usar as faixas de Hilbert.
+        Index("ix_pois_hilbert_e7", "hilbert", "lon_e7", "lat_e7"),
+        # tipo IN (...) com ou sem município (/pois/query) e tipo sozinho pelo prefixo do índice;
+        # substitui o índice simples de tipo
+        Index("ix_pois_tipo_municipio", "tipo", "municipio_id"),
+    )
+
+class PoiCount(Base):
+    """
+    Nº de POIs por (município, tipo), para os painéis de resumo sem listar POIs.
+    Refeita pelo ETL com um GROUP BY e mantida por crud.create_poi; município ou tipo
+    ausentes no POI ficam NULL também aqui.
+    """
+    __tablename__ = "poi_counts"
+    id = Column(Integer, primary_key=True)
+    municipio_id = Column(Integer)
+    tipo = Column(String)
+    n = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_poi_counts_municipio_tipo", "municipio_id", "tipo"),
+    )
+
+class MunicipioVizinho(Base):
+    """
+    Vizinhança entre municípios (contiguidade "queen", backend/contiguity.py), um par por
+    linha e nos dois sentidos; a chave primária deixa os vizinhos de cada município contíguos.
+    Refeita pelo ETL a partir das geometrias.
+    """
+    __tablename__ = "municipio_vizinhos"
+    municipio_id = Column(Integer, primary_key=True)
+    vizinho_id = Column(Integer, primary_key=True)
+
+# Busca textual de POIs (FTS5) sobre nome e tipo. Tabela de conteúdo externo: o índice
+# aponta para pois.id e o texto fica só em `pois`. unicode61 com remove_diacritics faz
+# "sao" achar "São"; os índices de prefixo de 2 e 3 letras aceleram a busca enquanto se digita.
+# Criada junto com `pois` (create_all); bancos antigos: python -m backend.etl.optimize.
+POI_SEARCH_TABLE = "pois_fts"
+POI_SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {POI_SEARCH_TABLE} USING fts5("
+    "nome, tipo, content='pois', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+event.listen(POI.__table__, "after_create", DDL(POI_SEARCH_DDL).execute_if(dialect="sqlite"))
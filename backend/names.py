@@ -0,0 +1,147 @@
+# backend/names.py
+# Autocomplete de nomes de municípios (?q= em /municipios/): índice em memória montado uma
+# vez por versão dos dados sobre os nomes normalizados (normalize_name, a mesma do ETL).
+#
+#   trie de palavras  cada nó guarda os municípios com alguma palavra que começa pelo
+#                     prefixo dele: "sao jo" = nó("sao") ∩ nó("jo"), sem varrer a lista
+#   trigramas         "  jose " -> "  j", " jo", "jos", "ose", "se "; tolera erro de
+#                     digitação ("sao jse") quando o prefixo não acha o bastante
+#
+# ordem: nome igual, nome começando pela consulta, todas as palavras como prefixo (a
+# primeira palavra casada mais cedo no nome primeiro) e por fim os parecidos por trigrama;
+# empate pelo nome mais curto.
+import re
+import unicodedata
+from collections import namedtuple
+from typing import Dict, FrozenSet, List, Sequence
+import numpy as np
+from .cache import VersionedCache
+
+try:
+    from unidecode import unidecode
+except ImportError:  # API sem as dependências do ETL: decomposição Unicode basta para o português
+    unidecode = None
+
+# fração mínima dos trigramas da consulta presentes no nome
+TRIGRAM_THRESHOLD = 0.5
+# consultas menores que isso não passam pelos trigramas (só prefixo)
+TRIGRAM_MIN_CHARS = 3
+
+NameEntry = namedtuple("NameEntry", ("id", "ibge_code", "nome"))
+
+
+def fold(s: str) -> str:
+    if unidecode is not None:
+        return unidecode(s)
+    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+
+
+def normalize_name(s) -> str:
+    """Minúsculas, sem acento e sem pontuação: "São José dos Campos" -> "sao jose dos campos"."""
+    s = "" if s is None else str(s)
+    s = fold(s.strip().lower())
+    s = re.sub(r'[^a-z0-9\s]', ' ', s)
+    s = re.sub(r'\s+', ' ', s).strip()
+    return s
+
+
+def trigrams(name: str) -> set:
+    """Trigramas de cada palavra com dois espaços antes e um depois (como o pg_trgm)."""
+    grams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.ids = set()
+
+
+class NameIndex:
+    """Índice de nomes (imutável): trie de palavras + trigramas sobre `entries`."""
+
+    def __init__(self, entries: Sequence):
+        self.entries = [NameEntry(e.id, e.ibge_code, e.nome) for e in entries]
+        self.names = [normalize_name(e.nome) for e in self.entries]
+        self.words = [name.split() for name in self.names]
+        self.root = _Node()
+        postings: Dict[str, List[int]] = {}
+        for i, words in enumerate(self.words):
+            for word in set(words):
+                node = self.root
+                node.ids.add(i)
+                for ch in word:
+                    node = node.children.setdefault(ch, _Node())
+                    node.ids.add(i)
+            for gram in trigrams(self.names[i]):
+                postings.setdefault(gram, []).append(i)
+        self._freeze(self.root)
+        self.postings = {g: np.array(ids, dtype=np.int32) for g, ids in postings.items()}
+        self.lengths = np.array([len(name) for name in self.names], dtype=np.int32)
+
+    def _freeze(self, root: _Node) -> None:
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.ids = frozenset(node.ids)
+            stack.extend(node.children.values())
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def prefixed(self, word: str) -> FrozenSet[int]:
+        """Municípios com alguma palavra começando por `word`."""
+        node = self.root
+        for ch in word:
+            node = node.children.get(ch)
+            if node is None:
+                return frozenset()
+        return node.ids
+
+    def _prefix_rank(self, i: int, query: str, tokens: List[str]) -> tuple:
+        name = self.names[i]
+        if name == query:
+            tier = 0
+        elif name.startswith(query):
+            tier = 1
+        else:
+            tier = 2
+        first = next(pos for pos, word in enumerate(self.words[i]) if word.startswith(tokens[0]))
+        return (tier, first, len(name), name)
+
+    def similar(self, query: str, exclude=()) -> List[int]:
+        """Posições com ao menos TRIGRAM_THRESHOLD dos trigramas da consulta, mais parecidas primeiro."""
+        grams = [self.postings[g] for g in trigrams(query) if g in self.postings]
+        total = len(trigrams(query))
+        if not grams or not total:
+            return []
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.entries))
+        score = shared / total
+        candidates = np.flatnonzero(score >= TRIGRAM_THRESHOLD)
+        candidates = candidates[~np.isin(candidates, list(exclude))]
+        # mais trigramas em comum primeiro; empate pelo nome mais curto
+        order = np.lexsort((self.lengths[candidates], -shared[candidates]))
+        return candidates[order].tolist()
+
+    def search(self, q: str, limit: int = 10) -> List[NameEntry]:
+        query = normalize_name(q)
+        tokens = query.split()
+        if not tokens:
+            return []
+        matches = self.prefixed(tokens[0])
+        for token in tokens[1:]:
+            if not matches:
+                break
+            matches = matches & self.prefixed(token)
+        ranked = sorted(matches, key=lambda i: self._prefix_rank(i, query, tokens))[:limit]
+        if len(ranked) < limit and len(query) >= TRIGRAM_MIN_CHARS:
+            ranked += self.similar(query, exclude=matches)[:limit - len(ranked)]
+        return [self.entries[i] for i in ranked]
+
+
+municipio_names = VersionedCache(NameIndex)
@@ -0,0 +1,138 @@
+# backend/planner.py
+# Plano da consulta composta de POIs (/pois/query): entre os caminhos de acesso possíveis
+# para os filtros pedidos, escolhe o que deve ler menos linhas, com base em estatísticas
+# de cardinalidade guardadas em memória por versão dos dados:
+#
+#   spatial    faixas de Hilbert em ix_pois_hilbert_e7      estimativa: grade 64x64 de contagens
+#   tipo       ix_pois_tipo_municipio (tipo IN, município)   contagem por tipo (x fração do município)
+#   municipio  ix_pois_municipio_id                          contagem por município
+#   fts        pois_fts (prefixo do nome)                    count(*) do MATCH, limitado ao melhor custo
+#   scan       tabela inteira                                total
+#   empty      filtros que não casam com nada (WHERE falso)
+#
+# Os outros filtros viram recorte das linhas que o caminho escolhido trouxe (crud.poi_query_stmt).
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from . import crud
+from .cache import VersionedCache
+from .spatial import to_e7
+
+GRID_SIZE = 64
+# custo relativo por linha: o caminho FTS faz o MATCH e depois um lookup em pois por linha
+PATH_COST = {"spatial": 1.0, "tipo": 1.0, "municipio": 1.0, "fts": 2.0, "scan": 1.0}
+# empate: o caminho mais à esquerda
+PATH_ORDER = ("spatial", "tipo", "municipio", "fts", "scan")
+
+Plan = namedtuple("Plan", ("path", "estimate", "estimates"))
+# filtros contraditórios: nenhuma linha, sem consultar estatísticas
+EMPTY_PLAN = Plan("empty", 0.0, {})
+
+
+class PoiStats:
+    """Contagens de POIs por tipo, por município e numa grade sobre a extensão dos dados (E7)."""
+
+    def __init__(self, tipo_counts: Sequence, municipio_counts: Sequence, extent: Optional[tuple],
+                 grid_counts: Sequence = (), size: int = GRID_SIZE):
+        self.by_tipo: Dict[str, int] = {tipo: int(n) for tipo, n in tipo_counts}
+        self.by_municipio: Dict[Optional[int], int] = {mid: int(n) for mid, n in municipio_counts}
+        self.total = sum(self.by_tipo.values())
+        self.extent = tuple(extent) if extent and extent[0] is not None else None
+        self.size = size
+        self.grid = np.zeros((size, size), dtype=np.int64)
+        for cx, cy, n in grid_counts:
+            self.grid[min(int(cy), size - 1), min(int(cx), size - 1)] += int(n)
+
+    @classmethod
+    def from_rows(cls, rows: dict) -> "PoiStats":
+        return cls(rows["tipos"], rows["municipios"], rows["extent"], rows["grid"])
+
+    def bbox_estimate(self, bbox: tuple) -> float:
+        """POIs no bbox: células cobertas inteiras + fração da área das células da borda."""
+        if self.extent is None:
+            return 0.0
+        x0, y0, x1, y1 = self.extent
+        width, height = (x1 - x0 + 1) / self.size, (y1 - y0 + 1) / self.size
+        edges_x = x0 + width * np.arange(self.size + 1)
+        edges_y = y0 + height * np.arange(self.size + 1)
+        min_lon, min_lat, max_lon, max_lat = (to_e7(v) for v in bbox)
+        # fração de cada coluna/linha da grade dentro do bbox
+        fx = np.clip((np.minimum(edges_x[1:], max_lon) - np.maximum(edges_x[:-1], min_lon)) / width, 0, 1)
+        fy = np.clip((np.minimum(edges_y[1:], max_lat) - np.maximum(edges_y[:-1], min_lat)) / height, 0, 1)
+        return float(fy @ self.grid @ fx)
+
+    def tipo_estimate(self, tipos: List[str], municipio_id: Optional[int] = None) -> float:
+        count = sum(self.by_tipo.get(t, 0) for t in tipos)
+        if municipio_id is not None and self.total:
+            # (tipo, municipio_id) no índice: supõe tipos distribuídos como o total do município
+            count *= self.by_municipio.get(municipio_id, 0) / self.total
+        return float(count)
+
+    def municipio_estimate(self, municipio_id: int) -> float:
+        return float(self.by_municipio.get(municipio_id, 0))
+
+
+def load_stats(db) -> dict:
+    extent = db.execute(crud.poi_extent_stmt()).one()
+    return {
+        "tipos": db.execute(crud.poi_tipo_counts_stmt()).all(),
+        "municipios": db.execute(crud.poi_municipio_counts_stmt()).all(),
+        "extent": extent,
+        "grid": db.execute(crud.poi_grid_stmt(extent, GRID_SIZE)).all() if extent[0] is not None else [],
+    }
+
+
+async def load_stats_async(db) -> dict:
+    extent = (await db.execute(crud.poi_extent_stmt())).one()
+    grid = (await db.execute(crud.poi_grid_stmt(extent, GRID_SIZE))).all() if extent[0] is not None else []
+    return {
+        "tipos": (await db.execute(crud.poi_tipo_counts_stmt())).all(),
+        "municipios": (await db.execute(crud.poi_municipio_counts_stmt())).all(),
+        "extent": extent,
+        "grid": grid,
+    }
+
+
+def estimate_paths(stats: PoiStats, tipos: Optional[List[str]] = None, municipio_id: Optional[int] = None,
+                   bbox: Optional[tuple] = None) -> Dict[str, float]:
+    """Linhas que cada caminho aplicável leria (sem o FTS, que é contado à parte)."""
+    estimates = {"scan": float(stats.total)}
+    if bbox is not None:
+        estimates["spatial"] = stats.bbox_estimate(bbox)
+    if tipos:
+        estimates["tipo"] = stats.tipo_estimate(tipos, municipio_id)
+    elif municipio_id is not None:
+        estimates["municipio"] = stats.municipio_estimate(municipio_id)
+    return estimates
+
+
+def search_cap(estimates: Dict[str, float]) -> int:
+    """Teto da contagem do FTS: passar do custo do melhor caminho já basta para descartá-lo."""
+    best = min(PATH_COST[path] * n for path, n in estimates.items())
+    return int(best / PATH_COST["fts"]) + 1
+
+
+def choose(estimates: Dict[str, float]) -> Plan:
+    path = min(estimates, key=lambda p: (PATH_COST[p] * estimates[p], PATH_ORDER.index(p)))
+    return Plan(path, estimates[path], estimates)
+
+
+def plan_query(db, stats: PoiStats, tipos: Optional[List[str]] = None, municipio_id: Optional[int] = None,
+               bbox: Optional[tuple] = None, expression: Optional[str] = None) -> Plan:
+    estimates = estimate_paths(stats, tipos, municipio_id, bbox)
+    if expression is not None:
+        estimates["fts"] = float(db.execute(crud.search_count_stmt(expression, search_cap(estimates))).scalar())
+    return choose(estimates)
+
+
+async def plan_query_async(db, stats: PoiStats, tipos: Optional[List[str]] = None,
+                           municipio_id: Optional[int] = None, bbox: Optional[tuple] = None,
+                           expression: Optional[str] = None) -> Plan:
+    estimates = estimate_paths(stats, tipos, municipio_id, bbox)
+    if expression is not None:
+        result = await db.execute(crud.search_count_stmt(expression, search_cap(estimates)))
+        estimates["fts"] = float(result.scalar())
+    return choose(estimates)
+
+
+poi_stats = VersionedCache(PoiStats.from_rows)
@@ -3,6 +3,8 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+# tipo é texto livre no POST /pois/; o teto protege o dicionário de tipos (ex.: ?format=binary)
+TIPO_MAX_LENGTH = 100
 
 # ----------------------------
 # Municipio
@@ -25,6 +27,23 @@ class MunicipioOut(MunicipioBase):
     class Config:
         orm_mode = True
 
+class EstadoStats(BaseModel):
+    media: Dict[str, Optional[float]]
+    mediana: Dict[str, Optional[float]]
+
+class MunicipioCard(BaseModel):
+    """Ficha do município (backend/cards.py): cada dict de indicadores vai de campo a valor."""
+    ibge_code: str = Field(..., example="3500105")
+    nome: str = Field(..., example="Adamantina")
+    indicadores: Dict[str, Optional[float]]
+    rank: Dict[str, Optional[int]] = Field(..., description="1 = maior valor do estado")
+    percentil: Dict[str, Optional[float]] = Field(..., description="% dos municípios com valor menor ou igual")
+    total: Dict[str, int] = Field(..., description="municípios com o indicador (base do rank)")
+    estado: EstadoStats
+    vizinhos: List[str] = Field(..., description="códigos IBGE dos municípios que fazem divisa")
+    vizinhos_media: Dict[str, Optional[float]]
+    pois: Dict[str, int] = Field(..., example={"hospital": 3, "school": 21})
+
 
 # ----------------------------
 # Indicador
@@ -55,6 +74,75 @@ class IndicadorOut(IndicadorBase):
     class Config:
         orm_mode = True
 
+class IndicadorStats(BaseModel):
+    count: int = Field(..., description="municípios com valor")
+    missing: int
+    mean: Optional[float] = None
+    std: Optional[float] = Field(None, description="desvio padrão populacional")
+    min: Optional[float] = None
+    p25: Optional[float] = None
+    median: Optional[float] = None
+    p75: Optional[float] = None
+    max: Optional[float] = None
+
+class IndicadorHistogram(BaseModel):
+    """counts[i] = municípios em [edges[i], edges[i + 1]) (a última faixa inclui o máximo)."""
+    indicator: str = Field(..., example="idh")
+    edges: List[float]
+    counts: List[int]
+    missing: int
+
+class IndicadorCorrelation(BaseModel):
+    """matrix[i][j] = Pearson entre indicators[i] e indicators[j] sobre n[i][j] municípios com os dois."""
+    indicators: List[str]
+    matrix: List[List[Optional[float]]]
+    n: List[List[int]]
+
+class CompositeItem(BaseModel):
+    ibge_code: str
+    value: Optional[float] = Field(None, description="sem valor se falta algum indicador do índice")
+    rank: Optional[int] = Field(None, description="1 = maior índice do estado")
+    percentil: Optional[float] = None
+
+class IndicadorComposite(BaseModel):
+    """Índice ponderado de todos os municípios; breaks[i]..breaks[i + 1] = classe i do coroplético (quantis)."""
+    weights: Dict[str, float] = Field(..., description="pesos aplicados (divididos pela soma dos módulos)")
+    normalize: str = Field(..., example="minmax")
+    total: int = Field(..., description="municípios com índice")
+    breaks: List[float]
+    items: List[CompositeItem]
+
+class LisaItem(BaseModel):
+    ibge_code: str
+    value: float
+    lag: Optional[float] = Field(None, description="média do indicador nos vizinhos")
+    local_i: float
+    p_value: Optional[float] = None
+    cluster: str = Field(..., example="LL", description="HH | LL | HL | LH | ns (p > 0,05) | isolado (sem vizinho)")
+
+class Autocorrelation(BaseModel):
+    """Moran global e LISA do indicador sobre a vizinhança queen (pesos padronizados por linha)."""
+    indicator: str = Field(..., example="saneamento")
+    n: int = Field(..., description="municípios com o indicador")
+    permutations: int
+    moran_i: Optional[float] = None
+    expected: Optional[float] = Field(None, description="E[I] = -1 / (n - 1)")
+    z_score: Optional[float] = Field(None, description="em relação às permutações")
+    p_value: Optional[float] = Field(None, description="pseudo p-valor das permutações")
+    lisa: List[LisaItem]
+
+class IndicadorCompareIn(BaseModel):
+    codes: List[str] = Field(..., example=["3550308", "3509502"])
+    stats: bool = Field(False, description="inclui z-score e percentil no estado")
+
+class IndicadorComparison(IndicadorOut):
+    zscore: Optional[Dict[str, Optional[float]]] = Field(None, description="(valor - média) / desvio do estado")
+    percentil: Optional[Dict[str, Optional[float]]] = Field(None, description="% dos municípios com valor menor ou igual")
+
+class IndicadorCompareOut(BaseModel):
+    items: List[IndicadorComparison]
+    missing: List[str] = Field(..., description="códigos pedidos sem indicador")
+
 
 # ----------------------------
 # POI
@@ -68,10 +156,10 @@ class POIBase(BaseModel):
 
 
 class POICreate(POIBase):
-    pass
+    tipo: Optional[str] = Field(None, example="hospital", max_length=TIPO_MAX_LENGTH)
 
 class POIUpdate(BaseModel):
-    tipo: Optional[str] = None
+    tipo: Optional[str] = Field(None, max_length=TIPO_MAX_LENGTH)
     nome: Optional[str] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
@@ -85,6 +173,21 @@ class POIOut(POIBase):
         orm_mode = True
 
 
+class POICount(BaseModel):
+    ibge_code: Optional[str] = Field(None, example="3500105", description="None = POIs fora dos municípios")
+    tipo: Optional[str] = Field(None, example="school")
+    n: int = Field(..., example=12)
+
+    class Config:
+        orm_mode = True
+
+class POICountMatrix(BaseModel):
+    """Contagens do estado inteiro: counts[i][j] = POIs do município ibge_codes[i] com o tipo tipos[j]."""
+    ibge_codes: List[Optional[str]]
+    tipos: List[Optional[str]]
+    counts: List[List[int]]
+
+
 # ----------------------------
 # Convenience response schemas
 # ----------------------------
@@ -0,0 +1,113 @@
+# backend/shared_index.py
+# Artefatos de leitura compartilhados entre os workers (uvicorn --workers / gunicorn).
+# O primeiro worker que sobe publica, sob um lock de arquivo, as colunas de POIs (com o
+# índice em grade, ver backend/columnar.py) e o GeoJSON dos municípios já serializado;
+# os demais esperam o lock e só mapeiam os arquivos. As páginas ficam no page cache do SO,
+# uma cópia para todos os processos, em vez de um índice por worker.
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from . import crud
+from .columnar import COLUMNAR_DIR, POIColumnStore, export_pois, poi_store
+from .db import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos, cada worker pode reconstruir
+    fcntl = None
+
+# "off" desliga a publicação na subida (e, com isso, o GeoJSON compartilhado)
+SHARED_INDEX = os.getenv("SHARED_INDEX", "on") != "off"
+SHARED_DIR = Path(os.getenv("SHARED_INDEX_DIR", str(DATA_DIR / "shared")))
+# página do GeoJSON que é compartilhada (a que o frontend pede: parâmetros padrão da rota)
+GEOJSON_SKIP, GEOJSON_LIMIT = 0, 1000
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Lock exclusivo entre processos (flock) enquanto um worker publica um artefato."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def ensure_columnar(db: Session, store: POIColumnStore = poi_store, directory: Path = COLUMNAR_DIR) -> bool:
+    """
+    Garante colunas de POIs na versão corrente dos dados e mapeia-as em `store`.
+    Só um worker exporta do SQLite; quem chega depois encontra meta.json atualizado.
+    """
+    if not store.enabled:
+        return False
+    version = crud.get_data_version(db)
+    store.load()
+    if store.is_fresh(version):
+        return True
+    with file_lock(Path(directory) / ".lock"):
+        store.load()
+        if not store.is_fresh(version):
+            export_pois(db, directory)
+            store.load()
+    return store.is_fresh(version)
+
+
+class SharedGeojson:
+    """
+    FeatureCollection dos municípios serializado uma vez por versão dos dados, num arquivo
+    que todos os workers servem (FileResponse, sem cópia por processo). Quando a versão
+    muda, o primeiro worker que precisar republica; as versões antigas são apagadas.
+    Fica desligado até publish_all rodar na subida do worker.
+    Com outro `suffix` serve para os demais arquivos por versão (ex.: o FlatGeobuf).
+    """
+
+    def __init__(self, directory: Path = SHARED_DIR, suffix: str = ".geojson"):
+        self.directory = Path(directory)
+        self.suffix = suffix
+        self.enabled = False
+        self.version: Optional[int] = None
+        self.path: Optional[Path] = None
+
+    def path_for(self, version: int) -> Path:
+        return self.directory / f"municipios-v{version}{self.suffix}"
+
+    def publish(self, version: int, build: Callable[[], bytes]) -> Path:
+        """Devolve o arquivo da versão, gerando-o (uma vez entre todos os workers) se faltar."""
+        if self.version == version and self.path.exists():
+            return self.path
+        path = self.path_for(version)
+        if not path.exists():
+            with file_lock(self.directory / f"{self.suffix}.lock"):
+                if not path.exists():
+                    # nome próprio por artefato: .geojson e .fgb da mesma versão têm locks diferentes
+                    tmp = path.with_name(path.name + ".tmp")
+                    tmp.write_bytes(build())
+                    os.replace(tmp, path)
+                    # mantém a versão anterior: um worker pode estar prestes a abri-la
+                    published = sorted(self.directory.glob(f"municipios-v*{self.suffix}"), key=lambda f: f.stat().st_mtime)
+                    for old in published[:-2]:
+                        old.unlink(missing_ok=True)
+        self.version, self.path = version, path
+        return path
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "version": self.version,
+                "bytes": self.path.stat().st_size if self.path and self.path.exists() else 0}
+
+
+shared_geojson = SharedGeojson()
+# /municipios/export.fgb: gerado sob demanda, uma vez por versão (não depende de publish_all)
+shared_fgb = SharedGeojson(suffix=".fgb")
+
+
+def publish_all(db: Session, build_geojson: Callable[[Session, int, int], bytes]) -> None:
+    """Chamado na subida de cada worker: publica (ou só mapeia) os artefatos compartilhados."""
+    ensure_columnar(db)
+    shared_geojson.enabled = True
+    shared_geojson.publish(crud.get_data_version(db), lambda: build_geojson(db, GEOJSON_SKIP, GEOJSON_LIMIT))
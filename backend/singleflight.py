@@ -0,0 +1,119 @@
+# backend/singleflight.py
+# Coalescência de requisições: chamadas idênticas e simultâneas esperam um único cálculo.
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from fastapi import Request
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Garante que, para uma mesma chave, só um cálculo esteja em andamento.
+    Quem chega enquanto o cálculo roda espera e recebe o mesmo resultado (ou a mesma exceção).
+    Nada fica guardado depois que o cálculo termina: não é um cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": self.in_flight(), "executed": self.executed, "coalesced": self.coalesced}
+
+
+def request_key(request: Request, version: Optional[int] = None) -> tuple:
+    """Chave normalizada: rota + parâmetros ordenados (+ versão dos dados)."""
+    params = tuple(sorted(request.query_params.multi_items()))
+    return (request.url.path.rstrip("/"), params, version)
+
+
+flights = SingleFlight()
+
+
+class AsyncSingleFlight:
+    """
+    Versão para rotas `async def`: quem chega espera o Future do cálculo em andamento.
+    Vale dentro de um event loop (um por worker).
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future"] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: se um dos que esperam for cancelado, o cálculo continua para os demais
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marca como lida se ninguém estiver esperando
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": self.in_flight(), "executed": self.executed, "coalesced": self.coalesced}
+
+
+async_flights = AsyncSingleFlight()
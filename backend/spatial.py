@@ -0,0 +1,114 @@
+# backend/spatial.py
+# Chave de Hilbert para POIs: mapeia (lon, lat) numa posição da curva de Hilbert sobre uma
+# grade 2^ORDER x 2^ORDER do globo. Pontos próximos no mapa ficam próximos na chave, então
+# gravar a tabela em ordem de chave deixa um viewport pequeno em poucas páginas contíguas.
+import math
+from typing import List, Tuple
+import numpy as np
+
+HILBERT_ORDER = 16                 # 65536 x 65536 células (~600 m em longitude)
+HILBERT_SIDE = 1 << HILBERT_ORDER
+MAX_RANGES = 32                    # faixas de chave por bbox (mais faixas = cobertura mais justa)
+E7 = 10_000_000                    # coordenadas inteiras em 1e-7 grau (~1 cm)
+METERS_PER_DEGREE = 111_320        # um grau de latitude (e de longitude no equador)
+
+
+def to_e7(value: float) -> int:
+    return int(round(value * E7))
+
+
+def radius_bbox(lon: float, lat: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """Retângulo que contém o círculo de `radius_m` metros em volta de (lon, lat)."""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return (lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+
+
+def round_coords(coords, precision: int):
+    """Arredonda as coordenadas (listas aninhadas de GeoJSON) para `precision` casas."""
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(c, precision) for c in coords]
+    return [round_coords(c, precision) for c in coords]
+
+
+def round_geometry(geom: dict, precision: int) -> dict:
+    if geom.get("type") == "GeometryCollection":
+        return {**geom, "geometries": [round_geometry(g, precision) for g in geom["geometries"]]}
+    return {**geom, "coordinates": round_coords(geom["coordinates"], precision)}
+
+
+def _cell(lon: float, lat: float, order: int = HILBERT_ORDER) -> Tuple[int, int]:
+    side = 1 << order
+    x = min(max(int((lon + 180.0) / 360.0 * side), 0), side - 1)
+    y = min(max(int((lat + 90.0) / 180.0 * side), 0), side - 1)
+    return x, y
+
+
+def xy_to_hilbert(x: int, y: int, order: int = HILBERT_ORDER) -> int:
+    """Posição da célula (x, y) na curva de Hilbert de ordem `order` (algoritmo xy2d)."""
+    d = 0
+    s = 1 << (order - 1)
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = s - 1 - x
+                y = s - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def hilbert_key(lon: float, lat: float) -> int:
+    return xy_to_hilbert(*_cell(lon, lat))
+
+
+def hilbert_keys(lon: np.ndarray, lat: np.ndarray, order: int = HILBERT_ORDER) -> np.ndarray:
+    """Versão vetorizada de hilbert_key (ETL e backfill)."""
+    side = 1 << order
+    x = np.clip(((np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * side).astype(np.int64), 0, side - 1)
+    y = np.clip(((np.asarray(lat, dtype=np.float64) + 90.0) / 180.0 * side).astype(np.int64), 0, side - 1)
+    d = np.zeros_like(x)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        flip = ~ry & rx
+        x = np.where(flip, s - 1 - x, x)
+        y = np.where(flip, s - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return d
+
+
+def hilbert_ranges(min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+                   max_ranges: int = MAX_RANGES) -> List[Tuple[int, int]]:
+    """
+    Faixas [início, fim] de chave que cobrem o bbox. Usa o nível mais fino da curva em
+    que o bbox cruza no máximo `max_ranges` células: cada célula de nível l é um bloco
+    contíguo de 4^(ORDER-l) chaves, e blocos vizinhos na curva são fundidos.
+    """
+    x0, y0 = _cell(min_lon, min_lat)
+    x1, y1 = _cell(max_lon, max_lat)
+    level = HILBERT_ORDER
+    while level > 0 and ((x1 >> (HILBERT_ORDER - level)) - (x0 >> (HILBERT_ORDER - level)) + 1) * \
+            ((y1 >> (HILBERT_ORDER - level)) - (y0 >> (HILBERT_ORDER - level)) + 1) > max_ranges:
+        level -= 1
+    shift = HILBERT_ORDER - level
+    block = 1 << (2 * shift)
+    starts = sorted(
+        xy_to_hilbert(cx, cy, level) * block if level else 0
+        for cx in range(x0 >> shift, (x1 >> shift) + 1)
+        for cy in range(y0 >> shift, (y1 >> shift) + 1)
+    )
+    ranges: List[Tuple[int, int]] = []
+    for start in starts:
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], start + block - 1)
+        else:
+            ranges.append((start, start + block - 1))
+    return ranges
@@ -0,0 +1,124 @@
+# backend/streaming.py
+# Respostas em streaming para resultados grandes: as linhas saem do cursor em lotes
+# (yield_per) e são escritas em pedaços de ~64 KiB, então a memória não cresce com o
+# número de linhas e o primeiro byte sai antes da última linha ser lida.
+#
+# ?format=json    lista JSON montada inteira (padrão, contrato original)
+# ?format=stream  a mesma lista JSON, escrita em streaming
+# ?format=ndjson  um objeto JSON por linha (application/x-ndjson)
+import gzip
+import json
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
+from fastapi import Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+STREAM_CHUNK_BYTES = 64 * 1024
+MEDIA_TYPES = {"stream": "application/json", "ndjson": "application/x-ndjson"}
+STREAM_FORMATS = tuple(MEDIA_TYPES)
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# corpos binários menores que isso não compensam o gzip
+GZIP_MIN_BYTES = 1024
+FORMAT = Query("json", regex="^(json|stream|ndjson)$", description="json | stream (lista JSON em streaming) | ndjson")
+
+
+def chunks(fragments: Iterable[bytes], head: bytes = b"[", separator: bytes = b", ", tail: bytes = b"]",
+           chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Junta os fragmentos (`head` f1 `separator` f2 ... `tail`) em pedaços de ~`chunk_bytes`."""
+    chunk = [head]
+    size = 0
+    for i, fragment in enumerate(fragments):
+        if i:
+            chunk.append(separator)
+        chunk.append(fragment)
+        size += len(fragment)
+        if size >= chunk_bytes:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    chunk.append(tail)
+    yield b"".join(chunk)
+
+
+async def chunks_async(fragments: AsyncIterable[bytes], head: bytes = b"[", separator: bytes = b", ",
+                       tail: bytes = b"]", chunk_bytes: int = STREAM_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    chunk = [head]
+    size = 0
+    first = True
+    async for fragment in fragments:
+        if not first:
+            chunk.append(separator)
+        first = False
+        chunk.append(fragment)
+        size += len(fragment)
+        if size >= chunk_bytes:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    chunk.append(tail)
+    yield b"".join(chunk)
+
+
+def framing(format: str, head: bytes = b"[", tail: bytes = b"]") -> dict:
+    """Argumentos de `chunks` para o formato: lista JSON ou uma linha por objeto."""
+    if format == "ndjson":
+        return {"head": b"", "separator": b"\n", "tail": b"\n"}
+    return {"head": head, "separator": b", ", "tail": tail}
+
+
+def stream_response(fragments, format: str, headers: Optional[dict] = None,
+                    head: bytes = b"[", tail: bytes = b"]") -> StreamingResponse:
+    """StreamingResponse a partir de fragmentos JSON (iterável síncrono ou assíncrono)."""
+    if hasattr(fragments, "__aiter__"):
+        body = chunks_async(fragments, **framing(format, head, tail))
+    else:
+        body = chunks(fragments, **framing(format, head, tail))
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
+
+
+def compressed_response(request: Request, body: bytes, media_type: str) -> Response:
+    """Resposta com gzip (nível 1: rápido) quando o cliente aceita; cabeçalhos de cache mantidos."""
+    headers = dict(getattr(request.state, "cache_headers", None) or {})
+    headers["Vary"] = "Accept-Encoding"
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=1, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def ranged_file_response(request: Request, path: Path, media_type: str, headers: Optional[dict] = None) -> Response:
+    """
+    Arquivo inteiro (200) ou um intervalo `Range: bytes=a-b` (206), para clientes que leem
+    só partes do arquivo (índice do FlatGeobuf). Vários intervalos numa requisição, ou um
+    If-Range com ETag diferente, recebem o arquivo inteiro, como permite a RFC 9110.
+    """
+    headers = {**(headers or {}), "Accept-Ranges": "bytes"}
+    match = RANGE.match(request.headers.get("range", "").replace(" ", ""))
+    if_range = request.headers.get("if-range")
+    if not match or not any(match.groups()) or (if_range and if_range != headers.get("ETag")):
+        return FileResponse(path, media_type=media_type, headers=headers)
+    size = os.path.getsize(path)
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:  # bytes=-N: os últimos N bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        body = fh.read(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(content=body, status_code=206, media_type=media_type, headers=headers)
+
+
+def poi_json(row, precision: Optional[int] = None) -> bytes:
+    """Um POI no formato de schemas.POIOut, já em UTF-8."""
+    lat, lon = row.latitude, row.longitude
+    if precision is not None:
+        lat, lon = round(lat, precision), round(lon, precision)
+    return json.dumps({
+        "municipio_id": row.municipio_id, "tipo": row.tipo, "nome": row.nome,
+        "latitude": lat, "longitude": lon, "id": row.id,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }, ensure_ascii=False).encode("utf-8")
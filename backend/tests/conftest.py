@@ -0,0 +1,79 @@
+"""
+Shared fixtures for backend tests
+"""
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# tests use temporary databases and mocked crud: never publish shared artifacts under data/
+os.environ.setdefault("SHARED_INDEX", "off")
+os.environ.setdefault("POI_ENGINE", "sqlite")
+
+from backend import models
+from backend.cache import query_cache
+from backend.db import get_db, get_read_db
+from backend.main import create_app
+
+
+@pytest.fixture(autouse=True)
+def clear_query_cache():
+    """Mocked crud results must not leak between tests through the query cache"""
+    query_cache.clear()
+    yield
+    query_cache.clear()
+
+
+@pytest.fixture(scope="session")
+def make_engine():
+    """Factory of SQLite engines with the app schema at a given path (disposed at session end)"""
+    engines = []
+
+    def make(path):
+        # check_same_thread off: o TestClient abre sessões em outra thread
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        models.Base.metadata.create_all(engine)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def temp_engine(tmp_path, make_engine):
+    """Engine of a temporary database with the app schema"""
+    engine = make_engine(tmp_path / "test.sqlite")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def temp_session(temp_engine):
+    """Sessionmaker bound to the temporary database"""
+    return sessionmaker(bind=temp_engine)
+
+
+@pytest.fixture
+def temp_client(temp_session):
+    """Factory of TestClients for the sync app reading from the temporary database
+
+    writes=True also points get_db at it. The client is returned unopened: use it as `with temp_client() as client`.
+    """
+    def override_get_db():
+        session = temp_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def make(writes: bool = False) -> TestClient:
+        app = create_app("sync")
+        app.dependency_overrides[get_read_db] = override_get_db
+        if writes:
+            app.dependency_overrides[get_db] = override_get_db
+        return TestClient(app)
+
+    return make
@@ -3,6 +3,9 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch
 from backend.main import app
 from backend import schemas
+from backend.cache import VersionedCache
+from backend.contiguity import NeighborGraph
+from backend.indicators import IndicadorMatrix
 
 
 @pytest.fixture
@@ -71,6 +74,139 @@ class TestIndicadoresListEndpoint:
                 assert response.status_code == 200
 
 
+class TestCompareEndpoint:
+    """Test GET/POST /indicadores/compare (in-memory indicator matrix)"""
+
+    ROWS = [
+        schemas.IndicadorOut(id=1, ibge_code="3550308", idh=0.805, saneamento=99.1),
+        schemas.IndicadorOut(id=2, ibge_code="3509502", idh=0.805, saneamento=90.0),
+        schemas.IndicadorOut(id=3, ibge_code="3500105", idh=0.760, saneamento=95.0),
+    ]
+
+    def call(self, client, method, *args, **kwargs):
+        with patch('backend.api.indicadores.indicador_matrix', VersionedCache(IndicadorMatrix)), \
+                patch('backend.api.indicadores.load_matrix', return_value=self.ROWS) as mock_load:
+            response = getattr(client, method)(*args, **kwargs)
+            getattr(client, method)(*args, **kwargs)
+        # a matriz é montada uma vez por versão dos dados
+        mock_load.assert_called_once()
+        return response
+
+    def test_get(self, client):
+        response = self.call(client, "get", "/indicadores/compare?codes=3500105, 3550308,9999999,3500105")
+        assert response.status_code == 200
+        assert response.headers["etag"]
+        data = response.json()
+        assert [i["ibge_code"] for i in data["items"]] == ["3500105", "3550308"]
+        assert data["items"][1]["idh"] == 0.805 and data["items"][1]["zscore"] is None
+        assert data["missing"] == ["9999999"]
+
+    def test_stats(self, client):
+        data = self.call(client, "get", "/indicadores/compare?codes=3550308&stats=true").json()
+        item = data["items"][0]
+        assert item["percentil"]["idh"] == 100.0 and item["percentil"]["saneamento"] == 100.0
+        assert item["zscore"]["saneamento"] > 1
+
+    def test_post(self, client):
+        codes = ["3509502", "3550308"] + [str(4000000 + i) for i in range(500)]
+        response = self.call(client, "post", "/indicadores/compare", json={"codes": codes, "stats": True})
+        assert response.status_code == 200
+        data = response.json()
+        assert [i["ibge_code"] for i in data["items"]] == ["3509502", "3550308"]
+        assert len(data["missing"]) == 500
+
+    def test_bad_codes(self, client):
+        assert client.get("/indicadores/compare?codes=,").status_code == 400
+        assert client.get("/indicadores/compare").status_code == 422
+        too_many = ",".join(str(3500000 + i) for i in range(1001))
+        assert client.post("/indicadores/compare", json={"codes": too_many.split(",")}).status_code == 400
+
+
+class TestStatisticsEndpoints:
+    """Test /indicadores/stats, /histogram and /correlation"""
+
+    ROWS = TestCompareEndpoint.ROWS
+
+    def get(self, client, url):
+        with patch('backend.api.indicadores.indicador_matrix', VersionedCache(IndicadorMatrix)), \
+                patch('backend.api.indicadores.load_matrix', return_value=self.ROWS):
+            return client.get(url)
+
+    def test_stats(self, client):
+        response = self.get(client, "/indicadores/stats")
+        assert response.status_code == 200
+        assert response.headers["etag"]
+        data = response.json()
+        assert data["idh"]["count"] == 3 and data["idh"]["max"] == 0.805
+        assert data["renda_per_capita"]["mean"] is None
+
+    def test_histogram(self, client):
+        data = self.get(client, "/indicadores/histogram?indicator=saneamento&bins=2").json()
+        assert data["counts"] == [1, 2] and len(data["edges"]) == 3
+
+    def test_histogram_validation(self, client):
+        assert client.get("/indicadores/histogram?indicator=populacao").status_code == 422
+        assert client.get("/indicadores/histogram?indicator=idh&bins=0").status_code == 422
+
+    def test_correlation(self, client):
+        data = self.get(client, "/indicadores/correlation").json()
+        assert data["indicators"][0] == "idh"
+        assert data["matrix"][0][0] == 1.0 and data["n"][0][0] == 3
+
+    def test_composite(self, client):
+        response = self.get(client, "/indicadores/composite?weights=idh:1,saneamento:1&classes=2")
+        assert response.status_code == 200
+        assert response.headers["etag"]
+        data = response.json()
+        assert data["normalize"] == "minmax" and data["total"] == 3
+        assert len(data["breaks"]) == 3
+        # idh empatado no máximo em 3550308 e 3509502: decide o saneamento
+        assert [i["rank"] for i in data["items"]] == [1, 2, 3]
+
+    def test_composite_validation(self, client):
+        for weights in ("populacao:1", "idh", "idh:abc", "idh:1,idh:2", "idh:0", "idh:nan"):
+            response = client.get(f"/indicadores/composite?weights={weights}")
+            assert response.status_code == 400, weights
+        assert client.get("/indicadores/composite?weights=idh:1&normalize=rank").status_code == 422
+
+
+class TestAutocorrelationEndpoint:
+    """Test GET /indicadores/autocorrelation (Moran's I / LISA over the stored graph)"""
+
+    # linha de 5 municípios, saneamento crescente
+    GRAPH = {
+        "municipios": [schemas.MunicipioOut(id=i + 1, ibge_code=str(3500000 + i), nome=f"M{i}") for i in range(5)],
+        "edges": [(a, b) for i in range(1, 5) for a, b in ((i, i + 1), (i + 1, i))],
+    }
+    ROWS = [schemas.IndicadorOut(id=i + 1, ibge_code=str(3500000 + i), saneamento=80.0 + 5 * i) for i in range(5)]
+
+    def get(self, client, url):
+        with patch('backend.api.indicadores.indicador_matrix', VersionedCache(IndicadorMatrix)), \
+                patch('backend.api.indicadores.load_matrix', return_value=self.ROWS), \
+                patch('backend.api.indicadores.municipio_graph', VersionedCache(NeighborGraph.from_rows)), \
+                patch('backend.api.indicadores.load_graph', return_value=self.GRAPH):
+            return client.get(url)
+
+    def test_moran(self, client):
+        response = self.get(client, "/indicadores/autocorrelation?indicator=saneamento&permutations=99")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["indicator"] == "saneamento" and data["n"] == 5 and data["permutations"] == 99
+        assert data["moran_i"] > 0 and data["expected"] == -0.25
+        assert [item["ibge_code"] for item in data["lisa"]] == [str(3500000 + i) for i in range(5)]
+        assert data["lisa"][0]["lag"] == 85.0
+        assert {item["cluster"] for item in data["lisa"]} <= {"HH", "LL", "HL", "LH", "ns"}
+
+    def test_indicator_without_values(self, client):
+        data = self.get(client, "/indicadores/autocorrelation?indicator=idh").json()
+        assert data["n"] == 0 and data["moran_i"] is None and data["lisa"] == []
+
+    def test_validation(self, client):
+        assert client.get("/indicadores/autocorrelation?indicator=nope").status_code == 422
+        assert client.get("/indicadores/autocorrelation?indicator=idh&permutations=-1").status_code == 422
+        assert client.get("/indicadores/autocorrelation?indicator=idh&seed=-1").status_code == 422
+
+
 class TestIndicadorDetailEndpoint:
     """Test GET /indicadores/{ibge_code} endpoint"""
     
@@ -5,9 +5,13 @@ Tests municipios endpoints using TestClient
 import pytest
 import json
 from fastapi.testclient import TestClient
-from unittest.mock import patch, Mock, MagicMock
+from unittest.mock import ANY, patch, Mock, MagicMock
 from backend.main import app
-from backend import schemas, models
+from backend import crud, schemas, models
+from backend.cache import VersionedCache
+from backend.cards import CardIndex
+from backend.contiguity import NeighborGraph
+from backend.names import NameIndex
 
 
 @pytest.fixture
@@ -58,6 +62,38 @@ class TestMunicipiosListEndpoint:
                 assert response.status_code == 200
 
 
+class TestMunicipiosSearch:
+    """Test GET /municipios/?q= (in-memory name index)"""
+
+    ROWS = [
+        schemas.MunicipioOut(id=1, ibge_code="3549904", nome="São José dos Campos"),
+        schemas.MunicipioOut(id=2, ibge_code="3549805", nome="São José do Rio Preto"),
+        schemas.MunicipioOut(id=3, ibge_code="3550308", nome="São Paulo"),
+    ]
+
+    def search(self, client, q, **params):
+        with patch('backend.api.municipios.municipio_names', VersionedCache(NameIndex)), \
+                patch('backend.api.municipios.crud.list_municipios', return_value=self.ROWS) as mock_list:
+            response = client.get("/municipios/", params={"q": q, **params})
+        return response, mock_list
+
+    def test_search_ranked(self, client):
+        response, mock_list = self.search(client, "sao jose dos")
+        assert response.status_code == 200
+        assert response.json()[0] == {"id": 1, "ibge_code": "3549904", "nome": "São José dos Campos",
+                                      "geometry": None}
+        assert mock_list.call_args.kwargs["columns"] == crud.MUNICIPIO_NAME_COLUMNS
+
+    def test_search_typo_and_paging(self, client):
+        response, _ = self.search(client, "sao jse", skip=1, limit=1)
+        assert [m["nome"] for m in response.json()] == ["São José do Rio Preto"]
+
+    def test_blank_query_lists(self, client):
+        response, mock_list = self.search(client, " ")
+        assert [m["nome"] for m in response.json()] == [m.nome for m in self.ROWS]
+        mock_list.assert_called_once_with(ANY, skip=0, limit=1000)
+
+
 class TestMunicipiosGeoJsonEndpoint:
     """Test GET /municipios/geojson endpoint"""
     
@@ -80,6 +116,19 @@ class TestMunicipiosGeoJsonEndpoint:
             assert data["type"] == "FeatureCollection"
             assert "features" in data
     
+    def test_geojson_precision(self, client):
+        """Test ?precision= rounds geometry coordinates"""
+        mock_municipios = [
+            Mock(id=1, nome="Adamantina", ibge_code="3500105",
+                 geometry='{"type": "Point", "coordinates": [-46.123456789, -23.987654321]}')
+        ]
+
+        with patch('backend.api.municipios.crud.list_municipios', return_value=mock_municipios):
+            response = client.get("/municipios/geojson?precision=3")
+
+            assert response.status_code == 200
+            assert response.json()["features"][0]["geometry"]["coordinates"] == [-46.123, -23.988]
+
     def test_geojson_with_invalid_geometry(self, client):
         """Test GeoJSON endpoint with invalid geometry is skipped"""
         mock_municipios = [
@@ -188,6 +237,72 @@ class TestMunicipioDetailEndpoint:
             assert response.status_code == 200
 
 
+class TestMunicipioCardEndpoint:
+    """Test GET /municipios/{ibge_code}/card (precomputed cards)"""
+
+    ROWS = {
+        "municipios": [
+            schemas.MunicipioOut(id=1, ibge_code="3500105", nome="Adamantina"),
+            schemas.MunicipioOut(id=2, ibge_code="3500204", nome="Adolfo"),
+        ],
+        "indicadores": [schemas.IndicadorOut(id=1, ibge_code="3500105", idh=0.79),
+                        schemas.IndicadorOut(id=2, ibge_code="3500204", idh=0.73)],
+        "counts": [schemas.POICount(ibge_code="3500105", tipo="school", n=3)],
+        "edges": [(1, 2), (2, 1)],
+    }
+
+    def get(self, client, code, **kwargs):
+        with patch('backend.api.municipios.municipio_cards', VersionedCache(CardIndex.from_rows)), \
+                patch('backend.api.municipios.load_cards', return_value=self.ROWS) as mock_load:
+            response = client.get(f"/municipios/{code}/card", **kwargs)
+            client.get(f"/municipios/{code}/card")
+        # montado uma vez para a versão; a segunda requisição é só o lookup
+        mock_load.assert_called_once()
+        return response
+
+    def test_card(self, client):
+        response = self.get(client, "3500105")
+        assert response.status_code == 200
+        assert response.headers["etag"]
+        card = response.json()
+        assert card["indicadores"]["idh"] == 0.79
+        assert card["rank"]["idh"] == 1 and card["percentil"]["idh"] == 100.0
+        assert card["estado"]["media"]["idh"] == pytest.approx(0.76)
+        assert card["vizinhos"] == ["3500204"] and card["vizinhos_media"]["idh"] == 0.73
+        assert card["pois"] == {"school": 3}
+
+    def test_card_not_found(self, client):
+        assert self.get(client, "9999999").status_code == 404
+
+
+class TestMunicipioNeighborsEndpoint:
+    """Test GET /municipios/{ibge_code}/neighbors (stored contiguity graph)"""
+
+    ROWS = {
+        "municipios": [
+            schemas.MunicipioOut(id=1, ibge_code="3500105", nome="Adamantina"),
+            schemas.MunicipioOut(id=2, ibge_code="3500204", nome="Adolfo"),
+            schemas.MunicipioOut(id=3, ibge_code="3500303", nome="Aguaí"),
+        ],
+        "edges": [(1, 2), (1, 3), (2, 1), (3, 1)],
+    }
+
+    def get(self, client, code):
+        with patch('backend.api.municipios.municipio_graph', VersionedCache(NeighborGraph.from_rows)), \
+                patch('backend.api.municipios.load_graph', return_value=self.ROWS):
+            return client.get(f"/municipios/{code}/neighbors")
+
+    def test_neighbors(self, client):
+        response = self.get(client, "3500105")
+        assert response.status_code == 200
+        assert [m["nome"] for m in response.json()] == ["Adolfo", "Aguaí"]
+        assert response.json()[0]["geometry"] is None
+        assert [m["ibge_code"] for m in self.get(client, "3500303").json()] == ["3500105"]
+
+    def test_not_found(self, client):
+        assert self.get(client, "9999999").status_code == 404
+
+
 class TestMunicipiosErrorHandling:
     """Test error handling in municipios endpoints"""
     
@@ -2,18 +2,19 @@
 Tests for backend/api/pois.py
 Tests POIs endpoints using TestClient
 """
+import json
 import pytest
-from fastapi.testclient import TestClient
 from unittest.mock import patch, Mock
-from backend.main import app
-from backend import schemas
+from backend.cache import VersionedCache
+from backend import crud, models, schemas
+from backend.planner import PoiStats
 from datetime import datetime
 
 
 @pytest.fixture
-def client():
-    """Create a TestClient for the FastAPI app"""
-    return TestClient(app)
+def client(temp_client):
+    """Create a TestClient for the FastAPI app on a temporary database (never data/db.sqlite)"""
+    return temp_client(writes=True)
 
 
 class TestPOIsListEndpoint:
@@ -212,6 +213,12 @@ class TestPOIsBboxEndpoint:
             assert response.status_code == 400
             assert "bbox must be" in response.json()["detail"]
     
+    def test_bbox_non_numeric_or_infinite(self, client):
+        """Test bbox with values that are not finite numbers"""
+        for bbox in ("a,-23.7,-46.4,-23.5", "-inf,-23.7,-46.4,-23.5", "-46.7,nan,-46.4,-23.5"):
+            assert client.get(f"/pois/bbox?bbox={bbox}").status_code == 400, bbox
+            assert client.get(f"/pois/count?bbox={bbox}").status_code == 400, bbox
+
     def test_bbox_with_type_filter(self, client):
         """Test bbox query with type filter"""
         mock_pois = []
@@ -228,9 +235,218 @@ class TestPOIsBboxEndpoint:
         assert response.status_code == 422  # Unprocessable Entity
 
 
+class TestColumnarRouting:
+    """Test routes use the columnar store when it matches the data version"""
+
+    def test_bbox_served_from_store(self, client):
+        """Test a fresh store answers without calling crud"""
+        store = Mock()
+        store.is_fresh.return_value = True
+        store.pois_in_bbox.return_value = [
+            schemas.POIOut(id=7, tipo="hospital", latitude=-23.5, longitude=-46.5)
+        ]
+        with patch('backend.api.pois.poi_store', store), \
+             patch('backend.api.pois.crud.list_pois_in_bbox') as crud_bbox:
+            response = client.get("/pois/bbox?bbox=-46.7,-23.7,-46.4,-23.5")
+
+            assert response.status_code == 200
+            assert response.json()[0]["id"] == 7
+            crud_bbox.assert_not_called()
+
+    def test_precision_rounds_coordinates(self, client):
+        """Test ?precision= rounds latitude/longitude in the response"""
+        store = Mock()
+        store.is_fresh.return_value = True
+        store.pois_in_bbox.return_value = [
+            schemas.POIOut(id=7, tipo="hospital", latitude=-23.5123456, longitude=-46.5654321)
+        ]
+        with patch('backend.api.pois.poi_store', store):
+            response = client.get("/pois/bbox?bbox=-46.7,-23.7,-46.4,-23.5&precision=4")
+            invalid = client.get("/pois/bbox?bbox=-46.7,-23.7,-46.4,-23.5&precision=9")
+
+            assert response.status_code == 200
+            poi = response.json()[0]
+            assert (poi["latitude"], poi["longitude"]) == (-23.5123, -46.5654)
+            assert invalid.status_code == 422
+
+    def test_count_falls_back_to_sqlite(self, client):
+        """Test /pois/count uses crud when the store is stale"""
+        store = Mock()
+        store.is_fresh.return_value = False
+        with patch('backend.api.pois.poi_store', store), \
+             patch('backend.api.pois.crud.count_pois', return_value=42) as count:
+            response = client.get("/pois/count?tipo=hospital&bbox=-46.7,-23.7,-46.4,-23.5")
+
+            assert response.status_code == 200
+            assert response.json() == {"count": 42}
+            assert count.call_args.kwargs["tipo"] == "hospital"
+
+
+class TestSearchEndpoint:
+    """Test GET /pois/search (FTS5 index over nome and tipo)"""
+
+    @pytest.fixture
+    def search_client(self, temp_engine, temp_session, temp_client):
+        db = temp_session()
+        db.add_all([
+            models.POI(tipo="hospital", nome="Hospital São Luiz", latitude=-23.59, longitude=-46.68),
+            models.POI(tipo="hospital", nome="Hospital das Clínicas", latitude=-23.55, longitude=-46.67),
+            models.POI(tipo="school", nome="Escola Estadual São Paulo", latitude=-22.90, longitude=-47.06),
+            models.POI(tipo="pharmacy", nome="Drogaria São Paulo", latitude=-23.56, longitude=-46.66),
+            models.POI(tipo="park", nome=None, latitude=-23.58, longitude=-46.65),
+        ])
+        db.commit()
+        with temp_engine.begin() as conn:
+            assert crud.rebuild_poi_search(conn) == 5
+        db.close()
+        with temp_client(writes=True) as client:
+            yield client
+
+    def names(self, response):
+        assert response.status_code == 200
+        return [p["nome"] for p in response.json()]
+
+    def test_accents_and_case_are_folded(self, search_client):
+        assert sorted(self.names(search_client.get("/pois/search?q=SAO PAULO"))) == \
+            ["Drogaria São Paulo", "Escola Estadual São Paulo"]
+        assert self.names(search_client.get("/pois/search?q=clinicas")) == ["Hospital das Clínicas"]
+
+    def test_prefix(self, search_client):
+        assert sorted(self.names(search_client.get("/pois/search?q=hosp"))) == \
+            ["Hospital São Luiz", "Hospital das Clínicas"]
+
+    def test_ranked_by_bm25(self, search_client):
+        # "hospital" no nome pesa mais que só no tipo
+        assert self.names(search_client.get("/pois/search?q=hospital sao"))[0] == "Hospital São Luiz"
+
+    def test_tipo_and_bbox_filters(self, search_client):
+        assert self.names(search_client.get("/pois/search?q=sao&tipo=school")) == ["Escola Estadual São Paulo"]
+        assert sorted(self.names(search_client.get("/pois/search?q=sao&bbox=-46.7,-23.6,-46.6,-23.5"))) == \
+            ["Drogaria São Paulo", "Hospital São Luiz"]
+
+    def test_fts_syntax_is_not_interpreted(self, search_client):
+        assert self.names(search_client.get('/pois/search?q=" OR nome:*')) == []
+        assert self.names(search_client.get("/pois/search?q=!!!")) == []
+        assert search_client.get("/pois/search").status_code == 422
+
+    def test_created_poi_is_searchable(self, search_client):
+        response = search_client.post("/pois/", json={"tipo": "museum", "nome": "Museu do Ipiranga",
+                                                      "latitude": -23.585, "longitude": -46.609})
+        assert response.status_code == 200
+        assert self.names(search_client.get("/pois/search?q=ipir")) == ["Museu do Ipiranga"]
+
+
+class TestQueryEndpoint:
+    """Test GET /pois/query (combined filters, planned access path) and /pois/counts"""
+
+    @pytest.fixture
+    def query_client(self, temp_engine, temp_session, temp_client):
+        db = temp_session()
+        db.add_all([models.Municipio(id=1, ibge_code="3550308", nome="São Paulo"),
+                    models.Municipio(id=2, ibge_code="3509502", nome="Campinas")])
+        pois = [models.POI(municipio_id=1, tipo="school", nome=f"Escola {i}", latitude=-23.5 - i / 1000,
+                           longitude=-46.6 - i / 1000) for i in range(50)]
+        pois += [
+            models.POI(municipio_id=1, tipo="hospital", nome="Hospital Sírio", latitude=-23.557, longitude=-46.654),
+            models.POI(municipio_id=1, tipo="museum", nome="Museu do Ipiranga", latitude=-23.585, longitude=-46.609),
+            models.POI(municipio_id=2, tipo="hospital", nome="Hospital de Clínicas", latitude=-22.83, longitude=-47.06),
+            models.POI(municipio_id=2, tipo="school", nome="Escola Campinas", latitude=-22.90, longitude=-47.06),
+        ]
+        db.add_all(pois)
+        db.commit()
+        with temp_engine.begin() as conn:
+            crud.rebuild_poi_search(conn)
+            crud.rebuild_poi_counts(conn)
+        db.close()
+        with patch("backend.api.pois.poi_stats", VersionedCache(PoiStats.from_rows)), temp_client() as client:
+            yield client
+
+    def query(self, client, **params):
+        response = client.get("/pois/query", params=params)
+        assert response.status_code == 200
+        return response.headers["x-query-plan"].split(";")[0], sorted(p["nome"] for p in response.json())
+
+    def test_tipos_and_municipio(self, query_client):
+        plan, names = self.query(query_client, tipo=["hospital", "museum"], ibge_code="3550308")
+        assert plan == "tipo"
+        assert names == ["Hospital Sírio", "Museu do Ipiranga"]
+        # vírgulas equivalem a repetir o parâmetro
+        assert self.query(query_client, tipo="hospital,museum", ibge_code="3550308")[1] == names
+
+    def test_selective_bbox_uses_spatial_path(self, query_client):
+        plan, names = self.query(query_client, tipo="school", bbox="-46.605,-23.505,-46.6,-23.5")
+        assert plan == "spatial"
+        assert names == ["Escola 0", "Escola 1", "Escola 2", "Escola 3", "Escola 4", "Escola 5"]
+
+    def test_rare_tipo_beats_large_bbox(self, query_client):
+        plan, names = self.query(query_client, tipo="museum", bbox="-48,-24,-46,-22")
+        assert plan == "tipo"
+        assert names == ["Museu do Ipiranga"]
+
+    def test_name_prefix_uses_fts(self, query_client):
+        plan, names = self.query(query_client, name="hosp", bbox="-48,-24,-46,-22")
+        assert plan == "fts"
+        assert names == ["Hospital Sírio", "Hospital de Clínicas"]
+
+    def test_radius(self, query_client):
+        # Museu do Ipiranga está a ~3,5 km do Hospital Sírio
+        plan, names = self.query(query_client, lat=-23.557, lon=-46.654, radius=1000)
+        assert plan == "spatial"
+        assert names == ["Hospital Sírio"]
+        assert "Museu do Ipiranga" in self.query(query_client, lat=-23.557, lon=-46.654, radius=6000)[1]
+
+    def test_contradictory_filters(self, query_client):
+        assert self.query(query_client, bbox="-47.1,-22.95,-47,-22.8", lat=-23.557, lon=-46.654,
+                          radius=1000) == ("empty", [])
+        assert self.query(query_client, name="!!!") == ("empty", [])
+
+    def test_errors(self, query_client):
+        assert query_client.get("/pois/query?lat=-23.5&lon=-46.6").status_code == 400
+        assert query_client.get("/pois/query?ibge_code=0000000").status_code == 404
+        assert query_client.get("/pois/query?radius=-1&lat=0&lon=0").status_code == 422
+
+    def test_counts(self, query_client):
+        response = query_client.get("/pois/counts?ibge_code=3550308")
+        assert response.status_code == 200
+        assert response.json() == [
+            {"ibge_code": "3550308", "tipo": "hospital", "n": 1},
+            {"ibge_code": "3550308", "tipo": "museum", "n": 1},
+            {"ibge_code": "3550308", "tipo": "school", "n": 50},
+        ]
+        assert query_client.get("/pois/counts?tipo=hospital").json() == [
+            {"ibge_code": "3509502", "tipo": "hospital", "n": 1},
+            {"ibge_code": "3550308", "tipo": "hospital", "n": 1},
+        ]
+        assert query_client.get("/pois/counts?ibge_code=0000000").json() == []
+
+    def test_count_matrix_and_tipos(self, query_client):
+        matrix = query_client.get("/pois/counts/matrix").json()
+        assert matrix == {"ibge_codes": ["3509502", "3550308"], "tipos": ["hospital", "museum", "school"],
+                          "counts": [[1, 0, 1], [1, 1, 50]]}
+        assert query_client.get("/pois/tipos").json() == {"tipos": ["hospital", "museum", "school"]}
+
+    def test_other_formats_keep_plan(self, query_client):
+        response = query_client.get("/pois/query?tipo=museum&format=ndjson")
+        assert response.headers["x-query-plan"].startswith("tipo")
+        assert [json.loads(line)["nome"] for line in response.text.splitlines()] == ["Museu do Ipiranga"]
+
+
 class TestCreatePOIEndpoint:
     """Test POST /pois/ endpoint"""
-    
+
+    def test_caches_follow_the_written_version(self, client, temp_session):
+        """Test the store and the query cache get the version bumped by this write"""
+        db = temp_session()
+        crud.bump_data_version(db)
+        db.commit()
+        with patch('backend.api.pois.poi_store') as store, patch('backend.api.pois.query_cache') as cache:
+            response = client.post("/pois/", json={"tipo": "hospital", "latitude": -23.5, "longitude": -46.5})
+        assert response.status_code == 200
+        assert crud.get_data_version(db) == 2
+        db.close()
+        assert store.append.call_args.args[1] == 2
+        assert cache.invalidate_poi.call_args.args[1] == 2
+
     def test_create_poi_success(self, client):
         """Test successfully creating a POI"""
         poi_data = {
@@ -251,7 +467,7 @@ class TestCreatePOIEndpoint:
             created_at=datetime.now()
         )
         
-        with patch('backend.api.pois.crud.create_poi', return_value=mock_poi):
+        with patch('backend.api.pois.crud.create_poi', return_value=(mock_poi, 4)):
             response = client.post("/pois/", json=poi_data)
             
             assert response.status_code == 200
@@ -287,7 +503,7 @@ class TestCreatePOIEndpoint:
             created_at=datetime.now()
         )
         
-        with patch('backend.api.pois.crud.create_poi', return_value=mock_poi):
+        with patch('backend.api.pois.crud.create_poi', return_value=(mock_poi, 4)):
             response = client.post("/pois/", json=poi_data)
             
             assert response.status_code == 200
@@ -0,0 +1,102 @@
+"""
+Tests for backend/arrow_ipc.py
+Tests the Arrow IPC stream responses (?format=arrow and /export/{table}.arrow)
+"""
+import json
+from datetime import datetime
+from unittest.mock import patch
+import pytest
+from backend import crud, models
+
+pa = pytest.importorskip("pyarrow")
+
+from backend.arrow_ipc import arrow_schema, ipc_chunks  # noqa: E402
+
+
+def read_stream(content: bytes):
+    return pa.ipc.open_stream(pa.py_buffer(content)).read_all()
+
+
+@pytest.fixture
+def client(temp_session, temp_client):
+    db = temp_session()
+    db.add(models.Municipio(ibge_code="3550308", nome="São Paulo", min_lon=-46.8, min_lat=-24.0,
+                            max_lon=-46.3, max_lat=-23.3,
+                            geometry=json.dumps({"type": "Point", "coordinates": [-46.6, -23.5]})))
+    db.add(models.Indicador(ibge_code="3550308", idh=0.805, renda_per_capita=1500.0))
+    db.add(models.Indicador(ibge_code="3509502", idh=0.805, saneamento=None))
+    db.add_all([
+        models.POI(tipo="hospital" if i % 2 else "school", nome=f"P{i}", municipio_id=1 if i % 3 else None,
+                   latitude=-23.5 - i / 1000, longitude=-46.5 - i / 1000, created_at=datetime(2024, 5, 1))
+        for i in range(30)
+    ])
+    db.commit()
+    db.close()
+    with temp_client() as client:
+        yield client
+
+
+class TestIPC:
+    """Test record batches built from cursor partitions"""
+
+    def test_one_batch_per_partition(self):
+        schema = arrow_schema(crud.INDICADOR_COLUMNS)
+        partitions = [[(i, str(i), 0.5, None, None, None, None, None) for i in range(3)], [(3, "3", None) + (None,) * 5]]
+        table = read_stream(b"".join(ipc_chunks(partitions, schema)))
+        assert table.num_rows == 4
+        assert len(table.to_batches()) == 2
+        assert table.column("idh").null_count == 1
+
+    def test_empty_stream_has_schema(self):
+        schema = arrow_schema(crud.POI_COLUMNS)
+        table = read_stream(b"".join(ipc_chunks([], schema)))
+        assert table.num_rows == 0
+        assert table.schema.field("created_at").type == pa.timestamp("us")
+
+
+class TestArrowRoutes:
+    """Test ?format=arrow on the list endpoints and the export endpoint"""
+
+    def test_pois_match_json(self, client):
+        plain = client.get("/pois/?limit=10").json()
+        response = client.get("/pois/?limit=10&format=arrow")
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        table = read_stream(response.content)
+        assert table.column("id").to_pylist() == [p["id"] for p in plain]
+        assert table.column("latitude").to_pylist() == [p["latitude"] for p in plain]
+        assert table.column("municipio_id").to_pylist() == [p["municipio_id"] for p in plain]
+
+    def test_bbox_and_tipo(self, client):
+        table = read_stream(client.get("/pois/bbox?bbox=-46.52,-23.52,-46.4,-23.4&tipo=hospital&format=arrow").content)
+        assert set(table.column("tipo").to_pylist()) == {"hospital"}
+        assert table.num_rows == 10
+
+    def test_indicadores(self, client):
+        response = client.get("/indicadores/?format=arrow")
+        assert "etag" in response.headers
+        table = read_stream(response.content)
+        assert table.column("ibge_code").to_pylist() == ["3550308", "3509502"]
+        assert table.column("renda_per_capita").to_pylist() == [1500.0, None]
+
+    def test_export_streams_batches(self, client):
+        with patch("backend.api.export.ARROW_BATCH_SIZE", 7):
+            response = client.get("/export/pois.arrow")
+        assert response.headers["content-disposition"] == 'attachment; filename="pois.arrow"'
+        table = read_stream(response.content)
+        assert table.num_rows == 30
+        assert [b.num_rows for b in table.to_batches()] == [7, 7, 7, 7, 2]
+        assert table.column("created_at").to_pylist()[0] == datetime(2024, 5, 1)
+
+    def test_export_municipios_without_geometry(self, client):
+        table = read_stream(client.get("/export/municipios.arrow").content)
+        assert "geometry" not in table.schema.names
+        assert table.column("max_lat").to_pylist() == [-23.3]
+
+    def test_unknown_table(self, client):
+        assert client.get("/export/users.arrow").status_code == 404
+
+    def test_without_pyarrow(self, client):
+        with patch("backend.arrow_ipc.pa", None):
+            assert client.get("/indicadores/?format=arrow").status_code == 501
+            assert client.get("/export/pois.arrow").status_code == 501
+        assert client.get("/pois/?format=json").status_code == 200
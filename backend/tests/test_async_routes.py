@@ -0,0 +1,214 @@
+"""
+Tests for the async read path (DB_MODE=async)
+Tests async routes against a temporary SQLite file through aiosqlite
+"""
+import json
+from unittest.mock import Mock, patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend import crud, models
+from backend.cache import VersionedCache
+from backend.cards import CardIndex
+from backend.contiguity import NeighborGraph, rebuild_neighbors
+from backend.indicators import IndicadorMatrix
+from backend.db import create_async_read_engine, make_async_sessionmaker, get_async_db, get_db, get_read_db
+from backend.main import create_app
+from backend.planner import PoiStats
+from backend.shared_index import SharedGeojson
+
+
+@pytest.fixture
+def async_client(tmp_path):
+    """App in async mode bound to a seeded temporary database"""
+    path = tmp_path / "async.sqlite"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    geom = {"type": "Point", "coordinates": [-46.5, -23.5]}
+    muni = models.Municipio(ibge_code="3500105", nome="Adamantina", geometry=json.dumps(geom))
+    db.add(muni)
+    db.commit()
+    db.add_all([
+        models.POI(municipio_id=muni.id, tipo="hospital", nome="H1", latitude=-23.55, longitude=-46.55),
+        models.POI(municipio_id=muni.id, tipo="school", nome="E1", latitude=-23.60, longitude=-46.60),
+    ])
+    db.add(models.Indicador(ibge_code="3500105", idh=0.79))
+    db.commit()
+    db.close()
+    with engine.begin() as conn:
+        crud.rebuild_poi_counts(conn)
+        rebuild_neighbors(conn)
+
+    async_engine = create_async_read_engine(f"sqlite+aiosqlite:///{path}")
+    AsyncSession = make_async_sessionmaker(async_engine)
+
+    async def override_get_async_db():
+        async with AsyncSession() as session:
+            yield session
+
+    def override_get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = create_app("async")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    with TestClient(app) as client:
+        yield client
+    engine.dispose()
+
+
+class TestAsyncReadRoutes:
+    """Test async def read routes"""
+
+    def test_root_reports_mode(self, async_client):
+        assert async_client.get("/").json()["db_mode"] == "async"
+
+    def test_list_municipios(self, async_client):
+        response = async_client.get("/municipios/")
+        assert response.status_code == 200
+        assert response.json()[0]["ibge_code"] == "3500105"
+
+    def test_geojson(self, async_client):
+        response = async_client.get("/municipios/geojson")
+        assert response.status_code == 200
+        assert len(response.json()["features"]) == 1
+
+    def test_municipio_not_found(self, async_client):
+        assert async_client.get("/municipios/9999999").status_code == 404
+
+    def test_municipio_search(self, async_client):
+        response = async_client.get("/municipios/?q=adamant")
+        assert response.status_code == 200
+        assert [m["ibge_code"] for m in response.json()] == ["3500105"]
+
+    def test_indicador(self, async_client):
+        response = async_client.get("/indicadores/3500105")
+        assert response.status_code == 200
+        assert response.json()["idh"] == 0.79
+
+    def test_pois_bbox_and_types(self, async_client):
+        response = async_client.get("/pois/bbox?bbox=-46.58,-23.58,-46.5,-23.5")
+        assert response.status_code == 200
+        assert [p["nome"] for p in response.json()] == ["H1"]
+        assert async_client.get("/pois/tipos").json() == {"tipos": ["hospital", "school"]}
+
+    def test_pois_by_municipio(self, async_client):
+        response = async_client.get("/pois/municipio/3500105")
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_search(self, async_client):
+        async_client.post("/pois/", json={"tipo": "museum", "nome": "Museu Histórico", "latitude": -23.5,
+                                          "longitude": -46.5})
+        response = async_client.get("/pois/search?q=historico")
+        assert response.status_code == 200
+        assert [p["nome"] for p in response.json()] == ["Museu Histórico"]
+
+    def test_query(self, async_client):
+        with patch("backend.api.pois.poi_stats", VersionedCache(PoiStats.from_rows)):
+            response = async_client.get("/pois/query?tipo=hospital&tipo=school&ibge_code=3500105&bbox=-46.58,-23.58,-46.5,-23.5")
+        assert response.status_code == 200
+        assert response.headers["x-query-plan"].split(";")[0] in ("spatial", "tipo")
+        assert [p["nome"] for p in response.json()] == ["H1"]
+
+    def test_municipio_card(self, async_client):
+        with patch("backend.api.municipios.municipio_cards", VersionedCache(CardIndex.from_rows)):
+            card = async_client.get("/municipios/3500105/card").json()
+            assert async_client.get("/municipios/9999999/card").status_code == 404
+        assert card["indicadores"]["idh"] == 0.79 and card["rank"]["idh"] == 1
+        assert card["pois"] == {"hospital": 1, "school": 1}
+
+    def test_compare(self, async_client):
+        with patch("backend.api.indicadores.indicador_matrix", VersionedCache(IndicadorMatrix)):
+            got = async_client.get("/indicadores/compare?codes=3500105,1&stats=true").json()
+            posted = async_client.post("/indicadores/compare", json={"codes": ["3500105"]}).json()
+        assert got["items"][0]["idh"] == 0.79 and got["items"][0]["percentil"]["idh"] == 100.0
+        assert got["missing"] == ["1"]
+        assert posted["items"][0]["ibge_code"] == "3500105"
+
+    def test_indicator_statistics(self, async_client):
+        with patch("backend.api.indicadores.indicador_matrix", VersionedCache(IndicadorMatrix)):
+            stats = async_client.get("/indicadores/stats").json()
+            hist = async_client.get("/indicadores/histogram?indicator=idh&bins=3").json()
+            corr = async_client.get("/indicadores/correlation").json()
+        assert stats["idh"]["mean"] == 0.79
+        assert hist["counts"] == [0, 1, 0]
+        # um município só: sem variância, sem correlação
+        assert corr["matrix"][0][0] is None
+
+    def test_composite(self, async_client):
+        with patch("backend.api.indicadores.indicador_matrix", VersionedCache(IndicadorMatrix)):
+            data = async_client.get("/indicadores/composite?weights=idh:1&normalize=zscore").json()
+        # sem variância: o indicador entra com 0
+        assert data["items"] == [{"ibge_code": "3500105", "value": 0.0, "rank": 1, "percentil": 100.0}]
+
+    def test_neighbors_and_autocorrelation(self, async_client):
+        with patch("backend.api.municipios.municipio_graph", VersionedCache(NeighborGraph.from_rows)), \
+                patch("backend.api.indicadores.municipio_graph", VersionedCache(NeighborGraph.from_rows)), \
+                patch("backend.api.indicadores.indicador_matrix", VersionedCache(IndicadorMatrix)):
+            assert async_client.get("/municipios/3500105/neighbors").json() == []
+            assert async_client.get("/municipios/9999999/neighbors").status_code == 404
+            data = async_client.get("/indicadores/autocorrelation?indicator=idh&permutations=9").json()
+        # um município só, sem vizinhos
+        assert data["n"] == 1 and data["moran_i"] is None
+        assert data["lisa"][0]["cluster"] == "isolado"
+
+    def test_counts(self, async_client):
+        assert async_client.get("/pois/counts?tipo=school").json() == [{"ibge_code": "3500105", "tipo": "school", "n": 1}]
+        assert async_client.get("/pois/counts/matrix").json()["counts"] == [[1, 1]]
+
+    def test_conditional_304(self, async_client):
+        etag = async_client.get("/pois/tipo/school").headers["etag"]
+        response = async_client.get("/pois/tipo/school", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+    def test_post_still_sync(self, async_client):
+        payload = {"tipo": "police", "nome": "D1", "latitude": -23.5, "longitude": -46.5, "municipio_id": 1}
+        response = async_client.post("/pois/", json=payload)
+        assert response.status_code == 200
+        assert response.json()["tipo"] == "police"
+
+    def test_count(self, async_client):
+        assert async_client.get("/pois/count").json() == {"count": 2}
+        assert async_client.get("/pois/count?tipo=school&ibge_code=3500105").json() == {"count": 1}
+
+    def test_streamed_formats(self, async_client):
+        lines = async_client.get("/pois/?format=ndjson").text.splitlines()
+        assert sorted(json.loads(line)["nome"] for line in lines) == ["E1", "H1"]
+        bbox = async_client.get("/pois/bbox?bbox=-46.58,-23.58,-46.5,-23.5&format=stream")
+        assert [p["nome"] for p in bbox.json()] == ["H1"]
+        assert async_client.get("/pois/tipo/school?format=stream").json()[0]["nome"] == "E1"
+        geojson = async_client.get("/municipios/geojson?format=stream")
+        assert geojson.json()["features"][0]["properties"]["ibge_code"] == "3500105"
+
+    def test_shared_file_pruned_before_publish(self, async_client, tmp_path):
+        # a checagem vê o arquivo; publish não o encontra mais e precisa montar os bytes
+        shared = SharedGeojson(tmp_path / "shared", suffix=".fgb")
+        with patch("backend.api.municipios.shared_fgb", shared), \
+                patch.object(shared, "path_for", side_effect=[Mock(exists=Mock(return_value=True)),
+                                                              tmp_path / "shared" / "municipios-v1.fgb"]):
+            (tmp_path / "shared").mkdir()
+            response = async_client.get("/municipios/export.fgb")
+        assert response.status_code == 200 and response.content.startswith(b"fgb\x03fgb\x00")
+
+    def test_arrow_format(self, async_client):
+        pa = pytest.importorskip("pyarrow")
+        table = pa.ipc.open_stream(async_client.get("/pois/bbox?bbox=-46.58,-23.58,-46.5,-23.5&format=arrow").content).read_all()
+        assert table.column("nome").to_pylist() == ["H1"]
+        export = pa.ipc.open_stream(async_client.get("/export/pois.arrow").content).read_all()
+        assert sorted(export.column("nome").to_pylist()) == ["E1", "H1"]
+
+    def test_flatgeobuf_export(self, async_client, tmp_path):
+        with patch("backend.api.municipios.shared_fgb", SharedGeojson(tmp_path / "shared", suffix=".fgb")):
+            full = async_client.get("/municipios/export.fgb")
+            assert full.content.startswith(b"fgb\x03fgb\x00")
+            part = async_client.get("/municipios/export.fgb", headers={"Range": "bytes=8-11"})
+        assert part.status_code == 206 and part.content == full.content[8:12]
@@ -0,0 +1,186 @@
+"""
+Tests for backend/cache.py
+Tests LRU byte budget, bbox quantization and selective invalidation
+"""
+import pytest
+from unittest.mock import Mock, patch
+from backend.cache import (
+    LRUCache, DiskCache, NullCache, QueryCache, ResultCache,
+    snap_bbox, grid_step, poi_record,
+)
+
+
+def make_poi(id, lon, lat, tipo="hospital", municipio_id=1):
+    return Mock(id=id, municipio_id=municipio_id, tipo=tipo, nome=f"POI {id}",
+                latitude=lat, longitude=lon, created_at=None)
+
+
+class TestBboxQuantization:
+    """Test bbox snapping to the zoom grid"""
+
+    def test_snap_contains_original(self):
+        """Test snapped bbox always contains the requested bbox"""
+        b = (-46.712345, -23.712345, -46.412345, -23.512345)
+        s = snap_bbox(*b)
+        assert s[0] <= b[0] and s[1] <= b[1] and s[2] >= b[2] and s[3] >= b[3]
+
+    def test_near_identical_bboxes_share_snap(self):
+        """Test bboxes differing in the 6th decimal snap to the same cell"""
+        a = snap_bbox(-46.700001, -23.700001, -46.400001, -23.500001)
+        b = snap_bbox(-46.700004, -23.700002, -46.400003, -23.500009)
+        assert a == b
+
+    def test_grid_step_follows_zoom(self):
+        """Test smaller bboxes use a finer grid"""
+        assert grid_step(0, 0, 0.01, 0.01) < grid_step(0, 0, 1.0, 1.0)
+
+
+class TestLRUCache:
+    """Test in-process LRU with byte budget"""
+
+    def test_get_set_and_stats(self):
+        cache = LRUCache(max_bytes=1000)
+        assert cache.get("a") is None
+        cache.set("a", [1], size=10)
+        assert cache.get("a") == [1]
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_bytes=100)
+        cache.set("a", "A", size=40)
+        cache.set("b", "B", size=40)
+        cache.get("a")
+        cache.set("c", "C", size=40)
+        assert cache.get("b") is None
+        assert cache.get("a") == "A"
+        assert cache.total_bytes <= 100
+        assert cache.evictions == 1
+
+    def test_oversized_entry_not_stored(self):
+        cache = LRUCache(max_bytes=10)
+        cache.set("a", "A", size=11)
+        assert cache.get("a") is None
+
+    def test_invalidate_by_meta(self):
+        cache = LRUCache(max_bytes=1000)
+        cache.set("a", 1, size=1, meta={"tipo": "school"})
+        cache.set("b", 2, size=1, meta={"tipo": "park"})
+        assert cache.invalidate(lambda m: m["tipo"] == "school") == 1
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+
+    def test_null_cache_never_stores(self):
+        cache = NullCache()
+        cache.set("a", 1, size=1)
+        assert cache.get("a") is None
+
+    def test_disk_cache_roundtrip(self, tmp_path):
+        cache = DiskCache(directory=tmp_path, max_bytes=1000)
+        cache.set("a", [{"id": 1}], size=10)
+        assert cache.get("a") == [{"id": 1}]
+        cache.delete("a")
+        assert list(tmp_path.glob("*.pkl")) == []
+
+    def test_result_cache_computes_once_and_stays_bounded(self):
+        cache = ResultCache(max_bytes=20000)
+        compute = Mock(side_effect=lambda: {"items": [{"value": 0.5}] * 10})
+        first = cache.get_or_compute(("composite", 1), compute)
+        assert cache.get_or_compute(("composite", 1), compute) is first
+        assert compute.call_count == 1
+        # chaves vindas do cliente: o orçamento vale para qualquer quantidade delas
+        for i in range(1000):
+            cache.get_or_compute(("composite", float(i)), lambda: {"items": [{"value": 0.5}] * 10})
+        assert cache.total_bytes <= 20000 and cache.evictions > 0
+
+
+class TestQueryCache:
+    """Test the cache in front of crud POI queries"""
+
+    def test_bbox_hit_filters_to_exact_bbox(self):
+        """Test neighbouring bboxes share an entry and get filtered exactly"""
+        qc = QueryCache(LRUCache())
+        # POI 3 fica no bbox alinhado à grade, mas fora do bbox pedido
+        pois = [make_poi(1, -46.5, -23.6), make_poi(2, -46.45, -23.55), make_poi(3, -46.38, -23.6)]
+        with patch('backend.cache.crud.list_pois_in_bbox', return_value=pois) as mock_list:
+            first = qc.pois_in_bbox(Mock(), -46.7, -23.7, -46.4, -23.5, version=1)
+            second = qc.pois_in_bbox(Mock(), -46.700004, -23.700002, -46.400003, -23.500009, version=1)
+
+            assert mock_list.call_count == 1
+            assert [r.id for r in first] == [1, 2]
+            assert [r.id for r in second] == [1, 2]
+            assert qc.stats()["hits"] == 1
+
+    def test_version_change_clears(self):
+        """Test an external data version change drops all entries"""
+        qc = QueryCache(LRUCache())
+        with patch('backend.cache.crud.list_pois_by_type', return_value=[]) as mock_list:
+            qc.pois_by_type(Mock(), "school", version=1)
+            qc.pois_by_type(Mock(), "school", version=2)
+            assert mock_list.call_count == 2
+
+    def test_invalidate_poi_is_selective(self):
+        """Test a write only drops entries of its tipo and cell"""
+        qc = QueryCache(LRUCache())
+        with patch('backend.cache.crud.list_pois_by_type', return_value=[make_poi(1, -46.5, -23.5, tipo="park")]):
+            qc.pois_by_type(Mock(), "park", version=1)
+            qc.pois_by_type(Mock(), "school", version=1)
+        with patch('backend.cache.crud.list_pois_in_bbox', return_value=[]):
+            qc.pois_in_bbox(Mock(), -46.7, -23.7, -46.4, -23.5, version=1)
+            qc.pois_in_bbox(Mock(), -40.7, -20.7, -40.4, -20.5, version=1)
+
+        removed = qc.invalidate_poi(make_poi(9, -46.5, -23.6, tipo="school"), 2)
+
+        # tipo "school" + bbox que contém o ponto
+        assert removed == 2
+        assert qc.stats()["entries"] == 2
+        # escrita local avança a versão esperada sem limpar o resto
+        assert qc.version == 2
+
+    def test_invalidate_poi_with_skipped_version_clears(self):
+        """Test a write that is not the next version drops every entry"""
+        qc = QueryCache(LRUCache())
+        with patch('backend.cache.crud.list_pois_by_type', return_value=[make_poi(1, -46.5, -23.5, tipo="park")]):
+            qc.pois_by_type(Mock(), "park", version=1)
+        # a versão 2 veio de outro worker: a entrada de "park" pode não ter o POI dele
+        assert qc.invalidate_poi(make_poi(9, -46.5, -23.6, tipo="school"), 3) == 1
+        assert qc.version == 3 and qc.stats()["entries"] == 0
+
+    def test_read_racing_a_write_is_not_stored(self):
+        """Test rows fetched before a write lands are not cached under the new version"""
+        qc = QueryCache(LRUCache())
+
+        def fetch_then_write(*args, **kwargs):
+            # create_poi comita e invalida enquanto a leitura ainda está no banco
+            qc.invalidate_poi(make_poi(9, -46.5, -23.6, tipo="school"), 2)
+            return []
+
+        with patch('backend.cache.crud.list_pois_by_type', side_effect=fetch_then_write):
+            qc.pois_by_type(Mock(), "school", version=1)
+        assert qc.version == 2
+        assert qc.stats()["entries"] == 0
+
+    def test_municipio_entries(self):
+        """Test municipio entries are dropped by matching municipio_id"""
+        qc = QueryCache(LRUCache())
+        with patch('backend.cache.crud.list_pois_by_municipio', return_value=[make_poi(1, -46.5, -23.5, municipio_id=5)]):
+            qc.pois_by_municipio(Mock(), "3500105", version=1)
+        assert qc.invalidate_poi(make_poi(2, -46.5, -23.5, municipio_id=6), 2) == 0
+        assert qc.invalidate_poi(make_poi(3, -46.5, -23.5, municipio_id=5), 3) == 1
+
+    def test_poi_record_is_compact_tuple(self):
+        rec = poi_record(make_poi(1, -46.5, -23.5))
+        assert rec.id == 1 and rec.longitude == -46.5
+        assert rec._fields == ("id", "municipio_id", "tipo", "nome", "latitude", "longitude", "created_at")
+
+
+class TestCacheStatsEndpoint:
+    """Test GET /cache/stats"""
+
+    def test_stats_endpoint(self):
+        from fastapi.testclient import TestClient
+        from backend.main import app
+        response = TestClient(app).get("/cache/stats")
+        assert response.status_code == 200
+        assert "hit_ratio" in response.json()
@@ -0,0 +1,66 @@
+"""
+Tests for backend/cards.py
+Tests neighbour means and the precomputed municipality cards
+"""
+import json
+from collections import namedtuple
+import numpy as np
+from backend.cards import CardIndex, INDICADOR_FIELDS, neighbour_means
+
+Row = namedtuple("Row", ("id", "ibge_code", "nome"))
+Ind = namedtuple("Ind", ("ibge_code",) + INDICADOR_FIELDS)
+Count = namedtuple("Count", ("ibge_code", "tipo", "n"))
+
+
+def indicador(code, idh=None, renda=None):
+    values = dict.fromkeys(INDICADOR_FIELDS)
+    values.update(idh=idh, renda_per_capita=renda)
+    return Ind(code, **values)
+
+
+class TestNeighbourMeans:
+    def test_neighbour_means_skip_missing(self):
+        values = np.array([[1.0], [np.nan], [3.0]])
+        # 0 - 1 - 2 em linha
+        indptr, indices = np.array([0, 1, 3, 4]), np.array([1, 0, 2, 1])
+        assert neighbour_means(values, indptr, indices)[:, 0].tolist()[1] == 2.0
+        assert np.isnan(neighbour_means(values, indptr, indices)[0, 0])
+
+
+class TestCardIndex:
+    def make(self):
+        municipios = [Row(i + 1, f"350000{i}", f"M{i}") for i in range(4)]
+        # 1 - 2 - 3 em linha, 4 isolado; par com município desconhecido (99) é ignorado
+        edges = [(1, 2), (2, 1), (2, 3), (3, 2), (3, 99)]
+        indicadores = [indicador("3500000", 0.8, 1000.0), indicador("3500001", 0.6, 500.0),
+                       indicador("3500002", 0.7)]
+        counts = [Count("3500001", "school", 4), Count("3500001", "hospital", 1), Count(None, "park", 2)]
+        return CardIndex(municipios, indicadores, counts, edges)
+
+    def card(self, index, code):
+        return json.loads(index.get(code))
+
+    def test_card_contents(self):
+        index = self.make()
+        assert len(index) == 4
+        card = self.card(index, "3500001")
+        assert card["nome"] == "M1"
+        assert card["indicadores"]["idh"] == 0.6
+        assert card["rank"]["idh"] == 3 and card["percentil"]["idh"] == round(100 / 3, 2)
+        assert card["total"]["idh"] == 3 and card["total"]["renda_per_capita"] == 2
+        assert card["estado"]["media"]["idh"] == np.mean([0.8, 0.6, 0.7])
+        assert card["estado"]["mediana"]["renda_per_capita"] == 750.0
+        assert card["vizinhos"] == ["3500000", "3500002"]
+        assert card["vizinhos_media"]["idh"] == 0.75
+        assert card["vizinhos_media"]["renda_per_capita"] == 1000.0
+        assert card["pois"] == {"school": 4, "hospital": 1}
+
+    def test_missing_indicators_and_isolated(self):
+        card = self.card(self.make(), "3500003")
+        assert card["indicadores"]["idh"] is None and card["rank"]["idh"] is None
+        assert card["vizinhos"] == [] and card["vizinhos_media"]["idh"] is None
+        assert card["estado"]["media"]["saneamento"] is None
+        assert card["pois"] == {}
+
+    def test_unknown(self):
+        assert self.make().get("9999999") is None
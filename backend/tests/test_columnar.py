@@ -0,0 +1,194 @@
+"""
+Tests for backend/columnar.py
+Tests the memory-mapped NumPy POI store: round trip, vectorized filters and the delta buffer
+"""
+import json
+import threading
+from datetime import datetime
+from unittest.mock import patch
+import numpy as np
+import pytest
+from backend import crud, models
+from backend.cache import PoiRecord
+from backend import columnar
+from backend.columnar import POIColumnStore, concat_columns, encode_columns, export_pois, write_columns
+
+ROWS = [
+    PoiRecord(1, 10, "hospital", "Hospital São Paulo", -23.55, -46.55, datetime(2024, 1, 1)),
+    PoiRecord(2, 10, "school", "Escola", -23.60, -46.60, None),
+    PoiRecord(3, 20, "hospital", None, -22.90, -47.06, None),
+    PoiRecord(4, None, None, "Sem tipo", -23.51, -46.51, None),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    write_columns(encode_columns(ROWS), tmp_path, 5, {"3550308": 10, "3509502": 20})
+    s = POIColumnStore(tmp_path)
+    assert s.load()
+    return s
+
+
+class TestEncoding:
+    """Test column encoding"""
+
+    def test_tipo_dictionary(self):
+        cols = encode_columns(ROWS)
+        assert cols["tipos"] == ["hospital", "school"]
+        assert cols["tipo"].tolist() == [0, 1, 0, -1]
+        assert cols["municipio_id"].tolist() == [10, 10, 20, -1]
+
+    def test_loaded_columns_are_memory_mapped(self, store):
+        assert isinstance(store.cols["lat"], np.memmap)
+        assert store.version == 5
+
+    def test_concat_matches_encoding_all_rows(self):
+        # blocos fora de ordem de id, com dicionários de tipo diferentes
+        extra = [PoiRecord(0, 30, "museum", "Museu Ipiranga", -23.58, -46.61, None),
+                 PoiRecord(9, None, None, "Ç", -23.0, -46.0, None)]
+        merged = concat_columns([encode_columns(ROWS), encode_columns(extra)])
+        expected = encode_columns(sorted(ROWS + extra, key=lambda r: r.id))
+        assert merged["tipos"] == expected["tipos"]
+        for name in columnar.COLUMNS:
+            assert merged[name].tolist() == expected[name].tolist(), name
+
+
+class TestQueries:
+    """Test vectorized filters against the mapped columns"""
+
+    def test_round_trip(self, store):
+        assert store.query() == ROWS
+
+    def test_bbox(self, store):
+        assert [p.id for p in store.pois_in_bbox(-46.58, -23.58, -46.5, -23.5)] == [1, 4]
+
+    def test_bbox_and_tipo(self, store):
+        assert [p.id for p in store.pois_in_bbox(-48, -24, -46, -22, tipo="hospital")] == [1, 3]
+
+    def test_unknown_tipo_is_empty(self, store):
+        assert store.pois_by_type("museum") == []
+
+    def test_by_municipio(self, store):
+        assert [p.id for p in store.pois_by_municipio("3550308")] == [1, 2]
+        assert store.pois_by_municipio("0000000") == []
+
+    def test_pagination(self, store):
+        assert [p.id for p in store.query(skip=1, limit=2)] == [2, 3]
+
+    def test_count(self, store):
+        assert store.count_pois() == 4
+        assert store.count_pois(tipo="hospital", ibge_code="3509502") == 1
+
+
+class TestDelta:
+    """Test the write buffer and merge"""
+
+    def test_append_is_visible_and_advances_version(self, store):
+        store.append(PoiRecord(5, 20, "school", "Nova", -22.91, -47.07, None), 6)
+        assert store.version == 6
+        assert store.is_fresh(6)
+        assert [p.id for p in store.pois_by_type("school")] == [2, 5]
+        assert store.count_pois(ibge_code="3509502") == 2
+
+    def test_merge_rewrites_files(self, store, tmp_path):
+        store.append(PoiRecord(5, 20, "museum", "Museu", -22.91, -47.07, None), 6)
+        store.merge()
+        assert store.delta == []
+        meta = json.loads((tmp_path / "meta.json").read_text())
+        assert meta["data_version"] == 6 and meta["count"] == 5
+        assert "museum" in store.tipos
+        assert [p.id for p in store.pois_by_type("museum")] == [5]
+
+    def test_other_process_merge_is_picked_up(self, store, tmp_path):
+        other = POIColumnStore(tmp_path)
+        other.load()
+        store.append(PoiRecord(5, 20, "school", "Nova", -22.91, -47.07, None), 6)
+        store.merge()
+        assert other.is_fresh(6)
+        assert other.count_pois() == 5
+
+    def wait_for_merge(self):
+        for t in threading.enumerate():
+            if t.name == "poi-delta-merge":
+                t.join()
+
+    def test_append_merges_in_background(self, store, tmp_path):
+        with patch.object(columnar, "DELTA_MERGE_ROWS", 1):
+            store.append(PoiRecord(5, 20, "school", "Nova", -22.91, -47.07, None), 6)
+            self.wait_for_merge()
+        assert store.delta == [] and store.version == 6
+        assert json.loads((tmp_path / "meta.json").read_text())["count"] == 5
+        assert [p.id for p in store.pois_by_type("school")] == [2, 5]
+
+    def test_writes_during_merge_stay_in_delta(self, store):
+        late = PoiRecord(6, 10, "park", "Parque", -23.56, -46.56, None)
+        real_write = columnar.write_columns
+
+        def write_then_append(*args, **kwargs):
+            store.append(late, 7)
+            return real_write(*args, **kwargs)
+
+        store.append(PoiRecord(5, 20, "school", "Nova", -22.91, -47.07, None), 6)
+        with patch.object(columnar, "write_columns", side_effect=write_then_append):
+            store.merge()
+        assert store.delta == [late] and store.version == 7
+        assert store.count_pois() == 6
+        assert [p.id for p in store.query()] == [1, 2, 3, 4, 5, 6]
+
+    def test_stale_version_falls_back(self, store):
+        assert not store.is_fresh(9)
+
+    def test_skipped_version_leaves_store_stale(self, store):
+        # outro worker gravou a versão 6: esta escrita é a 7 e o delta não tem a 6
+        store.append(PoiRecord(5, 20, "school", "Nova", -22.91, -47.07, None), 7)
+        assert store.version == 5 and store.delta == []
+        assert not store.is_fresh(7)
+
+
+class TestExport:
+    """Test export from SQLite (used by the ETL)"""
+
+    def test_export_pois(self, tmp_path, temp_session):
+        db = temp_session()
+        muni = models.Municipio(ibge_code="3500105", nome="Adamantina")
+        db.add(muni)
+        db.flush()
+        db.add(models.POI(municipio_id=muni.id, tipo="hospital", nome="H1", latitude=-23.5, longitude=-46.5))
+        db.add(models.POI(municipio_id=muni.id, tipo="school", nome="E1", latitude=-23.6, longitude=-46.6))
+        crud.bump_data_version(db)
+        db.commit()
+
+        # um lote por linha: os blocos são juntados em arrays
+        assert export_pois(db, tmp_path / "cols", batch_size=1) == 2
+        store = POIColumnStore(tmp_path / "cols")
+        store.load()
+        assert store.is_fresh(crud.get_data_version(db))
+        poi, school = store.pois_by_municipio("3500105")
+        assert (poi.nome, poi.tipo, poi.latitude) == ("H1", "hospital", -23.5)
+        assert (school.nome, school.tipo) == ("E1", "school")
+        assert poi.created_at is not None
+        db.close()
+
+
+class TestGridIndex:
+    """Test the grid index used for bbox queries"""
+
+    def test_grid_matches_full_scan(self, tmp_path):
+        rnd = np.random.default_rng(3)
+        lat = rnd.uniform(-24, -23, 5000)
+        lon = rnd.uniform(-47, -46, 5000)
+        rows = [PoiRecord(i + 1, 1, "school", None, lat[i], lon[i], None) for i in range(5000)]
+        write_columns(encode_columns(rows), tmp_path, 1, {})
+        store = POIColumnStore(tmp_path)
+        store.load()
+        for box in [(-46.6, -23.6, -46.55, -23.52), (-48, -25, -45, -22), (-46.0, -23.0, -45.0, -22.0)]:
+            expected = [r.id for r in rows if box[0] <= r.longitude <= box[2] and box[1] <= r.latitude <= box[3]]
+            assert [p.id for p in store.pois_in_bbox(*box)] == expected
+
+    def test_new_generation_keeps_old_mapping_valid(self, store, tmp_path):
+        before = store.cols["lat"]
+        for version in (6, 7, 8):
+            write_columns(encode_columns(ROWS), tmp_path, version, {})
+        assert len(list(tmp_path.glob("gen-*"))) == 2
+        assert before.tolist() == [r.latitude for r in ROWS]
+        assert store.is_fresh(8)
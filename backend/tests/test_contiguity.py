@@ -0,0 +1,147 @@
+"""
+Tests for backend/contiguity.py and backend/autocorrelation.py
+Tests shared-vertex contiguity, the stored neighbour graph and Moran's I / LISA
+"""
+import json
+from collections import namedtuple
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+from backend import crud, models
+from backend.autocorrelation import local_moran, moran, spatial_lag, subgraph
+from backend.contiguity import NeighborGraph, csr, rebuild_neighbors, touching
+from backend.geometry import PackedGeometry, pack_geometry
+
+Entry = namedtuple("Entry", ("id", "ibge_code", "nome"))
+
+
+def square(x, y):
+    return {"type": "Polygon", "coordinates": [[[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1], [x, y]]]}
+
+
+def packed(x, y):
+    return PackedGeometry(pack_geometry(square(x, y)))
+
+
+def grid_graph(width, height):
+    """Grade width x height com vizinhança queen (ids 1..n, linha a linha)."""
+    entries = [Entry(i + 1, str(3500000 + i), f"M{i}") for i in range(width * height)]
+    edges = []
+    for y in range(height):
+        for x in range(width):
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    if (dx or dy) and 0 <= x + dx < width and 0 <= y + dy < height:
+                        edges.append((y * width + x + 1, (y + dy) * width + x + dx + 1))
+    return NeighborGraph(entries, edges)
+
+
+class TestTouching:
+    def test_queen_contiguity(self):
+        # grade 2x2 + um quadrado isolado: na grade todos se tocam (lado ou canto)
+        geoms = [packed(0, 0), packed(1, 0), packed(0, 1), packed(1, 1), packed(10, 10), None]
+        indptr, indices = touching(geoms)
+        neighbours = [indices[indptr[i]:indptr[i + 1]].tolist() for i in range(len(geoms))]
+        assert neighbours == [[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2], [], []]
+
+    def test_no_geometries(self):
+        indptr, indices = touching([None, None])
+        assert indptr.tolist() == [0, 0, 0] and indices.tolist() == []
+
+    def test_csr_dedupes_and_sorts(self):
+        indptr, indices = csr(3, np.array([2, 0, 0, 2]), np.array([0, 2, 1, 0]))
+        assert indptr.tolist() == [0, 2, 2, 3] and indices.tolist() == [1, 2, 0]
+
+
+class TestStoredGraph:
+    def test_rebuild_and_load(self, temp_engine):
+        with Session(temp_engine) as db:
+            db.add_all([models.Municipio(id=i + 1, ibge_code=str(3500000 + i), nome=f"M{i}",
+                                         geometry=json.dumps(square(x, 0)))
+                        for i, x in enumerate((0, 1, 5))])
+            db.commit()
+        with temp_engine.begin() as conn:
+            assert rebuild_neighbors(conn) == 2
+            # refazer não duplica
+            assert rebuild_neighbors(conn) == 2
+        with Session(temp_engine) as db:
+            edges = crud.list_neighbors(db)
+            names = crud.list_municipios(db, skip=0, limit=None, columns=crud.MUNICIPIO_NAME_COLUMNS)
+        assert [tuple(e) for e in edges] == [(1, 2), (2, 1)]
+        graph = NeighborGraph(names, edges)
+        assert [e.nome for e in graph.neighbors("3500000")] == ["M1"]
+        assert graph.neighbors("3500002") == []
+        assert graph.neighbors("9999999") is None
+
+
+    def test_cached_results_are_bounded(self):
+        graph = grid_graph(3, 3)
+        graph._results.max_bytes = 20000
+        values = np.arange(9, dtype=np.float64)
+        first = graph.cached(("moran", "idh", 99, 0), lambda: moran(graph, values, 99, 0))
+        assert graph.cached(("moran", "idh", 99, 0), lambda: None) is first
+        # uma entrada por (permutações, semente) do cliente, mas o orçamento não passa
+        for seed in range(500):
+            graph.cached(("moran", "idh", 99, seed), lambda: moran(graph, values, 99, seed))
+        assert graph._results.total_bytes <= 20000 and len(graph._results._index) < 500
+
+class TestMoran:
+    def test_spatial_lag_rows_and_batches(self):
+        graph = grid_graph(3, 1)
+        z = np.array([1.0, 2.0, 4.0])
+        assert spatial_lag(z, graph.indptr, graph.indices).tolist() == [2.0, 2.5, 2.0]
+        batch = spatial_lag(np.stack([z, z[::-1]]), graph.indptr, graph.indices)
+        assert batch[1].tolist() == [2.0, 2.5, 2.0][::-1]
+
+    def test_subgraph_drops_missing_nodes(self):
+        graph = grid_graph(3, 1)
+        indptr, indices = subgraph(graph.indptr, graph.indices, np.array([True, False, True]))
+        assert indptr.tolist() == [0, 0, 0] and indices.tolist() == []
+
+    def test_gradient_is_clustered(self):
+        graph = grid_graph(12, 12)
+        values = np.array([x + y for y in range(12) for x in range(12)], dtype=float)
+        result = moran(graph, values, permutations=199)
+        assert result["moran_i"] > 0.8
+        assert result["p_value"] == pytest.approx(1 / 200)
+        assert result["expected"] == pytest.approx(-1 / 143)
+        clusters = {item["ibge_code"]: item["cluster"] for item in result["lisa"]}
+        assert clusters["3500000"] == "LL" and clusters[str(3500000 + 143)] == "HH"
+
+    def test_alternating_rows_are_dispersed(self):
+        # faixas alternadas: só 2 dos 8 vizinhos queen têm o mesmo valor
+        graph = grid_graph(10, 10)
+        values = np.array([y % 2 for y in range(10) for x in range(10)], dtype=float)
+        assert moran(graph, values, permutations=0)["moran_i"] < 0
+
+    def test_matches_reference_formula(self):
+        rng = np.random.default_rng(3)
+        graph = grid_graph(6, 5)
+        values = rng.normal(size=30)
+        z = values - values.mean()
+        degrees = np.diff(graph.indptr)
+        w = np.zeros((30, 30))
+        for i in range(30):
+            w[i, graph.indices[graph.indptr[i]:graph.indptr[i + 1]]] = 1.0 / degrees[i]
+        expected = 30 / w.sum() * (z @ w @ z) / (z @ z)
+        result = moran(graph, values, permutations=99, seed=1)
+        assert result["moran_i"] == pytest.approx(expected)
+        local, _, _ = local_moran(z, graph.indptr, graph.indices, 0, rng)
+        assert local == pytest.approx(z * (w @ z) / (z @ z / 30))
+        # mesma semente, mesmos p-valores
+        again = moran(graph, values, permutations=99, seed=1)
+        assert [i["p_value"] for i in again["lisa"]] == [i["p_value"] for i in result["lisa"]]
+
+    def test_missing_values_and_islands(self):
+        graph = grid_graph(4, 1)
+        values = np.array([1.0, np.nan, 3.0, 5.0])
+        result = moran(graph, values, permutations=9)
+        assert result["n"] == 3
+        lisa = {item["ibge_code"]: item for item in result["lisa"]}
+        assert "3500001" not in lisa
+        assert lisa["3500000"]["cluster"] == "isolado" and lisa["3500000"]["lag"] is None
+        assert lisa["3500002"]["lag"] == 5.0
+
+    def test_too_few_values(self):
+        result = moran(grid_graph(2, 1), np.array([1.0, 2.0]), permutations=9)
+        assert result["moran_i"] is None and result["p_value"] is None
@@ -28,7 +28,8 @@ class TestMunicipiosCrud:
         
         assert len(result) == 2
         assert result[0].nome == "Adamantina"
-        mock_session.query.assert_called_once_with(models.Municipio)
+        # listas selecionam colunas (Row leve), não a entidade ORM
+        mock_session.query.assert_called_once_with(*crud.MUNICIPIO_COLUMNS)
     
     def test_list_municipios_with_skip_limit(self, mock_session):
         """Test list_municipios respects skip and limit parameters"""
@@ -102,7 +103,7 @@ class TestPOIsCrud:
             Mock(id=1, tipo="hospital", nome="Hospital Central"),
             Mock(id=2, tipo="school", nome="School 1")
         ]
-        mock_session.query.return_value.offset.return_value.limit.return_value.all.return_value = mock_pois
+        mock_session.query.return_value.order_by.return_value.offset.return_value.limit.return_value.all.return_value = mock_pois
         
         result = crud.list_pois(mock_session, skip=0, limit=100)
         
@@ -115,7 +116,7 @@ class TestPOIsCrud:
             Mock(id=1, tipo="hospital", nome="Hospital Central"),
             Mock(id=2, tipo="hospital", nome="Hospital 2")
         ]
-        mock_session.query.return_value.filter.return_value.offset.return_value.limit.return_value.all.return_value = mock_pois
+        mock_session.query.return_value.filter.return_value.order_by.return_value.offset.return_value.limit.return_value.all.return_value = mock_pois
         
         result = crud.list_pois_by_type(mock_session, tipo="hospital", skip=0, limit=100)
         
@@ -133,7 +134,7 @@ class TestPOIsCrud:
         # First call returns the municipio
         # Second call returns the POIs
         mock_session.query.return_value.filter.return_value.first.return_value = mock_municipio
-        mock_session.query.return_value.filter.return_value.offset.return_value.limit.return_value.all.return_value = mock_pois
+        mock_session.query.return_value.filter.return_value.order_by.return_value.offset.return_value.limit.return_value.all.return_value = mock_pois
         
         result = crud.list_pois_by_municipio(mock_session, ibge_code="3500105", skip=0, limit=500)
         
@@ -251,6 +252,7 @@ class TestPOIsCrud:
         mock_session.add = Mock()
         mock_session.commit = Mock()
         mock_session.refresh = Mock()
+        mock_session.execute.return_value.scalar.return_value = 3
         
         # Mock the POI constructor
         with patch('backend.crud.models.POI') as mock_poi_class:
@@ -260,6 +262,34 @@ class TestPOIsCrud:
             mock_session.add.assert_called_once()
             mock_session.commit.assert_called_once()
             mock_session.refresh.assert_called_once_with(mock_poi)
+            # create_poi incrementa a versão dos dados (3 -> 4) e a devolve com o POI
+            sql = str(mock_session.execute.call_args_list[-1][0][0])
+            assert sql == "PRAGMA user_version = 4"
+            assert result == (mock_poi, 4)
+
+
+class TestDataVersion:
+    """Test data version counter (PRAGMA user_version)"""
+
+    def test_get_data_version(self, mock_session):
+        """Test reading the data version"""
+        mock_session.execute.return_value.scalar.return_value = 7
+
+        assert crud.get_data_version(mock_session) == 7
+
+    def test_get_data_version_default_zero(self, mock_session):
+        """Test data version defaults to 0 on a fresh database"""
+        mock_session.execute.return_value.scalar.return_value = None
+
+        assert crud.get_data_version(mock_session) == 0
+
+    def test_bump_data_version(self, mock_session):
+        """Test bump writes version + 1"""
+        mock_session.execute.return_value.scalar.return_value = 1
+
+        assert crud.bump_data_version(mock_session) == 2
+        sql = str(mock_session.execute.call_args_list[-1][0][0])
+        assert sql == "PRAGMA user_version = 2"
 
 
 class TestCrudPagination:
@@ -276,12 +306,12 @@ class TestCrudPagination:
     
     def test_list_pois_default_pagination(self, mock_session):
         """Test default pagination for POIs"""
-        mock_session.query.return_value.offset.return_value.limit.return_value.all.return_value = []
+        mock_session.query.return_value.order_by.return_value.offset.return_value.limit.return_value.all.return_value = []
         
         crud.list_pois(mock_session)
         
-        mock_session.query.return_value.offset.assert_called_with(0)
-        mock_session.query.return_value.offset.return_value.limit.assert_called_with(100)
+        mock_session.query.return_value.order_by.return_value.offset.assert_called_with(0)
+        mock_session.query.return_value.order_by.return_value.offset.return_value.limit.assert_called_with(100)
 
 
 class TestCrudErrorHandling:
@@ -305,3 +335,122 @@ class TestCrudErrorHandling:
         
         # None should be filtered out (through the filter in the function)
         assert None not in result
+
+
+class TestLightweightReads:
+    """Test list/bbox queries return Row records instead of ORM entities"""
+
+    @pytest.fixture
+    def db(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        engine = create_engine("sqlite:///:memory:")
+        models.Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        session.add(models.Municipio(id=1, ibge_code="3500105", nome="Adamantina"))
+        session.add(models.POI(municipio_id=1, tipo="hospital", nome="H", latitude=-23.5, longitude=-46.5))
+        session.commit()
+        yield session
+        session.close()
+
+    def test_bbox_returns_rows(self, db):
+        rows = crud.list_pois_in_bbox(db, -47, -24, -46, -23)
+        assert len(rows) == 1
+        assert not isinstance(rows[0], models.POI)
+        assert rows[0].nome == "H" and rows[0]._fields[0] == "id"
+
+    def test_lists_do_not_fill_identity_map(self, db):
+        db.expunge_all()
+        crud.list_pois(db)
+        crud.list_pois_by_type(db, "hospital")
+        crud.list_pois_by_municipio(db, "3500105")
+        crud.list_municipios(db)
+        assert len(db.identity_map) == 0
+
+    def test_rows_serialize_with_schema(self, db):
+        row = crud.list_pois(db)[0]
+        out = schemas.POIOut.from_orm(row)
+        assert out.tipo == "hospital"
+
+
+class TestPoiOrder:
+    """Test POI pages come in id order whatever index drives the query"""
+
+    @pytest.fixture
+    def db(self, temp_session):
+        session = temp_session()
+        session.add(models.Municipio(id=1, ibge_code="3500105", nome="Adamantina"))
+        # municipio_id decresce com o id: a ordem de ix_pois_tipo_municipio é a inversa da de id
+        session.add_all([models.POI(id=i, municipio_id=1 if i % 2 else 40 - i, tipo="school",
+                                    latitude=-23.5, longitude=-46.5) for i in range(1, 21)])
+        session.commit()
+        yield session
+        session.close()
+
+    def pages(self, fetch, size=7):
+        return [row.id for skip in range(0, 21, size) for row in fetch(skip, size)]
+
+    def test_lists_paginate_by_id(self, db):
+        expected = list(range(1, 21))
+        assert self.pages(lambda skip, limit: crud.list_pois(db, skip, limit)) == expected
+        assert self.pages(lambda skip, limit: crud.list_pois_by_type(db, "school", skip, limit)) == expected
+        assert self.pages(lambda skip, limit: crud.list_pois_by_municipio(db, "3500105", skip, limit)) == \
+            list(range(1, 21, 2))
+
+    def test_statements_paginate_by_id(self, db):
+        expected = list(range(1, 21))
+        assert self.pages(lambda skip, limit: db.execute(crud.pois_stmt(skip, limit, tipo="school"))) == expected
+        assert self.pages(lambda skip, limit: db.execute(
+            crud.pois_stmt(skip, limit, bbox=(-47, -24, -46, -23)))) == expected
+        for path in ("tipo", "scan", "spatial"):
+            assert self.pages(lambda skip, limit: db.execute(crud.poi_query_stmt(
+                path, tipos=["school"], bbox=(-47, -24, -46, -23), skip=skip, limit=limit))) == expected, path
+
+
+class TestPoiCounts:
+    """Test the materialized poi_counts table (rebuild and incremental maintenance)"""
+
+    @pytest.fixture
+    def db(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        engine = create_engine("sqlite:///:memory:")
+        models.Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        session.add_all([models.Municipio(id=1, ibge_code="3500105", nome="Adamantina"),
+                         models.Municipio(id=2, ibge_code="3550308", nome="São Paulo")])
+        session.add_all([models.POI(municipio_id=m, tipo=t, latitude=-23.5, longitude=-46.5)
+                         for m, t in [(1, "school"), (1, "school"), (1, "hospital"), (2, "school"), (None, "park")]])
+        session.commit()
+        assert crud.rebuild_poi_counts(session.connection()) == 4
+        session.commit()
+        yield session
+        session.close()
+
+    def counts(self, db, **filters):
+        return [tuple(r) for r in crud.list_poi_counts(db, **filters)]
+
+    def test_rebuild_groups_by_municipio_and_tipo(self, db):
+        assert self.counts(db, ibge_code="3500105") == [("3500105", "hospital", 1), ("3500105", "school", 2)]
+        assert self.counts(db, tipo="school") == [("3500105", "school", 2), ("3550308", "school", 1)]
+        assert self.counts(db, tipo="park") == [(None, "park", 1)]
+
+    def test_create_poi_increments(self, db):
+        for municipio_id, tipo in [(1, "school"), (2, "hospital"), (None, None), (None, None)]:
+            crud.create_poi(db, schemas.POICreate(municipio_id=municipio_id, tipo=tipo, latitude=-23.5, longitude=-46.5))
+        assert self.counts(db, ibge_code="3500105") == [("3500105", "hospital", 1), ("3500105", "school", 3)]
+        assert self.counts(db, ibge_code="3550308") == [("3550308", "hospital", 1), ("3550308", "school", 1)]
+        assert (None, None, 2) in self.counts(db)
+        # manutenção incremental = refazer do zero
+        before = sorted(self.counts(db), key=repr)
+        crud.rebuild_poi_counts(db.connection())
+        assert sorted(self.counts(db), key=repr) == before
+
+    def test_poi_types_from_counts(self, db):
+        assert crud.get_poi_types(db) == ["hospital", "park", "school"]
+
+    def test_count_matrix(self, db):
+        matrix = crud.count_matrix(crud.list_poi_counts(db))
+        assert matrix["ibge_codes"] == ["3500105", "3550308", None]
+        assert matrix["tipos"] == ["hospital", "park", "school"]
+        assert matrix["counts"] == [[1, 0, 2], [0, 0, 1], [0, 1, 0]]
@@ -250,3 +250,72 @@ class TestConnectArgs:
         # This is configuration logic, not directly testable without mocking
         # but we can verify the engine exists
         assert engine is not None
+
+
+class TestSqlitePerformanceProfile:
+    """Test SQLite PRAGMA profile and read/write engines"""
+
+    def test_performance_profile_pragmas(self, tmp_path):
+        """Test WAL, synchronous and temp_store are applied on connect"""
+        from sqlalchemy import text
+        from backend.db import create_engines
+        writer, reader = create_engines(f"sqlite:///{tmp_path / 'p.sqlite'}", profile="performance")
+        with writer.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA temp_store")).scalar() == 2   # MEMORY
+        writer.dispose()
+        reader.dispose()
+
+    def test_reader_is_query_only(self, tmp_path):
+        """Test read engine connections refuse writes"""
+        from sqlalchemy import text
+        from sqlalchemy.exc import OperationalError
+        from backend.db import create_engines
+        writer, reader = create_engines(f"sqlite:///{tmp_path / 'r.sqlite'}")
+        with writer.begin() as conn:
+            conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        with reader.connect() as conn:
+            assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+            with pytest.raises(OperationalError):
+                conn.execute(text("INSERT INTO t VALUES (1)"))
+        writer.dispose()
+        reader.dispose()
+
+    def test_readers_on_optimized_copy(self, tmp_path):
+        """Test read_url points the read pool at the VACUUM INTO copy"""
+        from sqlalchemy import text
+        from backend.db import create_engines
+        from backend.etl.optimize import vacuum_into
+        writer, _ = create_engines(f"sqlite:///{tmp_path / 'w.sqlite'}")
+        with writer.begin() as conn:
+            conn.execute(text("CREATE TABLE t (x INTEGER)"))
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+        copy = vacuum_into(writer, tmp_path / "w.optimized.sqlite")
+        with writer.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+        _, reader = create_engines(f"sqlite:///{tmp_path / 'w.sqlite'}", read_url=f"sqlite:///{copy}")
+        with reader.connect() as conn:
+            # a cópia só tem o que existia no VACUUM INTO
+            assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        writer.dispose()
+        reader.dispose()
+
+    def test_single_writer_connection(self):
+        """Test the writer pool holds a single connection"""
+        assert engine.pool.size() == 1
+
+    def test_env_overrides_pragma(self):
+        """Test SQLITE_<NAME> environment variables override the profile"""
+        from backend.db import sqlite_pragmas
+        with patch.dict(os.environ, {"SQLITE_MMAP_SIZE": "0"}):
+            assert sqlite_pragmas("performance")["mmap_size"] == "0"
+        assert sqlite_pragmas("default") == {}
+
+    def test_get_read_db_yields_session(self):
+        """Test get_read_db yields a session bound to the read engine"""
+        from backend.db import get_read_db, read_engine
+        gen = get_read_db()
+        session = next(gen)
+        assert session.get_bind() is read_engine
+        gen.close()
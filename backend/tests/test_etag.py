@@ -0,0 +1,103 @@
+"""
+Tests for backend/etag.py
+Tests conditional requests (ETag / If-None-Match) tied to the data version
+"""
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from backend.main import app
+from fastapi import Request, Response
+from backend.etag import check_conditional, make_etag, etag_matches, CACHE_CONTROL
+
+
+@pytest.fixture
+def client():
+    """Create a TestClient for the FastAPI app"""
+    return TestClient(app)
+
+
+class TestMakeEtag:
+    """Test ETag construction"""
+
+    def test_etag_is_strong_and_quoted(self):
+        """Test ETag is a quoted strong validator"""
+        etag = make_etag("municipios", 3, {"skip": "0"})
+        assert etag.startswith('"') and etag.endswith('"')
+        assert not etag.startswith("W/")
+
+    def test_etag_changes_with_version(self):
+        """Test ETag changes when the data version changes"""
+        assert make_etag("municipios", 1) != make_etag("municipios", 2)
+
+    def test_etag_changes_with_params(self):
+        """Test ETag depends on query parameters"""
+        assert make_etag("pois", 1, {"limit": "10"}) != make_etag("pois", 1, {"limit": "20"})
+
+    def test_repeated_params_change_etag(self):
+        """Test every value of a repeated query parameter goes into the ETag"""
+        def etag(query):
+            request = Request({"type": "http", "method": "GET", "path": "/pois/query", "headers": [],
+                               "query_string": query, "path_params": {}})
+            check_conditional(request, Response(), "pois-query", 1)
+            return request.state.cache_headers["ETag"]
+
+        assert etag(b"tipo=a&tipo=b") != etag(b"tipo=c&tipo=b")
+        assert etag(b"skip=0") == make_etag("pois-query", 1, {"skip": "0"})
+
+    def test_etag_ignores_param_order(self):
+        """Test parameter order does not change the ETag"""
+        a = make_etag("pois", 1, {"skip": "0", "limit": "10"})
+        b = make_etag("pois", 1, {"limit": "10", "skip": "0"})
+        assert a == b
+
+    def test_etag_matches_list_and_wildcard(self):
+        """Test If-None-Match parsing"""
+        assert etag_matches('"a"', '"b", "a"')
+        assert etag_matches('"a"', "*")
+        assert not etag_matches('"a"', None)
+        assert not etag_matches('"a"', '"b"')
+
+
+class TestConditionalRequests:
+    """Test 304 responses on read endpoints"""
+
+    def test_response_has_cache_headers(self, client):
+        """Test read endpoints send ETag and Cache-Control"""
+        with patch('backend.api.indicadores.crud.list_indicadores', return_value=[]):
+            response = client.get("/indicadores/")
+
+            assert response.status_code == 200
+            assert "etag" in response.headers
+            assert response.headers["cache-control"] == CACHE_CONTROL
+
+    def test_if_none_match_returns_304_without_query(self, client):
+        """Test matching If-None-Match answers 304 before the query runs"""
+        with patch('backend.api.municipios.crud.list_municipios', return_value=[]) as mock_list:
+            first = client.get("/municipios/geojson")
+            etag = first.headers["etag"]
+
+            second = client.get("/municipios/geojson", headers={"If-None-Match": etag})
+
+            assert second.status_code == 304
+            assert second.content == b""
+            assert second.headers["etag"] == etag
+            assert mock_list.call_count == 1
+
+    def test_version_bump_invalidates_etag(self, client):
+        """Test a new data version produces a new ETag"""
+        with patch('backend.api.pois.crud.get_poi_types', return_value=[]):
+            with patch('backend.etag.crud.get_data_version', return_value=1):
+                old = client.get("/pois/tipos").headers["etag"]
+            with patch('backend.etag.crud.get_data_version', return_value=2):
+                response = client.get("/pois/tipos", headers={"If-None-Match": old})
+
+            assert response.status_code == 200
+            assert response.headers["etag"] != old
+
+    def test_different_params_do_not_match(self, client):
+        """Test ETag of one page does not validate another page"""
+        with patch('backend.api.pois.crud.list_pois', return_value=[]):
+            etag = client.get("/pois/?limit=10").headers["etag"]
+            response = client.get("/pois/?limit=20", headers={"If-None-Match": etag})
+
+            assert response.status_code == 200
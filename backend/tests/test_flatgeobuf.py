@@ -0,0 +1,224 @@
+"""
+Tests for backend/flatgeobuf.py
+Tests the FlatGeobuf export: header, packed Hilbert R-tree, features and HTTP range reads
+"""
+import json
+import struct
+from unittest.mock import patch
+import numpy as np
+import pytest
+from backend import models
+from backend.flatgeobuf import COLUMNS, MAGIC, MULTIPOLYGON, NODE_DTYPE, build_index, level_bounds
+from backend.geometry import pack_geometry
+from backend.shared_index import SharedGeojson
+
+
+def square(x, y, size=0.1):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+MUNICIPIOS = [
+    (f"35{i:05d}", f"Município {i}",
+     {"type": "Polygon", "coordinates": [square(-53 + (i % 10) * 0.8, -25 + (i // 10) * 0.4)]} if i % 4 else
+     {"type": "MultiPolygon", "coordinates": [[square(-53 + (i % 10) * 0.8, -25 + (i // 10) * 0.4)],
+                                              [square(-52.7 + (i % 10) * 0.8, -25 + (i // 10) * 0.4, 0.05)]]})
+    for i in range(40)
+]
+
+
+# ---------- leitor mínimo de FlatBuffers, só para conferir o arquivo ----------
+def fields(buf, table):
+    vtable = table - struct.unpack_from("<i", buf, table)[0]
+    size = struct.unpack_from("<H", buf, vtable)[0]
+    offsets = struct.unpack_from(f"<{(size - 4) // 2}H", buf, vtable + 4)
+    return {slot: table + off for slot, off in enumerate(offsets) if off}
+
+
+def deref(buf, at):
+    return at + struct.unpack_from("<I", buf, at)[0]
+
+
+def vector(buf, at, dtype):
+    pos = deref(buf, at)
+    return np.frombuffer(buf, dtype=dtype, count=struct.unpack_from("<I", buf, pos)[0], offset=pos + 4)
+
+
+def string(buf, at):
+    return bytes(vector(buf, at, np.uint8)).decode("utf-8")
+
+
+def tables(buf, at):
+    pos = deref(buf, at)
+    return [deref(buf, pos + 4 + 4 * i) for i in range(struct.unpack_from("<I", buf, pos)[0])]
+
+
+def read_file(data: bytes):
+    assert data[:8] == MAGIC
+    size = struct.unpack_from("<I", data, 8)[0]
+    header = data[12:12 + size]
+    h = fields(header, deref(header, 0))
+    count = struct.unpack_from("<Q", header, h[8])[0]
+    node_size = struct.unpack_from("<H", header, h[9])[0]
+    n_nodes = level_bounds(count, node_size)[0][1]
+    index_start = 12 + size
+    nodes = np.frombuffer(data, dtype=NODE_DTYPE, count=n_nodes, offset=index_start)
+    return {
+        "name": string(header, h[0]),
+        "envelope": vector(header, h[1], "<f8").tolist(),
+        "geometry_type": header[h[2]],
+        "columns": [string(header, fields(header, c)[0]) for c in tables(header, h[7])],
+        "count": count, "node_size": node_size, "nodes": nodes,
+        "features_start": index_start + n_nodes * NODE_DTYPE.itemsize,
+    }
+
+
+def read_feature(data: bytes, at: int):
+    size = struct.unpack_from("<I", data, at)[0]
+    buf = data[at + 4:at + 4 + size]
+    f = fields(buf, deref(buf, 0))
+    geometry = fields(buf, deref(buf, f[0]))
+    parts = [vector(buf, fields(buf, p)[1], "<f8").reshape(-1, 2) for p in tables(buf, geometry[7])]
+    props, raw, pos = {}, bytes(vector(buf, f[1], np.uint8)), 0
+    while pos < len(raw):
+        i = struct.unpack_from("<H", raw, pos)[0]
+        name, kind = COLUMNS[i]
+        pos += 2
+        if kind == 11:
+            n = struct.unpack_from("<I", raw, pos)[0]
+            props[name] = raw[pos + 4:pos + 4 + n].decode("utf-8")
+            pos += 4 + n
+        elif kind == 5:
+            props[name] = struct.unpack_from("<i", raw, pos)[0]
+            pos += 4
+        else:
+            props[name] = struct.unpack_from("<d", raw, pos)[0]
+            pos += 8
+    return props, parts
+
+
+def search(info, bbox):
+    """Busca na R-tree como um cliente com range faria: desce só pelos nós que cruzam o bbox."""
+    min_x, min_y, max_x, max_y = bbox
+    nodes, bounds = info["nodes"], level_bounds(info["count"], info["node_size"])
+    leaves_start = bounds[0][0]
+    found, stack = [], [(0, len(bounds) - 1)]
+    while stack:
+        index, level = stack.pop()
+        end = min(index + info["node_size"], bounds[level][1])
+        for pos in range(index, end):
+            n = nodes[pos]
+            if n["max_x"] < min_x or n["max_y"] < min_y or n["min_x"] > max_x or n["min_y"] > max_y:
+                continue
+            if pos >= leaves_start:
+                found.append(int(n["offset"]))
+            else:
+                stack.append((int(n["offset"]), level - 1))
+    return found
+
+
+@pytest.fixture
+def client(tmp_path, temp_session, temp_client):
+    db = temp_session()
+    for i, (code, nome, geom) in enumerate(MUNICIPIOS):
+        # metade só com o texto (bancos antigos), metade com a coluna binária
+        db.add(models.Municipio(ibge_code=code, nome=nome, geometry=json.dumps(geom),
+                                geometry_bin=pack_geometry(geom) if i % 2 else None))
+        if i % 3:
+            db.add(models.Indicador(ibge_code=code, idh=0.7 + i / 1000, renda_per_capita=1000.0 + i))
+    db.add(models.Municipio(ibge_code="9999999", nome="Sem geometria"))
+    db.commit()
+    db.close()
+    with patch("backend.api.municipios.shared_fgb", SharedGeojson(tmp_path / "shared", suffix=".fgb")):
+        with temp_client() as client:
+            yield client
+
+
+class TestIndex:
+    """Test the packed R-tree layout"""
+
+    def test_level_bounds(self):
+        assert level_bounds(645) == [(45, 690), (4, 45), (1, 4), (0, 1)]
+        assert level_bounds(1) == [(1, 2), (0, 1)]
+
+    def test_parents_cover_children(self):
+        rnd = np.random.default_rng(3)
+        lo = rnd.uniform(0, 10, size=(100, 2))
+        boxes = np.hstack([lo, lo + 0.5])
+        nodes = build_index(boxes, np.arange(100, dtype=np.uint64) * 10)
+        bounds = level_bounds(100)
+        for (start, end), (parent_start, parent_end) in zip(bounds[:-1], bounds[1:]):
+            for p in range(parent_start, parent_end):
+                first = int(nodes[p]["offset"])
+                children = nodes[first:min(first + 16, end)]
+                assert nodes[p]["min_x"] == children["min_x"].min()
+                assert nodes[p]["max_y"] == children["max_y"].max()
+        assert nodes[0]["min_x"] == boxes[:, 0].min()
+
+
+class TestExport:
+    """Test the /municipios/export.fgb endpoint"""
+
+    def test_header(self, client):
+        info = read_file(client.get("/municipios/export.fgb").content)
+        assert info["name"] == "municipios"
+        assert info["geometry_type"] == MULTIPOLYGON
+        assert info["columns"] == [name for name, _ in COLUMNS]
+        assert info["count"] == 40
+        assert info["envelope"] == pytest.approx([-53, -25, -45.7, -23.7])
+
+    def test_features_and_indicators(self, client):
+        data = client.get("/municipios/export.fgb").content
+        info = read_file(data)
+        offsets = search(info, info["envelope"])
+        assert len(offsets) == 40
+        props = {}
+        for offset in offsets:
+            p, parts = read_feature(data, info["features_start"] + offset)
+            props[p["ibge_code"]] = (p, parts)
+        p, parts = props["3500012"]
+        assert p["nome"] == "Município 12" and "idh" not in p
+        assert len(parts) == 2 and parts[1][0].tolist() == pytest.approx([-51.1, -24.6])
+        assert props["3500005"][0]["idh"] == pytest.approx(0.705)
+
+    def test_range_reads_match_bbox(self, client):
+        info = read_file(client.get("/municipios/export.fgb").content)
+        bbox = (-52.3, -24.7, -51.0, -24.2)
+        names = []
+        for offset in search(info, bbox):
+            start = info["features_start"] + offset
+            head = client.get("/municipios/export.fgb", headers={"Range": f"bytes={start}-{start + 3}"})
+            assert head.status_code == 206
+            size = struct.unpack("<I", head.content)[0]
+            body = client.get("/municipios/export.fgb", headers={"Range": f"bytes={start}-{start + 3 + size}"})
+            assert body.headers["content-range"].startswith(f"bytes {start}-")
+            names.append(read_feature(body.content, 0)[0]["nome"])
+        assert sorted(names) == ["Município 11", "Município 12", "Município 21", "Município 22"]
+
+    def test_range_edge_cases(self, client):
+        full = client.get("/municipios/export.fgb")
+        assert full.headers["accept-ranges"] == "bytes"
+        assert full.headers["content-disposition"] == 'attachment; filename="municipios.fgb"'
+        size = len(full.content)
+        assert client.get("/municipios/export.fgb", headers={"Range": "bytes=-8"}).content == full.content[-8:]
+        assert client.get("/municipios/export.fgb", headers={"Range": f"bytes={size}-"}).status_code == 416
+        stale = client.get("/municipios/export.fgb", headers={"Range": "bytes=0-7", "If-Range": '"old"'})
+        assert stale.status_code == 200
+        assert client.head("/municipios/export.fgb").status_code == 200
+        assert client.get("/municipios/export.fgb",
+                          headers={"If-None-Match": full.headers["etag"]}).status_code == 304
+
+    def test_built_once_per_version(self, client):
+        with patch("backend.api.municipios.build_municipios_fgb", wraps=lambda m, i: MAGIC) as build:
+            client.get("/municipios/export.fgb")
+            client.get("/municipios/export.fgb", headers={"Range": "bytes=0-7"})
+            assert build.call_count == 1
+
+    def test_gdal_reads_file(self, client, tmp_path):
+        pyogrio = pytest.importorskip("pyogrio")
+        path = tmp_path / "municipios.fgb"
+        path.write_bytes(client.get("/municipios/export.fgb").content)
+        info = pyogrio.read_info(path)
+        assert info["features"] == 40 and info["geometry_type"] == "MultiPolygon"
+        assert info["capabilities"]["fast_spatial_filter"]
+        _, _, geometry, field_data = pyogrio.raw.read(path, bbox=(-52.3, -24.7, -51.0, -24.2))
+        assert sorted(field_data[1].tolist()) == ["3500011", "3500012", "3500021", "3500022"]
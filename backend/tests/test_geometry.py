@@ -0,0 +1,134 @@
+"""
+Tests for backend/geometry.py
+Tests the packed binary geometry format, zero-copy reads and the GeoJSON text cache
+"""
+import json
+from unittest.mock import Mock, patch
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from backend import models
+from backend.etl.optimize import encode_features, pack_geometries
+from backend.geometry import PackedGeometry, feature_collection, geometry_cache, geometry_text, pack_geometry
+from backend.main import app
+
+SQUARE = [[-46.5, -23.5], [-46.4, -23.5], [-46.4, -23.4], [-46.5, -23.5]]
+HOLE = [[-46.48, -23.48], [-46.45, -23.48], [-46.45, -23.45], [-46.48, -23.48]]
+GEOMETRIES = [
+    {"type": "Point", "coordinates": [-46.633309, -23.55052]},
+    {"type": "MultiPoint", "coordinates": [[-46.1, -23.1], [-46.2, -23.2]]},
+    {"type": "LineString", "coordinates": SQUARE[:3]},
+    {"type": "MultiLineString", "coordinates": [SQUARE[:2], HOLE[:3]]},
+    {"type": "Polygon", "coordinates": [SQUARE, HOLE]},
+    {"type": "MultiPolygon", "coordinates": [[SQUARE, HOLE], [[[-47.0, -22.0], [-46.9, -22.0], [-47.0, -22.0]]]]},
+]
+
+
+class TestPacking:
+    """Test the binary layout"""
+
+    @pytest.mark.parametrize("geom", GEOMETRIES, ids=[g["type"] for g in GEOMETRIES])
+    def test_round_trip(self, geom):
+        assert PackedGeometry(pack_geometry(geom)).to_geojson() == geom
+
+    def test_arrays_are_views_of_the_blob(self):
+        blob = pack_geometry(GEOMETRIES[4])
+        packed = PackedGeometry(blob)
+        assert np.shares_memory(packed.coords, np.frombuffer(blob, dtype=np.uint8))
+        assert packed.ring(1).tolist()[0] == [-464800000, -234800000]
+        assert packed.bounds() == (-46.5, -23.5, -46.4, -23.4)
+
+    def test_unsupported_types(self):
+        assert pack_geometry({"type": "GeometryCollection", "geometries": []}) is None
+        assert pack_geometry(None) is None
+        with pytest.raises(ValueError):
+            PackedGeometry(b"WKB!" + bytes(16))
+
+    def test_precision(self):
+        blob = pack_geometry({"type": "Point", "coordinates": [-46.6333094, -23.5505199]})
+        assert PackedGeometry(blob).to_geojson(3)["coordinates"] == [-46.633, -23.551]
+
+
+class TestGeometryText:
+    """Test the GeoJSON text generated from the binary column"""
+
+    def test_text_is_cached(self):
+        geometry_cache.clear()
+        blob = pack_geometry(GEOMETRIES[4])
+        first = geometry_text(blob)
+        with patch("backend.geometry.PackedGeometry") as unpack:
+            assert geometry_text(blob) == first
+            unpack.assert_not_called()
+        assert json.loads(first) == GEOMETRIES[4]
+
+    def test_geojson_route_uses_binary_column(self):
+        rows = [Mock(id=1, nome="São Paulo", ibge_code="3550308", geometry=None,
+                     geometry_bin=pack_geometry(GEOMETRIES[0]))]
+        with patch("backend.api.municipios.crud.list_municipios", return_value=rows):
+            response = TestClient(app).get("/municipios/geojson")
+        assert response.status_code == 200
+        [feature] = response.json()["features"]
+        assert feature["geometry"] == GEOMETRIES[0]
+        assert feature["properties"]["nome"] == "São Paulo"
+
+
+class TestBackfill:
+    """Test packing geometries of databases created before the binary column"""
+
+    def test_pack_geometries(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite'}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE municipios (id INTEGER PRIMARY KEY, geometry TEXT)"))
+            conn.execute(text("INSERT INTO municipios (geometry) VALUES (:g), (NULL)"),
+                         {"g": json.dumps(GEOMETRIES[5])})
+        assert pack_geometries(engine) == 1
+        assert pack_geometries(engine) == 0
+        with engine.connect() as conn:
+            blob = conn.execute(text("SELECT geometry_bin FROM municipios WHERE id = 1")).scalar()
+        assert PackedGeometry(blob).to_geojson() == GEOMETRIES[5]
+        engine.dispose()
+
+
+class TestPreEncodedFeatures:
+    """Test the GeoJSON endpoint assembled from pre-encoded Feature bytes"""
+
+    @pytest.fixture
+    def client(self, temp_engine, temp_session, temp_client):
+        db = temp_session()
+        for code, nome, geom in [("3550308", "São Paulo", GEOMETRIES[4]), ("3509502", "Campinas", GEOMETRIES[5]),
+                                 ("3304557", "Rio de Janeiro", {"type": "Point", "coordinates": [-43.2, -22.9]})]:
+            db.add(models.Municipio(ibge_code=code, nome=nome, geometry=json.dumps(geom)))
+        db.commit()
+        db.close()
+        assert encode_features(temp_engine) == 3
+        assert encode_features(temp_engine) == 0
+        with temp_client() as client:
+            yield client
+
+    def test_features_are_not_parsed(self, client):
+        with patch("backend.api.municipios.geometry_json") as parse:
+            response = client.get("/municipios/geojson")
+            parse.assert_not_called()
+        features = response.json()["features"]
+        assert [f["properties"]["nome"] for f in features] == ["São Paulo", "Campinas", "Rio de Janeiro"]
+        assert features[0]["geometry"] == GEOMETRIES[4]
+
+    def test_bbox_subset(self, client):
+        response = client.get("/municipios/geojson?bbox=-46.6,-23.6,-46.3,-23.3")
+        assert [f["properties"]["ibge_code"] for f in response.json()["features"]] == ["3550308", "3509502"]
+
+    def test_ibge_subset(self, client):
+        response = client.get("/municipios/geojson?ibge=3304557,3509502")
+        assert sorted(f["properties"]["ibge_code"] for f in response.json()["features"]) == ["3304557", "3509502"]
+
+    def test_precision_bypasses_pre_encoded_bytes(self, client):
+        response = client.get("/municipios/geojson?ibge=3304557&precision=0")
+        assert response.json()["features"][0]["geometry"]["coordinates"] == [-43.0, -23.0]
+
+    def test_feature_collection_chunks(self):
+        fragments = [b'{"n": %d}' % i for i in range(100)]
+        chunks = list(feature_collection(fragments, chunk_bytes=64))
+        assert len(chunks) > 1
+        assert [f["n"] for f in json.loads(b"".join(chunks))["features"]] == list(range(100))
+        assert json.loads(b"".join(feature_collection([]))) == {"type": "FeatureCollection", "features": []}
@@ -0,0 +1,161 @@
+"""
+Tests for backend/indicators.py
+Tests the in-memory indicator matrix: lookups, z-scores and percentiles
+"""
+import numpy as np
+import pytest
+from backend import schemas
+from backend.indicators import INDICADOR_FIELDS, IndicadorMatrix, ranks
+
+
+def make_matrix():
+    return IndicadorMatrix([
+        schemas.IndicadorOut(id=1, ibge_code="3550308", idh=0.8, saneamento=99.0),
+        schemas.IndicadorOut(id=2, ibge_code="3509502", idh=0.6, saneamento=90.0),
+        schemas.IndicadorOut(id=3, ibge_code="3500105", idh=0.7),
+        # código repetido: vale a primeira linha
+        schemas.IndicadorOut(id=4, ibge_code="3500105", idh=0.1),
+    ])
+
+
+class TestRanks:
+    def test_ties_share_best_rank(self):
+        rank, percentile, total = ranks(np.array([0.5, 0.9, 0.5, np.nan, 0.7]))
+        assert total == 4
+        assert rank[[0, 1, 2, 4]].tolist() == [3, 1, 3, 2]
+        assert percentile[[0, 1, 2, 4]].tolist() == [50.0, 100.0, 50.0, 75.0]
+        assert np.isnan(rank[3]) and np.isnan(percentile[3])
+
+
+class TestIndicadorMatrix:
+    def test_shape_and_duplicates(self):
+        matrix = make_matrix()
+        assert len(matrix) == 3
+        assert matrix.values.shape == (3, len(INDICADOR_FIELDS))
+        assert matrix.ids.tolist() == [1, 2, 3]
+        assert matrix.totals["idh"] == 3 and matrix.totals["saneamento"] == 2
+
+    def test_compare_order_and_missing(self):
+        result = make_matrix().compare(["3500105", "9999999", "3550308"])
+        assert [i["ibge_code"] for i in result["items"]] == ["3500105", "3550308"]
+        assert result["items"][0]["idh"] == 0.7 and result["items"][0]["saneamento"] is None
+        assert "zscore" not in result["items"][0]
+        assert result["missing"] == ["9999999"]
+
+    def test_compare_stats(self):
+        item = make_matrix().compare(["3550308"], stats=True)["items"][0]
+        assert item["zscore"]["idh"] == pytest.approx(0.1 / np.std([0.8, 0.6, 0.7]))
+        assert item["zscore"]["saneamento"] == pytest.approx(1.0)
+        assert item["percentil"]["idh"] == 100.0
+        # sem valor no estado inteiro: sem z-score nem percentil
+        assert item["zscore"]["renda_per_capita"] is None and item["percentil"]["renda_per_capita"] is None
+
+    def test_empty(self):
+        matrix = IndicadorMatrix([])
+        assert len(matrix) == 0
+        assert matrix.compare(["3550308"], stats=True) == {"items": [], "missing": ["3550308"]}
+
+
+class TestStatistics:
+    def test_describe_ignores_missing(self):
+        stats = make_matrix().describe()
+        assert stats["idh"]["count"] == 3 and stats["idh"]["missing"] == 0
+        assert stats["idh"]["median"] == pytest.approx(0.7)
+        assert stats["idh"]["min"] == 0.6 and stats["idh"]["max"] == 0.8
+        assert stats["saneamento"]["count"] == 2 and stats["saneamento"]["p25"] == pytest.approx(92.25)
+        assert stats["renda_per_capita"] == {"count": 0, "missing": 3, "mean": None, "std": None, "min": None,
+                                             "p25": None, "median": None, "p75": None, "max": None}
+
+    def test_results_are_cached(self):
+        matrix = make_matrix()
+        assert matrix.describe() is matrix.describe()
+        assert matrix.histogram("idh", 4) is matrix.histogram("idh", 4)
+        assert matrix.correlation() is matrix.correlation()
+
+    def test_describe_empty_table(self):
+        stats = IndicadorMatrix([]).describe()
+        assert stats["idh"] == {"count": 0, "missing": 0, "mean": None, "std": None, "min": None, "p25": None,
+                                "median": None, "p75": None, "max": None}
+
+    def test_histogram(self):
+        hist = make_matrix().histogram("saneamento", 3)
+        assert hist["edges"] == pytest.approx([90.0, 93.0, 96.0, 99.0])
+        assert hist["counts"] == [1, 0, 1] and hist["missing"] == 1
+        assert make_matrix().histogram("renda_per_capita", 5) == {
+            "indicator": "renda_per_capita", "edges": [], "counts": [], "missing": 3}
+
+    def test_correlation_matches_numpy_on_complete_pairs(self):
+        rng = np.random.default_rng(7)
+        data = rng.normal(size=(200, len(INDICADOR_FIELDS)))
+        data[:, 1] = data[:, 0] * 2 + rng.normal(scale=0.1, size=200)
+        data[rng.random(data.shape) < 0.1] = np.nan
+        rows = [schemas.IndicadorOut(id=i, ibge_code=str(i), **{f: None if np.isnan(v) else float(v)
+                                                                for f, v in zip(INDICADOR_FIELDS, row)})
+                for i, row in enumerate(data)]
+        result = IndicadorMatrix(rows).correlation()
+        both = ~np.isnan(data[:, 0]) & ~np.isnan(data[:, 1])
+        expected = np.corrcoef(data[both, 0], data[both, 1])[0, 1]
+        assert result["matrix"][0][1] == pytest.approx(expected)
+        assert result["matrix"][1][0] == pytest.approx(expected)
+        assert result["n"][0][1] == int(both.sum())
+        assert result["matrix"][2][2] == pytest.approx(1.0)
+
+    def test_correlation_without_variance(self):
+        result = make_matrix().correlation()
+        # renda_per_capita não tem valor; idh x saneamento tem só 2 pares (r = 1)
+        assert result["matrix"][0][4] is None
+        i, j = INDICADOR_FIELDS.index("idh"), INDICADOR_FIELDS.index("saneamento")
+        assert result["matrix"][i][j] == pytest.approx(1.0) and result["n"][i][j] == 2
+
+
+class TestComposite:
+    def test_minmax_weighted_sum(self):
+        result = make_matrix().composite([("idh", 1.0), ("saneamento", 1.0)])
+        # pesos divididos pela soma: 0.5 cada; 3500105 não tem saneamento
+        assert result["weights"] == {"idh": 0.5, "saneamento": 0.5}
+        values = {i["ibge_code"]: i["value"] for i in result["items"]}
+        assert values == {"3550308": 1.0, "3509502": 0.0, "3500105": None}
+        assert [i["rank"] for i in result["items"]] == [1, 2, None]
+        assert result["total"] == 2
+
+    def test_zscore_and_negative_weight(self):
+        matrix = make_matrix()
+        result = matrix.composite([("idh", -2.0)], normalize="zscore")
+        idh = matrix.values[:, INDICADOR_FIELDS.index("idh")]
+        expected = -(idh - idh.mean()) / idh.std()
+        assert [i["value"] for i in result["items"]] == pytest.approx(expected.tolist())
+        # menor idh, maior índice
+        assert result["items"][1]["rank"] == 1
+
+    def test_breaks_are_quantiles(self):
+        result = make_matrix().composite([("idh", 1.0)], classes=2)
+        assert result["breaks"] == pytest.approx([0.0, 0.5, 1.0])
+
+    def test_constant_indicator_contributes_zero(self):
+        matrix = IndicadorMatrix([
+            schemas.IndicadorOut(id=1, ibge_code="1", idh=0.7, saneamento=50.0),
+            schemas.IndicadorOut(id=2, ibge_code="2", idh=0.7, saneamento=100.0),
+        ])
+        result = matrix.composite([("idh", 0.5), ("saneamento", 0.5)])
+        assert [i["value"] for i in result["items"]] == [0.0, 0.5]
+
+    def test_empty_table(self):
+        for normalize in ("minmax", "zscore"):
+            result = IndicadorMatrix([]).composite([("idh", 1.0)], normalize=normalize)
+            assert (result["total"], result["breaks"], result["items"]) == (0, [], [])
+
+    def test_cached_by_weights(self):
+        matrix = make_matrix()
+        first = matrix.composite([("idh", 0.5), ("saneamento", 0.5)])
+        assert matrix.composite([("saneamento", 0.5), ("idh", 0.5)]) is first
+        assert matrix.composite([("idh", 0.5), ("saneamento", 0.5)], normalize="zscore") is not first
+
+    def test_cache_is_bounded(self):
+        matrix = make_matrix()
+        matrix._results.max_bytes = 50000
+        for i in range(2000):
+            matrix.composite([("idh", 1.0), ("saneamento", i / 1000)])
+        assert matrix._results.total_bytes <= 50000
+        assert 0 < len(matrix._results._index) < 2000
+        # os sem parâmetro continuam guardados como antes
+        assert matrix.describe() is matrix.describe()
@@ -0,0 +1,153 @@
+"""
+Tests for backend/markers.py
+Tests the compact binary POI marker format and the ?format=binary responses
+"""
+import gzip
+from datetime import datetime
+from unittest.mock import patch
+import numpy as np
+import pytest
+from backend import models
+from backend.cache import PoiRecord
+from backend.columnar import POIColumnStore, encode_columns, write_columns
+from backend.markers import HEADER, NO_TIPO, decode_markers, encode_markers, markers_from_records
+
+ROWS = [
+    PoiRecord(1, 10, "hospital", "Hospital São Paulo", -23.55, -46.55, datetime(2024, 1, 1)),
+    PoiRecord(2, 10, "escola", "Escola", -23.60, -46.60, None),
+    PoiRecord(3, 20, "hospital", None, -22.90, -47.06, None),
+    PoiRecord(4, None, None, "Sem tipo", -23.51, -46.51, None),
+]
+
+
+def as_lists(decoded):
+    tipos = decoded["tipos"]
+    return [(int(i), int(lat), int(lon), tipos[t] if t != NO_TIPO else None)
+            for i, lat, lon, t in zip(decoded["id"], decoded["lat_e7"], decoded["lon_e7"], decoded["tipo"])]
+
+
+def expected(rows):
+    return [(r.id, round(r.latitude * 1e7), round(r.longitude * 1e7), r.tipo) for r in rows]
+
+
+class TestEncoding:
+    """Test the buffer layout"""
+
+    def test_round_trip(self):
+        decoded = decode_markers(markers_from_records(ROWS))
+        assert decoded["tipos"] == ["hospital", "escola"]
+        assert as_lists(decoded) == expected(ROWS)
+
+    def test_arrays_are_aligned(self):
+        buf = markers_from_records(ROWS)
+        decoded = decode_markers(buf)
+        offset = len(buf) - 14 * len(ROWS)
+        assert offset % 4 == 0 and offset >= HEADER.size
+        assert decoded["lat_e7"].dtype == np.dtype("<i4")
+        assert decoded["tipo"].dtype == np.dtype("<u2")
+
+    def test_empty(self):
+        decoded = decode_markers(markers_from_records([]))
+        assert decoded["tipos"] == [] and len(decoded["id"]) == 0
+
+    def test_too_many_tipos(self):
+        with pytest.raises(ValueError):
+            encode_markers(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0), [f"t{i}" for i in range(NO_TIPO)])
+
+    def test_long_and_many_tipos(self):
+        # tipo é texto livre: nomes acima de 255 bytes e mais de 255 tipos cabem
+        tipos = ["x" * 300] + [f"t{i}" for i in range(400)]
+        decoded = decode_markers(encode_markers(np.arange(401), np.zeros(401), np.zeros(401), np.arange(401), tipos))
+        assert decoded["tipos"] == tipos
+        assert decoded["tipo"].tolist() == list(range(401))
+
+    def test_invalid_buffer(self):
+        with pytest.raises(ValueError):
+            decode_markers(b"JSON" + bytes(8))
+
+
+class TestColumnStore:
+    """Test markers built straight from the mapped columns"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        write_columns(encode_columns(ROWS), tmp_path, 5, {"3550308": 10, "3509502": 20})
+        s = POIColumnStore(tmp_path)
+        assert s.load()
+        return s
+
+    def test_matches_records(self, store):
+        assert as_lists(decode_markers(store.markers())) == expected(ROWS)
+
+    def test_filters(self, store):
+        assert as_lists(decode_markers(store.markers(tipo="hospital"))) == expected([ROWS[0], ROWS[2]])
+        bbox = (-46.58, -23.58, -46.5, -23.5)
+        assert as_lists(decode_markers(store.markers(bbox=bbox))) == expected([ROWS[0], ROWS[3]])
+        assert as_lists(decode_markers(store.markers(ibge_code="3509502"))) == expected([ROWS[2]])
+        assert len(decode_markers(store.markers(ibge_code="0000000"))["id"]) == 0
+        assert as_lists(decode_markers(store.markers(skip=1, limit=2))) == expected(ROWS[1:3])
+
+    def test_includes_delta(self, store):
+        new = PoiRecord(5, 20, "museu", "Novo", -22.91, -47.07, None)
+        store.append(new, store.version + 1)
+        decoded = decode_markers(store.markers())
+        assert "museu" in decoded["tipos"]
+        assert as_lists(decoded) == expected(ROWS + [new])
+
+
+class TestBinaryRoutes:
+    """Test ?format=binary on the POI routes (SQLite path)"""
+
+    @pytest.fixture
+    def client(self, temp_session, temp_client):
+        db = temp_session()
+        db.add_all([
+            models.POI(tipo="hospital" if i % 2 else "escola", nome=f"P{i}",
+                       latitude=-23.5 - i / 1000, longitude=-46.5 - i / 1000)
+            for i in range(200)
+        ])
+        db.commit()
+        db.close()
+        with temp_client() as client:
+            yield client
+
+    def test_matches_json(self, client):
+        plain = client.get("/pois/tipo/hospital?limit=50").json()
+        response = client.get("/pois/tipo/hospital?limit=50&format=binary")
+        assert response.headers["content-type"] == "application/octet-stream"
+        decoded = decode_markers(response.content)
+        assert decoded["id"].tolist() == [p["id"] for p in plain]
+        assert np.allclose(decoded["lat_e7"] / 1e7, [p["latitude"] for p in plain])
+        assert set(decoded["tipos"]) == {"hospital"}
+
+    def test_gzip_when_accepted(self, client):
+        url = "/pois/bbox?bbox=-47,-24,-46,-23&format=binary"
+        raw = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in raw.headers
+        with patch("backend.streaming.gzip.compress", wraps=gzip.compress) as compress:
+            zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+            compress.assert_called_once()
+        assert zipped.headers["content-encoding"] == "gzip"
+        assert zipped.headers["vary"] == "Accept-Encoding"
+        assert zipped.content == raw.content
+        assert len(decode_markers(raw.content)["id"]) == 200
+
+    def test_list_keeps_etag(self, client):
+        response = client.get("/pois/?limit=10&format=binary")
+        assert "etag" in response.headers
+        assert len(decode_markers(response.content)["id"]) == 10
+        assert client.get("/pois/?limit=10&format=binary",
+                          headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    def test_long_tipo_from_database(self, client):
+        """Test a stored tipo longer than 255 bytes still encodes (rows loaded before the POST cap)"""
+        url = "/pois/bbox?bbox=-47,-24,-46,-23&format=binary"
+        with patch("backend.api.pois.crud.list_pois_in_bbox",
+                   return_value=[PoiRecord(1, None, "á" * 300, None, -23.5, -46.5, None)]):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert decode_markers(response.content)["tipos"] == ["á" * 300]
+
+    def test_post_rejects_long_tipo(self, client):
+        response = client.post("/pois/", json={"tipo": "x" * 300, "latitude": -23.5, "longitude": -46.5})
+        assert response.status_code == 422
@@ -0,0 +1,77 @@
+"""
+Tests for backend/names.py
+Tests name normalization, prefix/trigram search ranking and the per-version cache
+"""
+from backend.cache import VersionedCache
+from backend.names import NameEntry, NameIndex, normalize_name, trigrams
+
+NAMES = ["São José dos Campos", "São José do Rio Preto", "São Paulo", "Campos do Jordão", "Santos",
+         "José Bonifácio", "Ribeirão Preto", "Santa Bárbara d'Oeste", "Paulínia"]
+
+
+def make_index():
+    return NameIndex([NameEntry(i + 1, str(3500000 + i), nome) for i, nome in enumerate(NAMES)])
+
+
+def found(index, q, limit=10):
+    return [e.nome for e in index.search(q, limit)]
+
+
+class TestNormalizeName:
+    def test_accents_case_and_punctuation(self):
+        assert normalize_name("  Santa Bárbara D'Oeste ") == "santa barbara d oeste"
+        assert normalize_name("SÃO  JOSÉ") == "sao jose"
+
+    def test_none(self):
+        assert normalize_name(None) == ""
+
+    def test_trigrams_are_per_word(self):
+        assert trigrams("sao jo") == {"  s", " sa", "sao", "ao ", "  j", " jo", "jo "}
+
+
+class TestNameIndex:
+    def test_accent_insensitive_prefix(self):
+        index = make_index()
+        assert found(index, "sao jose")[:2] == ["São José dos Campos", "São José do Rio Preto"]
+        # depois dos prefixos vêm os parecidos por trigrama
+        assert found(index, "sao jose", limit=2) == ["São José dos Campos", "São José do Rio Preto"]
+        assert found(index, "são josé dos campos")[0] == "São José dos Campos"
+
+    def test_words_in_any_position(self):
+        assert found(make_index(), "preto") == ["Ribeirão Preto", "São José do Rio Preto"]
+
+    def test_ranking(self):
+        index = make_index()
+        # nome igual > começa pela consulta > palavra no meio do nome
+        assert found(index, "santos")[0] == "Santos"
+        assert found(index, "jose")[:1] == ["José Bonifácio"]
+        assert found(index, "sant") == ["Santos", "Santa Bárbara d'Oeste"]
+
+    def test_typo_tolerance(self):
+        index = make_index()
+        assert found(index, "sao jse dos campos")[0] == "São José dos Campos"
+        assert found(index, "ribeirao prto")[0] == "Ribeirão Preto"
+
+    def test_limit_and_no_match(self):
+        index = make_index()
+        assert len(found(index, "sao", limit=2)) == 2
+        assert found(index, "xyzw") == []
+        assert found(index, "!!") == []
+
+
+class TestVersionedCache:
+    def test_rebuilt_when_version_changes(self):
+        cache = VersionedCache(NameIndex)
+        calls = []
+
+        def load():
+            calls.append(1)
+            return [NameEntry(1, "3500105", "Adamantina")]
+
+        first = cache.get(1, load)
+        assert cache.get(1, load) is first
+        assert cache.current(2) is None
+        assert cache.get(2, load) is not first
+        assert len(calls) == 2
+        assert found(cache.put(3, [NameEntry(2, "3550308", "São Paulo")]), "sp") == []
+        assert cache.current(3) is not None
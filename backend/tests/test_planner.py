@@ -0,0 +1,122 @@
+"""
+Tests for backend/planner.py
+Tests cardinality estimates, path choice and that each path drives SQLite through its index
+"""
+import random
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from backend import crud, models
+from backend.planner import PoiStats, choose, estimate_paths, load_stats, plan_query, search_cap
+
+rnd = random.Random(3)
+TIPOS = ["school"] * 40 + ["hospital"] * 9 + ["museum"]
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory, make_engine):
+    engine = make_engine(tmp_path_factory.mktemp("planner") / "planner.sqlite")
+    with Session(engine) as db:
+        db.add_all([models.POI(tipo=rnd.choice(TIPOS), municipio_id=rnd.randint(1, 50),
+                               nome=f"Lugar {rnd.choice(['Alfa', 'Beta', 'Gama'])} {i}",
+                               latitude=rnd.uniform(-25, -20), longitude=rnd.uniform(-53, -44))
+                    for i in range(5000)])
+        db.commit()
+    with engine.begin() as conn:
+        crud.rebuild_poi_search(conn)
+        conn.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def stats(engine):
+    with Session(engine) as db:
+        return PoiStats.from_rows(load_stats(db))
+
+
+def eqp(db, stmt) -> str:
+    sql = str(stmt.compile(db.bind, compile_kwargs={"literal_binds": True}))
+    return " | ".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+
+class TestPoiStats:
+    def test_counts(self, stats):
+        assert stats.total == 5000
+        assert sum(stats.by_municipio.values()) == 5000
+        assert stats.grid.sum() == 5000
+
+    def test_bbox_estimate_close_to_actual(self, engine, stats):
+        bbox = (-50.0, -24.0, -47.0, -22.0)
+        with Session(engine) as db:
+            actual = crud.count_pois(db, bbox)
+        assert stats.bbox_estimate(bbox) == pytest.approx(actual, rel=0.15)
+        assert stats.bbox_estimate((-53, -25, -44, -20)) == pytest.approx(5000, rel=0.01)
+        assert stats.bbox_estimate((10, 10, 11, 11)) == 0
+
+    def test_tipo_estimate(self, stats):
+        assert stats.tipo_estimate(["museum", "hospital"]) == stats.by_tipo["museum"] + stats.by_tipo["hospital"]
+        assert stats.tipo_estimate(["school"], 7) < stats.tipo_estimate(["school"])
+        assert stats.tipo_estimate(["nope"]) == 0
+
+    def test_empty_table(self):
+        stats = PoiStats([], [], (None, None, None, None))
+        assert stats.total == 0 and stats.bbox_estimate((0, 0, 1, 1)) == 0
+
+
+class TestChoice:
+    def test_cheapest_path_wins(self):
+        assert choose({"scan": 1000, "spatial": 30, "tipo": 20}).path == "tipo"
+        # FTS custa o dobro por linha
+        assert choose({"scan": 1000, "tipo": 30, "fts": 20}).path == "tipo"
+        # empate: ordem de PATH_ORDER
+        assert choose({"scan": 10, "spatial": 10}).path == "spatial"
+
+    def test_search_cap(self):
+        assert search_cap({"scan": 1000, "tipo": 100}) == 51
+
+    def test_applicable_paths(self, stats):
+        assert set(estimate_paths(stats)) == {"scan"}
+        assert set(estimate_paths(stats, municipio_id=3)) == {"scan", "municipio"}
+        # com tipos, o município entra no índice composto
+        assert set(estimate_paths(stats, tipos=["school"], municipio_id=3, bbox=(0, 0, 1, 1))) == \
+            {"scan", "tipo", "spatial"}
+
+
+class TestAccessPaths:
+    @pytest.mark.parametrize("kwargs, path, index", [
+        ({"tipos": ["school"], "bbox": (-46.7, -23.7, -46.4, -23.5)}, "spatial", "ix_pois_hilbert_e7"),
+        ({"tipos": ["museum"], "bbox": (-53, -25, -44, -20)}, "tipo", "ix_pois_tipo_municipio (tipo=?)"),
+        ({"tipos": ["school", "hospital"], "municipio_id": 7}, "tipo",
+         "ix_pois_tipo_municipio (tipo=? AND municipio_id=?)"),
+        ({"municipio_id": 7, "bbox": (-53, -25, -44, -20)}, "municipio", "ix_pois_municipio_id"),
+        ({"expression": '"alfa"* "123"*', "bbox": (-53, -25, -44, -20)}, "fts", "SCAN pois_fts VIRTUAL TABLE"),
+    ])
+    def test_plan_and_index(self, engine, stats, kwargs, path, index):
+        with Session(engine) as db:
+            plan = plan_query(db, stats, kwargs.get("tipos"), kwargs.get("municipio_id"), kwargs.get("bbox"),
+                              kwargs.get("expression"))
+            assert plan.path == path
+            # o ORDER BY id de uma página pequena não faz o SQLite trocar o índice pela tabela
+            assert index in eqp(db, crud.poi_query_stmt(plan.path, limit=10, **kwargs))
+            stmt = crud.poi_query_stmt(plan.path, limit=10 ** 6, **kwargs)
+            assert index in eqp(db, stmt)
+            # o resultado não depende do caminho
+            expected = {r.id for r in db.execute(crud.poi_query_stmt("scan", limit=10 ** 6, **kwargs))}
+            assert [r.id for r in db.execute(stmt)] == sorted(expected)
+
+    def test_residual_filters_do_not_use_indexes(self, engine):
+        with Session(engine) as db:
+            plan = eqp(db, crud.poi_query_stmt("fts", tipos=["school"], municipio_id=3, expression='"alfa"*',
+                                               limit=10 ** 6))
+        assert "ix_pois_tipo_municipio" not in plan and "ix_pois_municipio_id" not in plan
+
+    def test_circle(self, engine):
+        with Session(engine) as db:
+            rows = db.execute(crud.poi_query_stmt("scan", circle=(-48.0, -22.0, 50000), limit=10 ** 6)).all()
+        assert rows
+        for r in rows:
+            # equirretangular x distância exata: a 50 km a diferença é desprezível
+            dx = (r.longitude + 48.0) * 111320 * 0.927
+            dy = (r.latitude + 22.0) * 111320
+            assert (dx * dx + dy * dy) ** 0.5 <= 50000 * 1.001
@@ -0,0 +1,103 @@
+"""
+Tests for backend/shared_index.py
+Tests artifacts published once and attached by every worker
+"""
+import os
+import threading
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from backend import crud, models
+from backend.columnar import POIColumnStore
+from backend.main import app
+from backend.shared_index import SharedGeojson, ensure_columnar
+
+
+@pytest.fixture
+def db(temp_session):
+    session = temp_session()
+    session.add(models.POI(tipo="hospital", nome="H1", latitude=-23.5, longitude=-46.5))
+    crud.bump_data_version(session)
+    session.commit()
+    yield session
+    session.close()
+
+
+class TestEnsureColumnar:
+    """Test POI columns are exported once and attached afterwards"""
+
+    def test_first_worker_exports_others_attach(self, db, tmp_path):
+        directory = tmp_path / "cols"
+        first = POIColumnStore(directory)
+        assert ensure_columnar(db, first, directory)
+        second = POIColumnStore(directory)
+        with patch("backend.shared_index.export_pois") as export:
+            assert ensure_columnar(db, second, directory)
+            export.assert_not_called()
+        assert second.count_pois() == 1
+
+    def test_republishes_on_new_version(self, db, tmp_path):
+        directory = tmp_path / "cols"
+        store = POIColumnStore(directory)
+        ensure_columnar(db, store, directory)
+        db.add(models.POI(tipo="school", latitude=-23.6, longitude=-46.6))
+        crud.bump_data_version(db)
+        db.commit()
+        assert ensure_columnar(db, store, directory)
+        assert store.count_pois() == 2
+
+    def test_disabled_store_is_skipped(self, db, tmp_path):
+        store = POIColumnStore(tmp_path / "cols", enabled=False)
+        assert not ensure_columnar(db, store, tmp_path / "cols")
+        assert not (tmp_path / "cols").exists()
+
+
+class TestSharedGeojson:
+    """Test the pre-serialized municipality GeoJSON file"""
+
+    def test_concurrent_publish_builds_once(self, tmp_path):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return b'{"type":"FeatureCollection","features":[]}'
+
+        workers = [SharedGeojson(tmp_path) for _ in range(8)]
+        threads = [threading.Thread(target=w.publish, args=(3, build)) for w in workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+        assert {w.path for w in workers} == {tmp_path / "municipios-v3.geojson"}
+
+    def test_geojson_and_fgb_use_separate_temp_files(self, tmp_path):
+        # locks diferentes: o .geojson e o .fgb da mesma versão podem estar sendo gravados juntos
+        with patch("backend.shared_index.os.replace", wraps=os.replace) as replace:
+            SharedGeojson(tmp_path).publish(3, lambda: b"geojson")
+            SharedGeojson(tmp_path, suffix=".fgb").publish(3, lambda: b"fgb")
+        temps = [Path(call.args[0]).name for call in replace.call_args_list]
+        assert len(set(temps)) == 2
+        assert (tmp_path / "municipios-v3.geojson").read_bytes() == b"geojson"
+        assert (tmp_path / "municipios-v3.fgb").read_bytes() == b"fgb"
+
+    def test_old_versions_are_pruned(self, tmp_path):
+        shared = SharedGeojson(tmp_path)
+        for version in range(1, 5):
+            shared.publish(version, lambda: b"{}")
+        assert sorted(p.name for p in tmp_path.glob("*.geojson")) == ["municipios-v3.geojson", "municipios-v4.geojson"]
+
+    def test_route_serves_published_file(self, tmp_path):
+        shared = SharedGeojson(tmp_path)
+        shared.enabled = True
+        body = b'{"type":"FeatureCollection","features":[]}'
+        with patch("backend.api.municipios.shared_geojson", shared), \
+             patch("backend.api.municipios.build_geojson", return_value=body) as build:
+            client = TestClient(app)
+            first = client.get("/municipios/geojson")
+            second = client.get("/municipios/geojson")
+            assert first.status_code == 200 and first.content == body
+            assert second.content == body
+            assert first.headers["etag"].startswith('"municipios-geojson-v')
+            assert build.call_count == 1
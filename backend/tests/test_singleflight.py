@@ -0,0 +1,102 @@
+"""
+Tests for backend/singleflight.py
+Tests coalescing of concurrent identical computations
+"""
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.singleflight import SingleFlight
+
+
+def run_concurrently(n, target):
+    results = [None] * n
+    errors = [None] * n
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight:
+    """Test SingleFlight.do"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test identical concurrent calls run the function once"""
+        sf = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"value": 42}
+
+        results, errors = run_concurrently(10, lambda: sf.do("key", slow))
+
+        assert len(calls) == 1
+        assert all(r == {"value": 42} for r in results)
+        assert sf.stats()["coalesced"] == 9
+        assert sf.in_flight() == 0
+
+    def test_different_keys_run_separately(self):
+        """Test different keys are not coalesced"""
+        sf = SingleFlight()
+        assert sf.do("a", lambda: 1) == 1
+        assert sf.do("b", lambda: 2) == 2
+        assert sf.stats()["executed"] == 2
+
+    def test_no_result_kept_after_completion(self):
+        """Test sequential calls recompute (not a cache)"""
+        sf = SingleFlight()
+        fn = Mock(return_value=1)
+        sf.do("a", fn)
+        sf.do("a", fn)
+        assert fn.call_count == 2
+
+    def test_error_propagates_to_waiters(self):
+        """Test every waiter receives the leader's exception"""
+        sf = SingleFlight()
+
+        def boom():
+            time.sleep(0.2)
+            raise ValueError("falhou")
+
+        results, errors = run_concurrently(5, lambda: sf.do("key", boom))
+
+        assert all(isinstance(e, ValueError) for e in errors)
+        assert sf.in_flight() == 0
+
+
+class TestGeojsonCoalescing:
+    """Test /municipios/geojson uses single-flight"""
+
+    def test_concurrent_geojson_requests_query_once(self):
+        """Test a burst of identical requests runs the full-table query once"""
+        client = TestClient(app)
+        mock_municipios = [
+            Mock(id=1, nome="Adamantina", ibge_code="3500105",
+                 geometry='{"type": "Point", "coordinates": [-46.5, -23.5]}')
+        ]
+
+        def slow_list(*args, **kwargs):
+            time.sleep(0.3)
+            return mock_municipios
+
+        with patch('backend.api.municipios.crud.list_municipios', side_effect=slow_list) as mock_list:
+            results, errors = run_concurrently(8, lambda: client.get("/municipios/geojson"))
+
+        assert all(e is None for e in errors)
+        assert all(r.status_code == 200 for r in results)
+        assert all(len(r.json()["features"]) == 1 for r in results)
+        assert mock_list.call_count < 8
@@ -0,0 +1,175 @@
+"""
+Tests for backend/spatial.py and backend/etl/optimize.py
+Tests Hilbert keys, bbox key ranges and the optimized read layout
+"""
+import random
+import sqlite3
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+from backend import crud, db
+from backend.cache import PoiRecord, quantize_pois
+from backend.etl.optimize import (DB_PATH, OPTIMIZED_DB_PATH, migrate_pois, quantize_geometries, reorder_pois,
+                                  vacuum_into)
+from backend.spatial import (HILBERT_ORDER, _cell, hilbert_key, hilbert_keys, hilbert_ranges, round_geometry,
+                             to_e7, xy_to_hilbert)
+
+rnd = random.Random(1)
+POINTS = [(rnd.uniform(-50, -44), rnd.uniform(-25, -19)) for _ in range(1000)]
+
+
+class TestHilbertKey:
+    """Test the curve mapping"""
+
+    def test_is_a_bijection(self):
+        assert {xy_to_hilbert(x, y, 4) for x in range(16) for y in range(16)} == set(range(256))
+
+    def test_neighbouring_keys_are_adjacent_cells(self):
+        cells = {xy_to_hilbert(x, y, 4): (x, y) for x in range(16) for y in range(16)}
+        for d in range(255):
+            (x0, y0), (x1, y1) = cells[d], cells[d + 1]
+            assert abs(x0 - x1) + abs(y0 - y1) == 1
+
+    def test_vectorized_matches_scalar(self):
+        lon = np.array([p[0] for p in POINTS])
+        lat = np.array([p[1] for p in POINTS])
+        assert hilbert_keys(lon, lat).tolist() == [hilbert_key(*p) for p in POINTS]
+
+    def test_coarse_cell_is_key_prefix(self):
+        """Test a level-l cell is a contiguous block of keys (what hilbert_ranges relies on)"""
+        for lon, lat in POINTS[:200]:
+            x, y = _cell(lon, lat)
+            for level in (1, 6, 12):
+                shift = HILBERT_ORDER - level
+                assert hilbert_key(lon, lat) >> (2 * shift) == xy_to_hilbert(x >> shift, y >> shift, level)
+
+
+class TestHilbertRanges:
+    """Test bbox key ranges"""
+
+    def test_ranges_cover_every_point_inside(self):
+        keys = [hilbert_key(*p) for p in POINTS]
+        for _ in range(100):
+            lon, lat = rnd.uniform(-49, -45), rnd.uniform(-24, -20)
+            box = (lon, lat, lon + rnd.uniform(0.001, 2), lat + rnd.uniform(0.001, 2))
+            ranges = hilbert_ranges(*box)
+            assert len(ranges) <= 32
+            for (plon, plat), k in zip(POINTS, keys):
+                if box[0] <= plon <= box[2] and box[1] <= plat <= box[3]:
+                    assert any(a <= k <= b for a, b in ranges)
+
+    def test_ranges_are_sorted_and_disjoint(self):
+        ranges = hilbert_ranges(-46.8, -23.8, -46.3, -23.4)
+        for (a0, b0), (a1, b1) in zip(ranges, ranges[1:]):
+            assert a0 <= b0 < a1 - 1 < b1
+
+
+class TestQuantization:
+    """Test fixed-point coordinates and output rounding"""
+
+    def test_to_e7(self):
+        assert to_e7(-46.6333094) == -466333094
+        assert to_e7(-23.5) == -235000000
+
+    def test_round_geometry(self):
+        geom = {"type": "MultiPolygon", "coordinates": [[[[-46.123456789, -23.987654321], [-46.1, -23.9]]]]}
+        assert round_geometry(geom, 4)["coordinates"] == [[[[-46.1235, -23.9877], [-46.1, -23.9]]]]
+        collection = {"type": "GeometryCollection", "geometries": [{"type": "Point", "coordinates": [1.23456, 2.5]}]}
+        assert round_geometry(collection, 2)["geometries"][0]["coordinates"] == [1.23, 2.5]
+
+    def test_quantize_pois(self):
+        pois = [PoiRecord(1, None, "school", None, -23.5123456, -46.6543219, None)]
+        assert quantize_pois(pois, None) is pois
+        [poi] = quantize_pois(pois, 5)
+        assert (poi.latitude, poi.longitude) == (-23.51235, -46.65432)
+
+
+class TestOptimizedLayout:
+    """Test the Hilbert column migration, reorder and VACUUM INTO"""
+
+    @pytest.fixture
+    def legacy_engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE pois (id INTEGER PRIMARY KEY, municipio_id INTEGER, tipo VARCHAR, nome VARCHAR, "
+                "latitude FLOAT NOT NULL, longitude FLOAT NOT NULL, created_at DATETIME)"
+            ))
+            conn.execute(text("CREATE INDEX ix_pois_longitude ON pois (longitude)"))
+            conn.execute(text("CREATE INDEX ix_pois_tipo ON pois (tipo)"))
+            conn.execute(text("INSERT INTO pois (tipo, latitude, longitude) VALUES (:t, :lat, :lon)"),
+                         [{"t": "school", "lat": lat, "lon": lon} for lon, lat in POINTS])
+        yield engine
+        engine.dispose()
+
+    def test_migrate_pois_backfills_and_swaps_indexes(self, legacy_engine):
+        assert migrate_pois(legacy_engine) == len(POINTS)
+        indexes = {i["name"] for i in inspect(legacy_engine).get_indexes("pois")}
+        assert "ix_pois_hilbert_e7" in indexes and "ix_pois_longitude" not in indexes
+        assert "ix_pois_tipo_municipio" in indexes and "ix_pois_tipo" not in indexes
+        with legacy_engine.connect() as conn:
+            lon, lat, key = conn.execute(text("SELECT longitude, latitude, hilbert FROM pois WHERE id = 1")).one()
+        assert key == hilbert_key(lon, lat)
+        with legacy_engine.connect() as conn:
+            lat_e7, lon_e7 = conn.execute(text("SELECT lat_e7, lon_e7 FROM pois WHERE id = 1")).one()
+        assert (lat_e7, lon_e7) == (to_e7(lat), to_e7(lon))
+        assert migrate_pois(legacy_engine) == 0
+
+    def test_quantize_geometries(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'geo.sqlite'}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE municipios (id INTEGER PRIMARY KEY, geometry TEXT)"))
+            conn.execute(text("INSERT INTO municipios (geometry) VALUES "
+                              "('{\"type\": \"Point\", \"coordinates\": [-46.123456789, -23.5]}')"))
+        assert quantize_geometries(engine, 6) == 1
+        assert quantize_geometries(engine, 6) == 0
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT geometry FROM municipios")).scalar() == \
+                '{"type": "Point", "coordinates": [-46.123457, -23.5]}'
+            assert conn.execute(text("PRAGMA user_version")).scalar() == 1
+        engine.dispose()
+
+    def test_reorder_writes_key_order_and_bumps_version(self, legacy_engine):
+        migrate_pois(legacy_engine)
+        assert reorder_pois(legacy_engine) == len(POINTS)
+        with legacy_engine.connect() as conn:
+            keys = [k for (k,) in conn.execute(text("SELECT hilbert FROM pois ORDER BY id"))]
+            assert conn.execute(text("PRAGMA user_version")).scalar() == 1
+        assert keys == sorted(keys)
+
+    def test_search_index_on_legacy_database(self, legacy_engine):
+        with legacy_engine.begin() as conn:
+            conn.execute(text("UPDATE pois SET nome = 'Escola ' || id"))
+            assert crud.rebuild_poi_search(conn) == len(POINTS)
+        with Session(legacy_engine) as db:
+            names = [p.nome for p in crud.search_pois(db, "escola 99", limit=None)]
+        assert sorted(names) == ["Escola 99"] + [f"Escola 99{i}" for i in range(10)]
+
+    def test_poi_counts_on_legacy_database(self, legacy_engine):
+        with legacy_engine.begin() as conn:
+            assert crud.rebuild_poi_counts(conn) == 1
+            assert conn.execute(text("SELECT municipio_id, tipo, n FROM poi_counts")).all() == \
+                [(None, "school", len(POINTS))]
+
+    def test_vacuum_into_page_size(self, legacy_engine, tmp_path):
+        migrate_pois(legacy_engine)
+        out = vacuum_into(legacy_engine, tmp_path / "read.sqlite", page_size=8192)
+        conn = sqlite3.connect(out)
+        assert conn.execute("PRAGMA page_size").fetchone()[0] == 8192
+        assert conn.execute("SELECT count(*) FROM pois").fetchone()[0] == len(POINTS)
+        assert conn.execute("SELECT count(*) FROM sqlite_stat1").fetchone()[0] > 0
+        conn.close()
+
+    def test_default_paths_do_not_depend_on_cwd(self):
+        # o mesmo arquivo que a API abre, seja qual for o diretório de onde o ETL roda
+        assert DB_PATH == db.DB_PATH
+        assert OPTIMIZED_DB_PATH.is_absolute() and OPTIMIZED_DB_PATH.parent == db.DATA_DIR
+
+    def test_bbox_query_uses_composite_index(self, legacy_engine):
+        migrate_pois(legacy_engine)
+        stmt = select(*crud.POI_COLUMNS).where(*crud.poi_bbox_filters(-46.6, -23.6, -46.5, -23.5))
+        sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+        with legacy_engine.connect() as conn:
+            plan = " ".join(r[-1] for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+        assert "ix_pois_hilbert_e7" in plan
@@ -0,0 +1,91 @@
+"""
+Tests for backend/streaming.py
+Tests the ?format=stream|ndjson responses read from the cursor in batches
+"""
+import json
+from datetime import datetime
+from unittest.mock import patch
+import pytest
+from backend import crud, models, schemas
+from backend.streaming import chunks, poi_json
+
+
+@pytest.fixture
+def client(temp_session, temp_client):
+    db = temp_session()
+    db.add(models.Municipio(ibge_code="3500105", nome="Adamantina",
+                            geometry=json.dumps({"type": "Point", "coordinates": [-46.5, -23.5]})))
+    db.add_all([
+        models.POI(tipo="hospital" if i % 2 else "school", nome=f"P{i}",
+                   latitude=-23.5 - i / 1000, longitude=-46.5 - i / 1000)
+        for i in range(50)
+    ])
+    db.commit()
+    db.close()
+    with temp_client() as client:
+        yield client
+
+
+class TestChunks:
+    """Test chunked framing"""
+
+    def test_json_array(self):
+        parts = list(chunks((b"%d" % i for i in range(1000)), chunk_bytes=100))
+        assert len(parts) > 1
+        assert json.loads(b"".join(parts)) == list(range(1000))
+
+    def test_empty(self):
+        assert b"".join(chunks([])) == b"[]"
+
+    def test_poi_json_matches_schema(self):
+        poi = schemas.POIOut(id=1, municipio_id=2, tipo="hospital", nome="São Luiz",
+                             latitude=-23.5, longitude=-46.5, created_at=datetime(2024, 5, 1, 12, 30))
+        assert json.loads(poi_json(poi)) == json.loads(poi.json())
+
+
+class TestStreamingRoutes:
+    """Test streamed POI and GeoJSON routes"""
+
+    def test_bbox_ndjson(self, client):
+        response = client.get("/pois/bbox?bbox=-46.52,-23.52,-46.4,-23.4&format=ndjson")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(p["nome"] for p in lines) == sorted(f"P{i}" for i in range(21))
+
+    def test_stream_matches_json(self, client):
+        plain = client.get("/pois/tipo/hospital?limit=10")
+        streamed = client.get("/pois/tipo/hospital?limit=10&format=stream")
+        assert streamed.headers["content-type"] == "application/json"
+        assert streamed.json() == plain.json()
+
+    def test_list_does_not_materialize(self, client):
+        with patch("backend.api.pois.crud.list_pois") as list_pois:
+            response = client.get("/pois/?limit=1000&format=stream&precision=1")
+            list_pois.assert_not_called()
+        assert len(response.json()) == 50
+        assert response.json()[0]["latitude"] == -23.5
+
+    def test_reads_in_batches(self, temp_session):
+        db = temp_session()
+        db.add_all([models.POI(tipo="park", latitude=-23.5, longitude=-46.5) for _ in range(20)])
+        db.commit()
+        with patch.object(db, "execute", wraps=db.execute) as execute:
+            rows = crud.stream_rows(db, crud.pois_stmt(tipo="park"), batch_size=7)
+            assert next(rows).tipo == "park"
+            assert execute.call_args.args[0].get_execution_options()["yield_per"] == 7
+        assert len(list(rows)) == 19
+        db.close()
+
+    def test_geojson_formats(self, client):
+        ndjson = client.get("/municipios/geojson?format=ndjson")
+        assert json.loads(ndjson.text.splitlines()[0])["properties"]["ibge_code"] == "3500105"
+        streamed = client.get("/municipios/geojson?format=stream")
+        assert streamed.json() == client.get("/municipios/geojson").json()
+
+    def test_invalid_format(self, client):
+        assert client.get("/pois/?format=csv").status_code == 422
+
+    def test_etag_kept(self, client):
+        response = client.get("/pois/tipo/school?format=ndjson")
+        assert "etag" in response.headers
@@ -141,6 +141,11 @@ for _, r in df.iterrows():
         """, (str(ibge), idh_val, idh_renda, idh_long, idh_educ))
         inserted += 1
 
+# invalida ETags / caches: incrementa a versão dos dados (PRAGMA user_version)
+cur.execute("PRAGMA user_version")
+data_version = cur.fetchone()[0] + 1
+cur.execute(f"PRAGMA user_version = {int(data_version)}")
+
 conn.commit()
 conn.close()
 
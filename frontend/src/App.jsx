@@ -3,7 +3,7 @@ import MunicipalitiesMap from './components/MapView'
 import Sidebar from './components/Sidebar'
 import POIDetail from './components/POIDetail'
 import RouteModal from './components/RouteModal'
-import { fetchIndicadorByIbge, fetchAllIndicadores, fetchPOIsByMunicipio, fetchPOIsByBbox } from './api/api'
+import { fetchIndicadorByIbge, fetchAllIndicadores, fetchIndicadorComposite, fetchPOIsByMunicipio, fetchPOIsByBbox } from './api/api'
 
 export default function App(){
   const [selectedMunicipio, setSelectedMunicipio] = useState(null)
@@ -13,6 +13,7 @@ export default function App(){
   const [choroplethActive, setChoroplethActive] = useState(false)
   const [choroplethIndicator, setChoroplethIndicator] = useState('idh') 
   const [indicatorsMap, setIndicatorsMap] = useState({}) 
+  const [compositeBreaks, setCompositeBreaks] = useState(null) // quantis do índice composto (servidor)
 
   // POI Filtering States
   const [poisMode, setPoisMode] = useState(false)           // está em modo de filtro POIs
@@ -93,10 +94,26 @@ export default function App(){
     setChoroplethIndicator(indKey)
   }
 
+  // índice composto calculado no servidor: entra em indicatorsMap como 'composite'
+  async function applyComposite(weights, normalize){
+    const data = await fetchIndicadorComposite(weights, normalize)
+    setIndicatorsMap(prev => {
+      const map = { ...prev }
+      data.items.forEach(it => {
+        map[it.ibge_code] = { ...(map[it.ibge_code] || { ibge_code: it.ibge_code }), composite: it.value }
+      })
+      return map
+    })
+    setCompositeBreaks(data.breaks)
+    setChoroplethIndicator('composite')
+    setChoroplethActive(true)
+  }
+
   function closeChoropleth(){
     setChoroplethActive(false)
     setChoroplethIndicator('idh')
     setIndicatorsMap({})
+    setCompositeBreaks(null)
   }
 
   // ----- NOVOS: handlers para criar POI -----
@@ -276,6 +293,8 @@ export default function App(){
           onStartChoropleth={startChoropleth}
           onChangeChoroplethIndicator={changeChoroplethIndicator}
           onCloseChoropleth={closeChoropleth}
+          onApplyComposite={applyComposite}
+          compositeAvailable={compositeBreaks != null}
           choroplethActive={choroplethActive}
           currentIndicator={choroplethIndicator}
           poisMode={poisMode}
@@ -328,6 +347,7 @@ export default function App(){
           choroplethActive={choroplethActive}
           choroplethIndicator={choroplethIndicator}
           indicatorsMap={indicatorsMap}
+          choroplethBreaks={choroplethIndicator === 'composite' ? compositeBreaks : null}
           pois={poisMode ? (selectedPoiType ? pois.filter(p => p.tipo === selectedPoiType) : pois) : []}
           onSelectPOI={handleSelectPOI}
           selectedMunicipio={selectedMunicipio}
@@ -1,3 +1,5 @@
+import { decodeMarkers } from '../utils/decodeMarkers'
+
 const API_BASE = import.meta.env.VITE_API_BASE || 'http://127.0.0.1:8000'
 
 export async function fetchPOIsGeoJSON({ bbox, category } = {}) {
@@ -34,6 +36,17 @@ export async function fetchIndicadorByIbge(ibge_code) {
   return res.json()
 }
 
+// ficha do município: indicadores, rank/percentil, médias do estado e dos vizinhos, POIs por tipo
+export async function fetchMunicipioCard(ibge_code) {
+  const url = `${API_BASE}/municipios/${encodeURIComponent(ibge_code)}/card`
+  const res = await fetch(url)
+  if (!res.ok) {
+    if (res.status === 404) return null
+    throw new Error('Erro ao buscar ficha do município')
+  }
+  return res.json()
+}
+
 export async function fetchAllIndicadores() {
   const url = `${API_BASE}/indicadores`
   const res = await fetch(url)
@@ -41,6 +54,17 @@ export async function fetchAllIndicadores() {
   return res.json() // espera array [{ ibge_code, idh, idh_renda, ... }, ...]
 }
 
+// weights: 'saneamento:0.5,idh_educacao:0.3' | normalize: 'minmax' | 'zscore'
+export async function fetchIndicadorComposite(weights, normalize = 'minmax', classes = 5) {
+  const params = new URLSearchParams({ weights, normalize, classes: String(classes) })
+  const res = await fetch(`${API_BASE}/indicadores/composite?${params}`)
+  if (!res.ok) {
+    const body = await res.json().catch(() => null)
+    throw new Error(body?.detail || 'Erro ao calcular índice composto')
+  }
+  return res.json() // { weights, normalize, total, breaks: [...], items: [{ ibge_code, value, rank, percentil }] }
+}
+
 // ===================== POI FILTERING =====================
 
 export async function fetchPOITypes() {
@@ -79,6 +103,21 @@ export async function fetchPOIsByBbox(minLon, minLat, maxLon, maxLat, tipo = nul
   return res.json()
 }
 
+/**
+ * Marcadores de POI no bbox em formato binário (id, lat, lon, tipo), para desenhar muitos pontos.
+ */
+export async function fetchPOIMarkers(minLon, minLat, maxLon, maxLat, tipo = null) {
+  const params = new URLSearchParams()
+  params.set('bbox', `${minLon},${minLat},${maxLon},${maxLat}`)
+  if (tipo) params.set('tipo', tipo)
+  params.set('format', 'binary')
+
+  const url = `${API_BASE}/pois/bbox?${params.toString()}`
+  const res = await fetch(url)
+  if (!res.ok) throw new Error('Erro ao buscar marcadores de POIs')
+  return decodeMarkers(await res.arrayBuffer())
+}
+
 export async function createPOI(payload) {
   const res = await fetch(`${API_BASE}/pois/`, {
     method: 'POST',
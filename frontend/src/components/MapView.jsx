@@ -146,7 +146,7 @@ function StoreMapRef({ mapRef }) {
 function formatValueForIndicator(value, indicatorKey) {
   if (value == null || value === "" || Number.isNaN(Number(value))) return '—'
   const v = Number(value)
-  if (indicatorKey.startsWith('idh')) {
+  if (indicatorKey.startsWith('idh') || indicatorKey === 'composite') {
     return v.toFixed(3) // e.g. 0.805
   }
   if (indicatorKey === 'saneamento') {
@@ -164,6 +164,7 @@ export default function MunicipalitiesMap({
   choroplethActive = false,
   choroplethIndicator = 'idh',
   indicatorsMap = {},
+  choroplethBreaks = null,
   pois = [],
   onSelectPOI = null,
   creatingPoiMode = false,
@@ -338,8 +339,8 @@ export default function MunicipalitiesMap({
   }, [gjson, indicatorsMap, choroplethIndicator])
 
   const colorizer = React.useMemo(() => {
-    return createColorizer(choroplethIndicator, values, { nClasses: 5 })
-  }, [choroplethIndicator, values])
+    return createColorizer(choroplethIndicator, values, { nClasses: 5, breaks: choroplethBreaks })
+  }, [choroplethIndicator, values, choroplethBreaks])
 
   function getFillColorForFeature(feature) {
     if (!choroplethActive) return "#9ecae1"
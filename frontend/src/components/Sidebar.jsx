@@ -65,6 +65,8 @@ export default function Sidebar({
   onStartChoropleth,
   onChangeChoroplethIndicator,
   onCloseChoropleth,
+  onApplyComposite = null,
+  compositeAvailable = false,
   choroplethActive,
   currentIndicator,
   // POI Filtering props
@@ -88,6 +90,10 @@ export default function Sidebar({
   // ---------- choropleth / filtros ----------
   const [selectedIndicator, setSelectedIndicator] = useState(currentIndicator ?? 'idh')
   const [showSaneTooltip, setShowSaneTooltip] = useState(false)
+  // índice composto: indicador:peso separados por vírgula (ver /indicadores/composite)
+  const [compositeWeights, setCompositeWeights] = useState('saneamento:0.5,idh_educacao:0.3,renda_per_capita:0.2')
+  const [compositeNormalize, setCompositeNormalize] = useState('minmax')
+  const [compositeError, setCompositeError] = useState(null)
   const [loadingPoiTypes, setLoadingPoiTypes] = useState(false)
   const [poiTypes, setPoiTypes] = useState([])
   const [showCreatePoi, setShowCreatePoi] = useState(false)
@@ -754,7 +760,23 @@ function openCreate() {
           <label>Indicador para coroplético</label><br/>
           <select value={selectedIndicator} onChange={e=>setSelectedIndicator(e.target.value)} style={{width:'100%', padding:6, marginTop:6}}>
             {IND_OPTIONS.map(o => <option key={o.key} value={o.key}>{o.label}</option>)}
+            {compositeAvailable ? <option value='composite'>Índice composto</option> : null}
           </select>
+
+          <label style={{display:'block', marginTop:12}}>Índice composto (indicador:peso)</label>
+          <input value={compositeWeights} onChange={e=>setCompositeWeights(e.target.value)} style={{width:'100%', padding:6, marginTop:6, boxSizing:'border-box'}} />
+          <div style={{display:'flex', gap:8, marginTop:6}}>
+            <select value={compositeNormalize} onChange={e=>setCompositeNormalize(e.target.value)} style={{flex:1, padding:6}}>
+              <option value='minmax'>Min–máx</option>
+              <option value='zscore'>Z-score</option>
+            </select>
+            <button onClick={async () => {
+              setCompositeError(null)
+              try { await onApplyComposite(compositeWeights, compositeNormalize) }
+              catch (err) { setCompositeError(err.message || 'Erro ao calcular índice composto') }
+            }} disabled={!onApplyComposite}>Calcular</button>
+          </div>
+          {compositeError ? <div style={{color:'#b00020', fontSize:12, marginTop:6}}>{compositeError}</div> : null}
         </div>
       ) : null}
 
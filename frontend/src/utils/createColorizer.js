@@ -62,8 +62,12 @@ export default function createColorizer(indicator, allValues = [], opts = {}) {
   }
 
   // calcular breaks (quantis); se useLog -> quantis em log space
+  // opts.breaks: quantis já calculados no servidor (ex.: /indicadores/composite)
   let breaks = [];
-  if (nums.length === 0) {
+  if (Array.isArray(opts.breaks)) {
+    useLog = false;
+    breaks = opts.breaks.slice();
+  } else if (nums.length === 0) {
     breaks = [];
   } else if (useLog) {
     const logs = nums.map(v => Math.log(v + 1)).sort((a,b)=>a-b);
@@ -108,5 +112,5 @@ export default function createColorizer(indicator, allValues = [], opts = {}) {
   }
   legend.push({ label: 'Sem dados', color: '#999' });
 
-  return { colorFor, legend, method: useLog ? 'log-quantiles' : 'quantiles' };
+  return { colorFor, legend, method: opts.breaks ? 'server-quantiles' : (useLog ? 'log-quantiles' : 'quantiles') };
 }
@@ -0,0 +1,57 @@
+/**
+ * decodeMarkers.js
+ * Lê o formato binário de marcadores de POI (?format=binary, ver backend/markers.py)
+ * Os arrays são views sobre o ArrayBuffer recebido, sem cópia nem JSON.parse
+ */
+
+const MAGIC = 'POIB'
+const FORMAT_VERSION = 2
+const HEADER_BYTES = 12
+const NO_TIPO = 0xFFFF
+const E7 = 1e7
+
+/**
+ * @param {ArrayBuffer} buffer - corpo da resposta (res.arrayBuffer())
+ * @returns {{tipos: string[], latE7: Int32Array, lonE7: Int32Array, id: Uint32Array, tipo: Uint16Array, length: number}}
+ */
+export function decodeMarkers(buffer) {
+  const view = new DataView(buffer)
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4))
+  if (magic !== MAGIC || view.getUint8(4) !== FORMAT_VERSION) {
+    throw new Error('Buffer de marcadores inválido')
+  }
+  const nTipos = view.getUint16(6, true)
+  const n = view.getUint32(8, true)
+
+  const decoder = new TextDecoder('utf-8')
+  const tipos = []
+  let offset = HEADER_BYTES
+  for (let i = 0; i < nTipos; i++) {
+    const size = view.getUint16(offset, true)
+    tipos.push(decoder.decode(new Uint8Array(buffer, offset + 2, size)))
+    offset += 2 + size
+  }
+  offset += (4 - (offset % 4)) % 4
+
+  return {
+    tipos,
+    latE7: new Int32Array(buffer, offset, n),
+    lonE7: new Int32Array(buffer, offset + 4 * n, n),
+    id: new Uint32Array(buffer, offset + 8 * n, n),
+    tipo: new Uint16Array(buffer, offset + 12 * n, n),
+    length: n,
+  }
+}
+
+/**
+ * Marcador i como objeto ({ id, tipo, latitude, longitude }), para quem precisa de um só
+ */
+export function markerAt(markers, i) {
+  const t = markers.tipo[i]
+  return {
+    id: markers.id[i],
+    tipo: t === NO_TIPO ? null : markers.tipos[t],
+    latitude: markers.latE7[i] / E7,
+    longitude: markers.lonE7[i] / E7,
+  }
+}
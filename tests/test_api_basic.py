@@ -11,7 +11,7 @@ from sqlalchemy.orm import sessionmaker
 # Ajuste os imports conforme sua estrutura de pacotes
 from backend.main import app
 from backend import models
-from backend.db import get_db
+from backend.db import get_db, get_read_db
 Base = models.Base
 
 class APIBasicTest(unittest.TestCase):
@@ -39,6 +39,8 @@ class APIBasicTest(unittest.TestCase):
 
         # substituir dependência da app (importante: get_db é do módulo backend.db)
         app.dependency_overrides[get_db] = override_get_db
+        # rotas GET usam o pool de leitura; aponta para o mesmo banco de teste
+        app.dependency_overrides[get_read_db] = override_get_db
 
         # TestClient apontando para app com dependência sobrescrita
         cls.client = TestClient(app)
@@ -73,6 +75,7 @@ class APIBasicTest(unittest.TestCase):
     def tearDownClass(cls):
         # limpar override e fechar engine antes de remover arquivo
         app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_read_db, None)
         try:
             cls.engine.dispose()
         except Exception: